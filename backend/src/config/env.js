@@ -16,6 +16,7 @@ module.exports = {
   ML_SERVICE_URL: process.env.ML_SERVICE_URL || 'http://localhost:8000',
   ML_TEXT_ENDPOINT: '/ml/text/classify',
   ML_IMAGE_ENDPOINT: '/ml/image/classify',
+  ML_CLASSIFY_ENDPOINT: '/ml/classify',
 
 
   // File Upload
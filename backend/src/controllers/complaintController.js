@@ -83,24 +83,22 @@ const createComplaint = async (req, res) => {
       };
     }
 
-    // Try text classification via ML service
-    try {
-      const textPrediction = await mlService.classifyText(`${title} ${description}`);
-      complaintData.categoryConfidence = textPrediction.confidence;
-    } catch (error) {
-      logger.warn('ML Service text classification failed:', error.message);
+    // Classify text and image in a single ML call
+    if (imageUrl) {
+      complaintData.imageUrl = imageUrl;
     }
 
-    // Try image classification if image provided
-    if (imageUrl) {
-      try {
-        const imagePrediction = await mlService.classifyImage(imageUrl);
-        complaintData.imageUrl = imageUrl;
-        complaintData.imageMLPrediction = imagePrediction.category;
-        complaintData.imageMLConfidence = imagePrediction.confidence;
-      } catch (error) {
-        logger.warn('ML Service image classification failed:', error.message);
+    try {
+      const prediction = await mlService.classifyComplaint(`${title} ${description}`, imageUrl);
+      if (prediction.text) {
+        complaintData.categoryConfidence = prediction.text.confidence;
+      }
+      if (prediction.image) {
+        complaintData.imageMLPrediction = prediction.image.category;
+        complaintData.imageMLConfidence = prediction.image.confidence;
       }
+    } catch (error) {
+      logger.warn('ML Service classification failed:', error.message);
     }
 
     const complaint = new Complaint(complaintData);
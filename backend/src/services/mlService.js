@@ -1,8 +1,54 @@
+const fs = require('fs');
+const path = require('path');
 const axios = require('axios');
 const FormData = require('form-data');
 const config = require('../config/env');
 const logger = require('../utils/logger');
 
+const TEXT_TIMEOUT_MS = 30000;
+const IMAGE_TIMEOUT_MS = 60000;
+
+// Tell ml-service when we stop waiting so it can drop expired work
+const deadlineHeaders = (timeoutMs) => ({ 'X-Request-Timeout-Ms': String(timeoutMs) });
+
+// Per-stage durations reported by ml-service (queue, decode, embed, cnn, ...)
+const logTiming = (label, response, level = 'debug') => {
+  const timing = response && response.headers && response.headers['server-timing'];
+  if (timing) {
+    logger[level](`ML Service - ${label} Server-Timing: ${timing}`);
+  }
+};
+
+// Attach an image as the multipart `file` field: a multer file (memory or disk
+// storage) or a base64 data URL as stored on complaints. Returns false for
+// anything else, e.g. remote URLs, which ml-service cannot fetch.
+const appendImageFile = (formData, imageInput) => {
+  if (imageInput && imageInput.buffer) {
+    formData.append('file', imageInput.buffer, {
+      filename: imageInput.originalname || 'image.jpg',
+      contentType: imageInput.mimetype || 'image/jpeg',
+    });
+    return true;
+  }
+  if (imageInput && imageInput.path) {
+    formData.append('file', fs.createReadStream(imageInput.path), {
+      filename: imageInput.originalname || path.basename(imageInput.path),
+      contentType: imageInput.mimetype || 'image/jpeg',
+    });
+    return true;
+  }
+  if (typeof imageInput === 'string' && imageInput.startsWith('data:')) {
+    const [header, data] = imageInput.split(',');
+    const contentType = header.slice(5).split(';')[0] || 'image/jpeg';
+    formData.append('file', Buffer.from(data, 'base64'), {
+      filename: 'image.jpg',
+      contentType,
+    });
+    return true;
+  }
+  return false;
+};
+
 const mlService = {
   // Classify text using ML service
   classifyText: async (text) => {
@@ -10,8 +56,9 @@ const mlService = {
       const response = await axios.post(
         `${config.ML_SERVICE_URL}${config.ML_TEXT_ENDPOINT}`,
         { text },
-        { timeout: 30000 }
+        { timeout: TEXT_TIMEOUT_MS, headers: deadlineHeaders(TEXT_TIMEOUT_MS) }
       );
+      logTiming('Text Classification', response);
 
       return {
         category: response.data.category || response.data.prediction,
@@ -19,6 +66,7 @@ const mlService = {
       };
     } catch (error) {
       logger.error('ML Service - Text Classification Error:', error.message);
+      logTiming('Text Classification', error.response, 'error');
       throw new Error('Failed to classify text');
     }
   },
@@ -33,26 +81,22 @@ const mlService = {
         response = await axios.post(
           `${config.ML_SERVICE_URL}${config.ML_IMAGE_ENDPOINT}`,
           { image_url: imageInput },
-          { timeout: 60000 }
+          { timeout: IMAGE_TIMEOUT_MS, headers: deadlineHeaders(IMAGE_TIMEOUT_MS) }
         );
       } 
       // If it's a file buffer/stream, send as FormData
       else if (imageInput.buffer || imageInput.path) {
         const formData = new FormData();
-        
-        // Append the buffer with proper metadata
-        formData.append('file', imageInput.buffer, {
-          filename: imageInput.originalname || 'image.jpg',
-          contentType: imageInput.mimetype || 'image/jpeg',
-        });
+        appendImageFile(formData, imageInput);
         
         response = await axios.post(
           `${config.ML_SERVICE_URL}${config.ML_IMAGE_ENDPOINT}`,
           formData,
           { 
-            timeout: 60000,
+            timeout: IMAGE_TIMEOUT_MS,
             headers: {
               ...formData.getHeaders(),
+              ...deadlineHeaders(IMAGE_TIMEOUT_MS),
             },
           }
         );
@@ -60,6 +104,8 @@ const mlService = {
         throw new Error('Invalid image input format');
       }
 
+      logTiming('Image Classification', response);
+
       // Return standardized response
       return {
         prediction: response.data.prediction || response.data.category,
@@ -70,11 +116,60 @@ const mlService = {
       logger.error('ML Service - Image Classification Error:', error.message);
       if (error.response) {
         logger.error('ML Service Response:', error.response.data);
+        logTiming('Image Classification', error.response, 'error');
       }
       throw new Error('Failed to classify image');
     }
   },
 
+  // Classify text and optional image in one call (pipelines run concurrently)
+  classifyComplaint: async (text, imageInput = null) => {
+    try {
+      const formData = new FormData();
+      formData.append('text', text);
+
+      const imageSkipped = Boolean(imageInput) && !appendImageFile(formData, imageInput);
+      if (imageSkipped) {
+        const kind = typeof imageInput === 'string' ? 'URL' : typeof imageInput;
+        logger.warn(`ML Service - Unsupported image input (${kind}), classifying complaint text only`);
+      }
+
+      const response = await axios.post(
+        `${config.ML_SERVICE_URL}${config.ML_CLASSIFY_ENDPOINT}`,
+        formData,
+        {
+          timeout: IMAGE_TIMEOUT_MS,
+          headers: { ...formData.getHeaders(), ...deadlineHeaders(IMAGE_TIMEOUT_MS) },
+          maxContentLength: Infinity,
+          maxBodyLength: Infinity,
+        }
+      );
+
+      logTiming('Complaint Classification', response);
+
+      const { text: textResult, image: imageResult } = response.data;
+
+      return {
+        category: response.data.prediction,
+        confidence: response.data.confidence || 0,
+        text: textResult && textResult.success
+          ? { category: textResult.prediction, confidence: textResult.confidence || 0 }
+          : null,
+        image: imageResult && imageResult.success
+          ? { category: imageResult.prediction, confidence: imageResult.confidence || 0 }
+          : null,
+        imageSkipped,
+      };
+    } catch (error) {
+      logger.error('ML Service - Complaint Classification Error:', error.message);
+      if (error.response) {
+        logger.error('ML Service Response:', error.response.data);
+        logTiming('Complaint Classification', error.response, 'error');
+      }
+      throw new Error('Failed to classify complaint');
+    }
+  },
+
   // Check if ML service is healthy
   healthCheck: async () => {
     try {
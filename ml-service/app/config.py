@@ -4,7 +4,7 @@ Handles environment variables and model paths
 """
 
 from pathlib import Path
-from typing import List
+from typing import Dict, List, Optional, Set
 import os
 
 # For Pydantic v2 (if you have v1, change this)
@@ -24,22 +24,169 @@ class Settings(BaseSettings):
     API_PORT: int = 8000
     API_RELOAD: bool = True
     
+    # Binary RPC (length-prefixed msgpack over TCP) for service-to-service calls
+    RPC_ENABLED: bool = False
+    RPC_HOST: str = "127.0.0.1"  # No authentication: keep it off public interfaces
+    RPC_PORT: int = 8001
+    RPC_MAX_STREAM_IMAGES: int = 32  # Max images per image.classify_stream call
+    
     # Model Paths - Using absolute paths for Windows compatibility
     BASE_DIR: Path = Path(__file__).resolve().parent
     MODELS_DIR: Path = BASE_DIR / "models"
     TEXT_MODEL_PATH: Path = MODELS_DIR / "text_classifier.pkl"
+    TEXT_HEAD_PATH: Path = MODELS_DIR / "text_head.npz"  # NumPy export of TEXT_MODEL_PATH
     IMAGE_MODEL_PATH: Path = MODELS_DIR / "image_classifier.h5"
+    TEXT_FAST_MODEL_PATH: Path = MODELS_DIR / "text_fast_classifier.pkl"
+    TEXT_PROJECTION_PATH: Path = MODELS_DIR / "text_projection.npz"
+    LABEL_ENCODER_PATH: Path = MODELS_DIR / "label_encoder.pkl"
     
     # Model Configuration
     IMAGE_SIZE: tuple = (224, 224)
     MAX_TEXT_LENGTH: int = 512
     
+    # Compiled inference: one traced CNN graph per batch-size bucket
+    IMAGE_BATCH_SIZES: List[int] = [1]  # Smaller batches are padded to the next bucket
+    IMAGE_JIT_COMPILE: bool = False  # XLA-compile the CNN forward pass
+    MODEL_WARMUP: bool = True  # Trace/run every bucket at load so first requests are fast
+    
+    # Upload limits (checked from the request stream and image header, before decoding)
+    MAX_UPLOAD_BYTES: int = 10 * 1024 * 1024  # Per image file
+    MAX_REQUEST_BYTES: int = 11 * 1024 * 1024  # Whole request body incl. form fields / JSON
+    IMAGE_MAX_DIMENSION: int = 10000  # Pixels per side
+    IMAGE_MAX_PIXELS: int = 40_000_000  # Decompression-bomb guard (width x height)
+    
+    # Perceptual hashing for duplicate image detection
+    IMAGE_HASH_ALGORITHM: str = "dhash"  # "dhash" or "phash"
+    IMAGE_HASH_RADIUS: int = 10  # Default Hamming radius for /ml/image/similar
+    IMAGE_HASH_INDEX_SIZE: int = 50000  # Max hashes kept in memory
+    IMAGE_DEDUP_REUSE: bool = False  # Reuse stored predictions for near-identical photos
+    IMAGE_DEDUP_REUSE_DISTANCE: int = 4
+    
     # Categories
     CATEGORIES: List[str] = ["potholes", "garbage", "fallen_trees", "electric_poles"]
     
     # mBERT Model for multilingual support
     MBERT_MODEL: str = "sentence-transformers/paraphrase-multilingual-MiniLM-L12-v2"
     
+    # Text cascade: a char n-gram first stage answers confident texts,
+    # the rest escalate to the mBERT embedder + classifier head
+    TEXT_CASCADE_ENABLED: bool = True  # Only active if the fast model file exists
+    TEXT_CASCADE_THRESHOLD: float = 0.9
+    
+    # Optional PCA/truncation stage between embedder and head
+    # (dimension is fixed when train_projection.py fits projection + head together)
+    TEXT_PROJECTION_ENABLED: bool = True  # Only active if the projection file exists
+    
+    # Serve the head from the NumPy export (export_text_head.py) instead of the pickle.
+    # Only active if the export matches the current pickle, label encoder and projection.
+    TEXT_HEAD_ENABLED: bool = True
+    
+    # Language routing: detected language (en, hi, mr, hi-latn, mixed, unknown) ->
+    # backend ("multilingual", "cascade" or a directory under TEXT_BACKENDS_DIR).
+    # Unlisted languages and unavailable backends use "multilingual".
+    TEXT_LANGUAGE_ROUTING: bool = False
+    TEXT_LANGUAGE_ROUTES: Dict[str, str] = {}  # e.g. {"en": "english"}
+    TEXT_BACKENDS_DIR: Path = MODELS_DIR / "text_backends"
+    # Char n-gram language profiles (train_language_backend.py --train-profiles);
+    # without the file, Hindi/Marathi and English/romanized use a keyword heuristic
+    LANGUAGE_PROFILES_PATH: Path = MODELS_DIR / "language_profiles.json"
+    
+    # Inference executors (thread pools per pipeline)
+    TEXT_WORKERS: int = 2
+    IMAGE_WORKERS: int = 2
+    
+    # Process-isolated inference: the embedder, CNN and image decode/resize run in
+    # supervised worker processes, with tensors passed through shared memory.
+    # The executor threads above then only wait on those processes.
+    INFERENCE_PROCESSES: bool = False
+    TEXT_PROCESSES: int = 1
+    IMAGE_PREPROCESS_PROCESSES: Optional[int] = None  # Default: half the logical CPUs
+    CNN_PROCESSES: int = 1
+    WORKER_QUEUE_DEPTH: int = 4  # Shared-memory slots (in-flight calls) per process
+    WORKER_TEXT_SLOT_BYTES: int = 4 * 1024 * 1024  # Embeddings per text call are chunked to fit
+    WORKER_IMAGE_SLOT_BYTES: int = 2 * 1024 * 1024  # Typical upload; larger files go through the pipe
+    WORKER_START_TIMEOUT_S: float = 300.0
+    WORKER_HANG_TIMEOUT_S: float = 120.0  # Restart a worker whose oldest call is older than this
+    WORKER_HEALTH_INTERVAL_S: float = 2.0
+    
+    # Model memory budget (edge nodes): evict idle models, reload on demand
+    MODEL_MEMORY_BUDGET_MB: Optional[float] = None  # None = account only, never evict
+    MODEL_IDLE_EVICT_S: float = 600.0  # Only models unused this long are evicted
+    MODEL_EVICT_CHECK_INTERVAL_S: float = 30.0
+    
+    # Append-only embedding store (opt-in): full-stage text embeddings with their
+    # predictions, for retraining the head without re-encoding the corpus
+    EMBEDDING_STORE_ENABLED: bool = False
+    EMBEDDING_STORE_DIR: Path = BASE_DIR.parent / "data" / "embeddings"
+    EMBEDDING_STORE_SEGMENT_ROWS: int = 65536  # Rows per segment file set
+    EMBEDDING_STORE_DTYPE: str = "float32"  # float16 halves the disk footprint
+    EMBEDDING_STORE_QUEUE_SIZE: int = 1024  # Batches waiting for the writer (dropped beyond)
+    EMBEDDING_STORE_FLUSH_INTERVAL_S: float = 2.0  # Rows become visible to readers per flush
+    
+    # Online learning (opt-in, needs the embedding store): label corrections sent to
+    # /ml/text/feedback retrain an SGD head in a background thread; it replaces the
+    # served head only when its accuracy on held-out corrections does not drop
+    ONLINE_LEARNING_ENABLED: bool = False
+    ONLINE_LEARNING_DIR: Path = BASE_DIR.parent / "data" / "online"
+    TEXT_ONLINE_HEAD_PATH: Path = MODELS_DIR / "text_online_head.npz"
+    ONLINE_LEARNING_INTERVAL_S: float = 600.0
+    ONLINE_LEARNING_MIN_CORRECTIONS: int = 20  # New corrections that start a round early
+    ONLINE_HOLDOUT_FRACTION: float = 0.2  # Corrections kept out of training (by text hash)
+    ONLINE_MIN_HOLDOUT: int = 20  # Never swap on fewer held-out corrections
+    ONLINE_MAX_ACCURACY_DROP: float = 0.0
+    ONLINE_GENERAL_HOLDOUT_ROWS: int = 5000  # Held-out confident base-head predictions per round
+    ONLINE_GENERAL_HOLDOUT_CONFIDENCE: float = 0.9
+    ONLINE_MAX_GENERAL_ACCURACY_DROP: float = 0.02  # Allowed loss of agreement on them
+    ONLINE_PSEUDO_LABEL_CONFIDENCE: Optional[float] = 0.9  # Also learn confident predictions (None: off)
+    ONLINE_CORRECTION_WEIGHT: float = 5.0  # Sample weight of a correction vs a pseudo-label
+    ONLINE_EPOCHS: int = 5  # Passes over the corrections per round
+    
+    # Async jobs (/ml/jobs): durable SQLite queue drained by background workers
+    # in batches, at bulk priority on the text/image executors
+    JOBS_ENABLED: bool = False
+    JOBS_DB_PATH: Path = BASE_DIR.parent / "data" / "jobs.sqlite3"
+    JOBS_WORKERS: int = 2  # Threads claiming and running job batches
+    JOBS_BATCH_SIZE: int = 32  # Jobs claimed per batch (texts and images run batched)
+    JOBS_MAX_TEXTS: int = 1000  # Max texts per batch job
+    JOBS_MAX_QUEUED: int = 10000  # Submissions beyond this get 503
+    JOBS_RESULT_TTL_S: float = 24 * 3600.0  # Finished jobs (and results) are kept this long
+    JOBS_LEASE_S: float = 300.0  # A claimed job is re-run if its worker stops renewing for this long
+    JOBS_MAX_ATTEMPTS: int = 3  # Claims before a job that keeps dying is failed
+    JOBS_POLL_INTERVAL_S: float = 1.0  # Idle workers re-check the queue (other processes' jobs)
+
+    # Runtime threading (None = derive from CPU topology when RUNTIME_AUTO_THREADS)
+    # Written per host by `python autotune.py` into .env.runtime
+    RUNTIME_AUTO_THREADS: bool = True
+    TORCH_NUM_THREADS: Optional[int] = None  # Intra-op threads per text forward pass
+    TORCH_INTEROP_THREADS: Optional[int] = None
+    TF_INTRA_OP_THREADS: Optional[int] = None  # Intra-op threads per CNN forward pass
+    TF_INTER_OP_THREADS: Optional[int] = None
+    TEXT_CPU_AFFINITY: Optional[str] = None  # CPU list for text workers, e.g. "0-3"
+    IMAGE_CPU_AFFINITY: Optional[str] = None  # CPU list for image workers, e.g. "4-7"
+    
+    # Priority scheduling (X-Priority: interactive|bulk, batch routes default to bulk)
+    PRIORITY_INTERACTIVE_WEIGHT: float = 8.0
+    PRIORITY_BULK_WEIGHT: float = 1.0
+    PRIORITY_BULK_MAX_CONCURRENCY: Optional[int] = None  # Default: workers - 1
+    PRIORITY_INTERACTIVE_MAX_QUEUE: int = 256
+    PRIORITY_BULK_MAX_QUEUE: int = 64
+    PRIORITY_SHED_BULK_AT: int = 16  # Interactive backlog that sheds queued bulk work
+    
+    # Request deadlines (override per request with X-Request-Timeout-Ms);
+    # defaults match the backend's axios timeouts
+    TEXT_REQUEST_TIMEOUT_S: float = 30.0
+    IMAGE_REQUEST_TIMEOUT_S: float = 60.0
+    DISCONNECT_POLL_INTERVAL_S: float = 0.25
+    
+    # Multimodal /ml/classify
+    FUSION_TEXT_WEIGHT: float = 0.5  # Image weight is 1 - this
+    EARLY_EXIT_THRESHOLD: Optional[float] = None  # Skip the CNN above this text confidence
+    
+    # Embedding endpoint
+    EMBED_MAX_TEXTS: int = 256  # Max texts per /ml/text/embed request
+    EMBED_BATCH_SIZE: int = 32  # Encoder forward-pass batch size
+    EMBED_MAX_BATCH_TOKENS: int = 4096  # Padded tokens per forward pass (length buckets)
+    
     # CORS Settings
     ALLOWED_ORIGINS: List[str] = [
         "http://localhost:3000",  # React dev server
@@ -48,9 +195,14 @@ class Settings(BaseSettings):
     
     # Logging
     LOG_LEVEL: str = "INFO"
+    LOG_FORMAT: str = "text"  # text (colored lines) or json (one object per line)
+    LOG_ENQUEUE: bool = True  # Write from a background thread instead of the caller
+    LOG_QUEUE_SIZE: int = 10000  # Lines buffered for the background writer (info lines dropped beyond)
+    LOG_SAMPLE_RATE: float = 0.1  # Fraction of per-request info lines kept (warnings/errors always)
     
     class Config:
-        env_file = ".env"
+        # .env overrides the autotuned .env.runtime
+        env_file = (".env.runtime", ".env")
         case_sensitive = True
         # Allow arbitrary types for Path objects
         arbitrary_types_allowed = True
@@ -65,4 +217,144 @@ try:
     
 except Exception as e:
     print(f"Error loading settings: {e}")
-    raise
\ No newline at end of file
+    raise
+
+
+def parse_cpu_list(value: Optional[str]) -> Optional[Set[int]]:
+    """Parse a Linux-style CPU list such as "0-3,8,10-11" """
+    if not value:
+        return None
+    cpus = set()
+    for part in value.split(","):
+        part = part.strip()
+        if not part:
+            continue
+        if "-" in part:
+            low, high = part.split("-", 1)
+            cpus.update(range(int(low), int(high) + 1))
+        else:
+            cpus.add(int(part))
+    return cpus
+
+
+def format_cpu_list(cpus) -> str:
+    """Format CPU ids as a compact Linux-style list"""
+    ranges = []
+    for cpu in sorted(cpus):
+        if ranges and cpu == ranges[-1][1] + 1:
+            ranges[-1][1] = cpu
+        else:
+            ranges.append([cpu, cpu])
+    return ",".join(str(low) if low == high else f"{low}-{high}" for low, high in ranges)
+
+
+def cpu_topology() -> Dict[str, object]:
+    """
+    Describe the CPUs this process may use
+
+    Returns logical CPUs available to the process (respecting cgroup/taskset
+    affinity) and an estimate of physical cores from sysfs thread siblings.
+    """
+    if hasattr(os, "sched_getaffinity"):
+        available = sorted(os.sched_getaffinity(0))
+    else:
+        available = list(range(os.cpu_count() or 1))
+
+    cores = set()
+    for cpu in available:
+        siblings = Path(f"/sys/devices/system/cpu/cpu{cpu}/topology/thread_siblings_list")
+        try:
+            cores.add(siblings.read_text().strip())
+        except OSError:
+            cores.add(str(cpu))
+
+    return {
+        "logical_cpus": len(available),
+        "physical_cores": len(cores),
+        "available": available,
+    }
+
+
+def resolve_thread_config(config: Settings = None) -> Dict[str, object]:
+    """
+    Work out thread counts and CPU sets for both frameworks
+
+    Explicit settings win. Otherwise (RUNTIME_AUTO_THREADS) the physical
+    cores are split between the text and image pipelines, and each pipeline's
+    cores are divided among its workers, so that
+    TEXT_WORKERS * TORCH_NUM_THREADS + IMAGE_WORKERS * TF_INTRA_OP_THREADS
+    does not exceed the core count and the two runtimes stop oversubscribing
+    each other.
+    """
+    config = config or settings
+    topology = cpu_topology()
+
+    text_cpus = parse_cpu_list(config.TEXT_CPU_AFFINITY)
+    image_cpus = parse_cpu_list(config.IMAGE_CPU_AFFINITY)
+
+    cores = max(1, topology["physical_cores"])
+    text_cores = len(text_cpus) if text_cpus else max(1, cores // 2)
+    image_cores = len(image_cpus) if image_cpus else max(1, cores - cores // 2)
+
+    def pick(explicit: Optional[int], auto: int) -> Optional[int]:
+        if explicit is not None:
+            return explicit
+        return auto if config.RUNTIME_AUTO_THREADS else None
+
+    return {
+        "torch_num_threads": pick(config.TORCH_NUM_THREADS, max(1, text_cores // config.TEXT_WORKERS)),
+        "torch_interop_threads": pick(config.TORCH_INTEROP_THREADS, 1),
+        "tf_intra_op_threads": pick(config.TF_INTRA_OP_THREADS, max(1, image_cores // config.IMAGE_WORKERS)),
+        "tf_inter_op_threads": pick(config.TF_INTER_OP_THREADS, 1),
+        "text_cpus": text_cpus,
+        "image_cpus": image_cpus,
+        "topology": {key: value for key, value in topology.items() if key != "available"},
+    }
+
+
+def configure_runtime(config: Settings = None) -> Dict[str, object]:
+    """
+    Apply thread settings to PyTorch and TensorFlow
+
+    Must run before either framework executes its first op (TensorFlow
+    rejects threading changes after its runtime is initialized).
+    Returns the applied configuration for logging and /health.
+    """
+    resolved = resolve_thread_config(config)
+
+    try:
+        import torch
+
+        if resolved["torch_num_threads"]:
+            torch.set_num_threads(resolved["torch_num_threads"])
+        if resolved["torch_interop_threads"]:
+            try:
+                torch.set_num_interop_threads(resolved["torch_interop_threads"])
+            except RuntimeError:
+                # Only settable once, before any inter-op work has started
+                pass
+    except ImportError:
+        pass
+
+    try:
+        import tensorflow as tf
+
+        if resolved["tf_intra_op_threads"]:
+            tf.config.threading.set_intra_op_parallelism_threads(resolved["tf_intra_op_threads"])
+        if resolved["tf_inter_op_threads"]:
+            tf.config.threading.set_inter_op_parallelism_threads(resolved["tf_inter_op_threads"])
+    except (ImportError, RuntimeError):
+        pass
+
+    return resolved
+
+
+def pin_current_thread(cpus: Optional[Set[int]]) -> None:
+    """
+    Restrict the calling thread to a CPU set (Linux only, no-op elsewhere)
+
+    Used as a worker-pool initializer; framework threads spawned from a
+    pinned worker inherit its affinity.
+    """
+    if cpus and hasattr(os, "sched_setaffinity"):
+        os.sched_setaffinity(0, cpus)
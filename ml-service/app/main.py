@@ -4,22 +4,27 @@ Main application entry point
 """
 
 from fastapi import FastAPI, HTTPException
+from fastapi.concurrency import run_in_threadpool
 from fastapi.middleware.cors import CORSMiddleware
 from fastapi.responses import JSONResponse
 from loguru import logger
-import sys
 
-from app.config import settings
-from app.routes import text_routes, image_routes
+from app.config import settings, configure_runtime, format_cpu_list
+from app.routes import text_routes, image_routes, classify_routes, job_routes
 from app.models.model_loader import model_loader
+from app.utils.metrics import metrics
+from app.utils.executors import shutdown_executors
+from app.utils.uploads import RequestSizeLimitMiddleware
+from app.utils.timing import ServerTimingMiddleware
+from app.utils.logs import configure_logging, flush_logging
+from app.utils.embedding_store import embedding_store
+from app.services.online_learning import online_learner
+from app.services.job_service import job_service
+from app.rpc import rpc_server
+from app.workers import inference_workers
 
 # Configure logging
-logger.remove()
-logger.add(
-    sys.stdout,
-    format="<green>{time:YYYY-MM-DD HH:mm:ss}</green> | <level>{level: <8}</level> | <cyan>{name}</cyan>:<cyan>{function}</cyan> - <level>{message}</level>",
-    level=settings.LOG_LEVEL
-)
+configure_logging()
 
 # Initialize FastAPI app
 app = FastAPI(
@@ -39,6 +44,12 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
+# Reject oversized bodies while they stream in, before multipart parsing
+app.add_middleware(RequestSizeLimitMiddleware, max_body_bytes=settings.MAX_REQUEST_BYTES)
+
+# Per-stage timings for /ml/* requests in a Server-Timing header
+app.add_middleware(ServerTimingMiddleware, prefix="/ml/")
+
 
 @app.on_event("startup")
 async def startup_event():
@@ -59,7 +70,22 @@ async def startup_event():
     
     errors = []
     
+    # Thread counts must be fixed before TF/PyTorch run their first op
+    runtime = configure_runtime()
+    app.state.runtime = runtime
+    logger.info(
+        f"🧵 Threads: torch={runtime['torch_num_threads']}/{runtime['torch_interop_threads']}, "
+        f"tf={runtime['tf_intra_op_threads']}/{runtime['tf_inter_op_threads']} "
+        f"({runtime['topology']['physical_cores']} cores, "
+        f"{runtime['topology']['logical_cpus']} logical CPUs)"
+    )
+    
     try:
+        # Process mode: embedder, CNN and image preprocessing load in workers
+        if settings.INFERENCE_PROCESSES:
+            logger.info("🧩 Starting inference worker processes...")
+            await run_in_threadpool(inference_workers.start)
+        
         logger.info("📦 Loading ML models...")
         
         # Load Text Classifier
@@ -83,9 +109,17 @@ async def startup_event():
         except Exception as e:
             logger.warning(f"⚠ Label encoder: {str(e)}")
         
+        # Load fast first-stage text classifier (optional)
+        if settings.TEXT_CASCADE_ENABLED:
+            if model_loader.load_fast_text_classifier() is not None:
+                logger.success("✓ Fast text classifier loaded (cascade enabled)")
+        
         # Load Embedder
         try:
-            model_loader.load_embedder()
+            if not inference_workers.enabled:
+                model_loader.load_embedder()
+            elif not inference_workers.text.available():
+                raise RuntimeError("no text worker process started")
             models_status["embedder"] = True
             logger.success("✓ Embedder loaded")
         except Exception as e:
@@ -95,7 +129,11 @@ async def startup_event():
         
         # Load Image Classifier
         try:
-            model_loader.load_image_classifier()
+            if not inference_workers.enabled:
+                if model_loader.load_image_classifier() is None:
+                    raise RuntimeError("model could not be loaded")
+            elif not inference_workers.cnn.available():
+                raise RuntimeError("no cnn worker process started")
             models_status["image_classifier"] = True
             logger.success("✓ Image classifier loaded")
         except Exception as e:
@@ -135,6 +173,17 @@ async def startup_event():
         else:
             logger.success("✅ ALL SYSTEMS READY - Both text and image classification working!")
         
+        if settings.RPC_ENABLED:
+            await rpc_server.start()
+        
+        if settings.ONLINE_LEARNING_ENABLED:
+            online_learner.start()
+            logger.info("🎓 Online learning enabled (POST /ml/text/feedback)")
+        
+        if settings.JOBS_ENABLED:
+            job_service.start()
+            logger.info(f"📮 Job workers started ({settings.JOBS_WORKERS}, queue: {settings.JOBS_DB_PATH})")
+        
     except Exception as e:
         logger.error(f"❌ Critical startup error: {str(e)}")
         import traceback
@@ -146,6 +195,18 @@ async def startup_event():
 async def shutdown_event():
     """Cleanup on shutdown"""
     logger.info("Shutting down ML Service")
+    await rpc_server.stop()
+    # Before the executors and workers: a batch cut short by their shutdown
+    # goes back to the queue, and one still running after the join timeout
+    # is re-run after its lease
+    await run_in_threadpool(job_service.stop)
+    shutdown_executors()
+    inference_workers.stop()
+    online_learner.stop()
+    # Commit embeddings still queued for the store
+    embedding_store.close()
+    # Flush lines still queued for the background sink
+    flush_logging()
 
 
 @app.get("/")
@@ -157,13 +218,28 @@ async def root():
         "version": "1.0.0",
         "endpoints": {
             "docs": "/docs",
+            "classification": "/ml/classify",
             "text_classification": "/ml/text/classify",
+            "text_embeddings": "/ml/text/embed",
+            "text_feedback": "/ml/text/feedback",
             "image_classification": "/ml/image/classify",
-            "health": "/health"
+            "similar_images": "/ml/image/similar",
+            "jobs": "/ml/jobs",
+            "health": "/health",
+            "metrics": "/metrics"
         }
     }
 
 
+def _runtime_info() -> dict:
+    """Applied thread configuration (JSON-safe)"""
+    runtime = dict(getattr(app.state, "runtime", {}))
+    for key in ("text_cpus", "image_cpus"):
+        if runtime.get(key):
+            runtime[key] = format_cpu_list(runtime[key])
+    return runtime
+
+
 @app.get("/health")
 async def health_check():
     """
@@ -176,6 +252,11 @@ async def health_check():
         return {
             "status": "healthy",
             "models": model_info,
+            "runtime": _runtime_info(),
+            "workers": inference_workers.status(),
+            "embedding_store": embedding_store.status(),
+            "online_learning": online_learner.status(),
+            "jobs": job_service.status(),
             "api_version": "1.0.0"
         }
         
@@ -184,18 +265,28 @@ async def health_check():
         raise HTTPException(status_code=503, detail="Service unhealthy")
 
 
+@app.get("/metrics")
+async def get_metrics():
+    """Return in-process counters and latency summaries"""
+    return metrics.snapshot()
+
+
 @app.get("/categories")
 async def get_categories():
     """Get list of supported categories"""
     return {
         "categories": settings.CATEGORIES,
-        "count": len(settings.CATEGORIES)
+        "count": len(settings.CATEGORIES),
+        # Slim responses return probabilities as arrays in this order
+        "index": {category: index for index, category in enumerate(settings.CATEGORIES)}
     }
 
 
 # Include routers
 app.include_router(text_routes.router, prefix="/ml")
 app.include_router(image_routes.router, prefix="/ml")
+app.include_router(classify_routes.router, prefix="/ml")
+app.include_router(job_routes.router, prefix="/ml")
 
 
 # Global exception handler
@@ -0,0 +1,333 @@
+"""
+Linear Classifier Head - NumPy runtime for exported scikit-learn heads
+Linear models (optionally sigmoid-calibrated, optionally behind a scaler
+and the embedding projection) are folded into one weight matrix stored in
+an uncompressed .npz, so probabilities for any batch size take one matmul
+and the weights can be memory-mapped instead of unpickled
+"""
+
+import hashlib
+import zipfile
+from pathlib import Path
+from typing import Any, Dict, Iterable, Optional, Union
+
+import numpy as np
+
+HEAD_KINDS = ("softmax", "sigmoid")
+
+
+def _mmap_npz(path: Union[str, Path]) -> Dict[str, np.ndarray]:
+    """
+    Memory-map every array of an uncompressed .npz
+
+    np.load ignores mmap_mode for .npz archives, but np.savez stores
+    members uncompressed, so each .npy payload can be mapped in place.
+    """
+    arrays = {}
+    with zipfile.ZipFile(path) as archive, open(path, "rb") as handle:
+        for info in archive.infolist():
+            if info.compress_type != zipfile.ZIP_STORED:
+                raise ValueError(f"{path} is compressed and cannot be memory-mapped")
+
+            # Local file header: 30 bytes + file name + extra field
+            handle.seek(info.header_offset + 26)
+            name_length, extra_length = np.frombuffer(handle.read(4), dtype="<u2")
+            handle.seek(info.header_offset + 30 + name_length + extra_length)
+
+            version = np.lib.format.read_magic(handle)
+            if version == (1, 0):
+                shape, fortran_order, dtype = np.lib.format.read_array_header_1_0(handle)
+            else:
+                shape, fortran_order, dtype = np.lib.format.read_array_header_2_0(handle)
+            name = info.filename[:-len(".npy")]
+            if dtype.hasobject:
+                raise ValueError(f"{path}:{name} holds Python objects")
+            if int(np.prod(shape)) == 0 or dtype.kind == "U":
+                # Labels and scalars are tiny; read them normally
+                with archive.open(info) as member:
+                    arrays[name] = np.lib.format.read_array(member, allow_pickle=False)
+            else:
+                arrays[name] = np.memmap(
+                    path,
+                    dtype=dtype,
+                    mode="r",
+                    offset=handle.tell(),
+                    shape=shape,
+                    order="F" if fortran_order else "C"
+                )
+    return arrays
+
+
+def source_digest(paths: Iterable[Union[str, Path]]) -> str:
+    """SHA-256 over the files a head was exported from (missing files count as absent)"""
+    digest = hashlib.sha256()
+    for path in paths:
+        path = Path(path)
+        digest.update(path.name.encode())
+        if path.exists():
+            digest.update(path.read_bytes())
+        digest.update(b"\0")
+    return digest.hexdigest()
+
+
+class LinearHead:
+    """
+    Exported classifier head: probabilities = link(x @ weights + bias)
+
+    kind "softmax": multinomial logistic regression, weights (dim, classes)
+    kind "sigmoid": one-vs-rest sigmoids averaged over `folds` stacked
+        column blocks (calibrated CV folds, or 1 for plain OvR/binary
+        models); column j is expit(-(slopes[j] * z + offsets[j])),
+        normalized per fold. Binary blocks have one column (the positive
+        class).
+    """
+
+    def __init__(
+        self,
+        kind: str,
+        weights: np.ndarray,
+        bias: np.ndarray,
+        classes: np.ndarray,
+        slopes: Optional[np.ndarray] = None,
+        offsets: Optional[np.ndarray] = None,
+        folds: int = 1,
+        projection_folded: bool = False,
+        source_digest: str = ""
+    ):
+        if kind not in HEAD_KINDS:
+            raise ValueError(f"Unknown head '{kind}'. Supported: {', '.join(HEAD_KINDS)}")
+
+        self.kind = kind
+        self.weights = weights
+        self.bias = np.asarray(bias, dtype=np.float32)
+        self.classes_ = np.asarray(classes)
+        self.slopes = None if slopes is None else np.asarray(slopes, dtype=np.float32)
+        self.offsets = None if offsets is None else np.asarray(offsets, dtype=np.float32)
+        self.folds = int(folds)
+        # True if the embedding projection is already part of `weights`
+        self.projection_folded = bool(projection_folded)
+        # source_digest() of the files this head was exported from
+        self.source_digest = source_digest
+
+        columns = self.weights.shape[1]
+        n_classes = len(self.classes_)
+        block = 1 if n_classes == 2 and kind == "sigmoid" else n_classes
+        if columns != self.folds * block:
+            raise ValueError(
+                f"Head has {columns} columns, expected {self.folds} x {block} for {n_classes} classes"
+            )
+
+    @property
+    def input_dim(self) -> int:
+        return int(self.weights.shape[0])
+
+    @classmethod
+    def from_sklearn(
+        cls,
+        model: Any,
+        label_encoder: Optional[Any] = None,
+        projection: Optional[Any] = None
+    ) -> "LinearHead":
+        """
+        Convert a fitted scikit-learn head
+
+        Supported: LogisticRegression, SGDClassifier(loss="log_loss"), and
+        CalibratedClassifierCV(method="sigmoid") over any linear model with
+        coef_/intercept_ (LinearSVC, SGDClassifier, RidgeClassifier, ...),
+        optionally as the last step of a Pipeline after a StandardScaler.
+
+        Args:
+            model: Fitted estimator or Pipeline
+            label_encoder: Decodes model.classes_ into the stored labels
+            projection: PCA EmbeddingProjection to fold into the weights
+
+        Raises:
+            ValueError: If the model or projection cannot be expressed as
+                a linear map plus link function
+        """
+        from sklearn.calibration import CalibratedClassifierCV
+        from sklearn.linear_model import LogisticRegression, SGDClassifier
+        from sklearn.pipeline import Pipeline
+        from sklearn.preprocessing import StandardScaler
+
+        scaler = None
+        if isinstance(model, Pipeline):
+            steps = [step for _, step in model.steps if step not in (None, "passthrough")]
+            if len(steps) > 2 or (len(steps) == 2 and not isinstance(steps[0], StandardScaler)):
+                raise ValueError("Only Pipeline([StandardScaler, classifier]) can be exported")
+            scaler = steps[0] if len(steps) == 2 else None
+            model = steps[-1]
+
+        if isinstance(model, CalibratedClassifierCV):
+            if model.method != "sigmoid":
+                raise ValueError(f"Only sigmoid calibration can be exported, got '{model.method}'")
+            weights, biases, slopes, offsets = [], [], [], []
+            for calibrated in model.calibrated_classifiers_:
+                coef, intercept = cls._linear_parameters(calibrated.estimator)
+                weights.append(coef)
+                biases.append(intercept)
+                slopes.extend(float(calibrator.a_) for calibrator in calibrated.calibrators)
+                offsets.extend(float(calibrator.b_) for calibrator in calibrated.calibrators)
+            kind = "sigmoid"
+            folds = len(model.calibrated_classifiers_)
+            weights = np.concatenate(weights, axis=1)
+            bias = np.concatenate(biases)
+
+        elif isinstance(model, LogisticRegression):
+            weights, bias = cls._linear_parameters(model)
+            multinomial = (
+                weights.shape[1] > 1
+                and model.solver != "liblinear"
+                and getattr(model, "multi_class", "auto") in ("auto", "multinomial", "deprecated")
+            )
+            kind, folds, slopes, offsets = cls._link(multinomial, weights.shape[1])
+
+        elif isinstance(model, SGDClassifier) and model.loss in ("log_loss", "log"):
+            weights, bias = cls._linear_parameters(model)
+            kind, folds, slopes, offsets = cls._link(False, weights.shape[1])
+
+        else:
+            raise ValueError(
+                f"Cannot export {type(model).__name__}: needs predict_proba from a linear model "
+                f"(wrap margin classifiers in CalibratedClassifierCV(method='sigmoid'))"
+            )
+
+        # Fold scaler: ((x - mean) / scale) @ W = x @ (W / scale) - mean @ (W / scale)
+        if scaler is not None:
+            if scaler.with_std:
+                weights = weights / scaler.scale_[:, None]
+            if scaler.with_mean:
+                bias = bias - scaler.mean_ @ weights
+
+        projection_folded = False
+        if projection is not None:
+            weights, bias = cls._fold_projection(projection, weights, bias)
+            projection_folded = True
+
+        classes = np.asarray(model.classes_)
+        if label_encoder is not None:
+            classes = label_encoder.inverse_transform(classes)
+
+        return cls(
+            kind,
+            np.ascontiguousarray(weights, dtype=np.float32),
+            bias,
+            np.asarray(classes).astype(str),
+            slopes=None if slopes is None else np.asarray(slopes),
+            offsets=None if offsets is None else np.asarray(offsets),
+            folds=folds,
+            projection_folded=projection_folded
+        )
+
+    @staticmethod
+    def _linear_parameters(estimator: Any):
+        """(dim, columns) weights and (columns,) bias of a linear estimator"""
+        if not hasattr(estimator, "coef_"):
+            raise ValueError(f"{type(estimator).__name__} is not a linear model")
+        coef = np.atleast_2d(np.asarray(estimator.coef_, dtype=np.float64))
+        intercept = np.broadcast_to(
+            np.asarray(estimator.intercept_, dtype=np.float64), (coef.shape[0],)
+        )
+        return coef.T, np.array(intercept)
+
+    @staticmethod
+    def _link(multinomial: bool, columns: int):
+        """kind, folds, slopes, offsets for plain (uncalibrated) models"""
+        if multinomial:
+            return "softmax", 1, None, None
+        # expit(z) == expit(-(-1 * z + 0))
+        return "sigmoid", 1, -np.ones(columns), np.zeros(columns)
+
+    @staticmethod
+    def _fold_projection(projection: Any, weights: np.ndarray, bias: np.ndarray):
+        """Compose a PCA projection into the head: (x - mean) @ C @ W"""
+        if projection.kind != "pca":
+            raise ValueError(f"Only PCA projections can be folded, got {projection!r}")
+        folded = projection.components_t.astype(np.float64) @ weights
+        return folded, bias - projection.mean.astype(np.float64) @ folded
+
+    def predict_proba(self, embeddings: np.ndarray) -> np.ndarray:
+        """
+        Class probabilities for an (n, dim) or (dim,) array
+
+        Returns:
+            float32 array of shape (n, len(classes_))
+        """
+        embeddings = np.asarray(embeddings, dtype=np.float32)
+        if embeddings.ndim == 1:
+            embeddings = embeddings.reshape(1, -1)
+
+        scores = embeddings @ self.weights
+        scores += self.bias
+
+        if self.kind == "softmax":
+            scores -= scores.max(axis=1, keepdims=True)
+            np.exp(scores, out=scores)
+            scores /= scores.sum(axis=1, keepdims=True)
+            return scores
+
+        # expit(-(a * z + b)) == 1 / (1 + exp(a * z + b))
+        scores *= self.slopes
+        scores += self.offsets
+        with np.errstate(over="ignore"):
+            np.exp(scores, out=scores)
+        scores += 1.0
+        np.reciprocal(scores, out=scores)
+
+        n_classes = len(self.classes_)
+        scores = scores.reshape(len(embeddings), self.folds, -1)
+        if n_classes == 2:
+            positive = scores[:, :, 0]
+            probabilities = np.stack([1.0 - positive, positive], axis=2)
+        else:
+            totals = scores.sum(axis=2, keepdims=True)
+            probabilities = np.where(totals > 0, scores / np.where(totals > 0, totals, 1.0), 1.0 / n_classes)
+        return probabilities.mean(axis=1, dtype=np.float32)
+
+    def predict(self, embeddings: np.ndarray) -> np.ndarray:
+        """Labels with the highest probability"""
+        return self.classes_[self.predict_proba(embeddings).argmax(axis=1)]
+
+    def save(self, path: Union[str, Path]) -> None:
+        """Write the head to an uncompressed .npz (mmap-able by load())"""
+        arrays = {
+            "kind": np.array(self.kind),
+            "weights": np.ascontiguousarray(self.weights, dtype=np.float32),
+            "bias": self.bias,
+            "classes": self.classes_.astype(str),
+            "folds": np.array(self.folds),
+            "projection_folded": np.array(self.projection_folded),
+            "source_digest": np.array(self.source_digest),
+        }
+        if self.kind == "sigmoid":
+            arrays["slopes"] = self.slopes
+            arrays["offsets"] = self.offsets
+        np.savez(path, **arrays)
+
+    @classmethod
+    def load(cls, path: Union[str, Path], mmap: bool = True) -> "LinearHead":
+        """Read a head written by save(), memory-mapping the weights"""
+        if mmap:
+            data = _mmap_npz(path)
+        else:
+            with np.load(path, allow_pickle=False) as archive:
+                data = {name: archive[name] for name in archive.files}
+
+        kind = str(data["kind"])
+        return cls(
+            kind,
+            data["weights"],
+            data["bias"],
+            data["classes"],
+            slopes=data.get("slopes"),
+            offsets=data.get("offsets"),
+            folds=int(data["folds"]),
+            projection_folded=bool(data["projection_folded"]),
+            source_digest=str(data["source_digest"]) if "source_digest" in data else ""
+        )
+
+    def __repr__(self) -> str:
+        return (
+            f"LinearHead(kind='{self.kind}', dim={self.input_dim}, "
+            f"classes={len(self.classes_)}, folds={self.folds})"
+        )
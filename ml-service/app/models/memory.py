@@ -0,0 +1,328 @@
+"""
+Model Memory Accounting
+Per-model resident-memory deltas and parameter sizes, and a memory budget
+that evicts least recently used idle models (reloaded on next use)
+"""
+
+import ctypes
+import gc
+import os
+import sys
+import threading
+import time
+from contextlib import contextmanager
+from dataclasses import dataclass, field
+from typing import Any, Callable, Dict, Iterator, List, Optional, Set
+
+import numpy as np
+from loguru import logger
+
+from app.config import settings
+from app.utils.metrics import metrics
+
+try:
+    import psutil
+except ImportError:
+    psutil = None
+
+MB = 1024 * 1024
+
+
+def process_rss_bytes(pid: Optional[int] = None) -> Optional[int]:
+    """Resident set size of this (or another) process, None if unavailable"""
+    if psutil is not None:
+        try:
+            return psutil.Process(pid).memory_info().rss
+        except psutil.Error:
+            return None
+    try:
+        with open(f"/proc/{pid or 'self'}/statm") as statm:
+            return int(statm.read().split()[1]) * os.sysconf("SC_PAGE_SIZE")
+    except (OSError, ValueError):
+        return None
+
+
+def _variable_bytes(variable) -> int:
+    dtype = getattr(variable.dtype, "name", variable.dtype)
+    return int(np.prod(variable.shape)) * np.dtype(str(dtype)).itemsize
+
+
+def parameter_bytes(model: Any, _seen: Optional[set] = None, _depth: int = 0) -> int:
+    """
+    Bytes of weights held by a model
+
+    Counts PyTorch parameters and buffers, Keras weights, and NumPy arrays
+    reachable through plain attributes (scikit-learn estimators, pipelines,
+    LinearHead, TextBackend). Memory-mapped arrays count their mapped size.
+    """
+    seen = _seen if _seen is not None else set()
+    if model is None or id(model) in seen or _depth > 6:
+        return 0
+    seen.add(id(model))
+
+    if isinstance(model, np.ndarray):
+        return int(model.nbytes)
+
+    torch = sys.modules.get("torch")
+    if torch is not None and isinstance(model, torch.nn.Module):
+        tensors = list(model.parameters()) + list(model.buffers())
+        return sum(tensor.numel() * tensor.element_size() for tensor in tensors)
+
+    if hasattr(model, "count_params") and hasattr(model, "weights"):
+        return sum(_variable_bytes(weight) for weight in model.weights)
+
+    if isinstance(model, dict):
+        children = list(model.values())
+    elif isinstance(model, (list, tuple)):
+        children = list(model)
+    elif hasattr(model, "__dict__") and not isinstance(model, type):
+        children = list(vars(model).values())
+    else:
+        return 0
+    return sum(parameter_bytes(child, seen, _depth + 1) for child in children)
+
+
+def _release_freed_memory() -> None:
+    """Collect garbage and ask glibc to return freed pages to the OS"""
+    gc.collect()
+    try:
+        ctypes.CDLL("libc.so.6").malloc_trim(0)
+    except (OSError, AttributeError):
+        pass
+
+
+@dataclass
+class ModelRecord:
+    """Accounting for one loaded model"""
+    name: str
+    parameter_bytes: int
+    rss_delta_bytes: Optional[int]
+    load_seconds: float
+    unload: Callable[[], None] = field(repr=False)
+    loaded_at: float = field(default_factory=time.time)
+    last_used: float = field(default_factory=time.monotonic)
+
+    @property
+    def accounted_bytes(self) -> int:
+        """What counts against the budget: the larger of RSS growth and weights"""
+        return max(self.rss_delta_bytes or 0, self.parameter_bytes)
+
+    def as_dict(self) -> Dict[str, Any]:
+        return {
+            "parameter_mb": round(self.parameter_bytes / MB, 2),
+            "rss_delta_mb": round(self.rss_delta_bytes / MB, 2) if self.rss_delta_bytes is not None else None,
+            "load_seconds": round(self.load_seconds, 3),
+            "idle_seconds": round(time.monotonic() - self.last_used, 1),
+        }
+
+
+class ModelMemoryManager:
+    """
+    Tracks loaded models and keeps them within MODEL_MEMORY_BUDGET_MB
+
+    Loads of the same model are single-flight: concurrent callers wait on
+    one lock while the first one loads. When the accounted total exceeds
+    the budget, models idle for at least MODEL_IDLE_EVICT_S are unloaded
+    least recently used first; their loader reloads them on next use.
+    Without a budget nothing is evicted and this only does accounting.
+    A load that returns None (an optional model that is missing or
+    broken) is remembered, so it is not retried and logged on every
+    access until the model is evicted or forget_missing() is called.
+    """
+
+    def __init__(self):
+        self._records: Dict[str, ModelRecord] = {}
+        self._flight_locks: Dict[str, threading.Lock] = {}
+        self._lock = threading.Lock()
+        self._evicted: Dict[str, int] = {}
+        self._missing: Set[str] = set()  # Models whose last load returned None
+        self._reaper: Optional[threading.Thread] = None
+
+    @property
+    def budget_bytes(self) -> Optional[int]:
+        if settings.MODEL_MEMORY_BUDGET_MB is None:
+            return None
+        return int(settings.MODEL_MEMORY_BUDGET_MB * MB)
+
+    @contextmanager
+    def single_flight(self, name: str) -> Iterator[None]:
+        """Hold the load/evict lock of one model"""
+        with self._lock:
+            lock = self._flight_locks.setdefault(name, threading.Lock())
+        with lock:
+            yield
+
+    def get_or_load(
+        self,
+        name: str,
+        current: Callable[[], Any],
+        load: Callable[[], Any],
+        unload: Callable[[], None]
+    ) -> Any:
+        """
+        Return a loaded model, loading it (once, for all waiting callers) if needed
+
+        Args:
+            name: Accounting name, e.g. "embedder"
+            current: Returns the cached model or None
+            load: Loads and caches the model, returning it (or None on failure)
+            unload: Drops the cached model so it can be garbage collected
+
+        Returns:
+            The model, or None if `load` returned None (now or on an
+            earlier call, see forget_missing)
+        """
+        model = current()
+        if model is None:
+            if name in self._missing:
+                return None
+            with self.single_flight(name):
+                model = current()
+                if model is None and name not in self._missing:
+                    model = self._load(name, load, unload)
+            # Outside the model's lock, so evictions cannot wait on each other
+            if model is not None:
+                self.enforce_budget(keep=name)
+        self.touch(name)
+        return model
+
+    def _load(self, name: str, load: Callable[[], Any], unload: Callable[[], None]) -> Any:
+        """Run a load function and record its memory (None is cached as missing)"""
+        rss_before = process_rss_bytes()
+        started = time.perf_counter()
+        model = load()
+        if model is None:
+            with self._lock:
+                self._missing.add(name)
+            return None
+
+        rss_after = process_rss_bytes()
+        record = ModelRecord(
+            name=name,
+            parameter_bytes=parameter_bytes(model),
+            rss_delta_bytes=rss_after - rss_before if rss_before is not None and rss_after is not None else None,
+            load_seconds=time.perf_counter() - started,
+            unload=unload
+        )
+        with self._lock:
+            self._records[name] = record
+            reload = name in self._evicted
+
+        metrics.increment("model_loads_total", model=name)
+        if reload:
+            metrics.increment("model_reloads_total", model=name)
+            logger.info(f"Reloaded evicted model '{name}' in {record.load_seconds:.2f}s")
+        metrics.observe("model_load_seconds", record.load_seconds, model=name)
+        metrics.set_gauge("model_memory_bytes", record.accounted_bytes, model=name)
+
+        self._ensure_reaper()
+        return model
+
+    def touch(self, name: str) -> None:
+        """Mark a model as used now"""
+        record = self._records.get(name)
+        if record is not None:
+            record.last_used = time.monotonic()
+
+    def accounted_bytes(self) -> int:
+        with self._lock:
+            return sum(record.accounted_bytes for record in self._records.values())
+
+    def forget_missing(self, name: Optional[str] = None) -> None:
+        """Retry the load of a missing model (all if name is None) on next use, e.g. after deploying it"""
+        with self._lock:
+            if name is None:
+                self._missing.clear()
+            else:
+                self._missing.discard(name)
+
+    def evict(self, name: str) -> bool:
+        """Unload one model (it reloads on next use); False if it was not loaded"""
+        with self.single_flight(name):
+            with self._lock:
+                self._missing.discard(name)
+                record = self._records.pop(name, None)
+                if record is None:
+                    return False
+                self._evicted[name] = self._evicted.get(name, 0) + 1
+            record.unload()
+
+        _release_freed_memory()
+        metrics.increment("model_evictions_total", model=name)
+        metrics.set_gauge("model_memory_bytes", 0, model=name)
+        logger.info(
+            f"Evicted idle model '{name}' ({record.accounted_bytes / MB:.0f} MB, "
+            f"idle {time.monotonic() - record.last_used:.0f}s)"
+        )
+        return True
+
+    def enforce_budget(self, keep: Optional[str] = None) -> List[str]:
+        """
+        Evict idle models, least recently used first, until within budget
+
+        Args:
+            keep: Model never to evict in this pass (the one just loaded)
+
+        Returns:
+            Names of evicted models
+        """
+        budget = self.budget_bytes
+        if budget is None:
+            return []
+
+        now = time.monotonic()
+        with self._lock:
+            total = sum(record.accounted_bytes for record in self._records.values())
+            candidates = sorted(
+                (
+                    record for record in self._records.values()
+                    if record.name != keep and now - record.last_used >= settings.MODEL_IDLE_EVICT_S
+                ),
+                key=lambda record: record.last_used
+            )
+
+        evicted = []
+        for record in candidates:
+            if total <= budget:
+                break
+            if self.evict(record.name):
+                total -= record.accounted_bytes
+                evicted.append(record.name)
+        return evicted
+
+    def _ensure_reaper(self) -> None:
+        """Start the periodic budget check once a budget is set and a model is loaded"""
+        if self.budget_bytes is None or self._reaper is not None:
+            return
+        self._reaper = threading.Thread(target=self._reap, name="ml-model-reaper", daemon=True)
+        self._reaper.start()
+
+    def _reap(self) -> None:
+        while True:
+            time.sleep(settings.MODEL_EVICT_CHECK_INTERVAL_S)
+            try:
+                self.enforce_budget()
+            except Exception as e:
+                logger.error(f"Model eviction check failed: {str(e)}")
+
+    def status(self) -> Dict[str, Any]:
+        """Memory section of /health"""
+        budget = self.budget_bytes
+        with self._lock:
+            models = {name: record.as_dict() for name, record in self._records.items()}
+            evicted = dict(self._evicted)
+            missing = sorted(self._missing)
+        rss = process_rss_bytes()
+        return {
+            "process_rss_mb": round(rss / MB, 1) if rss is not None else None,
+            "accounted_mb": round(self.accounted_bytes() / MB, 1),
+            "budget_mb": settings.MODEL_MEMORY_BUDGET_MB,
+            "idle_evict_s": settings.MODEL_IDLE_EVICT_S if budget is not None else None,
+            "models": models,
+            "evictions": evicted,
+            "missing": missing,
+        }
+
+
+# Global memory manager used by the model loader
+model_memory = ModelMemoryManager()
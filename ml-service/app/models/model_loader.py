@@ -1,6 +1,8 @@
 """
 Model Loader - Handles loading and caching of ML models
-Implements singleton pattern for efficient memory usage
+Implements singleton pattern for efficient memory usage; loads are
+single-flight and accounted by the memory manager, which may evict idle
+models under a memory budget (the next load_* call reloads them)
 """
 
 import joblib
@@ -12,6 +14,11 @@ from typing import Optional
 from pathlib import Path
 
 from app.config import settings
+from app.models.compiled_model import CompiledImageModel
+from app.models.linear_head import LinearHead, source_digest
+from app.models.memory import model_memory
+from app.models.projection import EmbeddingProjection
+from app.models.text_backend import TextBackend
 
 
 class ModelLoader:
@@ -22,6 +29,10 @@ class ModelLoader:
     _image_model = None
     _embedder = None
     _label_encoder = None
+    _fast_text_model = None
+    _text_projection = None
+    _text_backends = {}
+    _text_model_version = None
     
     def __new__(cls):
         """Ensure only one instance exists (Singleton pattern)"""
@@ -29,12 +40,96 @@ class ModelLoader:
             cls._instance = super(ModelLoader, cls).__new__(cls)
         return cls._instance
     
+    def _managed(self, name: str, attribute: str, load) -> object:
+        """Cached model stored in `attribute`, loaded through the memory manager"""
+        return model_memory.get_or_load(
+            name,
+            lambda: getattr(self, attribute),
+            load,
+            lambda: setattr(self, attribute, None)
+        )
+    
     def load_text_classifier(self) -> object:
+        """Text classifier head (see _load_text_classifier)"""
+        return self._managed("text_classifier", "_text_model", self._load_text_classifier)
+    
+    def load_label_encoder(self) -> Optional[object]:
+        """Label encoder, or None if there is none"""
+        return self._managed("label_encoder", "_label_encoder", self._load_label_encoder)
+    
+    def load_fast_text_classifier(self) -> Optional[object]:
+        """Cascade first-stage model, or None if not trained"""
+        return self._managed("fast_text_classifier", "_fast_text_model", self._load_fast_text_classifier)
+    
+    def load_text_projection(self) -> Optional[EmbeddingProjection]:
+        """Embedding projection, or None if the head uses full embeddings"""
+        return self._managed("text_projection", "_text_projection", self._load_text_projection)
+    
+    def load_embedder(self) -> SentenceTransformer:
+        """mBERT sentence transformer"""
+        return self._managed("embedder", "_embedder", self._load_embedder)
+    
+    def load_image_classifier(self) -> Optional[CompiledImageModel]:
+        """Compiled CNN, or None if it cannot be loaded"""
+        return self._managed("image_classifier", "_image_model", self._load_image_classifier)
+    
+    def load_text_backend(self, name: str, embedder: Optional[object] = None) -> Optional[TextBackend]:
+        """Per-language backend, or None if it is missing or failed to load"""
+        return model_memory.get_or_load(
+            f"text_backend:{name}",
+            lambda: self._text_backends.get(name),
+            lambda: self._load_text_backend(name, embedder),
+            lambda: self._text_backends.pop(name, None)
+        )
+    
+    def _load_text_classifier(self) -> object:
         """
-        Load the text classification model (.pkl file)
-        Returns: Loaded scikit-learn model
+        Load the text classification model
+        Returns: Memory-mapped LinearHead if an up-to-date export exists,
+            otherwise the scikit-learn model (.pkl file)
         """
         if self._text_model is None:
+            # Version of the base head files, unless the online head is served
+            self._text_model_version = None
+            
+            if settings.ONLINE_LEARNING_ENABLED and settings.TEXT_ONLINE_HEAD_PATH.exists():
+                try:
+                    logger.info(f"Loading online text head from {settings.TEXT_ONLINE_HEAD_PATH}")
+                    head = LinearHead.load(settings.TEXT_ONLINE_HEAD_PATH)
+                    
+                    if head.source_digest == self.text_head_sources_digest():
+                        self._text_model = head
+                        self._text_model_version = self._online_head_version()
+                        logger.success(f"✓ Online text head loaded: {head}")
+                        return self._text_model
+                    
+                    logger.warning(
+                        f"{settings.TEXT_ONLINE_HEAD_PATH.name} was trained for a different "
+                        f"classifier, label encoder or projection; ignoring it."
+                    )
+                    
+                except Exception as e:
+                    logger.warning(f"Failed to load online text head: {str(e)}")
+            
+            if settings.TEXT_HEAD_ENABLED and settings.TEXT_HEAD_PATH.exists():
+                try:
+                    logger.info(f"Loading text head from {settings.TEXT_HEAD_PATH}")
+                    head = LinearHead.load(settings.TEXT_HEAD_PATH)
+                    
+                    if head.source_digest == self.text_head_sources_digest():
+                        self._text_model = head
+                        logger.success(f"✓ Text head loaded: {head}")
+                        return self._text_model
+                    
+                    logger.warning(
+                        f"{settings.TEXT_HEAD_PATH.name} was exported from a different "
+                        f"classifier, label encoder or projection; re-run export_text_head.py. "
+                        f"Using the pickled model."
+                    )
+                    
+                except Exception as e:
+                    logger.warning(f"Failed to load text head, using the pickled model: {str(e)}")
+            
             try:
                 logger.info(f"Loading text classifier from {settings.TEXT_MODEL_PATH}")
                 
@@ -55,14 +150,14 @@ class ModelLoader:
         
         return self._text_model
     
-    def load_label_encoder(self) -> object:
+    def _load_label_encoder(self) -> object:
         """
         Load the label encoder
         Returns: Loaded LabelEncoder
         """
         if self._label_encoder is None:
             try:
-                encoder_path = settings.MODELS_DIR / "label_encoder.pkl"
+                encoder_path = settings.LABEL_ENCODER_PATH
                 logger.info(f"Loading label encoder from {encoder_path}")
                 
                 if not encoder_path.exists():
@@ -78,7 +173,103 @@ class ModelLoader:
         
         return self._label_encoder
     
-    def load_embedder(self) -> SentenceTransformer:
+    def _load_fast_text_classifier(self) -> Optional[object]:
+        """
+        Load the first-stage char n-gram text classifier (cascade)
+        Returns: Loaded scikit-learn pipeline, or None if not trained
+        """
+        if self._fast_text_model is None:
+            try:
+                if not settings.TEXT_FAST_MODEL_PATH.exists():
+                    logger.info("Fast text classifier not found, cascade disabled")
+                    return None
+                
+                logger.info(f"Loading fast text classifier from {settings.TEXT_FAST_MODEL_PATH}")
+                self._fast_text_model = joblib.load(settings.TEXT_FAST_MODEL_PATH)
+                logger.success("✓ Fast text classifier loaded successfully")
+                
+            except Exception as e:
+                logger.warning(f"Failed to load fast text classifier: {str(e)}")
+                return None
+        
+        return self._fast_text_model
+    
+    def _load_text_backend(self, name: str, embedder: Optional[object] = None) -> Optional[TextBackend]:
+        """
+        Load a per-language encoder + head from TEXT_BACKENDS_DIR/<name>
+        Args: embedder - encoder to use instead of loading the backend's own
+        Returns: TextBackend, or None if it is missing or fails to load
+            (callers fall back to the multilingual model)
+        """
+        if self._text_backends.get(name) is None:
+            try:
+                logger.info(f"Loading text backend '{name}'")
+                self._text_backends[name] = TextBackend.load(
+                    name,
+                    settings.TEXT_BACKENDS_DIR / name,
+                    embedder=embedder
+                )
+                logger.success(f"✓ Text backend '{name}' loaded successfully")
+                
+            except Exception as e:
+                # Not retried until evicted: the memory manager remembers the None
+                logger.warning(f"Failed to load text backend '{name}': {str(e)}")
+                self._text_backends[name] = None
+        
+        return self._text_backends[name]
+    
+    def swap_text_classifier(self, head: LinearHead) -> None:
+        """
+        Serve a new text head (online learning), already saved to TEXT_ONLINE_HEAD_PATH
+        
+        Requests in flight finish with the head they started with; an
+        eviction later reloads the saved file.
+        """
+        with model_memory.single_flight("text_classifier"):
+            self._text_model = head
+            self._text_model_version = self._online_head_version()
+        model_memory.touch("text_classifier")
+    
+    @staticmethod
+    def _online_head_version() -> str:
+        return "on-" + source_digest([settings.TEXT_ONLINE_HEAD_PATH])[:12]
+    
+    def text_model_version(self) -> str:
+        """Short digest of the text head files, stored with each recorded embedding"""
+        if self._text_model_version is None:
+            self._text_model_version = self.text_head_sources_digest()[:12]
+        return self._text_model_version
+    
+    @staticmethod
+    def text_head_sources_digest() -> str:
+        """Digest of the files export_text_head.py reads, to detect stale exports"""
+        return source_digest([
+            settings.TEXT_MODEL_PATH,
+            settings.LABEL_ENCODER_PATH,
+            settings.TEXT_PROJECTION_PATH,
+        ])
+    
+    def _load_text_projection(self) -> Optional[EmbeddingProjection]:
+        """
+        Load the embedding projection applied before the text head
+        Returns: EmbeddingProjection, or None if the head uses full embeddings
+        """
+        if self._text_projection is None:
+            try:
+                if not settings.TEXT_PROJECTION_PATH.exists():
+                    return None
+                
+                logger.info(f"Loading text projection from {settings.TEXT_PROJECTION_PATH}")
+                self._text_projection = EmbeddingProjection.load(settings.TEXT_PROJECTION_PATH)
+                logger.success(f"✓ Text projection loaded: {self._text_projection}")
+                
+            except Exception as e:
+                logger.error(f"Failed to load text projection: {str(e)}")
+                raise
+        
+        return self._text_projection
+    
+    def _load_embedder(self) -> SentenceTransformer:
         """
         Load mBERT sentence transformer for multilingual embeddings
         Supports Hindi, Marathi, English
@@ -99,18 +290,34 @@ class ModelLoader:
                     self._embedder = SentenceTransformer(settings.MBERT_MODEL)
                     logger.success("✓ mBERT embedder downloaded and loaded successfully")
                 
+                if settings.MODEL_WARMUP:
+                    self._warmup_embedder()
+                
             except Exception as e:
                 logger.error(f"Failed to load embedder: {str(e)}")
                 raise
         
         return self._embedder
     
-    def load_image_classifier(self) ->keras.Model:
+    def _warmup_embedder(self) -> None:
+        """
+        Run the embedder over short and long inputs at single and full batch sizes
+        so allocator pools and kernels are initialized before the first request
+        """
+        lengths = [4, 32, self._embedder.max_seq_length or 128]
+        for words in lengths:
+            text = " ".join(["warmup"] * words)
+            for batch_size in (1, settings.EMBED_BATCH_SIZE):
+                self._embedder.encode([text] * batch_size, batch_size=batch_size)
+        logger.info("Embedder warmed up")
+    
+    def _load_image_classifier(self) -> Optional[CompiledImageModel]:
         """
         Load the image classification model (.h5 file)
         WARNING: Model may be incompatible with TensorFlow 2.15+
         Gracefully handles legacy model format issues
-        Returns: Loaded Keras model or None if loading fails
+        Returns: Compiled inference wrapper (call it with a batch of
+            preprocessed images) or None if loading fails
         """
         if self._image_model is None:
             try:
@@ -122,22 +329,21 @@ class ModelLoader:
                         f"Please place your image_classifier.h5 file in the models directory."
                     )
                 
-                # Try standard loading
-                self._image_model = tf.keras.models.load_model(
+                # Try standard loading (training config is not needed for inference)
+                keras_model = tf.keras.models.load_model(
                     str(settings.IMAGE_MODEL_PATH),
                     compile=False
                 )
                 
-                # Compile for inference
-                try:
-                    if not self._image_model.compiled:
-                        self._image_model.compile(
-                            optimizer='adam',
-                            loss='sparse_categorical_crossentropy',
-                            metrics=['accuracy']
-                        )
-                except:
-                    pass
+                # Trace one graph per batch-size bucket instead of Model.predict
+                self._image_model = CompiledImageModel(
+                    keras_model,
+                    batch_sizes=settings.IMAGE_BATCH_SIZES,
+                    jit_compile=settings.IMAGE_JIT_COMPILE
+                )
+                
+                if settings.MODEL_WARMUP:
+                    self._image_model.warmup()
                 
                 logger.success("✓ Image classifier loaded successfully")
                 logger.info(f"Model input shape: {self._image_model.input_shape}")
@@ -157,8 +363,16 @@ class ModelLoader:
             "image_model_loaded": self._image_model is not None,
             "embedder_loaded": self._embedder is not None,
             "label_encoder_loaded": self._label_encoder is not None,
+            "fast_text_model_loaded": self._fast_text_model is not None,
+            "text_projection": repr(self._text_projection) if self._text_projection else None,
+            "text_head": repr(self._text_model) if isinstance(self._text_model, LinearHead) else None,
+            "text_backends": {
+                name: backend is not None for name, backend in self._text_backends.items()
+            },
             "categories": settings.CATEGORIES,
-            "image_size": settings.IMAGE_SIZE
+            "image_size": settings.IMAGE_SIZE,
+            "image_batch_sizes": self._image_model.batch_sizes if self._image_model else None,
+            "memory": model_memory.status()
         }
 
 
@@ -0,0 +1,96 @@
+"""
+Embedding Projection - Reduces embedding dimension before the classifier head
+Supports PCA and Matryoshka-style truncation, stored as a small .npz file
+"""
+
+from pathlib import Path
+from typing import Optional, Union
+
+import numpy as np
+
+PROJECTION_KINDS = ("pca", "truncate")
+
+
+class EmbeddingProjection:
+    """Linear projection from encoder dimension to a smaller head dimension"""
+
+    def __init__(
+        self,
+        kind: str,
+        dim: int,
+        mean: Optional[np.ndarray] = None,
+        components: Optional[np.ndarray] = None,
+        renormalize: bool = False
+    ):
+        if kind not in PROJECTION_KINDS:
+            raise ValueError(
+                f"Unknown projection '{kind}'. Supported: {', '.join(PROJECTION_KINDS)}"
+            )
+        if kind == "pca" and (mean is None or components is None):
+            raise ValueError("PCA projection requires mean and components")
+
+        self.kind = kind
+        self.dim = int(dim)
+        self.mean = None if mean is None else np.asarray(mean, dtype=np.float32)
+        # Stored transposed (input_dim, dim) so transform is a single matmul
+        self.components_t = (
+            None if components is None
+            else np.ascontiguousarray(np.asarray(components, dtype=np.float32).T)
+        )
+        self.renormalize = bool(renormalize)
+
+    @classmethod
+    def fit_pca(cls, embeddings: np.ndarray, dim: int) -> "EmbeddingProjection":
+        """Fit a PCA projection to `dim` components"""
+        embeddings = np.asarray(embeddings, dtype=np.float32)
+        mean = embeddings.mean(axis=0)
+        # Right singular vectors of the centered data are the principal axes
+        _, _, vt = np.linalg.svd(embeddings - mean, full_matrices=False)
+        return cls("pca", dim, mean=mean, components=vt[:dim])
+
+    @classmethod
+    def truncation(cls, dim: int, renormalize: bool = True) -> "EmbeddingProjection":
+        """Keep the first `dim` coordinates (Matryoshka-trained encoders)"""
+        return cls("truncate", dim, renormalize=renormalize)
+
+    def transform(self, embeddings: np.ndarray) -> np.ndarray:
+        """Project an (n, input_dim) or (input_dim,) array"""
+        embeddings = np.asarray(embeddings, dtype=np.float32)
+
+        if self.kind == "pca":
+            projected = (embeddings - self.mean) @ self.components_t
+        else:
+            projected = embeddings[..., :self.dim]
+            if self.renormalize:
+                norms = np.linalg.norm(projected, axis=-1, keepdims=True)
+                projected = projected / np.maximum(norms, 1e-12)
+
+        return projected
+
+    def save(self, path: Union[str, Path]) -> None:
+        """Write the projection to an .npz file"""
+        arrays = {
+            "kind": np.array(self.kind),
+            "dim": np.array(self.dim),
+            "renormalize": np.array(self.renormalize),
+        }
+        if self.kind == "pca":
+            arrays["mean"] = self.mean
+            arrays["components"] = self.components_t.T
+        np.savez(path, **arrays)
+
+    @classmethod
+    def load(cls, path: Union[str, Path]) -> "EmbeddingProjection":
+        """Read a projection written by save()"""
+        with np.load(path, allow_pickle=False) as data:
+            kind = str(data["kind"])
+            return cls(
+                kind,
+                int(data["dim"]),
+                mean=data["mean"] if kind == "pca" else None,
+                components=data["components"] if kind == "pca" else None,
+                renormalize=bool(data["renormalize"]),
+            )
+
+    def __repr__(self) -> str:
+        return f"EmbeddingProjection(kind='{self.kind}', dim={self.dim})"
@@ -0,0 +1,75 @@
+"""
+Per-Language Text Backends
+An encoder plus classifier head trained for one language (or script),
+stored under TEXT_BACKENDS_DIR/<name>/:
+
+    encoder/            sentence-transformers model directory, or
+    backend.json        {"encoder": "<model name or path>"}
+    head.npz            LinearHead export (preferred), or
+    head.pkl            scikit-learn classifier on the encoder's embeddings
+    label_encoder.pkl   optional, maps head.pkl outputs to labels
+"""
+
+import json
+from dataclasses import dataclass
+from pathlib import Path
+from typing import Any, Optional
+
+import joblib
+from sentence_transformers import SentenceTransformer
+
+from app.models.linear_head import LinearHead
+
+# Built-in routes that need no backend directory
+MULTILINGUAL = "multilingual"  # mBERT embedder + main head (the fallback)
+CASCADE = "cascade"  # char n-gram fast model, answers without the threshold
+
+
+@dataclass
+class TextBackend:
+    """A loaded encoder + head pair"""
+    name: str
+    embedder: SentenceTransformer
+    head: Any
+    label_encoder: Optional[Any] = None
+
+    @classmethod
+    def load(cls, name: str, directory: Path, embedder: Optional[Any] = None) -> "TextBackend":
+        """
+        Load a backend from its directory
+
+        Args:
+            embedder: Use this encoder (e.g. a worker-process proxy)
+                instead of loading the one in the directory
+
+        Raises:
+            FileNotFoundError: If the head or encoder is missing
+        """
+        head_path = directory / "head.pkl"
+        export_path = directory / "head.npz"
+        if not head_path.exists() and not export_path.exists():
+            raise FileNotFoundError(f"Text backend '{name}' has no head.npz or head.pkl in {directory}")
+
+        encoder_dir = directory / "encoder"
+        config_path = directory / "backend.json"
+        if encoder_dir.exists():
+            encoder = str(encoder_dir)
+        elif config_path.exists():
+            encoder = json.loads(config_path.read_text(encoding="utf-8"))["encoder"]
+        else:
+            raise FileNotFoundError(f"Text backend '{name}' has no encoder/ or backend.json in {directory}")
+
+        if embedder is None:
+            embedder = SentenceTransformer(encoder)
+        
+        if export_path.exists():
+            # Labels are decoded at export time
+            return cls(name=name, embedder=embedder, head=LinearHead.load(export_path))
+
+        label_encoder_path = directory / "label_encoder.pkl"
+        return cls(
+            name=name,
+            embedder=embedder,
+            head=joblib.load(head_path),
+            label_encoder=joblib.load(label_encoder_path) if label_encoder_path.exists() else None
+        )
@@ -1,6 +1,6 @@
 """
 API Routes Package
 """
-from . import text_routes, image_routes
+from . import text_routes, image_routes, classify_routes
 
-__all__ = ["text_routes", "image_routes"]
\ No newline at end of file
+__all__ = ["text_routes", "image_routes", "classify_routes"]
\ No newline at end of file
@@ -0,0 +1,87 @@
+"""
+Multimodal Classification API Routes
+"""
+
+from fastapi import APIRouter, Depends, File, Form, HTTPException, Request, UploadFile
+from typing import Optional
+from loguru import logger
+
+from app.services.multimodal_service import multimodal_classification_service
+from app.utils.deadline import deadline_dependency
+from app.utils.scheduler import INTERACTIVE, priority_dependency
+from app.utils.uploads import open_image_upload
+from app.utils.serialization import ResponseProjection, fast_response, projection_dependency
+from app.utils.timing import attach_timings, timings_dependency
+from app.utils.logs import sampled_logger
+from app.config import settings
+
+router = APIRouter(
+    tags=["Multimodal Classification"],
+    dependencies=[
+        Depends(deadline_dependency(settings.IMAGE_REQUEST_TIMEOUT_S)),
+        Depends(priority_dependency(INTERACTIVE)),
+    ]
+)
+
+
+@router.post("/classify")
+async def classify_complaint(
+    http_request: Request,
+    projection: ResponseProjection = Depends(projection_dependency),
+    include_timings: bool = Depends(timings_dependency),
+    text: str = Form(
+        ...,
+        min_length=5,
+        max_length=5000,
+        description="Text complaint in Hindi, Marathi, or English"
+    ),
+    file: Optional[UploadFile] = File(None, description="Optional image file (JPG, PNG, JPEG)"),
+    enhance: bool = Form(False, description="Apply image enhancement"),
+    early_exit_threshold: Optional[float] = Form(
+        settings.EARLY_EXIT_THRESHOLD,
+        ge=0.0,
+        le=1.0,
+        description="Skip the image CNN when text confidence reaches this value"
+    ),
+    reference: Optional[str] = Form(
+        None,
+        description="Optional complaint id stored with the image hash"
+    )
+):
+    """
+    Classify a complaint from its text and optional photo in one call
+
+    - Text and image pipelines run concurrently
+    - Returns fused probabilities plus the individual text/image results
+    - Latency approaches max(text, image) instead of their sum
+    - ?profile=slim or ?fields=... returns only the fused fields
+    - ?timings=true adds per-stage durations (also sent as Server-Timing);
+      text and image stages overlap, so they can add up to more than total
+    """
+    try:
+        image = None
+
+        if file is not None and file.filename:
+            # Header-only checks; pixels are decoded on the image executor
+            image = open_image_upload(file)
+
+        sampled_logger.info("Received multimodal request (image: {})", image is not None)
+
+        result = await multimodal_classification_service.classify(
+            text=text,
+            image=image,
+            enhance=enhance,
+            early_exit_threshold=early_exit_threshold,
+            reference=reference
+        )
+
+        if not result["success"]:
+            raise HTTPException(status_code=400, detail=result["error"])
+
+        return fast_response(attach_timings(projection.apply(result), include_timings), http_request)
+
+    except HTTPException:
+        raise
+    except Exception as e:
+        logger.error(f"Multimodal classification error: {str(e)}")
+        raise HTTPException(status_code=500, detail=str(e))
@@ -2,16 +2,34 @@
 Image Classification API Routes
 """
 
-from fastapi import APIRouter, File, UploadFile, HTTPException, Form
+from fastapi import APIRouter, Depends, File, UploadFile, HTTPException, Form, Request
 from pydantic import BaseModel
 from typing import Optional
 from loguru import logger
-from PIL import Image
-import io
 
 from app.services.image_service import image_classification_service
+from app.utils.deadline import deadline_dependency
+from app.utils.scheduler import INTERACTIVE, priority_dependency
+from app.utils.uploads import open_image_upload
+from app.utils.serialization import (
+    ResponseProjection,
+    fast_response,
+    projection_dependency,
+    wants_msgpack,
+)
+from app.utils.executors import image_executor, run_in_executor
+from app.utils.timing import attach_timings, timings_dependency
+from app.utils.logs import sampled_logger
+from app.config import settings
 
-router = APIRouter(prefix="/image", tags=["Image Classification"])
+router = APIRouter(
+    prefix="/image",
+    tags=["Image Classification"],
+    dependencies=[
+        Depends(deadline_dependency(settings.IMAGE_REQUEST_TIMEOUT_S)),
+        Depends(priority_dependency(INTERACTIVE)),
+    ]
+)
 
 
 class ImageResponse(BaseModel):
@@ -22,13 +40,25 @@ class ImageResponse(BaseModel):
     probabilities: Optional[dict] = None
     image_size: Optional[tuple] = None
     enhanced: Optional[bool] = None
+    image_hash: Optional[str] = None
+    reused: Optional[bool] = None
+    duplicate_of: Optional[str] = None
+    duplicate_distance: Optional[int] = None
+    timings: Optional[dict] = None
     error: Optional[str] = None
 
 
 @router.post("/classify", response_model=ImageResponse)
 async def classify_image(
+    http_request: Request,
+    projection: ResponseProjection = Depends(projection_dependency),
+    include_timings: bool = Depends(timings_dependency),
     file: UploadFile = File(..., description="Image file (JPG, PNG, JPEG)"),
-    enhance: bool = Form(False, description="Apply image enhancement")
+    enhance: bool = Form(False, description="Apply image enhancement"),
+    reference: Optional[str] = Form(
+        None,
+        description="Optional complaint id stored with the image hash"
+    )
 ):
     """
     Classify a civic issue from an image
@@ -37,38 +67,36 @@ async def classify_image(
     - Image size: minimum 50x50 pixels, maximum 10MB
     - Returns predicted category and confidence
     - Categories: potholes, garbage, fallen_trees, electric_poles
+    - ?profile=slim or ?fields=... and Accept: application/msgpack as for text
+    - ?timings=true adds per-stage durations (also sent as Server-Timing)
     """
     try:
-        # Validate file type
-        allowed_types = ["image/jpeg", "image/jpg", "image/png"]
-        if file.content_type not in allowed_types:
-            raise HTTPException(
-                status_code=400,
-                detail=f"Invalid file type. Allowed: {', '.join(allowed_types)}"
-            )
+        # Size, magic bytes and header dimensions; pixels are decoded on the executor
+        image = open_image_upload(file)
         
-        logger.info(f"Received image: {file.filename} ({file.content_type})")
-        
-        # Read image bytes
-        image_bytes = await file.read()
-        
-        # Validate file size (10MB limit)
-        if len(image_bytes) > 10 * 1024 * 1024:
-            raise HTTPException(
-                status_code=400,
-                detail="Image too large. Maximum size: 10MB"
-            )
+        sampled_logger.info(
+            "Received image: {} ({}, {}x{})",
+            file.filename,
+            image.format,
+            image.size[0],
+            image.size[1]
+        )
         
         # Make prediction
-        result = image_classification_service.predict(
-            image=image_bytes,
-            enhance=enhance
+        result = await run_in_executor(
+            image_executor,
+            image_classification_service.predict,
+            image=image,
+            enhance=enhance,
+            reference=reference
         )
         
         if not result["success"]:
             raise HTTPException(status_code=400, detail=result["error"])
         
-        return ImageResponse(**result)
+        if projection.is_full and not wants_msgpack(http_request):
+            return ImageResponse(**attach_timings(result, include_timings))
+        return fast_response(attach_timings(projection.apply(result), include_timings), http_request)
         
     except HTTPException:
         raise
@@ -79,6 +107,7 @@ async def classify_image(
 
 @router.post("/classify-top-k")
 async def classify_image_top_k(
+    include_timings: bool = Depends(timings_dependency),
     file: UploadFile = File(...),
     k: int = Form(2, ge=1, le=4, description="Number of top predictions")
 ):
@@ -89,32 +118,66 @@ async def classify_image_top_k(
     - Useful when confidence is low
     """
     try:
-        # Validate file type
-        allowed_types = ["image/jpeg", "image/jpg", "image/png"]
-        if file.content_type not in allowed_types:
-            raise HTTPException(
-                status_code=400,
-                detail=f"Invalid file type. Allowed: {', '.join(allowed_types)}"
-            )
+        image = open_image_upload(file)
         
-        logger.info(f"Received top-{k} request for: {file.filename}")
-        
-        # Read image
-        image_bytes = await file.read()
+        sampled_logger.info("Received top-{} request for: {}", k, file.filename)
         
         # Make prediction
-        result = image_classification_service.predict_top_k(
-            image=image_bytes,
+        result = await run_in_executor(
+            image_executor,
+            image_classification_service.predict_top_k,
+            image=image,
             k=k
         )
         
         if not result["success"]:
             raise HTTPException(status_code=400, detail=result["error"])
         
-        return result
+        return attach_timings(result, include_timings)
         
     except HTTPException:
         raise
     except Exception as e:
         logger.error(f"Top-K classification error: {str(e)}")
+        raise HTTPException(status_code=500, detail=str(e))
+
+
+@router.post("/similar")
+async def find_similar_images(
+    include_timings: bool = Depends(timings_dependency),
+    file: UploadFile = File(..., description="Image file (JPG, PNG, JPEG)"),
+    radius: int = Form(
+        settings.IMAGE_HASH_RADIUS,
+        ge=0,
+        le=64,
+        description="Maximum Hamming distance between perceptual hashes"
+    ),
+    limit: int = Form(10, ge=1, le=100, description="Maximum matches to return")
+):
+    """
+    Find near-duplicate photos among previously classified images
+    
+    - Compares 64-bit perceptual hashes, no CNN inference
+    - Returns matches closest first with their stored predictions
+    """
+    try:
+        image = open_image_upload(file)
+        
+        result = await run_in_executor(
+            image_executor,
+            image_classification_service.find_similar,
+            image=image,
+            radius=radius,
+            limit=limit
+        )
+        
+        if not result["success"]:
+            raise HTTPException(status_code=400, detail=result["error"])
+        
+        return attach_timings(result, include_timings)
+        
+    except HTTPException:
+        raise
+    except Exception as e:
+        logger.error(f"Similar image search error: {str(e)}")
         raise HTTPException(status_code=500, detail=str(e))
\ No newline at end of file
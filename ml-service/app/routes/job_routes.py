@@ -0,0 +1,155 @@
+"""
+Asynchronous Job API Routes
+"""
+
+from fastapi import APIRouter, HTTPException, Request
+from fastapi.concurrency import run_in_threadpool
+from pydantic import BaseModel, Field, ValidationError
+from starlette.datastructures import UploadFile
+from typing import Any, Dict, List, Optional, Tuple
+from loguru import logger
+
+from app.services.job_service import BATCH, CLASSIFY, IMAGE, TEXT, job_service
+from app.utils.job_queue import QueueFull
+from app.utils.uploads import open_image_stream
+from app.utils.serialization import fast_response
+from app.utils.logs import sampled_logger
+from app.config import settings
+
+router = APIRouter(prefix="/jobs", tags=["Jobs"])
+
+# Job inputs: (kind, JSON-safe payload, image bytes)
+JobInput = Tuple[str, Dict[str, Any], Optional[bytes]]
+
+
+class JobRequest(BaseModel):
+    """JSON body of a text job: one text or a list of texts"""
+    text: Optional[str] = Field(
+        None,
+        description="Text complaint in Hindi, Marathi, or English",
+        min_length=5,
+        max_length=5000
+    )
+    texts: Optional[List[str]] = Field(
+        None,
+        description="List of text complaints (batch job)",
+        min_length=1
+    )
+    complaint_id: Optional[str] = Field(None, max_length=64)
+    complaint_ids: Optional[List[Optional[str]]] = Field(
+        None,
+        description="Optional complaint id per text"
+    )
+
+
+def _text_job(request: JobRequest) -> JobInput:
+    if (request.text is None) == (request.texts is None):
+        raise HTTPException(status_code=400, detail="Send either 'text' or 'texts'")
+
+    if request.text is not None:
+        return TEXT, {"text": request.text, "complaint_id": request.complaint_id}, None
+
+    if len(request.texts) > settings.JOBS_MAX_TEXTS:
+        raise HTTPException(
+            status_code=400,
+            detail=f"Maximum {settings.JOBS_MAX_TEXTS} texts allowed per job"
+        )
+    if request.complaint_ids is not None and len(request.complaint_ids) != len(request.texts):
+        raise HTTPException(status_code=400, detail="complaint_ids must have one entry per text")
+
+    return BATCH, {"texts": request.texts, "complaint_ids": request.complaint_ids}, None
+
+
+async def _upload_job(request: Request) -> JobInput:
+    """Multipart job: `file` (image) and/or `text`, with `enhance` and `reference` as for /classify"""
+    form = await request.form()
+    text = form.get("text") or None
+    # Form parsing yields Starlette's UploadFile (FastAPI's is a subclass)
+    file = form.get("file")
+    payload = {
+        "complaint_id": form.get("reference") or None,
+        "enhance": str(form.get("enhance", "")).lower() in ("1", "true", "yes", "on"),
+    }
+
+    if text is not None:
+        if not isinstance(text, str) or not 5 <= len(text) <= 5000:
+            raise HTTPException(status_code=400, detail="text must be 5 to 5000 characters")
+        payload["text"] = text
+
+    if not isinstance(file, UploadFile) or not file.filename:
+        if text is None:
+            raise HTTPException(status_code=400, detail="Send an image 'file', a 'text', or both")
+        return TEXT, payload, None
+
+    # Size, magic bytes and header dimensions now; pixels are decoded by the job worker
+    open_image_stream(file.file, file.size)
+    file.file.seek(0)
+    image = await run_in_threadpool(file.file.read)
+
+    return (CLASSIFY if text is not None else IMAGE), payload, image
+
+
+@router.post("", status_code=202)
+async def submit_job(request: Request):
+    """
+    Queue a classification and return its job id at once
+
+    - JSON `{"text": ...}` or `{"texts": [...]}` (up to JOBS_MAX_TEXTS) for
+      text jobs, optionally with `complaint_id` / `complaint_ids`
+    - multipart/form-data with `file` and optional `text`, `enhance`,
+      `reference` (as for /ml/classify) for image and multimodal jobs
+    - Poll GET /ml/jobs/{job_id}; results are kept for JOBS_RESULT_TTL_S
+    - 503 when the queue is full or jobs are disabled
+    """
+    if not job_service.enabled:
+        raise HTTPException(status_code=503, detail="Jobs are disabled")
+
+    try:
+        content_type = request.headers.get("content-type", "")
+        if content_type.startswith("multipart/form-data"):
+            kind, payload, image = await _upload_job(request)
+        else:
+            try:
+                body = JobRequest.model_validate(await request.json())
+            except ValueError as e:
+                # ValidationError is a ValueError, as is malformed JSON
+                detail = e.errors() if isinstance(e, ValidationError) else "Invalid JSON body"
+                raise HTTPException(status_code=422, detail=detail)
+            kind, payload, image = _text_job(body)
+
+        job = await run_in_threadpool(job_service.submit, kind, payload, image)
+        sampled_logger.info("Queued {} job {}", kind, job["id"])
+
+        return {
+            "success": True,
+            "job_id": job["id"],
+            "kind": job["kind"],
+            "status": job["status"],
+            "status_url": f"/ml/jobs/{job['id']}"
+        }
+
+    except QueueFull:
+        raise HTTPException(status_code=503, detail="Job queue is full, retry later")
+    except HTTPException:
+        raise
+    except Exception as e:
+        logger.error(f"Job submission error: {str(e)}")
+        raise HTTPException(status_code=500, detail=str(e))
+
+
+@router.get("/{job_id}")
+async def get_job(job_id: str, request: Request):
+    """
+    Status of a job, with its result once finished
+
+    - status: queued, running, done or failed
+    - 404 for unknown job ids and for results past their TTL
+    """
+    if not job_service.enabled:
+        raise HTTPException(status_code=503, detail="Jobs are disabled")
+
+    job = await run_in_threadpool(job_service.get, job_id)
+    if job is None:
+        raise HTTPException(status_code=404, detail="Job not found or expired")
+
+    return fast_response({"success": True, "job_id": job.pop("id"), **job}, request)
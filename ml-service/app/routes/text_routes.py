@@ -2,14 +2,35 @@
 Text Classification API Routes
 """
 
-from fastapi import APIRouter, HTTPException
+from fastapi import APIRouter, Depends, HTTPException, Request, Response
 from pydantic import BaseModel, Field
-from typing import List, Optional
+from typing import List, Literal, Optional
 from loguru import logger
 
 from app.services.text_service import text_classification_service
+from app.services.online_learning import online_learner
+from app.utils.deadline import deadline_dependency
+from app.utils.scheduler import BULK, INTERACTIVE, priority_dependency
+from app.utils.executors import run_in_executor, text_executor
+from app.utils.timing import attach_timings, timings_dependency
+from app.utils.logs import sampled_logger
+from app.utils.embedding_codec import encode_embeddings, embeddings_to_json
+from app.utils.serialization import (
+    ResponseProjection,
+    fast_response,
+    projection_dependency,
+    wants_msgpack,
+)
+from app.config import settings
 
-router = APIRouter(prefix="/text", tags=["Text Classification"])
+router = APIRouter(
+    prefix="/text",
+    tags=["Text Classification"],
+    dependencies=[
+        Depends(deadline_dependency(settings.TEXT_REQUEST_TIMEOUT_S)),
+        Depends(priority_dependency(INTERACTIVE)),
+    ]
+)
 
 
 class TextRequest(BaseModel):
@@ -21,6 +42,11 @@ class TextRequest(BaseModel):
         max_length=5000,
         examples=["रस्त्यावर मोठे खड्डे पडलेत"]
     )
+    complaint_id: Optional[str] = Field(
+        None,
+        description="Complaint id stored with the embedding (when the embedding store is enabled)",
+        max_length=64
+    )
 
 
 class TextResponse(BaseModel):
@@ -29,8 +55,12 @@ class TextResponse(BaseModel):
     prediction: Optional[str] = None
     confidence: Optional[float] = None
     probabilities: Optional[dict] = None
+    stage: Optional[str] = None
+    language: Optional[str] = None
+    backend: Optional[str] = None
     original_text: Optional[str] = None
     cleaned_text: Optional[str] = None
+    timings: Optional[dict] = None
     error: Optional[str] = None
 
 
@@ -41,26 +71,80 @@ class BatchTextRequest(BaseModel):
         description="List of text complaints",
         max_items=50
     )
+    complaint_ids: Optional[List[Optional[str]]] = Field(
+        None,
+        description="Optional complaint id per text, stored with the embeddings"
+    )
+
+
+class FeedbackRequest(BaseModel):
+    """Request model for a label correction"""
+    label: str = Field(..., description="Correct category", examples=["potholes"])
+    complaint_id: Optional[str] = Field(
+        None,
+        description="Complaint whose stored embedding the correction applies to",
+        max_length=64
+    )
+    text: Optional[str] = Field(
+        None,
+        description="Complaint text (embedded and stored if sent)",
+        min_length=5,
+        max_length=5000
+    )
+
+
+class EmbedRequest(BaseModel):
+    """Request model for text embeddings"""
+    texts: List[str] = Field(
+        ...,
+        description="List of text complaints to embed",
+        min_length=1
+    )
+    encoding: Literal["float32", "float16", "int8", "binary"] = Field(
+        "float32",
+        description="Vector encoding: float32, float16, int8 (per-row scaled) or binary (sign bits)"
+    )
+    format: Literal["base64", "raw"] = Field(
+        "base64",
+        description="base64 fields in JSON, or raw application/octet-stream bytes"
+    )
+    normalize: bool = Field(False, description="L2-normalize embeddings before encoding")
 
 
 @router.post("/classify", response_model=TextResponse)
-async def classify_text(request: TextRequest):
+async def classify_text(
+    request: TextRequest,
+    http_request: Request,
+    projection: ResponseProjection = Depends(projection_dependency),
+    include_timings: bool = Depends(timings_dependency)
+):
     """
     Classify a single text complaint
     
     - Supports Hindi, Marathi, and English
     - Returns predicted category and confidence
     - Categories: potholes, garbage, fallen_trees, electric_poles
+    - ?profile=slim or ?fields=... returns only those fields, with
+      probabilities as an array in /categories order
+    - Accept: application/msgpack for a MessagePack body
+    - ?timings=true adds per-stage durations (also sent as Server-Timing)
     """
     try:
-        logger.info(f"Received text classification request")
+        sampled_logger.info("Received text classification request")
         
-        result = text_classification_service.predict(request.text)
+        result = await run_in_executor(
+            text_executor,
+            text_classification_service.predict,
+            request.text,
+            request.complaint_id
+        )
         
         if not result["success"]:
             raise HTTPException(status_code=400, detail=result["error"])
         
-        return TextResponse(**result)
+        if projection.is_full and not wants_msgpack(http_request):
+            return TextResponse(**attach_timings(result, include_timings))
+        return fast_response(attach_timings(projection.apply(result), include_timings), http_request)
         
     except HTTPException:
         raise
@@ -69,13 +153,20 @@ async def classify_text(request: TextRequest):
         raise HTTPException(status_code=500, detail=str(e))
 
 
-@router.post("/classify-batch")
-async def classify_batch(request: BatchTextRequest):
+@router.post("/classify-batch", dependencies=[Depends(priority_dependency(BULK))])
+async def classify_batch(
+    request: BatchTextRequest,
+    http_request: Request,
+    projection: ResponseProjection = Depends(projection_dependency),
+    include_timings: bool = Depends(timings_dependency)
+):
     """
     Classify multiple text complaints at once
     
     - Maximum 50 texts per request
-    - Returns list of predictions
+    - Scheduled as bulk work unless X-Priority: interactive
+    - Returns list of predictions (projected with ?profile=slim or ?fields=...)
+    - Serialized with orjson, or MessagePack with Accept: application/msgpack
     """
     try:
         if len(request.texts) > 50:
@@ -84,18 +175,126 @@ async def classify_batch(request: BatchTextRequest):
                 detail="Maximum 50 texts allowed per batch"
             )
         
-        logger.info(f"Received batch request with {len(request.texts)} texts")
+        if request.complaint_ids is not None and len(request.complaint_ids) != len(request.texts):
+            raise HTTPException(
+                status_code=400,
+                detail="complaint_ids must have one entry per text"
+            )
+        
+        sampled_logger.info("Received batch request with {} texts", len(request.texts))
+        
+        results = await run_in_executor(
+            text_executor,
+            text_classification_service.batch_predict,
+            request.texts,
+            request.complaint_ids
+        )
+        
+        return fast_response(
+            attach_timings(
+                {
+                    "success": True,
+                    "count": len(results),
+                    "results": [projection.apply(result) for result in results]
+                },
+                include_timings
+            ),
+            http_request
+        )
+        
+    except HTTPException:
+        raise
+    except Exception as e:
+        logger.error(f"Batch classification error: {str(e)}")
+        raise HTTPException(status_code=500, detail=str(e))
+
+
+@router.post("/embed", dependencies=[Depends(priority_dependency(BULK))])
+async def embed_texts(request: EmbedRequest, http_request: Request):
+    """
+    Return multilingual embeddings for a batch of texts
+    
+    - Texts are cleaned exactly as for classification
+    - format=base64: JSON with base64 `data` (and `scales` for int8)
+    - format=raw (or Accept: application/octet-stream): packed row-major bytes,
+      shape in the X-Embedding-Shape header; int8 rows are followed by one
+      float32 scale per row
+    """
+    try:
+        if len(request.texts) > settings.EMBED_MAX_TEXTS:
+            raise HTTPException(
+                status_code=400,
+                detail=f"Maximum {settings.EMBED_MAX_TEXTS} texts allowed per request"
+            )
+        
+        sampled_logger.info("Received embedding request with {} texts", len(request.texts))
         
-        results = text_classification_service.batch_predict(request.texts)
+        try:
+            embeddings = await run_in_executor(
+                text_executor,
+                text_classification_service.embed_texts,
+                request.texts,
+                normalize=request.normalize
+            )
+        except ValueError as e:
+            raise HTTPException(status_code=400, detail=str(e))
+        
+        accept = http_request.headers.get("accept", "")
+        if request.format == "raw" or "application/octet-stream" in accept:
+            data, scales, shape, dtype = encode_embeddings(
+                embeddings,
+                request.encoding
+            )
+            return Response(
+                content=data + (scales or b""),
+                media_type="application/octet-stream",
+                headers={
+                    "X-Embedding-Shape": ",".join(str(dim) for dim in shape),
+                    "X-Embedding-Dtype": dtype,
+                    "X-Embedding-Encoding": request.encoding,
+                    "X-Embedding-Dimension": str(embeddings.shape[1]),
+                }
+            )
         
         return {
             "success": True,
-            "count": len(results),
-            "results": results
+            "count": len(embeddings),
+            **embeddings_to_json(embeddings, request.encoding)
         }
         
     except HTTPException:
         raise
     except Exception as e:
-        logger.error(f"Batch classification error: {str(e)}")
-        raise HTTPException(status_code=500, detail=str(e))
\ No newline at end of file
+        logger.error(f"Embedding endpoint error: {str(e)}")
+        raise HTTPException(status_code=500, detail=str(e))
+
+
+@router.post("/feedback", dependencies=[Depends(priority_dependency(BULK))])
+async def submit_feedback(request: FeedbackRequest):
+    """
+    Record a staff label correction for online learning
+    
+    - Needs ONLINE_LEARNING_ENABLED (503 otherwise)
+    - Identify the complaint by `complaint_id` (sent when it was classified),
+      by `text`, or both
+    - Corrections retrain the text head in the background; it is swapped in
+      only if held-out accuracy does not drop
+    """
+    if not online_learner.enabled:
+        raise HTTPException(status_code=503, detail="Online learning is disabled")
+    
+    try:
+        correction = await run_in_executor(
+            text_executor,
+            online_learner.add_correction,
+            request.label,
+            request.complaint_id,
+            request.text
+        )
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    except Exception as e:
+        logger.error(f"Feedback endpoint error: {str(e)}")
+        raise HTTPException(status_code=500, detail=str(e))
+    
+    return {"success": True, "correction": correction}
@@ -0,0 +1,8 @@
+"""
+Binary RPC Interface
+Length-prefixed msgpack over TCP for service-to-service calls
+"""
+from .protocol import RpcError
+from .server import RpcServer, rpc_server
+
+__all__ = ["RpcError", "RpcServer", "rpc_server"]
@@ -0,0 +1,124 @@
+"""
+RPC Client
+asyncio client for the binary protocol, multiplexing calls on one connection
+"""
+
+import asyncio
+import itertools
+from typing import Any, AsyncIterator, Dict, Optional
+
+from app.rpc.protocol import RpcError, pack_frame, read_frame
+
+_END = object()
+
+
+class RpcClient:
+    """
+    Persistent connection to an RpcServer
+
+    Usage:
+        client = await RpcClient.connect("localhost", 8001)
+        result = await client.call("text.classify", {"text": "..."})
+        async for item in client.stream("text.classify_stream", {"texts": [...]}):
+            ...
+        await client.close()
+    """
+
+    def __init__(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter, max_frame_bytes: int):
+        self._reader = reader
+        self._writer = writer
+        self._max_frame_bytes = max_frame_bytes
+        self._ids = itertools.count(1)
+        self._pending: Dict[int, asyncio.Queue] = {}
+        self._write_lock = asyncio.Lock()
+        self._reader_task = asyncio.ensure_future(self._read_loop())
+
+    @classmethod
+    async def connect(cls, host: str, port: int, max_frame_bytes: int = 64 * 1024 * 1024) -> "RpcClient":
+        reader, writer = await asyncio.open_connection(host, port)
+        return cls(reader, writer, max_frame_bytes)
+
+    async def _read_loop(self) -> None:
+        try:
+            while True:
+                message = await read_frame(self._reader, self._max_frame_bytes)
+                if message is None:
+                    break
+                queue = self._pending.get(message.get("id"))
+                if queue is not None:
+                    queue.put_nowait(message)
+        finally:
+            # Fail every waiting call once the connection is gone
+            for queue in self._pending.values():
+                queue.put_nowait({"error": {"status": 499, "detail": "Connection closed"}})
+
+    async def _send(
+        self,
+        method: str,
+        params: Dict[str, Any],
+        timeout_ms: Optional[float],
+        priority: Optional[str]
+    ):
+        request_id = next(self._ids)
+        queue: asyncio.Queue = asyncio.Queue()
+        self._pending[request_id] = queue
+
+        message = {"id": request_id, "method": method, "params": params}
+        if timeout_ms is not None:
+            message["timeout_ms"] = timeout_ms
+        if priority is not None:
+            message["priority"] = priority
+
+        async with self._write_lock:
+            self._writer.write(pack_frame(message))
+            await self._writer.drain()
+        return request_id, queue
+
+    @staticmethod
+    def _raise_if_error(message: Dict[str, Any]) -> None:
+        if "error" in message:
+            error = message["error"]
+            raise RpcError(error.get("status", 500), error.get("detail", "Unknown error"))
+
+    async def call(
+        self,
+        method: str,
+        params: Optional[Dict[str, Any]] = None,
+        timeout_ms: Optional[float] = None,
+        priority: Optional[str] = None
+    ) -> Any:
+        """Invoke a unary method and return its result (raises RpcError)"""
+        request_id, queue = await self._send(method, params or {}, timeout_ms, priority)
+        try:
+            message = await queue.get()
+            self._raise_if_error(message)
+            return message["result"]
+        finally:
+            self._pending.pop(request_id, None)
+
+    async def stream(
+        self,
+        method: str,
+        params: Optional[Dict[str, Any]] = None,
+        timeout_ms: Optional[float] = None,
+        priority: Optional[str] = None
+    ) -> AsyncIterator[Any]:
+        """Invoke a streaming method and yield items as they arrive"""
+        request_id, queue = await self._send(method, params or {}, timeout_ms, priority)
+        try:
+            while True:
+                message = await queue.get()
+                self._raise_if_error(message)
+                if message.get("end"):
+                    return
+                yield message["item"]
+        finally:
+            self._pending.pop(request_id, None)
+
+    async def close(self) -> None:
+        self._writer.close()
+        try:
+            await self._writer.wait_closed()
+        except ConnectionError:
+            pass
+        self._reader_task.cancel()
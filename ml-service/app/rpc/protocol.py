@@ -0,0 +1,70 @@
+"""
+RPC Wire Protocol
+Length-prefixed MessagePack frames over a persistent TCP connection
+
+Every frame is a 4-byte big-endian payload length followed by one
+msgpack map. Requests carry an `id` chosen by the client so several calls
+can be in flight on one connection; replies may arrive in any order.
+
+    request:  {"id": 1, "method": "text.classify", "params": {...},
+               "timeout_ms": 30000, "priority": "interactive"}
+    reply:    {"id": 1, "result": {...}}
+    error:    {"id": 1, "error": {"status": 400, "detail": "..."}}
+    stream:   {"id": 1, "item": {...}, "index": 0} ... {"id": 1, "end": true, "count": n}
+
+Binary fields (images, embeddings) travel as msgpack bin, never base64.
+"""
+
+import asyncio
+import struct
+from typing import Any, Dict, Optional
+
+import msgpack
+
+HEADER = struct.Struct(">I")
+
+
+class RpcError(Exception):
+    """Error reply from the server (status follows HTTP conventions)"""
+
+    def __init__(self, status: int, detail: str):
+        super().__init__(f"{status}: {detail}")
+        self.status = status
+        self.detail = detail
+
+
+class FrameTooLarge(Exception):
+    """A peer announced a frame over the configured size limit"""
+
+
+def pack_frame(message: Dict[str, Any]) -> bytes:
+    """Serialize one message into a length-prefixed frame"""
+    payload = msgpack.packb(message, use_bin_type=True)
+    return HEADER.pack(len(payload)) + payload
+
+
+async def read_frame(
+    reader: asyncio.StreamReader,
+    max_frame_bytes: int
+) -> Optional[Dict[str, Any]]:
+    """
+    Read one frame, or return None when the peer closed the connection
+
+    Raises:
+        FrameTooLarge: Announced length exceeds max_frame_bytes (the
+            payload is not read, the connection should be closed)
+    """
+    try:
+        header = await reader.readexactly(HEADER.size)
+    except asyncio.IncompleteReadError:
+        return None
+
+    (length,) = HEADER.unpack(header)
+    if length > max_frame_bytes:
+        raise FrameTooLarge(f"Frame of {length} bytes exceeds limit of {max_frame_bytes}")
+
+    try:
+        payload = await reader.readexactly(length)
+    except asyncio.IncompleteReadError:
+        return None
+    return msgpack.unpackb(payload, raw=False)
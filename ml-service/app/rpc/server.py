@@ -0,0 +1,348 @@
+"""
+RPC Server
+Serves the text, image, batch and embed operations over the binary
+protocol, sharing models, executors, deadlines and priority classes with
+the HTTP API
+"""
+
+import asyncio
+import time
+from dataclasses import dataclass
+from io import BytesIO
+from typing import Any, AsyncIterator, Callable, Dict, List, Optional
+
+from fastapi import HTTPException
+from loguru import logger
+
+from app.config import settings
+from app.rpc.protocol import FrameTooLarge, RpcError, pack_frame, read_frame
+from app.services.image_service import image_classification_service
+from app.services.multimodal_service import multimodal_classification_service
+from app.services.text_service import text_classification_service
+from app.utils.deadline import Deadline, current_deadline
+from app.utils.embedding_codec import encode_embeddings
+from app.utils.executors import image_executor, run_in_executor, text_executor
+from app.utils.metrics import metrics
+from app.utils.scheduler import BULK, INTERACTIVE, current_priority
+from app.utils.serialization import PROJECTABLE_FIELDS, ResponseProjection
+from app.utils.uploads import open_image_stream
+
+
+@dataclass
+class RpcMethod:
+    """A registered operation and its scheduling defaults"""
+    handler: Callable
+    streaming: bool
+    timeout: float
+    priority: str
+
+
+METHODS: Dict[str, RpcMethod] = {}
+
+# Same cap as /ml/text/classify-batch
+MAX_BATCH_TEXTS = 50
+
+
+def rpc_method(name: str, timeout: float, priority: str = INTERACTIVE, streaming: bool = False):
+    """Register a coroutine (or async generator when streaming) under `name`"""
+    def register(handler: Callable) -> Callable:
+        METHODS[name] = RpcMethod(handler, streaming, timeout, priority)
+        return handler
+    return register
+
+
+def _projection(params: Dict[str, Any]) -> ResponseProjection:
+    """Optional `fields` list, same semantics as ?fields= over HTTP"""
+    fields = params.get("fields")
+    if not fields:
+        return ResponseProjection()
+    unknown = [field for field in fields if field not in PROJECTABLE_FIELDS]
+    if unknown:
+        raise RpcError(400, f"Unknown fields: {', '.join(unknown)}")
+    return ResponseProjection(tuple(fields))
+
+
+def _require(params: Dict[str, Any], name: str) -> Any:
+    if params.get(name) is None:
+        raise RpcError(400, f"Missing parameter '{name}'")
+    return params[name]
+
+
+def _require_list(params: Dict[str, Any], name: str, limit: int) -> List[Any]:
+    """A list parameter with at most `limit` items, capped like the HTTP routes"""
+    items = _require(params, name)
+    if not isinstance(items, list):
+        raise RpcError(400, f"Parameter '{name}' must be a list")
+    if len(items) > limit:
+        raise RpcError(400, f"Maximum {limit} {name} allowed per request")
+    return items
+
+
+def _checked(result: Dict[str, Any]) -> Dict[str, Any]:
+    """Raise service failures as 400 errors, like the HTTP routes"""
+    if not result["success"]:
+        raise RpcError(400, result["error"])
+    return result
+
+
+def _open_image(data: bytes):
+    """Header-validated, lazily decoded image from raw bytes"""
+    return open_image_stream(BytesIO(data), len(data))
+
+
+def _chunks(items: List[Any], size: int):
+    for start in range(0, len(items), size):
+        yield start, items[start:start + size]
+
+
+def _embedding_payload(params: Dict[str, Any], embeddings) -> Dict[str, Any]:
+    data, scales, shape, dtype = encode_embeddings(embeddings, params.get("encoding", "float32"))
+    return {
+        "data": data,
+        "scales": scales,
+        "shape": list(shape),
+        "dtype": dtype,
+        "dimension": int(embeddings.shape[1]),
+    }
+
+
+async def _embed(texts: List[str], normalize: bool):
+    try:
+        return await run_in_executor(
+            text_executor,
+            text_classification_service.embed_texts,
+            texts,
+            normalize=normalize
+        )
+    except ValueError as e:
+        raise RpcError(400, str(e))
+
+
+@rpc_method("ping", timeout=5.0)
+async def ping(params):
+    return {"pong": True, "categories": settings.CATEGORIES}
+
+
+@rpc_method("text.classify", timeout=settings.TEXT_REQUEST_TIMEOUT_S)
+async def text_classify(params):
+    result = await run_in_executor(
+        text_executor,
+        text_classification_service.predict,
+        _require(params, "text")
+    )
+    return _projection(params).apply(_checked(result))
+
+
+@rpc_method("text.classify_batch", timeout=settings.TEXT_REQUEST_TIMEOUT_S, priority=BULK)
+async def text_classify_batch(params):
+    projection = _projection(params)
+    results = await run_in_executor(
+        text_executor,
+        text_classification_service.batch_predict,
+        _require_list(params, "texts", MAX_BATCH_TEXTS)
+    )
+    return {"results": [projection.apply(result) for result in results]}
+
+
+@rpc_method("text.classify_stream", timeout=settings.TEXT_REQUEST_TIMEOUT_S, priority=BULK, streaming=True)
+async def text_classify_stream(params) -> AsyncIterator[Dict[str, Any]]:
+    """Results are sent as each embedding batch finishes"""
+    projection = _projection(params)
+    texts = _require_list(params, "texts", settings.EMBED_MAX_TEXTS)
+    for _, chunk in _chunks(texts, settings.EMBED_BATCH_SIZE):
+        results = await run_in_executor(
+            text_executor,
+            text_classification_service.batch_predict,
+            chunk
+        )
+        for result in results:
+            yield projection.apply(result)
+
+
+@rpc_method("text.embed", timeout=settings.TEXT_REQUEST_TIMEOUT_S, priority=BULK)
+async def text_embed(params):
+    texts = _require_list(params, "texts", settings.EMBED_MAX_TEXTS)
+    embeddings = await _embed(texts, params.get("normalize", False))
+    return _embedding_payload(params, embeddings)
+
+
+@rpc_method("text.embed_stream", timeout=settings.TEXT_REQUEST_TIMEOUT_S, priority=BULK, streaming=True)
+async def text_embed_stream(params) -> AsyncIterator[Dict[str, Any]]:
+    """One packed matrix per EMBED_BATCH_SIZE texts, with its row offset"""
+    texts = _require_list(params, "texts", settings.EMBED_MAX_TEXTS)
+    for offset, chunk in _chunks(texts, settings.EMBED_BATCH_SIZE):
+        embeddings = await _embed(chunk, params.get("normalize", False))
+        yield {"offset": offset, **_embedding_payload(params, embeddings)}
+
+
+@rpc_method("image.classify", timeout=settings.IMAGE_REQUEST_TIMEOUT_S)
+async def image_classify(params):
+    result = await run_in_executor(
+        image_executor,
+        image_classification_service.predict,
+        _open_image(_require(params, "image")),
+        params.get("enhance", False),
+        params.get("reference")
+    )
+    return _projection(params).apply(_checked(result))
+
+
+@rpc_method("image.classify_stream", timeout=settings.IMAGE_REQUEST_TIMEOUT_S, priority=BULK, streaming=True)
+async def image_classify_stream(params) -> AsyncIterator[Dict[str, Any]]:
+    """Per-image results in input order; bad images yield an error item"""
+    projection = _projection(params)
+    images = _require_list(params, "images", settings.RPC_MAX_STREAM_IMAGES)
+    references = params.get("references") or []
+    for index, data in enumerate(images):
+        try:
+            result = await run_in_executor(
+                image_executor,
+                image_classification_service.predict,
+                _open_image(data),
+                params.get("enhance", False),
+                references[index] if index < len(references) else None
+            )
+        except HTTPException as e:
+            if e.status_code not in (400, 413, 415):
+                raise
+            result = {"success": False, "error": e.detail}
+        yield projection.apply(result)
+
+
+@rpc_method("classify", timeout=settings.IMAGE_REQUEST_TIMEOUT_S)
+async def classify(params):
+    image = params.get("image")
+    result = await multimodal_classification_service.classify(
+        text=_require(params, "text"),
+        image=_open_image(image) if image else None,
+        enhance=params.get("enhance", False),
+        early_exit_threshold=params.get("early_exit_threshold", settings.EARLY_EXIT_THRESHOLD),
+        reference=params.get("reference")
+    )
+    return _projection(params).apply(_checked(result))
+
+
+class RpcServer:
+    """
+    asyncio TCP server for the binary protocol
+
+    Each request runs in its own task with its own deadline and priority
+    class, so one slow call never blocks others on the same connection.
+    When a client disconnects, its in-flight calls are cancelled the same
+    way as abandoned HTTP requests.
+    """
+
+    def __init__(self, host: str, port: int, max_frame_bytes: int):
+        self.host = host
+        self.port = port
+        self.max_frame_bytes = max_frame_bytes
+        self._server: Optional[asyncio.AbstractServer] = None
+
+    async def start(self) -> None:
+        self._server = await asyncio.start_server(self._handle_connection, self.host, self.port)
+        # Port 0 binds an ephemeral port (tests)
+        self.port = self._server.sockets[0].getsockname()[1]
+        logger.success(f"✓ RPC server listening on {self.host}:{self.port}")
+
+    async def stop(self) -> None:
+        if self._server is not None:
+            self._server.close()
+            await self._server.wait_closed()
+            self._server = None
+
+    async def _handle_connection(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter):
+        peer = writer.get_extra_info("peername")
+        write_lock = asyncio.Lock()
+        tasks = set()
+        closed = False
+
+        async def send(message: Dict[str, Any]) -> None:
+            async with write_lock:
+                writer.write(pack_frame(message))
+                await writer.drain()
+
+        async def is_disconnected() -> bool:
+            return closed
+
+        metrics.increment("rpc_connections_total")
+        try:
+            while True:
+                try:
+                    message = await read_frame(reader, self.max_frame_bytes)
+                except FrameTooLarge as e:
+                    await send({"id": None, "error": {"status": 413, "detail": str(e)}})
+                    break
+                if message is None:
+                    break
+
+                task = asyncio.ensure_future(self._dispatch(message, send, is_disconnected))
+                tasks.add(task)
+                task.add_done_callback(tasks.discard)
+        except (ConnectionError, asyncio.CancelledError):
+            pass
+        finally:
+            closed = True
+            if tasks:
+                # Deadline waits notice the disconnect and drop their work
+                await asyncio.gather(*tasks, return_exceptions=True)
+            writer.close()
+            logger.debug(f"RPC connection closed: {peer}")
+
+    async def _dispatch(self, message: Dict[str, Any], send, is_disconnected) -> None:
+        request_id = message.get("id")
+        name = message.get("method")
+        method = METHODS.get(name)
+        started = time.perf_counter()
+        status = 200
+
+        try:
+            if method is None:
+                raise RpcError(404, f"Unknown method '{name}'")
+
+            priority = message.get("priority") or method.priority
+            if priority not in (INTERACTIVE, BULK):
+                raise RpcError(400, f"Invalid priority: {priority}")
+
+            timeout_ms = message.get("timeout_ms")
+            timeout = timeout_ms / 1000 if timeout_ms else method.timeout
+
+            # Tasks run in a copy of the context, so these stay per request
+            current_deadline.set(Deadline(timeout, is_disconnected=is_disconnected))
+            current_priority.set(priority)
+
+            params = message.get("params") or {}
+            if method.streaming:
+                count = 0
+                async for item in method.handler(params):
+                    await send({"id": request_id, "item": item, "index": count})
+                    count += 1
+                await send({"id": request_id, "end": True, "count": count})
+            else:
+                result = await method.handler(params)
+                await send({"id": request_id, "result": result})
+
+        except RpcError as e:
+            status = e.status
+            await self._send_error(send, request_id, e.status, e.detail)
+        except HTTPException as e:
+            status = e.status_code
+            await self._send_error(send, request_id, e.status_code, e.detail)
+        except Exception as e:
+            status = 500
+            logger.error(f"RPC {name} error: {str(e)}")
+            await self._send_error(send, request_id, 500, str(e))
+        finally:
+            metrics.increment("rpc_requests_total", method=str(name), status=str(status))
+            metrics.observe("rpc_request_seconds", time.perf_counter() - started, method=str(name))
+
+    @staticmethod
+    async def _send_error(send, request_id, status: int, detail: str) -> None:
+        try:
+            await send({"id": request_id, "error": {"status": status, "detail": detail}})
+        except ConnectionError:
+            # Client is gone; nothing left to tell it
+            pass
+
+
+# Global server instance (started from app startup when RPC_ENABLED)
+rpc_server = RpcServer(settings.RPC_HOST, settings.RPC_PORT, settings.MAX_REQUEST_BYTES)
@@ -3,5 +3,10 @@ Business Logic Services Package
 """
 from .text_service import text_classification_service
 from .image_service import image_classification_service
+from .multimodal_service import multimodal_classification_service
 
-__all__ = ["text_classification_service", "image_classification_service"]
\ No newline at end of file
+__all__ = [
+    "text_classification_service",
+    "image_classification_service",
+    "multimodal_classification_service",
+]
\ No newline at end of file
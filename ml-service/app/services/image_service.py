@@ -3,14 +3,25 @@ Image Classification Service
 Handles image preprocessing and CNN prediction
 """
 
+import time
 import numpy as np
 from PIL import Image
 from loguru import logger
-from typing import Dict, Any, Union
+from typing import Dict, Any, List, Optional, Union
 from io import BytesIO
 
 from app.models.model_loader import model_loader
 from app.utils.preprocessing import ImagePreprocessor
+from app.utils.deadline import RequestAborted, check_deadline
+from app.utils.timing import note_timing, timed
+from app.utils.logs import sampled_logger
+from app.utils.image_hash import (
+    ImageHashIndex,
+    compute_image_hash,
+    hash_to_hex,
+)
+from app.workers import inference_workers
+from app.workers.remote import encoded_image_source
 from app.config import settings
 
 
@@ -19,44 +30,73 @@ class ImageClassificationService:
     
     def __init__(self):
         """Initialize service"""
-        self.image_model = None
         self.preprocessor = ImagePreprocessor()
         self.categories = settings.CATEGORIES
+        self.hash_index = ImageHashIndex(max_size=settings.IMAGE_HASH_INDEX_SIZE)
+    
+    @property
+    def image_model(self):
+        """
+        Compiled CNN (a proxy to the cnn worker in process mode), or None
+        
+        Looked up on every use so the memory manager can evict it when idle.
+        """
+        if inference_workers.enabled:
+            return inference_workers.image_model()
+        return model_loader.load_image_classifier()
     
     def load_model(self):
         """Load CNN model if not already loaded"""
-        if self.image_model is None:
-            logger.info("Loading image classification model...")
-            self.image_model = model_loader.load_image_classifier()
-            logger.success("Image model loaded successfully")
+        return self.image_model
     
-    def predict(
+    def compute_hash(self, processed_image: np.ndarray) -> int:
+        """
+        Compute the perceptual hash of a preprocessed image
+        
+        Args:
+            processed_image: Resized image batch from preprocess_image
+            
+        Returns:
+            64-bit perceptual hash
+        """
+        return compute_image_hash(
+            processed_image[0],
+            algorithm=settings.IMAGE_HASH_ALGORITHM
+        )
+    
+    def _model_unavailable(self) -> Dict[str, Any]:
+        """Error result returned when the CNN could not be loaded"""
+        logger.error("Image classification model is unavailable")
+        return {
+            "success": False,
+            "error": "Image classification model is currently unavailable. Please try text classification or contact support.",
+            "error_type": "MODEL_UNAVAILABLE"
+        }
+    
+    def prepare(
         self,
         image: Union[bytes, Image.Image],
         enhance: bool = False
     ) -> Dict[str, Any]:
         """
-        Predict category from image
+        Decode, validate, resize, hash and optionally enhance an image
+        
+        This is everything before the CNN, so callers can overlap it with
+        other work and decide afterwards whether to run the model.
         
         Args:
             image: Image as bytes or PIL Image
             enhance: Whether to apply image enhancement
             
         Returns:
-            Dictionary with prediction results
+            Dictionary with the model-ready batch under "image"
         """
         try:
-            # Ensure model is loaded
-            self.load_model()
-            
-            # Check if model loaded successfully
-            if self.image_model is None:
-                logger.error("Image classification model is unavailable")
-                return {
-                    "success": False,
-                    "error": "Image classification model is currently unavailable. Please try text classification or contact support.",
-                    "error_type": "MODEL_UNAVAILABLE"
-                }
+            # Process mode: decode and resize on an image worker instead
+            if inference_workers.enabled:
+                data = encoded_image_source(image)
+                if data is not None:
+                    return inference_workers.prepare_image(data, enhance=enhance)
             
             # Step 1: Convert bytes to PIL Image if necessary
             if isinstance(image, bytes):
@@ -72,54 +112,337 @@ class ImageClassificationService:
                     "error": error_msg
                 }
             
-            logger.info(f"Processing image of size: {pil_image.size}")
+            sampled_logger.info("Processing image of size: {}", pil_image.size)
+            
+            # Uploads are opened lazily; decode the pixels here so the
+            # decode and resize stages are timed separately
+            with timed("decode"):
+                pil_image.load()
             
             # Step 3: Preprocess image
-            processed_image = self.preprocessor.preprocess_image(pil_image)
+            with timed("resize"):
+                processed_image = self.preprocessor.preprocess_image(pil_image)
+            
+            # Step 3b: Perceptual hash of the resized image
+            with timed("hash"):
+                image_hash = self.compute_hash(processed_image)
             
             # Step 4: Optional enhancement
             if enhance:
-                processed_image = self.preprocessor.enhance_image(
-                    processed_image[0]  # Remove batch dimension
-                )
-                processed_image = np.expand_dims(processed_image, axis=0)
-            
-            # Step 5: Make prediction
-            predictions = self.image_model.predict(
-                processed_image,
-                verbose=0  # Suppress output
-            )
+                with timed("enhance"):
+                    processed_image = self.preprocessor.enhance_image(
+                        processed_image[0]  # Remove batch dimension
+                    )
+                    processed_image = np.expand_dims(processed_image, axis=0)
             
-            # Step 6: Process predictions
-            predicted_class_idx = np.argmax(predictions[0])
-            predicted_category = self.categories[predicted_class_idx]
-            confidence = float(predictions[0][predicted_class_idx])
+            return {
+                "success": True,
+                "image": processed_image,
+                "image_size": pil_image.size,
+                "image_hash": image_hash,
+                "enhanced": enhance
+            }
             
-            # Get all class probabilities
-            class_probabilities = {
-                category: float(prob)
-                for category, prob in zip(self.categories, predictions[0])
+        except Exception as e:
+            logger.error(f"Image preprocessing failed: {str(e)}")
+            return {
+                "success": False,
+                "error": f"Preprocessing error: {str(e)}"
             }
+    
+    def classify_prepared(
+        self,
+        prepared: Dict[str, Any],
+        reference: Optional[str] = None
+    ) -> Dict[str, Any]:
+        """
+        Run the CNN on the output of prepare()
+        
+        Args:
+            prepared: Successful result of prepare()
+            reference: Optional caller identifier (e.g. complaint id)
+                stored with the image hash for duplicate lookups
+            
+        Returns:
+            Dictionary with prediction results
+        """
+        return self.classify_prepared_batch([prepared], [reference])[0]
+    
+    def classify_prepared_batch(
+        self,
+        prepared: List[Dict[str, Any]],
+        references: Optional[List[Optional[str]]] = None
+    ) -> List[Dict[str, Any]]:
+        """
+        Run the CNN on several outputs of prepare() in batched forward passes
+        
+        Images whose prediction can be reused from the hash index skip the
+        CNN; the rest are stacked and run max(IMAGE_BATCH_SIZES) at a time.
+        
+        Args:
+            prepared: Successful results of prepare()
+            references: Optional caller identifier per image
+            
+        Returns:
+            List of prediction results, in input order
+        """
+        references = references or [None] * len(prepared)
+        
+        try:
+            # Ensure model is loaded (reloaded here if it was evicted)
+            image_model = self.load_model()
+            
+            # Check if model loaded successfully
+            if image_model is None:
+                return [self._model_unavailable() for _ in prepared]
+            
+            # Don't run the CNN for a request that expired during preprocessing
+            check_deadline()
+            
+            results: List[Optional[Dict[str, Any]]] = [None] * len(prepared)
+            pending = []
+            
+            for index, item in enumerate(prepared):
+                if settings.IMAGE_DEDUP_REUSE:
+                    reused = self._reuse_prediction(item["image_hash"], item["enhanced"])
+                    note_timing("cache", "miss" if reused is None else "hit")
+                    if reused is not None:
+                        reused["image_size"] = item["image_size"]
+                        results[index] = reused
+                        continue
+                pending.append(index)
             
-            logger.success(
-                f"✓ Predicted category: {predicted_category} "
-                f"(confidence: {confidence:.2%})"
+            # Step 5: Make prediction (compiled graph, no Keras predict loop)
+            chunk_size = max(settings.IMAGE_BATCH_SIZES)
+            for start in range(0, len(pending), chunk_size):
+                chunk = pending[start:start + chunk_size]
+                with timed("cnn"):
+                    predictions = image_model(
+                        np.concatenate([prepared[index]["image"] for index in chunk])
+                    )
+                
+                for index, probabilities in zip(chunk, predictions):
+                    results[index] = self._prediction_result(
+                        probabilities,
+                        prepared[index],
+                        references[index]
+                    )
+            
+            return results
+            
+        except RequestAborted:
+            raise
+        except Exception as e:
+            logger.error(f"Image prediction failed: {str(e)}")
+            return [
+                {
+                    "success": False,
+                    "error": f"Prediction error: {str(e)}"
+                }
+                for _ in prepared
+            ]
+    
+    def _prediction_result(
+        self,
+        probabilities: np.ndarray,
+        prepared: Dict[str, Any],
+        reference: Optional[str]
+    ) -> Dict[str, Any]:
+        """Result for one image's CNN output, recorded in the hash index"""
+        image_hash = prepared["image_hash"]
+        enhance = prepared["enhanced"]
+        
+        # Step 6: Process predictions
+        predicted_class_idx = np.argmax(probabilities)
+        predicted_category = self.categories[predicted_class_idx]
+        confidence = float(probabilities[predicted_class_idx])
+        
+        # Get all class probabilities
+        class_probabilities = {
+            category: float(prob)
+            for category, prob in zip(self.categories, probabilities)
+        }
+        
+        sampled_logger.success(
+            "✓ Predicted category: {} (confidence: {:.2%})",
+            predicted_category,
+            confidence
+        )
+        
+        self.hash_index.add(image_hash, {
+            "reference": reference,
+            "prediction": predicted_category,
+            "confidence": confidence,
+            "probabilities": class_probabilities,
+            "enhanced": enhance
+        })
+        
+        return {
+            "success": True,
+            "prediction": predicted_category,
+            "confidence": confidence,
+            "probabilities": class_probabilities,
+            "image_size": prepared["image_size"],
+            "enhanced": enhance,
+            "image_hash": hash_to_hex(image_hash),
+            "reused": False
+        }
+    
+    def predict(
+        self,
+        image: Union[bytes, Image.Image],
+        enhance: bool = False,
+        reference: Optional[str] = None
+    ) -> Dict[str, Any]:
+        """
+        Predict category from image
+        
+        Args:
+            image: Image as bytes or PIL Image
+            enhance: Whether to apply image enhancement
+            reference: Optional caller identifier (e.g. complaint id)
+                stored with the image hash for duplicate lookups
+            
+        Returns:
+            Dictionary with prediction results
+        """
+        # Fail fast before decoding if the model is missing
+        if self.load_model() is None:
+            return self._model_unavailable()
+        
+        prepared = self.prepare(image, enhance=enhance)
+        if not prepared["success"]:
+            return prepared
+        
+        return self.classify_prepared(prepared, reference=reference)
+    
+    def predict_batch(
+        self,
+        images: List[Union[bytes, Image.Image]],
+        enhance: Optional[List[bool]] = None,
+        references: Optional[List[Optional[str]]] = None
+    ) -> List[Dict[str, Any]]:
+        """
+        Predict categories for several images with batched CNN passes
+        
+        Args:
+            images: Images as bytes or PIL Images
+            enhance: Optional enhancement flag per image
+            references: Optional caller identifier per image
+            
+        Returns:
+            List of prediction results, in input order
+        """
+        if self.load_model() is None:
+            return [self._model_unavailable() for _ in images]
+        
+        enhance = enhance or [False] * len(images)
+        references = references or [None] * len(images)
+        
+        results = [
+            self.prepare(image, enhance=flag)
+            for image, flag in zip(images, enhance)
+        ]
+        ready = [index for index, result in enumerate(results) if result["success"]]
+        
+        if ready:
+            classified = self.classify_prepared_batch(
+                [results[index] for index in ready],
+                [references[index] for index in ready]
             )
+            for index, result in zip(ready, classified):
+                results[index] = result
+        
+        return results
+    
+    def _reuse_prediction(
+        self,
+        image_hash: int,
+        enhance: bool
+    ) -> Optional[Dict[str, Any]]:
+        """
+        Return the stored prediction of a near-identical image, if any
+        
+        Only entries classified with the same enhancement setting qualify,
+        since enhancement can change the CNN output.
+        """
+        matches = self.hash_index.search(
+            image_hash,
+            settings.IMAGE_DEDUP_REUSE_DISTANCE
+        )
+        for distance, matched_hash, entry in matches:
+            if entry["enhanced"] != enhance:
+                continue
             
+            sampled_logger.info("Reusing prediction of near-duplicate image (distance: {})", distance)
             return {
                 "success": True,
-                "prediction": predicted_category,
-                "confidence": confidence,
-                "probabilities": class_probabilities,
-                "image_size": pil_image.size,
-                "enhanced": enhance
+                "prediction": entry["prediction"],
+                "confidence": entry["confidence"],
+                "probabilities": entry["probabilities"],
+                "enhanced": enhance,
+                "image_hash": hash_to_hex(image_hash),
+                "reused": True,
+                "duplicate_of": entry["reference"] or hash_to_hex(matched_hash),
+                "duplicate_distance": distance
+            }
+        
+        return None
+    
+    def find_similar(
+        self,
+        image: Union[bytes, Image.Image],
+        radius: Optional[int] = None,
+        limit: int = 10
+    ) -> Dict[str, Any]:
+        """
+        Find previously classified images that are near-duplicates
+        
+        Args:
+            image: Image as bytes or PIL Image
+            radius: Maximum Hamming distance (default from config)
+            limit: Maximum number of matches to return
+            
+        Returns:
+            Dictionary with the query hash and matches, closest first
+        """
+        try:
+            if radius is None:
+                radius = settings.IMAGE_HASH_RADIUS
+            
+            # Same decode, validation and hash as classification
+            prepared = self.prepare(image)
+            if not prepared["success"]:
+                return prepared
+            image_hash = prepared["image_hash"]
+            
+            start = time.perf_counter()
+            matches = self.hash_index.search(image_hash, radius, limit=limit)
+            search_ms = (time.perf_counter() - start) * 1000
+            
+            return {
+                "success": True,
+                "image_hash": hash_to_hex(image_hash),
+                "radius": radius,
+                "indexed": len(self.hash_index),
+                "search_ms": round(search_ms, 3),
+                "matches": [
+                    {
+                        "image_hash": hash_to_hex(matched_hash),
+                        "distance": distance,
+                        "reference": entry["reference"],
+                        "prediction": entry["prediction"],
+                        "confidence": entry["confidence"]
+                    }
+                    for distance, matched_hash, entry in matches
+                ]
             }
             
         except Exception as e:
-            logger.error(f"Image prediction failed: {str(e)}")
+            logger.error(f"Similar image search failed: {str(e)}")
             return {
                 "success": False,
-                "error": f"Prediction error: {str(e)}"
+                "error": f"Similarity search error: {str(e)}"
             }
     
     def predict_top_k(
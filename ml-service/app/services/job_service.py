@@ -0,0 +1,289 @@
+"""
+Job Service
+Accepts classifications as asynchronous jobs in the durable job queue and
+drains it with background workers that batch claimed jobs into one text
+pass and one image pass, at bulk priority on the inference executors
+"""
+
+import functools
+import threading
+import time
+from concurrent.futures import CancelledError, Future, wait
+from typing import Any, Dict, List, Optional
+
+from loguru import logger
+
+from app.config import settings
+from app.services.image_service import image_classification_service
+from app.services.multimodal_service import combine_results
+from app.services.text_service import text_classification_service
+from app.utils.executors import image_executor, text_executor
+from app.utils.job_queue import JobQueue, QueueFull
+from app.utils.metrics import metrics
+from app.utils.scheduler import BULK, SchedulerOverloaded, SchedulerShutdown
+from app.workers import WorkerUnavailable
+
+# Job kinds: which inputs a job carries and how its result is built
+TEXT = "text"  # One text -> text result
+BATCH = "batch"  # Many texts -> {"count", "results"} like /text/classify-batch
+IMAGE = "image"  # One image -> image result
+CLASSIFY = "classify"  # Text + image -> fused result like /classify
+
+
+class JobService:
+    """
+    Asynchronous classification jobs
+
+    Submissions are written to the SQLite queue and return at once; the
+    backend polls for the result. Each of JOBS_WORKERS threads claims up
+    to JOBS_BATCH_SIZE jobs, runs all their texts through one
+    batch_predict call and all their images through one batched CNN
+    pass (concurrently, on the text and image executors), then stores
+    every result. Work is submitted as bulk, so interactive requests
+    keep priority; jobs shed by the scheduler, cut short by shutdown or
+    by a lost inference worker go back to the queue instead of failing.
+    While a batch runs its leases are renewed every JOBS_LEASE_S / 3, so
+    only batches of a dead worker are claimed again.
+    """
+
+    def __init__(self):
+        self._queue: Optional[JobQueue] = None
+        self._lock = threading.Lock()
+        self._wake = threading.Event()
+        self._stop = threading.Event()
+        self._threads: List[threading.Thread] = []
+        self._last_purge = 0.0
+
+    @property
+    def enabled(self) -> bool:
+        return settings.JOBS_ENABLED
+
+    @property
+    def queue(self) -> JobQueue:
+        """The job database, opened on first use"""
+        if self._queue is None:
+            with self._lock:
+                if self._queue is None:
+                    self._queue = JobQueue(
+                        settings.JOBS_DB_PATH,
+                        max_queued=settings.JOBS_MAX_QUEUED,
+                        result_ttl_s=settings.JOBS_RESULT_TTL_S
+                    )
+        return self._queue
+
+    def start(self) -> None:
+        """Start the job workers"""
+        if not self.enabled or self._threads:
+            return
+
+        self._stop.clear()
+        for index in range(max(1, settings.JOBS_WORKERS)):
+            thread = threading.Thread(target=self._run, name=f"ml-jobs-{index}", daemon=True)
+            thread.start()
+            self._threads.append(thread)
+
+    def stop(self) -> None:
+        if not self._threads:
+            return
+        self._stop.set()
+        self._wake.set()
+        for thread in self._threads:
+            thread.join(timeout=30)
+        self._threads = []
+
+        if self._queue is not None:
+            self._queue.close()
+            self._queue = None
+
+    def submit(self, kind: str, payload: Dict[str, Any], image: Optional[bytes] = None) -> Dict[str, Any]:
+        """
+        Queue a job
+
+        Args:
+            kind: TEXT, BATCH, IMAGE or CLASSIFY
+            payload: JSON-safe inputs (text, texts, complaint ids, flags)
+            image: Original image file bytes for IMAGE and CLASSIFY jobs
+
+        Returns:
+            {"id", "kind", "status", "created_at"}
+
+        Raises:
+            QueueFull: If JOBS_MAX_QUEUED jobs are unfinished
+        """
+        try:
+            job = self.queue.submit(kind, payload, image)
+        except QueueFull:
+            metrics.increment("jobs_rejected_total", kind=kind)
+            raise
+
+        metrics.increment("jobs_submitted_total", kind=kind)
+        self._wake.set()
+        return job
+
+    def get(self, job_id: str) -> Optional[Dict[str, Any]]:
+        """Job status and result, or None if unknown or expired"""
+        return self.queue.get(job_id)
+
+    def _run(self) -> None:
+        while not self._stop.is_set():
+            try:
+                self._purge_expired()
+                jobs = self.queue.claim(
+                    settings.JOBS_BATCH_SIZE,
+                    lease_s=settings.JOBS_LEASE_S,
+                    max_attempts=settings.JOBS_MAX_ATTEMPTS
+                )
+            except Exception as e:
+                logger.error(f"Job queue error: {str(e)}")
+                jobs = []
+
+            if not jobs:
+                # Submissions wake one worker; other processes' jobs are polled
+                self._wake.wait(settings.JOBS_POLL_INTERVAL_S)
+                self._wake.clear()
+                continue
+
+            # More may be waiting: let an idle worker claim the next batch
+            self._wake.set()
+            self.run_batch(jobs)
+
+    def _purge_expired(self) -> None:
+        now = time.monotonic()
+        if now - self._last_purge < 60.0:
+            return
+        self._last_purge = now
+        purged = self.queue.purge()
+        if purged:
+            logger.info(f"🧹 Purged {purged} expired jobs")
+
+    def run_batch(self, jobs: List[Dict[str, Any]]) -> None:
+        """Run claimed jobs and store their results"""
+        started = time.perf_counter()
+        attempts = {job["id"]: job["attempts"] for job in jobs}
+
+        texts: List[str] = []
+        complaint_ids: List[Optional[str]] = []
+        images: List[bytes] = []
+        enhance: List[bool] = []
+        references: List[Optional[str]] = []
+
+        for job in jobs:
+            payload = job["payload"]
+            if job["kind"] == BATCH:
+                job["texts"] = slice(len(texts), len(texts) + len(payload["texts"]))
+                texts.extend(payload["texts"])
+                complaint_ids.extend(payload.get("complaint_ids") or [None] * len(payload["texts"]))
+            elif job["kind"] in (TEXT, CLASSIFY):
+                job["texts"] = len(texts)
+                texts.append(payload["text"])
+                complaint_ids.append(payload.get("complaint_id"))
+
+            if job["kind"] in (IMAGE, CLASSIFY):
+                job["images"] = len(images)
+                images.append(job["image"])
+                enhance.append(bool(payload.get("enhance")))
+                references.append(payload.get("complaint_id"))
+
+        futures: List[Future] = []
+        try:
+            # Text and image passes run concurrently on their own executors
+            text_future = image_future = None
+            if texts:
+                text_future = self._submit(
+                    text_executor, text_classification_service.batch_predict, texts, complaint_ids
+                )
+                futures.append(text_future)
+            if images:
+                image_future = self._submit(
+                    image_executor, image_classification_service.predict_batch, images, enhance, references
+                )
+                futures.append(image_future)
+
+            self._wait(futures, attempts)
+            text_results = text_future.result() if text_future else []
+            image_results = image_future.result() if image_future else []
+
+        except SchedulerOverloaded:
+            # Interactive traffic is backlogged: retry these jobs later
+            for future in futures:
+                future.cancel()
+            metrics.increment("jobs_requeued_total", len(jobs))
+            self.queue.release(attempts)
+            self._stop.wait(settings.JOBS_POLL_INTERVAL_S)
+            return
+        except (CancelledError, SchedulerShutdown, WorkerUnavailable) as e:
+            # Executors or workers stopped under the batch: not the jobs' fault
+            for future in futures:
+                future.cancel()
+            logger.warning(f"Job batch interrupted, requeued {len(jobs)} jobs: {str(e) or type(e).__name__}")
+            metrics.increment("jobs_requeued_total", len(jobs))
+            # A worker lost outside shutdown may have been killed by one of
+            # these jobs: count the attempt so JOBS_MAX_ATTEMPTS still applies
+            lost_worker = isinstance(e, WorkerUnavailable) and not self._stop.is_set()
+            self.queue.release(attempts, count_attempt=lost_worker)
+            return
+        except Exception as e:
+            logger.error(f"Job batch failed: {str(e)}")
+            text_results = image_results = None
+            error = {"success": False, "error": f"Job failed: {str(e)}"}
+
+        results = {}
+        for job in jobs:
+            if text_results is None:
+                result = error
+            elif job["kind"] == BATCH:
+                batch = text_results[job["texts"]]
+                result = {"success": True, "count": len(batch), "results": batch}
+            elif job["kind"] == TEXT:
+                result = text_results[job["texts"]]
+            elif job["kind"] == IMAGE:
+                result = image_results[job["images"]]
+            else:
+                result = combine_results(text_results[job["texts"]], image_results[job["images"]])
+            results[job["id"]] = result
+
+            metrics.increment(
+                "jobs_finished_total",
+                kind=job["kind"],
+                status="done" if result["success"] else "failed"
+            )
+            metrics.observe("job_queue_wait_seconds", job["started_at"] - job["created_at"], kind=job["kind"])
+
+        stored = self.queue.finish(results, attempts)
+        if stored < len(results):
+            # Lease lost (e.g. the process was suspended): a newer claim owns these jobs
+            logger.warning(f"Dropped {len(results) - stored} job results whose lease was taken over")
+            metrics.increment("jobs_stale_results_total", len(results) - stored)
+        metrics.observe("job_batch_seconds", time.perf_counter() - started)
+
+    def _wait(self, futures: List[Future], attempts: Dict[str, int]) -> None:
+        """Wait for a batch, renewing its leases so long batches are not claimed again"""
+        interval = max(1.0, settings.JOBS_LEASE_S / 3)
+        pending = futures
+        while pending:
+            _, pending = wait(pending, timeout=interval)
+            if pending:
+                self.queue.renew(attempts, settings.JOBS_LEASE_S)
+
+    @staticmethod
+    def _submit(executor, fn, *args) -> Future:
+        """Queue work on an inference executor as bulk"""
+        return executor.submit(BULK, functools.partial(fn, *args))
+
+    def status(self) -> Dict[str, Any]:
+        """Jobs section of /health"""
+        if not self.enabled:
+            return {"enabled": False}
+        try:
+            counts = self.queue.counts()
+        except Exception as e:
+            return {"enabled": True, "error": str(e)}
+        return {
+            "enabled": True,
+            "workers": len(self._threads),
+            "jobs": counts,
+        }
+
+
+# Global service instance
+job_service = JobService()
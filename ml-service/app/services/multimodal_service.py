@@ -0,0 +1,198 @@
+"""
+Multimodal Classification Service
+Runs text and image pipelines concurrently and fuses their probabilities
+"""
+
+import asyncio
+from typing import Any, Dict, Optional, Union
+
+from PIL import Image
+
+from app.config import settings
+from app.services.image_service import image_classification_service
+from app.services.text_service import text_classification_service
+from app.utils.categories import canonical_category
+from app.utils.deadline import discard_task
+from app.utils.executors import image_executor, run_in_executor, text_executor
+from app.utils.logs import sampled_logger
+
+
+def fuse_probabilities(
+    text_probabilities: Optional[Dict[str, float]],
+    image_probabilities: Optional[Dict[str, float]],
+    text_weight: float = 0.5
+) -> Optional[Dict[str, float]]:
+    """
+    Weighted average of text and image class probabilities
+
+    Labels are canonicalized first; if only one modality is available its
+    probabilities are returned unchanged.
+    """
+    sources = []
+    if text_probabilities:
+        sources.append((text_probabilities, text_weight))
+    if image_probabilities:
+        sources.append((image_probabilities, 1.0 - text_weight))
+    if not sources:
+        return None
+
+    total_weight = sum(weight for _, weight in sources) or 1.0
+    fused: Dict[str, float] = {}
+    for probabilities, weight in sources:
+        for label, prob in probabilities.items():
+            category = canonical_category(label)
+            fused[category] = fused.get(category, 0.0) + prob * weight / total_weight
+
+    return fused
+
+
+def combine_results(
+    text_result: Dict[str, Any],
+    image_result: Optional[Dict[str, Any]] = None,
+    image_skipped: bool = False
+) -> Dict[str, Any]:
+    """
+    Fused multimodal result from the individual text and image results
+
+    Args:
+        text_result: TextClassificationService.predict result
+        image_result: ImageClassificationService result, or None without an image
+        image_skipped: The CNN was skipped by the early exit
+
+    Returns:
+        Fused prediction plus the individual text and image results
+    """
+    text_ok = text_result["success"]
+    image_ok = image_result is not None and image_result["success"]
+
+    if not text_ok and not image_ok:
+        return {
+            "success": False,
+            "error": text_result.get("error") or "Classification failed",
+            "text": text_result,
+            "image": image_result
+        }
+
+    probabilities = fuse_probabilities(
+        text_result.get("probabilities") if text_ok else None,
+        image_result.get("probabilities") if image_ok else None,
+        text_weight=settings.FUSION_TEXT_WEIGHT
+    )
+
+    if probabilities:
+        prediction = max(probabilities, key=probabilities.get)
+        confidence = probabilities[prediction]
+    else:
+        # Heads without predict_proba: fall back to the text label
+        source = text_result if text_ok else image_result
+        prediction = canonical_category(str(source["prediction"]))
+        confidence = source.get("confidence")
+
+    sampled_logger.info(
+        "Multimodal prediction: {} (text: {}, image: {})",
+        prediction,
+        "ok" if text_ok else "failed",
+        "skipped" if image_skipped else "ok" if image_ok else "none"
+    )
+
+    return {
+        "success": True,
+        "prediction": prediction,
+        "confidence": confidence,
+        "probabilities": probabilities,
+        "text": text_result,
+        "image": image_result,
+        "image_skipped": image_skipped
+    }
+
+
+class MultimodalClassificationService:
+    """Service for classifying a complaint from its text and optional photo"""
+
+    async def classify(
+        self,
+        text: str,
+        image: Optional[Union[bytes, Image.Image]] = None,
+        enhance: bool = False,
+        early_exit_threshold: Optional[float] = None,
+        reference: Optional[str] = None
+    ) -> Dict[str, Any]:
+        """
+        Classify text and image concurrently on their executors
+
+        Args:
+            text: Raw complaint text
+            image: Optional image bytes or (lazily opened) PIL Image
+            enhance: Apply image enhancement before the CNN
+            early_exit_threshold: Skip the CNN when the text confidence
+                reaches this value (image decoding still overlaps with text)
+            reference: Optional complaint id stored with the image hash
+                (and with the text embedding)
+
+        Returns:
+            Fused prediction plus the individual text and image results
+        """
+        text_task = asyncio.ensure_future(
+            run_in_executor(text_executor, text_classification_service.predict, text, reference)
+        )
+
+        image_result = None
+        image_skipped = False
+
+        if image is None:
+            text_result = await text_task
+        elif early_exit_threshold is None:
+            image_task = asyncio.ensure_future(
+                run_in_executor(
+                    image_executor,
+                    image_classification_service.predict,
+                    image,
+                    enhance,
+                    reference
+                )
+            )
+            text_result = await self._await_text(text_task, image_task)
+            image_result = await image_task
+        else:
+            # Decode/resize while the text pipeline runs, then decide on the CNN
+            prepare_task = asyncio.ensure_future(
+                run_in_executor(
+                    image_executor,
+                    image_classification_service.prepare,
+                    image,
+                    enhance
+                )
+            )
+            text_result = await self._await_text(text_task, prepare_task)
+
+            text_confidence = text_result.get("confidence") if text_result["success"] else None
+            if text_confidence is not None and text_confidence >= early_exit_threshold:
+                image_skipped = True
+                # Only the image work is dropped; the request itself succeeds
+                discard_task(prepare_task)
+            else:
+                prepared = await prepare_task
+                if prepared["success"]:
+                    image_result = await run_in_executor(
+                        image_executor,
+                        image_classification_service.classify_prepared,
+                        prepared,
+                        reference
+                    )
+                else:
+                    image_result = prepared
+
+        return combine_results(text_result, image_result, image_skipped)
+
+    @staticmethod
+    async def _await_text(text_task: asyncio.Future, image_task: asyncio.Future) -> Dict[str, Any]:
+        """Text result; if the text side raises (or we are cancelled), drop the image work too"""
+        try:
+            return await text_task
+        except BaseException:
+            image_task.cancel()
+            raise
+
+
+# Global service instance
+multimodal_classification_service = MultimodalClassificationService()
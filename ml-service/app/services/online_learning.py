@@ -0,0 +1,479 @@
+"""
+Online Learning Service
+Collects label corrections and incrementally retrains the text head from
+stored embeddings in a background thread, hot-swapping it into the text
+service when held-out accuracy does not regress
+"""
+
+import json
+import os
+import threading
+import time
+from pathlib import Path
+from typing import Any, Dict, List, Optional, Tuple
+
+import joblib
+import numpy as np
+from loguru import logger
+
+from app.config import settings
+from app.models.linear_head import LinearHead
+from app.models.model_loader import model_loader
+from app.services.text_service import text_classification_service
+from app.utils.categories import canonical_category
+from app.utils.embedding_store import EmbeddingStoreReader, embedding_store, text_hash
+from app.utils.metrics import metrics
+
+FEEDBACK_FILE = "feedback.jsonl"
+STATE_FILE = "state.json"
+MODEL_FILE = "online_classifier.pkl"
+
+
+def in_holdout(key: str) -> bool:
+    """Whether a text hash belongs to the validation split (stable across rounds)"""
+    return int(key[:8], 16) % 10000 < settings.ONLINE_HOLDOUT_FRACTION * 10000
+
+
+class OnlineLearner:
+    """
+    Incremental retraining of the text head from label corrections
+
+    Corrections are appended to feedback.jsonl and joined to stored
+    embeddings by complaint id or text hash; with the embedding store no
+    text is ever re-encoded. Each round, on a low-priority thread, an
+    SGDClassifier(loss="log_loss") continues with partial_fit on the
+    corrections outside the holdout (weighted by ONLINE_CORRECTION_WEIGHT)
+    and, optionally, on confident predictions stored since the previous
+    round. A fresh model starts from the base head's weights, not from
+    zero. The candidate and the served head are scored on the held-out
+    corrections and on a reserved slice of the base head's confident
+    predictions (the general distribution); the candidate is exported as
+    a LinearHead and swapped in unless it loses more than
+    ONLINE_MAX_ACCURACY_DROP accuracy on the corrections or
+    ONLINE_MAX_GENERAL_ACCURACY_DROP on the general holdout.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._wake = threading.Event()
+        self._stop = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+        self._pending = 0  # Corrections since the last round
+        self._last_round: Optional[Dict[str, Any]] = None
+        self._rounds = 0
+
+    @property
+    def enabled(self) -> bool:
+        return settings.ONLINE_LEARNING_ENABLED
+
+    @property
+    def directory(self) -> Path:
+        return Path(settings.ONLINE_LEARNING_DIR)
+
+    def start(self) -> None:
+        """Start the background training thread"""
+        if not self.enabled or self._thread is not None:
+            return
+        if not settings.EMBEDDING_STORE_ENABLED:
+            logger.warning("Online learning needs EMBEDDING_STORE_ENABLED; corrections are only logged")
+        self.directory.mkdir(parents=True, exist_ok=True)
+        self._stop.clear()
+        self._thread = threading.Thread(target=self._run, name="online-learning", daemon=True)
+        self._thread.start()
+
+    def stop(self) -> None:
+        if self._thread is None:
+            return
+        self._stop.set()
+        self._wake.set()
+        self._thread.join(timeout=30)
+        self._thread = None
+
+    # Corrections
+
+    @staticmethod
+    def label_space() -> List[str]:
+        """Labels the served head predicts (the classes a correction may use)"""
+        head = model_loader.load_text_classifier()
+        label_encoder = model_loader.load_label_encoder()
+        if label_encoder is not None and not isinstance(head, LinearHead):
+            return [str(label) for label in label_encoder.classes_]
+        return [str(label) for label in head.classes_]
+
+    def normalize_label(self, label: str) -> str:
+        """
+        Map a correction onto the head's labels ("potholes" -> "pothole")
+
+        Raises:
+            ValueError: If the label matches no class
+        """
+        classes = self.label_space()
+        if label in classes:
+            return label
+        for candidate in classes:
+            if canonical_category(candidate) == canonical_category(label):
+                return candidate
+        raise ValueError(f"Unknown label '{label}'. Known labels: {', '.join(classes)}")
+
+    def add_correction(
+        self,
+        label: str,
+        complaint_id: Optional[str] = None,
+        text: Optional[str] = None
+    ) -> Dict[str, Any]:
+        """
+        Record a staff label correction
+
+        With `text`, the text is embedded now and stored, so the correction
+        can be trained on even if the complaint was never classified with
+        the embedding store enabled. With only `complaint_id`, it joins the
+        embedding stored when that complaint was classified.
+
+        Args:
+            label: Correct category
+            complaint_id: Complaint the correction is for
+            text: Complaint text
+
+        Returns:
+            The recorded correction
+
+        Raises:
+            ValueError: If the label is unknown, the text is invalid or
+                neither complaint_id nor text is given
+        """
+        if not complaint_id and not text:
+            raise ValueError("Send a complaint_id, a text or both")
+        label = self.normalize_label(label)
+
+        key = None
+        if text:
+            is_valid, error_msg = text_classification_service.preprocessor.validate_text(text)
+            if not is_valid:
+                raise ValueError(error_msg)
+            cleaned_text = text_classification_service.preprocessor.clean_text(text)
+            key = text_hash(cleaned_text)
+
+            embeddings = text_classification_service.encode_texts([cleaned_text])
+            result = text_classification_service.classify_embeddings(embeddings)[0]
+            embedding_store.append(
+                [cleaned_text],
+                embeddings,
+                [result["prediction"]],
+                [result["confidence"]],
+                model_loader.text_model_version(),
+                [complaint_id]
+            )
+
+        correction = {
+            "label": label,
+            "complaint_id": complaint_id or None,
+            "text_hash": key,
+            "created_at": time.time(),
+        }
+        self.directory.mkdir(parents=True, exist_ok=True)
+        with self._lock:
+            with open(self.directory / FEEDBACK_FILE, "a", encoding="utf-8") as feedback:
+                feedback.write(json.dumps(correction) + "\n")
+            self._pending += 1
+            pending = self._pending
+
+        metrics.increment("online_corrections_total")
+        if pending >= settings.ONLINE_LEARNING_MIN_CORRECTIONS:
+            self._wake.set()
+        return correction
+
+    def _load_corrections(self) -> Tuple[Dict[str, str], Dict[str, str]]:
+        """Latest label per complaint id and per text hash"""
+        by_id, by_hash = {}, {}
+        path = self.directory / FEEDBACK_FILE
+        if not path.exists():
+            return by_id, by_hash
+        with open(path, encoding="utf-8") as feedback:
+            for line in feedback:
+                if not line.strip():
+                    continue
+                correction = json.loads(line)
+                if correction.get("complaint_id"):
+                    by_id[correction["complaint_id"]] = correction["label"]
+                if correction.get("text_hash"):
+                    by_hash[correction["text_hash"]] = correction["label"]
+        return by_id, by_hash
+
+    # Training
+
+    def _run(self) -> None:
+        # Lowest CPU priority for this thread only (Linux); requests come first
+        try:
+            os.setpriority(os.PRIO_PROCESS, threading.get_native_id(), 19)
+        except (AttributeError, OSError):
+            pass
+
+        while not self._stop.is_set():
+            self._wake.wait(settings.ONLINE_LEARNING_INTERVAL_S)
+            self._wake.clear()
+            if self._stop.is_set():
+                return
+            try:
+                self.run_round()
+            except Exception as e:
+                logger.error(f"Online learning round failed: {str(e)}")
+                metrics.increment("online_learning_rounds_total", result="failed")
+
+    def _load_state(self, base_digest: str, classes: List[str]) -> Tuple[Any, Dict[str, Any]]:
+        """The SGD model and store positions of earlier rounds (reset after a redeploy)"""
+        from sklearn.linear_model import SGDClassifier
+
+        state_path = self.directory / STATE_FILE
+        model_path = self.directory / MODEL_FILE
+        if state_path.exists() and model_path.exists():
+            state = json.loads(state_path.read_text(encoding="utf-8"))
+            if state.get("base_digest") == base_digest and state.get("classes") == classes:
+                return joblib.load(model_path), state
+            logger.info("Base text head changed; online learning starts over")
+
+        model = SGDClassifier(loss="log_loss", alpha=1e-4, random_state=0)
+        self._warm_start(model, classes)
+        return model, {"base_digest": base_digest, "classes": classes, "positions": {}, "rounds": 0}
+
+    @staticmethod
+    def _warm_start(model: Any, classes: List[str]) -> None:
+        """
+        Start the SGD model from the base head's coef_ and intercept_
+
+        partial_fit keeps a coef_ that is already set, so the first round
+        continues from the served weights instead of from zero. Rows follow
+        sorted(classes), the order partial_fit gives classes_. Calibrated
+        heads have no single linear map; those start from zero.
+        """
+        try:
+            base = LinearHead.from_sklearn(
+                joblib.load(settings.TEXT_MODEL_PATH),
+                label_encoder=model_loader.load_label_encoder()
+            )
+        except Exception as e:
+            logger.warning(f"Online learning starts from zero weights: {str(e)}")
+            return
+
+        base_classes = [str(label) for label in base.classes_]
+        if base.folds != 1 or sorted(base_classes) != sorted(classes):
+            logger.warning(
+                "Base text head is calibrated or has other classes; online learning starts from zero weights"
+            )
+            return
+
+        # float32 like the features partial_fit sees (SGD keeps coef_ in the input dtype)
+        order = sorted(classes)
+        weights = np.asarray(base.weights, dtype=np.float32)
+        bias = np.asarray(base.bias, dtype=np.float32)
+        if weights.shape[1] == 1:
+            # Binary: one column for base_classes[1], partial_fit's positive class is order[1]
+            sign = 1.0 if base_classes[1] == order[1] else -1.0
+            model.coef_ = sign * weights.T.copy()
+            model.intercept_ = sign * bias.copy()
+        else:
+            rows = [base_classes.index(label) for label in order]
+            model.coef_ = np.ascontiguousarray(weights.T[rows])
+            model.intercept_ = bias[rows].copy()
+        logger.info(f"Online learning starts from the base head ({len(order)} classes)")
+
+    def _save_state(self, model: Any, state: Dict[str, Any]) -> None:
+        model_path = self.directory / MODEL_FILE
+        tmp = model_path.with_suffix(".tmp")
+        joblib.dump(model, tmp)
+        os.replace(tmp, model_path)
+
+        state_path = self.directory / STATE_FILE
+        tmp = state_path.with_suffix(".tmp")
+        tmp.write_text(json.dumps(state), encoding="utf-8")
+        os.replace(tmp, state_path)
+
+    def run_round(self) -> Dict[str, Any]:
+        """
+        One training round over the stored embeddings (see class docstring)
+
+        Returns:
+            Round summary, also reported in status()
+        """
+        started = time.perf_counter()
+        with self._lock:
+            self._pending = 0
+
+        # Rows queued before this round become visible to the reader
+        embedding_store.flush(timeout=30)
+
+        by_id, by_hash = self._load_corrections()
+        summary: Dict[str, Any] = {}
+        if not by_id and not by_hash:
+            return self._finish(summary, "skipped", started)
+
+        classes = self.label_space()
+        class_set = set(classes)
+        base_digest = model_loader.text_head_sources_digest()
+        model, state = self._load_state(base_digest, classes)
+        projection = text_classification_service.projection
+
+        def features(embeddings: np.ndarray) -> np.ndarray:
+            embeddings = np.asarray(embeddings, dtype=np.float32)
+            if projection is not None:
+                embeddings = np.asarray(projection.transform(embeddings), dtype=np.float32)
+            return embeddings
+
+        seen = state["positions"]
+        pseudo_threshold = settings.ONLINE_PSEUDO_LABEL_CONFIDENCE
+        base_version = base_digest[:12]
+        corrected: Dict[str, Tuple[np.ndarray, str]] = {}  # text hash -> (embedding, label)
+        # Confident base-head predictions reserved to check the general distribution
+        general: List[Tuple[np.ndarray, str]] = []
+        pseudo_rows = 0
+
+        reader = EmbeddingStoreReader(embedding_store.root)
+        for batch in reader.iter_batches(
+            columns=["embedding", "text_hash", "complaint_id", "prediction", "confidence", "model_version"],
+            embedder=settings.MBERT_MODEL,
+            positions=True
+        ):
+            # Corrections, joined by complaint id first, then by text hash
+            labels = [
+                by_id.get(complaint_id) if complaint_id else None
+                for complaint_id in batch["complaint_id"]
+            ]
+            labels = [
+                label or by_hash.get(key)
+                for label, key in zip(labels, batch["text_hash"])
+            ]
+            for row, label in enumerate(labels):
+                if label in class_set:
+                    corrected[batch["text_hash"][row]] = (batch["embedding"][row], label)
+
+            uncorrected = np.array([label is None for label in labels])
+            held_out = np.array([in_holdout(key) for key in batch["text_hash"]])
+            confidence = np.nan_to_num(batch["confidence"])
+            known = np.isin(batch["prediction"], classes)
+
+            if len(general) < settings.ONLINE_GENERAL_HOLDOUT_ROWS:
+                reserve = (
+                    uncorrected & held_out & known
+                    & (confidence >= settings.ONLINE_GENERAL_HOLDOUT_CONFIDENCE)
+                    & (batch["model_version"] == base_version)
+                )
+                general.extend(
+                    (batch["embedding"][row], batch["prediction"][row])
+                    for row in np.flatnonzero(reserve)[:settings.ONLINE_GENERAL_HOLDOUT_ROWS - len(general)]
+                )
+
+            # Confident predictions stored since the previous round (never the holdout)
+            if pseudo_threshold is None:
+                continue
+            new = batch["row"] >= np.array([seen.get(name, 0) for name in batch["segment"]])
+            keep = new & uncorrected & ~held_out & known & (confidence >= pseudo_threshold)
+            if keep.any():
+                model.partial_fit(
+                    features(batch["embedding"][keep]),
+                    batch["prediction"][keep],
+                    classes=classes
+                )
+                pseudo_rows += int(keep.sum())
+
+        train = [(embedding, label) for key, (embedding, label) in corrected.items() if not in_holdout(key)]
+        holdout = [(embedding, label) for key, (embedding, label) in corrected.items() if in_holdout(key)]
+        summary.update(
+            corrections=len(corrected),
+            trained_corrections=len(train),
+            holdout=len(holdout),
+            general_holdout=len(general),
+            pseudo_labeled=pseudo_rows
+        )
+
+        if train:
+            x_train = features(np.stack([embedding for embedding, _ in train]))
+            y_train = np.array([label for _, label in train])
+            weights = np.full(len(train), settings.ONLINE_CORRECTION_WEIGHT)
+            rng = np.random.default_rng(state["rounds"])
+            for _ in range(settings.ONLINE_EPOCHS):
+                order = rng.permutation(len(train))
+                model.partial_fit(x_train[order], y_train[order], classes=classes, sample_weight=weights[order])
+
+        if not hasattr(model, "classes_"):
+            return self._finish(summary, "skipped", started)
+
+        state["positions"] = reader.committed_rows()
+        state["rounds"] += 1
+        self._save_state(model, state)
+
+        if min(len(holdout), len(general)) < settings.ONLINE_MIN_HOLDOUT:
+            return self._finish(summary, "insufficient_holdout", started)
+
+        candidate = LinearHead.from_sklearn(
+            model,
+            projection=projection if projection is not None and projection.kind == "pca" else None
+        )
+        candidate.source_digest = base_digest
+
+        def accuracies(rows: List[Tuple[np.ndarray, str]], split: str) -> Tuple[float, float]:
+            """Accuracy of the served head and of the candidate on held-out rows"""
+            x = np.stack([embedding for embedding, _ in rows]).astype(np.float32)
+            y = np.array([label for _, label in rows])
+            current = float(np.mean([
+                result["prediction"] == label
+                for result, label in zip(text_classification_service.classify_embeddings(x), y)
+            ]))
+            candidate_input = x if candidate.projection_folded else features(x)
+            new = float(np.mean(candidate.predict(candidate_input) == y))
+            metrics.set_gauge("online_holdout_accuracy", current, head="current", split=split)
+            metrics.set_gauge("online_holdout_accuracy", new, head="candidate", split=split)
+            return current, new
+
+        current_accuracy, candidate_accuracy = accuracies(holdout, "corrections")
+        current_general, candidate_general = accuracies(general, "general")
+        summary.update(
+            current_accuracy=current_accuracy,
+            candidate_accuracy=candidate_accuracy,
+            current_general_accuracy=current_general,
+            candidate_general_accuracy=candidate_general
+        )
+
+        if candidate_general < current_general - settings.ONLINE_MAX_GENERAL_ACCURACY_DROP:
+            return self._finish(summary, "rejected", started)
+        if candidate_accuracy < current_accuracy - settings.ONLINE_MAX_ACCURACY_DROP:
+            return self._finish(summary, "rejected", started)
+
+        path = Path(settings.TEXT_ONLINE_HEAD_PATH)
+        tmp = path.with_name(path.stem + ".tmp.npz")
+        candidate.save(tmp)
+        os.replace(tmp, path)
+        model_loader.swap_text_classifier(LinearHead.load(path))
+        summary["model_version"] = model_loader.text_model_version()
+        logger.info(
+            f"Online text head swapped in: holdout accuracy {current_accuracy:.3f} -> "
+            f"{candidate_accuracy:.3f} on {len(holdout)} corrections, {current_general:.3f} -> "
+            f"{candidate_general:.3f} on {len(general)} general rows"
+        )
+        return self._finish(summary, "swapped", started)
+
+    def _finish(self, summary: Dict[str, Any], result: str, started: float) -> Dict[str, Any]:
+        seconds = time.perf_counter() - started
+        summary.update(result=result, seconds=round(seconds, 3), finished_at=time.time())
+        metrics.increment("online_learning_rounds_total", result=result)
+        metrics.observe("online_learning_round_seconds", seconds)
+        with self._lock:
+            self._last_round = summary
+            self._rounds += 1
+        return summary
+
+    def status(self) -> Dict[str, Any]:
+        """Online learning section of /health"""
+        if not self.enabled:
+            return {"enabled": False}
+        with self._lock:
+            return {
+                "enabled": True,
+                "running": self._thread is not None and self._thread.is_alive(),
+                "pending_corrections": self._pending,
+                "rounds": self._rounds,
+                "last_round": self._last_round,
+                "model_version": model_loader.text_model_version(),
+            }
+
+
+# Global online learner
+online_learner = OnlineLearner()
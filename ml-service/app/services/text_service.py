@@ -3,12 +3,25 @@ Text Classification Service
 Handles text preprocessing, embedding generation, and prediction
 """
 
+import time
+from contextlib import nullcontext
 import numpy as np
+import torch
 from loguru import logger
-from typing import Dict, Any
+from typing import Dict, Any, List, Optional, Tuple
 
+from app.models.linear_head import LinearHead
 from app.models.model_loader import model_loader
+from app.models.text_backend import CASCADE, MULTILINGUAL, TextBackend
 from app.utils.preprocessing import TextPreprocessor
+from app.utils.batching import length_buckets
+from app.utils.metrics import metrics
+from app.utils.deadline import RequestAborted, check_deadline
+from app.utils.timing import note_timing, timed
+from app.utils.embedding_store import embedding_store
+from app.utils.logs import sampled_logger
+from app.workers import inference_workers
+from app.workers.remote import RemoteEmbedder
 from app.config import settings
 
 
@@ -17,20 +30,125 @@ class TextClassificationService:
     
     def __init__(self):
         """Initialize service with models"""
-        self.text_model = None
-        self.embedder = None
-        self.label_encoder = None  # ADD THIS
         self.preprocessor = TextPreprocessor()
         self.categories = settings.CATEGORIES
     
+    # Models are looked up through the loader on every use instead of being
+    # kept on the service, so the memory manager can evict idle ones
+    
+    @property
+    def text_model(self):
+        return model_loader.load_text_classifier()
+    
+    @property
+    def embedder(self):
+        """mBERT embedder (a proxy to the text workers in process mode)"""
+        if inference_workers.enabled:
+            return inference_workers.embedder()
+        return model_loader.load_embedder()
+    
+    @property
+    def label_encoder(self):
+        return model_loader.load_label_encoder()
+    
+    @property
+    def fast_model(self):
+        if not settings.TEXT_CASCADE_ENABLED:
+            return None
+        return model_loader.load_fast_text_classifier()
+    
+    @property
+    def projection(self):
+        if not settings.TEXT_PROJECTION_ENABLED:
+            return None
+        return model_loader.load_text_projection()
+    
     def load_models(self):
         """Load ML models if not already loaded"""
-        if self.text_model is None:
-            logger.info("Loading text classification models...")
-            self.text_model = model_loader.load_text_classifier()
-            self.embedder = model_loader.load_embedder()
-            self.label_encoder = model_loader.load_label_encoder()  # ADD THIS
-            logger.success("Models loaded successfully")
+        # Each property loads its model on first access
+        _ = (self.text_model, self.embedder, self.label_encoder, self.fast_model, self.projection)
+    
+    def encode_texts(
+        self,
+        cleaned_texts: List[str],
+        normalize: bool = False,
+        embedder=None
+    ) -> np.ndarray:
+        """
+        Embed cleaned texts in length-bucketed batches
+        
+        Texts are tokenized once up front and truncated to the embedder's
+        token limit, then grouped by token length so each forward pass
+        carries little padding. Rows are returned in input order.
+        
+        Args:
+            cleaned_texts: Output of TextPreprocessor.clean_text
+            normalize: L2-normalize each embedding
+            embedder: Encoder to use (default: the multilingual mBERT embedder)
+            
+        Returns:
+            float32 array of shape (len(cleaned_texts), dim)
+        """
+        embedder = embedder or self.embedder
+        tokenizer = getattr(embedder, "tokenizer", None)
+        note_timing("batch", len(cleaned_texts))
+        
+        if tokenizer is None:
+            # Custom embedders without a HF tokenizer: let encode() batch
+            # (worker-process embedders report their own stages)
+            remote = isinstance(embedder, RemoteEmbedder)
+            with nullcontext() if remote else timed("embed"):
+                embeddings = embedder.encode(
+                    cleaned_texts,
+                    batch_size=settings.EMBED_BATCH_SIZE,
+                    convert_to_numpy=True,
+                    normalize_embeddings=normalize,
+                    show_progress_bar=False
+                )
+            return np.asarray(embeddings, dtype=np.float32).reshape(len(cleaned_texts), -1)
+        
+        with timed("tokenize"):
+            encoded = tokenizer(
+                cleaned_texts,
+                truncation=True,
+                max_length=embedder.max_seq_length
+            )
+        lengths = [len(ids) for ids in encoded["input_ids"]]
+        buckets = length_buckets(
+            lengths,
+            max_batch_size=settings.EMBED_BATCH_SIZE,
+            max_batch_tokens=settings.EMBED_MAX_BATCH_TOKENS
+        )
+        
+        embeddings = np.empty(
+            (len(cleaned_texts), embedder.get_sentence_embedding_dimension()),
+            dtype=np.float32
+        )
+        
+        with torch.inference_mode():
+            for bucket in buckets:
+                # Skip remaining buckets once the request expired or disconnected
+                check_deadline()
+                
+                with timed("tokenize"):
+                    features = tokenizer.pad(
+                        {key: [values[i] for i in bucket] for key, values in encoded.items()},
+                        padding=True,
+                        return_tensors="pt"
+                    )
+                    features = {
+                        key: tensor.to(embedder.device)
+                        for key, tensor in features.items()
+                    }
+                
+                with timed("embed"):
+                    batch_embeddings = embedder(features)["sentence_embedding"]
+                    if normalize:
+                        batch_embeddings = torch.nn.functional.normalize(batch_embeddings, p=2, dim=1)
+                    
+                    embeddings[bucket] = batch_embeddings.float().cpu().numpy()
+        
+        return embeddings
     
     def generate_embeddings(self, text: str) -> np.ndarray:
         """
@@ -43,92 +161,314 @@ class TextClassificationService:
             Embedding vector (numpy array)
         """
         try:
-            # Generate embeddings using sentence-transformers
-            embeddings = self.embedder.encode(
-                text,
-                convert_to_numpy=True,
-                show_progress_bar=False
-            )
-            
-            return embeddings
+            return self.encode_texts([text])[0]
             
+        except RequestAborted:
+            raise
         except Exception as e:
             logger.error(f"Embedding generation failed: {str(e)}")
             raise
     
-    def predict(self, text: str) -> Dict[str, Any]:
+    def classify_embeddings(
+        self,
+        embeddings: np.ndarray,
+        backend: Optional[TextBackend] = None
+    ) -> List[Dict[str, Any]]:
         """
-        Predict category from text complaint
+        Run the classifier head on a batch of embeddings
         
         Args:
-            text: Raw input text (Hindi/Marathi/English)
+            embeddings: Array of shape (n, dim) from the embedder
+            backend: Per-language backend whose head to use
+                (default: the multilingual head)
             
         Returns:
-            Dictionary with prediction results
+            List of {prediction, confidence, probabilities} per row
         """
-        try:
-            # Ensure models are loaded
-            self.load_models()
+        with timed("head"):
+            return self._classify_embeddings(embeddings, backend)
+    
+    def _classify_embeddings(
+        self,
+        embeddings: np.ndarray,
+        backend: Optional[TextBackend]
+    ) -> List[Dict[str, Any]]:
+        if backend is not None:
+            head, label_encoder, projection = backend.head, backend.label_encoder, None
+        else:
+            head, label_encoder, projection = self.text_model, self.label_encoder, self.projection
+        
+        if isinstance(head, LinearHead):
+            # Exported heads carry decoded labels (and maybe the projection)
+            label_encoder = None
+            if head.projection_folded:
+                projection = None
+        
+        # Reduce dimension if the head was trained on projected vectors
+        if projection is not None:
+            embeddings = projection.transform(embeddings)
+        
+        # Get prediction probabilities (if available); the prediction is
+        # their argmax, so the head only runs once
+        probabilities = None
+        if hasattr(head, 'predict_proba'):
+            probabilities = head.predict_proba(embeddings)
+            predictions_encoded = np.asarray(head.classes_)[np.argmax(probabilities, axis=1)]
+        else:
+            predictions_encoded = head.predict(embeddings)
+        
+        # Decode predictions if label encoder exists
+        if label_encoder is not None:
+            predictions = label_encoder.inverse_transform(predictions_encoded)
+        else:
+            predictions = predictions_encoded
+        
+        # Get all class probabilities with proper labels
+        if label_encoder is not None:
+            class_names = label_encoder.classes_
+        elif isinstance(head, LinearHead) or backend is not None:
+            class_names = head.classes_
+        else:
+            class_names = self.categories
+        
+        results = []
+        for row, prediction in enumerate(predictions):
+            confidence = None
+            class_probabilities = None
             
-            # Step 1: Validate text
-            is_valid, error_msg = self.preprocessor.validate_text(text)
-            if not is_valid:
-                return {
-                    "success": False,
-                    "error": error_msg
+            if probabilities is not None:
+                confidence = float(np.max(probabilities[row]))
+                class_probabilities = {
+                    category: float(prob)
+                    for category, prob in zip(class_names, probabilities[row])
                 }
             
-            # Step 2: Clean and preprocess text
-            cleaned_text = self.preprocessor.clean_text(text)
-            cleaned_text = self.preprocessor.truncate_text(cleaned_text)
+            results.append({
+                "prediction": prediction,
+                "confidence": confidence,
+                "probabilities": class_probabilities
+            })
+        
+        return results
+    
+    def predict_fast(
+        self,
+        cleaned_text: str,
+        threshold: Optional[float] = None
+    ) -> Optional[Dict[str, Any]]:
+        """
+        First cascade stage: char n-gram linear model on cleaned text
+        
+        Args:
+            cleaned_text: Output of TextPreprocessor.clean_text
+            threshold: Minimum confidence to answer (default:
+                TEXT_CASCADE_THRESHOLD; 0 always answers)
             
-            logger.info(f"Processing text: '{cleaned_text[:50]}...'")
+        Returns:
+            Prediction fields if the calibrated confidence reaches the
+            threshold, otherwise None (escalate to mBERT)
+        """
+        if self.fast_model is None:
+            return None
+        
+        if threshold is None:
+            threshold = settings.TEXT_CASCADE_THRESHOLD
+        
+        with timed("fast"):
+            probabilities = self.fast_model.predict_proba([cleaned_text])[0]
+        best_idx = int(np.argmax(probabilities))
+        confidence = float(probabilities[best_idx])
+        
+        if confidence < threshold:
+            return None
+        
+        class_names = self.fast_model.classes_
+        return {
+            "prediction": str(class_names[best_idx]),
+            "confidence": confidence,
+            "probabilities": {
+                str(category): float(prob)
+                for category, prob in zip(class_names, probabilities)
+            }
+        }
+    
+    def route(self, language: str) -> Tuple[str, Optional[TextBackend]]:
+        """
+        Pick the text backend for a detected language
+        
+        Args:
+            language: LanguageGuess.language
             
-            # Step 3: Generate embeddings
-            embeddings = self.generate_embeddings(cleaned_text)
+        Returns:
+            (backend name, TextBackend or None for the built-in routes).
+            Unrouted languages, and routes whose model is unavailable,
+            use the multilingual model.
+        """
+        if not settings.TEXT_LANGUAGE_ROUTING:
+            return MULTILINGUAL, None
+        
+        name = settings.TEXT_LANGUAGE_ROUTES.get(language, MULTILINGUAL)
+        if name == MULTILINGUAL:
+            return MULTILINGUAL, None
+        if name == CASCADE:
+            return (CASCADE, None) if self.fast_model is not None else (MULTILINGUAL, None)
+        
+        backend = model_loader.load_text_backend(
+            name,
+            embedder=inference_workers.embedder(name) if inference_workers.enabled else None
+        )
+        if backend is None:
+            return MULTILINGUAL, None
+        return name, backend
+    
+    @staticmethod
+    def _record(language: str, backend: str, stage: str, start: float) -> None:
+        """Cascade, per-language routing and latency metrics for one text"""
+        metrics.increment("text_cascade_total", stage=stage)
+        metrics.increment("text_language_total", language=language, backend=backend)
+        metrics.observe(
+            "text_predict_seconds",
+            time.perf_counter() - start,
+            stage=stage,
+            language=language
+        )
+    
+    @staticmethod
+    def _store_embeddings(
+        cleaned_texts: List[str],
+        embeddings: np.ndarray,
+        results: List[Dict[str, Any]],
+        complaint_ids: Optional[List[Optional[str]]] = None
+    ) -> None:
+        """Queue multilingual embeddings and predictions for the embedding store"""
+        if not embedding_store.enabled:
+            return
+        embedding_store.append(
+            cleaned_texts,
+            embeddings,
+            [result["prediction"] for result in results],
+            [result["confidence"] for result in results],
+            model_loader.text_model_version(),
+            complaint_ids
+        )
+    
+    def embed_texts(
+        self,
+        texts: List[str],
+        normalize: bool = False
+    ) -> np.ndarray:
+        """
+        Generate embeddings for a batch of raw texts
+        
+        Texts go through the same validation and cleaning as predict,
+        so the vectors match what the classifier head sees.
+        
+        Args:
+            texts: Raw input texts
+            normalize: L2-normalize each embedding
             
-            # Step 4: Reshape for sklearn model (expects 2D array)
-            embeddings_2d = embeddings.reshape(1, -1)
+        Returns:
+            float32 array of shape (len(texts), dim)
             
-            # Step 5: Predict using trained model
-            prediction_encoded = self.text_model.predict(embeddings_2d)[0]
+        Raises:
+            ValueError: If any text fails validation
+        """
+        self.load_models()
+        
+        cleaned_texts = []
+        for index, text in enumerate(texts):
+            is_valid, error_msg = self.preprocessor.validate_text(text)
+            if not is_valid:
+                raise ValueError(f"Text at index {index}: {error_msg}")
             
-            # Step 6: Decode prediction if label encoder exists
-            if self.label_encoder is not None:
-                prediction = self.label_encoder.inverse_transform([prediction_encoded])[0]
-            else:
-                prediction = prediction_encoded
+            cleaned_texts.append(self.preprocessor.clean_text(text))
+        
+        return self.encode_texts(cleaned_texts, normalize=normalize)
+    
+    def predict(self, text: str, complaint_id: Optional[str] = None) -> Dict[str, Any]:
+        """
+        Predict category from text complaint
+        
+        Args:
+            text: Raw input text (Hindi/Marathi/English)
+            complaint_id: Optional id stored with the embedding (embedding store)
             
-            # Step 7: Get prediction probabilities (if available)
-            confidence = None
-            class_probabilities = None
+        Returns:
+            Dictionary with prediction results
+        """
+        try:
+            # Ensure models are loaded
+            self.load_models()
             
-            if hasattr(self.text_model, 'predict_proba'):
-                probabilities = self.text_model.predict_proba(embeddings_2d)[0]
-                confidence = float(np.max(probabilities))
+            with timed("clean"):
+                # Step 1: Validate text
+                is_valid, error_msg = self.preprocessor.validate_text(text)
+                if not is_valid:
+                    return {
+                        "success": False,
+                        "error": error_msg
+                    }
                 
-                # Get all class probabilities with proper labels
-                if self.label_encoder is not None:
-                    class_names = self.label_encoder.classes_
-                else:
-                    class_names = self.categories
+                # Step 2: Clean and preprocess text, detect its language
+                # (token-level truncation happens in encode_texts)
+                cleaned_text, guess = self.preprocessor.clean_and_detect(text)
+            backend_name, backend = self.route(guess.language)
+            
+            sampled_logger.info(
+                "Processing text ({} -> {}): '{:.50}...'",
+                guess.language,
+                backend_name,
+                cleaned_text
+            )
+            
+            start = time.perf_counter()
+            
+            # Step 2b: Cascade first stage answers confident texts
+            # (and every text routed to the cascade model)
+            fast_result = self.predict_fast(
+                cleaned_text,
+                threshold=0.0 if backend_name == CASCADE else None
+            )
+            if fast_result is not None:
+                self._record(guess.language, CASCADE, "fast", start)
+                sampled_logger.success("✓ Predicted category (fast stage): {}", fast_result["prediction"])
                 
-                class_probabilities = {
-                    category: float(prob)
-                    for category, prob in zip(class_names, probabilities)
+                return {
+                    "success": True,
+                    **fast_result,
+                    "stage": "fast",
+                    "language": guess.language,
+                    "backend": CASCADE,
+                    "original_text": text,
+                    "cleaned_text": cleaned_text
                 }
             
-            logger.success(f"✓ Predicted category: {prediction}")
+            # Step 3: Generate embeddings
+            if backend is None:
+                embeddings = self.generate_embeddings(cleaned_text)
+            else:
+                embeddings = self.encode_texts([cleaned_text], embedder=backend.embedder)[0]
+            
+            # Step 4: Classify (head expects a 2D array)
+            result = self.classify_embeddings(embeddings.reshape(1, -1), backend)[0]
+            if backend is None:
+                self._store_embeddings([cleaned_text], embeddings.reshape(1, -1), [result], [complaint_id])
+            
+            self._record(guess.language, backend_name, "full", start)
+            sampled_logger.success("✓ Predicted category: {}", result["prediction"])
             
             return {
                 "success": True,
-                "prediction": prediction,
-                "confidence": confidence,
-                "probabilities": class_probabilities,
+                **result,
+                "stage": "full",
+                "language": guess.language,
+                "backend": backend_name,
                 "original_text": text,
                 "cleaned_text": cleaned_text
             }
             
+        except RequestAborted:
+            raise
         except Exception as e:
             logger.error(f"Prediction failed: {str(e)}")
             return {
@@ -136,23 +476,100 @@ class TextClassificationService:
                 "error": f"Prediction error: {str(e)}"
             }
     
-    def batch_predict(self, texts: list[str]) -> list[Dict[str, Any]]:
+    def batch_predict(
+        self,
+        texts: list[str],
+        complaint_ids: Optional[List[Optional[str]]] = None
+    ) -> list[Dict[str, Any]]:
         """
         Predict categories for multiple texts
         
         Args:
             texts: List of text strings
+            complaint_ids: Optional id per text, stored with the embeddings
             
         Returns:
             List of prediction results
         """
-        results = []
-        
-        for text in texts:
-            result = self.predict(text)
-            results.append(result)
-        
-        return results
+        try:
+            self.load_models()
+            
+            results: List[Optional[Dict[str, Any]]] = [None] * len(texts)
+            # backend name -> (backend, [(index, cleaned_text, language)])
+            # escalated to that backend's embedder
+            pending: Dict[str, Tuple[Optional[TextBackend], list]] = {}
+            
+            for index, text in enumerate(texts):
+                with timed("clean"):
+                    is_valid, error_msg = self.preprocessor.validate_text(text)
+                    if not is_valid:
+                        results[index] = {"success": False, "error": error_msg}
+                        continue
+                    
+                    cleaned_text, guess = self.preprocessor.clean_and_detect(text)
+
+                backend_name, backend = self.route(guess.language)
+                
+                fast_result = self.predict_fast(
+                    cleaned_text,
+                    threshold=0.0 if backend_name == CASCADE else None
+                )
+                if fast_result is not None:
+                    metrics.increment("text_cascade_total", stage="fast")
+                    metrics.increment("text_language_total", language=guess.language, backend=CASCADE)
+                    results[index] = {
+                        "success": True,
+                        **fast_result,
+                        "stage": "fast",
+                        "language": guess.language,
+                        "backend": CASCADE,
+                        "original_text": text,
+                        "cleaned_text": cleaned_text
+                    }
+                else:
+                    pending.setdefault(backend_name, (backend, []))[1].append(
+                        (index, cleaned_text, guess.language)
+                    )
+            
+            for backend_name, (backend, items) in pending.items():
+                # One bucketed embedding pass per backend for its escalated texts
+                embeddings = self.encode_texts(
+                    [cleaned for _, cleaned, _ in items],
+                    embedder=backend.embedder if backend is not None else None
+                )
+                head_results = self.classify_embeddings(embeddings, backend)
+                if backend is None:
+                    self._store_embeddings(
+                        [cleaned for _, cleaned, _ in items],
+                        embeddings,
+                        head_results,
+                        [complaint_ids[index] for index, _, _ in items] if complaint_ids else None
+                    )
+                
+                metrics.increment("text_cascade_total", len(items), stage="full")
+                for (index, cleaned_text, language), head_result in zip(items, head_results):
+                    metrics.increment("text_language_total", language=language, backend=backend_name)
+                    results[index] = {
+                        "success": True,
+                        **head_result,
+                        "stage": "full",
+                        "language": language,
+                        "backend": backend_name,
+                        "original_text": texts[index],
+                        "cleaned_text": cleaned_text
+                    }
+            
+            sampled_logger.success("✓ Batch of {} texts classified", len(texts))
+            return results
+            
+        except RequestAborted:
+            raise
+        except Exception as e:
+            logger.error(f"Batch prediction failed: {str(e)}")
+            return [
+                {"success": False, "error": f"Prediction error: {str(e)}"}
+                for _ in texts
+            ]
 
 
 # Global service instance
@@ -0,0 +1,70 @@
+"""
+Length-Bucketed Batching
+Groups variable-length sequences so padded transformer batches waste little compute
+"""
+
+from typing import List, Optional, Sequence
+
+
+def length_buckets(
+    lengths: Sequence[int],
+    max_batch_size: int = 32,
+    max_batch_tokens: Optional[int] = None
+) -> List[List[int]]:
+    """
+    Split sequence indices into batches of similar length
+
+    Indices are sorted by length (longest first, so peak memory is hit
+    early) and cut into batches capped by size and, optionally, by the
+    padded token count (batch_size * longest_length).
+
+    Args:
+        lengths: Token length of each sequence
+        max_batch_size: Maximum sequences per batch
+        max_batch_tokens: Maximum padded tokens per batch
+
+    Returns:
+        List of index lists; every index appears exactly once
+    """
+    order = sorted(range(len(lengths)), key=lambda i: lengths[i], reverse=True)
+
+    buckets: List[List[int]] = []
+    current: List[int] = []
+    current_max = 0
+
+    for index in order:
+        # Longest-first order: the first item of a batch sets its padded length
+        longest = current_max if current else lengths[index]
+        too_many = len(current) >= max_batch_size
+        too_long = (
+            max_batch_tokens is not None
+            and current
+            and (len(current) + 1) * longest > max_batch_tokens
+        )
+        if too_many or too_long:
+            buckets.append(current)
+            current = []
+
+        if not current:
+            current_max = lengths[index]
+        current.append(index)
+
+    if current:
+        buckets.append(current)
+
+    return buckets
+
+
+def arrival_batches(count: int, max_batch_size: int = 32) -> List[List[int]]:
+    """Fixed-size batches in arrival order (the unbucketed baseline)"""
+    return [
+        list(range(start, min(start + max_batch_size, count)))
+        for start in range(0, count, max_batch_size)
+    ]
+
+
+def padding_efficiency(lengths: Sequence[int], batches: List[List[int]]) -> float:
+    """Fraction of padded token slots that hold real tokens (1.0 = no padding)"""
+    real = sum(lengths[i] for batch in batches for i in batch)
+    padded = sum(len(batch) * max(lengths[i] for i in batch) for batch in batches if batch)
+    return real / padded if padded else 1.0
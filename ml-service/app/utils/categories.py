@@ -0,0 +1,22 @@
+"""
+Category Labels
+Maps the labels of the text and image models onto settings.CATEGORIES
+"""
+
+from app.config import settings
+
+
+def canonical_category(label: str) -> str:
+    """
+    Map a model label onto settings.CATEGORIES
+
+    The text label encoder may use singular names ("pothole") while the
+    CNN uses the configured plural categories ("potholes").
+    """
+    if label in settings.CATEGORIES:
+        return label
+    stem = label.rstrip("s")
+    for category in settings.CATEGORIES:
+        if category.rstrip("s") == stem:
+            return category
+    return label
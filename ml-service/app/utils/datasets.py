@@ -0,0 +1,101 @@
+"""
+Labeled Dataset Readers
+Loads complaint texts and labels for the training scripts, and streams
+complaint archives for offline reclassification
+"""
+
+import csv
+import json
+from pathlib import Path
+from typing import Any, Dict, Iterator, List, Tuple, Union
+
+
+def load_labeled_texts(
+    path: Union[str, Path],
+    text_column: str = "text",
+    label_column: str = "label"
+) -> Tuple[List[str], List[str]]:
+    """
+    Load (text, label) pairs from a CSV or JSONL file
+
+    Rows with an empty text or label are skipped.
+
+    Args:
+        path: .csv, .jsonl or .json (list of objects) file
+        text_column: Field holding the complaint text
+        label_column: Field holding the category label
+
+    Returns:
+        (texts, labels)
+    """
+    path = Path(path)
+    suffix = path.suffix.lower()
+
+    if suffix == ".csv":
+        with open(path, newline="", encoding="utf-8") as f:
+            rows = list(csv.DictReader(f))
+    elif suffix == ".jsonl":
+        with open(path, encoding="utf-8") as f:
+            rows = [json.loads(line) for line in f if line.strip()]
+    elif suffix == ".json":
+        with open(path, encoding="utf-8") as f:
+            rows = json.load(f)
+    else:
+        raise ValueError(f"Unsupported dataset format: {path.suffix} (use .csv, .jsonl or .json)")
+
+    texts, labels = [], []
+    for row in rows:
+        text = row.get(text_column)
+        label = row.get(label_column)
+        if not text or label in (None, ""):
+            continue
+        texts.append(str(text))
+        labels.append(str(label))
+
+    if not texts:
+        raise ValueError(
+            f"No labeled rows found in {path} "
+            f"(columns: '{text_column}', '{label_column}')"
+        )
+
+    return texts, labels
+
+
+def iter_records(
+    path: Union[str, Path],
+    parquet_batch_size: int = 1024
+) -> Iterator[Dict[str, Any]]:
+    """
+    Stream rows from a CSV, JSONL or Parquet file without loading it whole
+
+    Parquet needs the optional pyarrow package.
+
+    Args:
+        path: .csv, .jsonl or .parquet file
+        parquet_batch_size: Rows decoded per Parquet record batch
+
+    Yields:
+        One dict per row
+    """
+    path = Path(path)
+    suffix = path.suffix.lower()
+
+    if suffix == ".csv":
+        with open(path, newline="", encoding="utf-8") as f:
+            yield from csv.DictReader(f)
+    elif suffix == ".jsonl":
+        with open(path, encoding="utf-8") as f:
+            for line in f:
+                if line.strip():
+                    yield json.loads(line)
+    elif suffix == ".parquet":
+        try:
+            import pyarrow.parquet as pq
+        except ImportError:
+            raise ImportError("Reading Parquet requires pyarrow: pip install pyarrow")
+
+        parquet_file = pq.ParquetFile(path)
+        for batch in parquet_file.iter_batches(batch_size=parquet_batch_size):
+            yield from batch.to_pylist()
+    else:
+        raise ValueError(f"Unsupported archive format: {path.suffix} (use .csv, .jsonl or .parquet)")
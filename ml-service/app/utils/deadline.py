@@ -0,0 +1,185 @@
+"""
+Request Deadlines and Cancellation
+Carries a per-request deadline into executor work so expired or abandoned
+requests are dropped instead of burning CPU for a client that is gone
+"""
+
+import asyncio
+import contextvars
+import threading
+import time
+import weakref
+from concurrent.futures import Future
+from typing import Awaitable, Callable, Optional
+
+from fastapi import HTTPException, Request
+
+from app.config import settings
+from app.utils.metrics import metrics
+
+DEADLINE_HEADER = "X-Request-Timeout-Ms"
+
+
+class RequestAborted(HTTPException):
+    """Base class for work abandoned because its request cannot succeed"""
+
+
+class DeadlineExceeded(RequestAborted):
+    """The request deadline passed before inference finished"""
+
+    def __init__(self):
+        super().__init__(status_code=504, detail="Request deadline exceeded")
+
+
+class RequestCancelled(RequestAborted):
+    """The client disconnected before inference finished"""
+
+    def __init__(self):
+        # 499: client closed request (nginx convention)
+        super().__init__(status_code=499, detail="Client disconnected")
+
+
+class Deadline:
+    """Absolute monotonic deadline plus a cancellation flag shared with workers"""
+
+    def __init__(
+        self,
+        timeout: float,
+        is_disconnected: Optional[Callable[[], Awaitable[bool]]] = None
+    ):
+        self.timeout = timeout
+        self.expires_at = time.monotonic() + timeout
+        self._cancelled = threading.Event()
+        self._is_disconnected = is_disconnected
+        # Tasks whose result the request no longer needs (see discard())
+        self._discarded: "weakref.WeakSet[asyncio.Task]" = weakref.WeakSet()
+
+    def remaining(self) -> float:
+        """Seconds left (negative once expired)"""
+        return self.expires_at - time.monotonic()
+
+    def expired(self) -> bool:
+        return self.remaining() <= 0
+
+    @property
+    def cancelled(self) -> bool:
+        return self._cancelled.is_set()
+
+    def cancel(self) -> None:
+        """Tell in-flight work to stop at its next checkpoint"""
+        self._cancelled.set()
+
+    def discard(self, task: asyncio.Task) -> None:
+        """
+        Cancel one task whose result the request no longer needs
+
+        Unlike an abandoned request, the rest of the request carries on:
+        the task's executor work is dropped if still queued (running work
+        finishes), the cancel flag is left alone and nothing is counted
+        as dropped.
+        """
+        self._discarded.add(task)
+        task.cancel()
+
+    def check(self) -> None:
+        """Raise if the work should not continue (called from worker threads)"""
+        if self.cancelled:
+            raise RequestCancelled()
+        if self.expired():
+            self.cancel()
+            raise DeadlineExceeded()
+
+    async def wait(self, future: Future):
+        """
+        Await an executor future until it finishes, the deadline passes
+        or the client disconnects
+
+        On expiry or disconnect the future is cancelled (dropping it if it
+        is still queued) and the cancel flag is set for running work. The
+        same happens when the awaiting task itself is cancelled (e.g. the
+        RPC client went away), unless it was cancelled through discard().
+        """
+        wrapped = asyncio.wrap_future(future)
+        try:
+            while True:
+                remaining = self.remaining()
+                if remaining <= 0:
+                    self._abandon(future, wrapped, "expired")
+                    raise DeadlineExceeded()
+
+                done, _ = await asyncio.wait(
+                    {wrapped},
+                    timeout=min(remaining, settings.DISCONNECT_POLL_INTERVAL_S)
+                )
+                if done:
+                    return wrapped.result()
+
+                if self._is_disconnected is not None and await self._is_disconnected():
+                    self._abandon(future, wrapped, "cancelled")
+                    raise RequestCancelled()
+
+        except asyncio.CancelledError:
+            # asyncio.wait() does not cancel what it waits on: drop the work here
+            if asyncio.current_task() in self._discarded:
+                future.cancel()
+                wrapped.cancel()
+            else:
+                self._abandon(future, wrapped, "abandoned")
+            raise
+
+    def _abandon(self, future: Future, wrapped: asyncio.Future, reason: str) -> None:
+        """Cancel the future and record whether it was still queued"""
+        self.cancel()
+        stage = "queued" if future.cancel() else "running"
+        wrapped.cancel()
+        metrics.increment("requests_dropped_total", reason=reason, stage=stage)
+
+
+# Deadline of the request being handled (copied into executor threads)
+current_deadline: contextvars.ContextVar[Optional[Deadline]] = contextvars.ContextVar(
+    "current_deadline",
+    default=None
+)
+
+
+def check_deadline() -> None:
+    """Checkpoint for long-running work: raise if the request was abandoned"""
+    deadline = current_deadline.get()
+    if deadline is not None:
+        deadline.check()
+
+
+def discard_task(task: asyncio.Task) -> None:
+    """Cancel a task whose result is not needed, without abandoning the request"""
+    deadline = current_deadline.get()
+    if deadline is not None:
+        deadline.discard(task)
+    else:
+        task.cancel()
+
+
+def deadline_dependency(default_timeout: float):
+    """
+    Build a FastAPI dependency that attaches a deadline to the request
+
+    The timeout comes from the X-Request-Timeout-Ms header when present,
+    otherwise from the route default. The dependency is async so the
+    context variable is set in the same task as the endpoint.
+    """
+    async def attach_deadline(request: Request) -> Deadline:
+        timeout = default_timeout
+        header = request.headers.get(DEADLINE_HEADER)
+        if header:
+            try:
+                timeout = float(header) / 1000
+            except ValueError:
+                raise HTTPException(
+                    status_code=400,
+                    detail=f"Invalid {DEADLINE_HEADER} header: {header}"
+                )
+
+        deadline = Deadline(timeout, is_disconnected=request.is_disconnected)
+        current_deadline.set(deadline)
+        return deadline
+
+    return attach_deadline
@@ -0,0 +1,113 @@
+"""
+Compact Embedding Encodings
+Serializes embedding matrices as float32, float16, int8-scaled or sign-binarized bytes
+"""
+
+import base64
+from typing import Dict, Optional, Tuple
+
+import numpy as np
+
+ENCODINGS = ("float32", "float16", "int8", "binary")
+
+
+def encode_embeddings(
+    embeddings: np.ndarray,
+    encoding: str = "float32"
+) -> Tuple[bytes, Optional[bytes], Tuple[int, ...], str]:
+    """
+    Encode a 2D embedding matrix into little-endian bytes
+
+    Args:
+        embeddings: Array of shape (n, dim)
+        encoding: One of float32, float16, int8, binary
+
+    Returns:
+        (data, scales, shape, dtype) where
+        - data is the packed matrix (row-major)
+        - scales holds one float32 per row for int8, else None
+          (dequantize with data[i] * scales[i])
+        - shape is the shape of the packed matrix
+        - dtype is the numpy dtype string of the packed matrix
+    """
+    if encoding not in ENCODINGS:
+        raise ValueError(
+            f"Unknown encoding '{encoding}'. Supported: {', '.join(ENCODINGS)}"
+        )
+
+    embeddings = np.asarray(embeddings, dtype=np.float32)
+    if embeddings.ndim == 1:
+        embeddings = embeddings.reshape(1, -1)
+
+    scales = None
+
+    if encoding == "float32":
+        packed = embeddings.astype("<f4", copy=False)
+    elif encoding == "float16":
+        packed = embeddings.astype("<f2")
+    elif encoding == "int8":
+        # Symmetric per-row quantization: row max maps to +/-127
+        row_max = np.abs(embeddings).max(axis=1, keepdims=True)
+        row_scale = np.where(row_max > 0, row_max / 127.0, 1.0).astype(np.float32)
+        packed = np.clip(np.rint(embeddings / row_scale), -127, 127).astype(np.int8)
+        scales = row_scale.ravel().astype("<f4").tobytes()
+    else:
+        # One bit per dimension (1 = positive), padded to whole bytes per row
+        packed = np.packbits(embeddings > 0, axis=1)
+
+    packed = np.ascontiguousarray(packed)
+    return packed.tobytes(), scales, packed.shape, packed.dtype.str
+
+
+def embeddings_to_json(
+    embeddings: np.ndarray,
+    encoding: str = "float32"
+) -> Dict[str, object]:
+    """Encode embeddings as base64 fields for a JSON response"""
+    data, scales, shape, dtype = encode_embeddings(embeddings, encoding)
+
+    payload = {
+        "encoding": encoding,
+        "dtype": dtype,
+        "shape": list(shape),
+        "dimension": int(np.asarray(embeddings).shape[-1]),
+        "data": base64.b64encode(data).decode("ascii"),
+    }
+    if scales is not None:
+        payload["scales"] = base64.b64encode(scales).decode("ascii")
+
+    return payload
+
+
+def decode_embeddings(
+    data: bytes,
+    shape: Tuple[int, ...],
+    encoding: str = "float32",
+    scales: Optional[bytes] = None,
+    dimension: Optional[int] = None
+) -> np.ndarray:
+    """
+    Decode bytes produced by encode_embeddings back to float32
+
+    Binary encodings decode to +1/-1 vectors truncated to `dimension`.
+    """
+    if encoding == "float32":
+        return np.frombuffer(data, dtype="<f4").reshape(shape)
+    if encoding == "float16":
+        return np.frombuffer(data, dtype="<f2").reshape(shape).astype(np.float32)
+    if encoding == "int8":
+        matrix = np.frombuffer(data, dtype=np.int8).reshape(shape).astype(np.float32)
+        if scales is not None:
+            matrix *= np.frombuffer(scales, dtype="<f4").reshape(-1, 1)
+        return matrix
+    if encoding == "binary":
+        bits = np.unpackbits(
+            np.frombuffer(data, dtype=np.uint8).reshape(shape),
+            axis=1,
+            count=dimension
+        )
+        return bits.astype(np.float32) * 2.0 - 1.0
+
+    raise ValueError(
+        f"Unknown encoding '{encoding}'. Supported: {', '.join(ENCODINGS)}"
+    )
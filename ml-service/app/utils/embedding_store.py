@@ -0,0 +1,473 @@
+"""
+Embedding Store
+Append-only, segmented columnar store of the text embeddings computed at
+inference time (with their predictions), written off the request path and
+streamed back for retraining and analytics without loading it into memory
+
+Layout:
+    <root>/index.json              segments and their committed row counts
+    <root>/000001/embedding.npy    (capacity, dim) embeddings
+    <root>/000001/<column>.npy     (capacity,) per-row columns (see COLUMNS)
+"""
+
+import hashlib
+import json
+import os
+import queue
+import threading
+import time
+from pathlib import Path
+from typing import Any, Dict, Iterator, List, Optional, Sequence, Union
+
+import numpy as np
+from loguru import logger
+
+from app.config import settings
+from app.utils.metrics import metrics
+
+try:
+    import fcntl
+except ImportError:
+    # No advisory lock on Windows; run a single writing process
+    fcntl = None
+
+INDEX_FILE = "index.json"
+LOCK_FILE = ".writer.lock"
+STORE_FORMAT = 1
+EMBEDDING = "embedding"
+
+# Per-row columns stored next to the embedding matrix
+COLUMNS = {
+    "text_hash": "S32",  # text_hash() of the cleaned text
+    "complaint_id": "U64",  # Empty if the caller sent none
+    "prediction": "U32",
+    "confidence": "f4",  # NaN for heads without probabilities
+    "model_version": "U16",  # ModelLoader.text_model_version()
+    "created_at": "f8",  # Unix time
+}
+
+_STOP = object()
+
+
+def text_hash(cleaned_text: str) -> str:
+    """Key of a cleaned complaint text: 128-bit BLAKE2b as 32 hex characters"""
+    return hashlib.blake2b(cleaned_text.encode("utf-8"), digest_size=16).hexdigest()
+
+
+def read_index(root: Union[str, Path]) -> Dict[str, Any]:
+    """Store index (an empty one if the store does not exist yet)"""
+    path = Path(root) / INDEX_FILE
+    if not path.exists():
+        return {"format": STORE_FORMAT, "segments": []}
+    index = json.loads(path.read_text(encoding="utf-8"))
+    if index.get("format") != STORE_FORMAT:
+        raise ValueError(f"{path} has format {index.get('format')}, expected {STORE_FORMAT}")
+    return index
+
+
+def _write_index(root: Path, index: Dict[str, Any]) -> None:
+    """Atomically replace the index (readers see the old or the new one)"""
+    path = root / INDEX_FILE
+    tmp = path.with_suffix(".json.tmp")
+    tmp.write_text(json.dumps(index, indent=1), encoding="utf-8")
+    os.replace(tmp, path)
+
+
+class _Segment:
+    """Memory-mapped column files of the segment being appended to"""
+
+    def __init__(self, root: Path, meta: Dict[str, Any], create: bool):
+        self.meta = meta
+        directory = root / meta["name"]
+        directory.mkdir(parents=True, exist_ok=True)
+
+        capacity = meta["capacity"]
+        shapes = {EMBEDDING: ((capacity, meta["dim"]), meta["dtype"])}
+        shapes.update({name: ((capacity,), dtype) for name, dtype in COLUMNS.items()})
+
+        self.columns: Dict[str, np.memmap] = {}
+        for name, (shape, dtype) in shapes.items():
+            path = directory / f"{name}.npy"
+            if create:
+                # Sparse file: untouched rows take no disk space
+                self.columns[name] = np.lib.format.open_memmap(path, mode="w+", dtype=dtype, shape=shape)
+            else:
+                self.columns[name] = np.load(path, mmap_mode="r+")
+
+    @property
+    def free(self) -> int:
+        return self.meta["capacity"] - self.meta["rows"]
+
+    def write(self, rows: Dict[str, np.ndarray], start: int, count: int) -> None:
+        """Copy rows[start:start + count] behind the last row of the segment"""
+        offset = self.meta["rows"]
+        for name, column in self.columns.items():
+            column[offset:offset + count] = rows[name][start:start + count]
+        self.meta["rows"] = offset + count
+
+    def flush(self) -> None:
+        for column in self.columns.values():
+            column.flush()
+
+
+class EmbeddingStore:
+    """
+    Asynchronous appender for the embedding store
+
+    append() only puts the batch on a bounded queue. A writer thread
+    hashes the texts, copies the rows into the memory-mapped segment of
+    the current embedder and dimension, and every
+    EMBEDDING_STORE_FLUSH_INTERVAL_S flushes the segment and then the
+    index. Readers only see rows counted in the index, so a crash loses at
+    most the last interval and never exposes half-written rows. Batches
+    that find the queue full are dropped and counted; inference never
+    waits on the disk.
+    """
+
+    def __init__(self, root: Optional[Union[str, Path]] = None):
+        self._root = Path(root) if root is not None else None
+        self._queue: queue.Queue = queue.Queue(maxsize=settings.EMBEDDING_STORE_QUEUE_SIZE)
+        self._thread: Optional[threading.Thread] = None
+        self._start_lock = threading.Lock()
+        self._failed = False
+        self._lock_handle = None
+        self._index: Dict[str, Any] = {}
+        self._segment: Optional[_Segment] = None
+
+    @property
+    def root(self) -> Path:
+        return self._root or Path(settings.EMBEDDING_STORE_DIR)
+
+    @property
+    def enabled(self) -> bool:
+        return settings.EMBEDDING_STORE_ENABLED and not self._failed
+
+    def append(
+        self,
+        cleaned_texts: Sequence[str],
+        embeddings: np.ndarray,
+        predictions: Sequence[Any],
+        confidences: Sequence[Optional[float]],
+        model_version: str,
+        complaint_ids: Optional[Sequence[Optional[str]]] = None
+    ) -> bool:
+        """
+        Queue one batch of rows (no-op unless EMBEDDING_STORE_ENABLED)
+
+        Args:
+            cleaned_texts: Texts the embeddings were computed from
+            embeddings: (n, dim) embedder output, before any projection
+            predictions: Predicted label per row
+            confidences: Confidence per row (None if unavailable)
+            model_version: Version of the head that made the predictions
+            complaint_ids: Optional complaint id per row
+
+        Returns:
+            False if the batch was dropped (store disabled or queue full)
+        """
+        if not self.enabled or not len(cleaned_texts):
+            return False
+        self._ensure_writer()
+
+        try:
+            self._queue.put_nowait((
+                list(cleaned_texts),
+                embeddings,
+                list(predictions),
+                list(confidences),
+                model_version,
+                list(complaint_ids) if complaint_ids is not None else None,
+                time.time()
+            ))
+            return True
+        except queue.Full:
+            metrics.increment("embedding_store_dropped_total", len(cleaned_texts))
+            return False
+
+    def flush(self, timeout: Optional[float] = None) -> None:
+        """Block until every queued batch is written and committed to the index"""
+        if self._thread is None or not self._thread.is_alive():
+            return
+        done = threading.Event()
+        self._queue.put(done)
+        deadline = None if timeout is None else time.monotonic() + timeout
+        # Stop waiting if the writer thread died (e.g. the store failed to open)
+        while not done.wait(0.1):
+            thread = self._thread
+            if thread is None or not thread.is_alive():
+                return
+            if deadline is not None and time.monotonic() >= deadline:
+                return
+
+    def close(self) -> None:
+        """Commit what is queued and stop the writer (called on shutdown)"""
+        if self._thread is None:
+            return
+        if self._thread.is_alive():
+            self._queue.put(_STOP)
+            self._thread.join(timeout=30)
+        self._thread = None
+
+    def status(self) -> Dict[str, Any]:
+        """Embedding store section of /health"""
+        if not settings.EMBEDDING_STORE_ENABLED:
+            return {"enabled": False}
+        segments = list(self._index.get("segments", []))
+        return {
+            "enabled": self.enabled,
+            "path": str(self.root),
+            "rows": sum(segment["rows"] for segment in segments),
+            "segments": len(segments),
+            "queued_batches": self._queue.qsize(),
+        }
+
+    # Writer thread
+
+    def _ensure_writer(self) -> None:
+        if self._thread is not None:
+            return
+        with self._start_lock:
+            if self._thread is None:
+                self._thread = threading.Thread(target=self._run, name="embedding-store", daemon=True)
+                self._thread.start()
+
+    def _open(self) -> None:
+        """Take the writer lock and resume the last unsealed segment"""
+        root = self.root
+        root.mkdir(parents=True, exist_ok=True)
+
+        if fcntl is not None:
+            self._lock_handle = open(root / LOCK_FILE, "w")
+            try:
+                fcntl.flock(self._lock_handle, fcntl.LOCK_EX | fcntl.LOCK_NB)
+            except BlockingIOError:
+                raise RuntimeError(f"another process is writing to {root}")
+
+        self._index = read_index(root)
+        segments = self._index["segments"]
+        if segments and not segments[-1]["sealed"]:
+            last = segments[-1]
+            if last["embedder"] == settings.MBERT_MODEL and last["dtype"] == settings.EMBEDDING_STORE_DTYPE:
+                # Rows after the committed count are overwritten
+                self._segment = _Segment(root, last, create=False)
+            else:
+                last["sealed"] = True
+
+        logger.info(
+            f"Embedding store at {root}: "
+            f"{sum(segment['rows'] for segment in segments)} rows in {len(segments)} segments"
+        )
+
+    def _run(self) -> None:
+        try:
+            self._open()
+        except Exception as e:
+            logger.error(f"Embedding store disabled: {str(e)}")
+            self._failed = True
+            return
+
+        interval = settings.EMBEDDING_STORE_FLUSH_INTERVAL_S
+        last_commit = time.monotonic()
+        dirty = False
+
+        while True:
+            try:
+                item = self._queue.get(timeout=interval)
+            except queue.Empty:
+                item = None
+
+            try:
+                if item is _STOP or isinstance(item, threading.Event):
+                    if dirty:
+                        self._commit()
+                        dirty = False
+                    if item is _STOP:
+                        self._release()
+                        return
+                    item.set()
+                elif item is not None:
+                    self._write(item)
+                    dirty = True
+
+                if dirty and time.monotonic() - last_commit >= interval:
+                    self._commit()
+                    dirty = False
+                    last_commit = time.monotonic()
+            except Exception as e:
+                logger.error(f"Embedding store write failed: {str(e)}")
+
+    def _write(self, item: tuple) -> None:
+        cleaned_texts, embeddings, predictions, confidences, model_version, complaint_ids, created = item
+        n = len(cleaned_texts)
+        embeddings = np.asarray(embeddings).reshape(n, -1)
+
+        rows = {
+            EMBEDDING: embeddings,
+            "text_hash": np.array([text_hash(text) for text in cleaned_texts], dtype=COLUMNS["text_hash"]),
+            "complaint_id": np.array(
+                [str(value) if value else "" for value in complaint_ids or [None] * n],
+                dtype=COLUMNS["complaint_id"]
+            ),
+            "prediction": np.array([str(value) for value in predictions], dtype=COLUMNS["prediction"]),
+            "confidence": np.array(
+                [np.nan if value is None else value for value in confidences],
+                dtype=COLUMNS["confidence"]
+            ),
+            "model_version": np.full(n, model_version, dtype=COLUMNS["model_version"]),
+            "created_at": np.full(n, created, dtype=COLUMNS["created_at"]),
+        }
+
+        start = 0
+        while start < n:
+            segment = self._writable_segment(embeddings.shape[1])
+            count = min(segment.free, n - start)
+            segment.write(rows, start, count)
+            start += count
+
+        metrics.increment("embedding_store_rows_total", n)
+
+    def _writable_segment(self, dim: int) -> _Segment:
+        """Current segment, or a new one when it is full or has another dimension"""
+        segment = self._segment
+        if segment is not None and segment.free > 0 and segment.meta["dim"] == dim:
+            return segment
+
+        if segment is not None:
+            segment.flush()
+            segment.meta["sealed"] = True
+
+        segments = self._index["segments"]
+        meta = {
+            "name": f"{int(segments[-1]['name']) + 1 if segments else 1:06d}",
+            "rows": 0,
+            "capacity": settings.EMBEDDING_STORE_SEGMENT_ROWS,
+            "dim": dim,
+            "dtype": settings.EMBEDDING_STORE_DTYPE,
+            "embedder": settings.MBERT_MODEL,
+            "created_at": time.time(),
+            "sealed": False,
+        }
+        segments.append(meta)
+        self._segment = _Segment(self.root, meta, create=True)
+        return self._segment
+
+    def _commit(self) -> None:
+        """Flush segment data, then publish the new row counts"""
+        start = time.perf_counter()
+        if self._segment is not None:
+            self._segment.flush()
+        _write_index(self.root, self._index)
+        metrics.observe("embedding_store_commit_seconds", time.perf_counter() - start)
+
+    def _release(self) -> None:
+        self._segment = None
+        if self._lock_handle is not None:
+            self._lock_handle.close()
+            self._lock_handle = None
+
+
+class EmbeddingStoreReader:
+    """
+    Streams rows back from an embedding store, also while it is written
+
+    Only rows committed to the index when the reader was created (or last
+    refreshed) are visible. Segments are memory-mapped and copied out one
+    batch at a time, so memory stays bounded by the batch size whatever
+    the size of the store.
+    """
+
+    def __init__(self, root: Optional[Union[str, Path]] = None):
+        self.root = Path(root or settings.EMBEDDING_STORE_DIR)
+        self.refresh()
+
+    def refresh(self) -> None:
+        """Pick up rows committed since the reader was created"""
+        self.index = read_index(self.root)
+
+    @property
+    def segments(self) -> List[Dict[str, Any]]:
+        return self.index["segments"]
+
+    def __len__(self) -> int:
+        return sum(segment["rows"] for segment in self.segments)
+
+    def _column(self, segment: Dict[str, Any], name: str) -> np.ndarray:
+        array = np.load(self.root / segment["name"] / f"{name}.npy", mmap_mode="r")
+        return array[:segment["rows"]]
+
+    def iter_batches(
+        self,
+        batch_size: int = 4096,
+        columns: Optional[Sequence[str]] = None,
+        model_version: Optional[str] = None,
+        embedder: Optional[str] = None,
+        positions: bool = False
+    ) -> Iterator[Dict[str, np.ndarray]]:
+        """
+        Yield committed rows in append order
+
+        Args:
+            batch_size: Maximum rows per batch
+            columns: Columns to read ("embedding" and/or COLUMNS keys; default all)
+            model_version: Only rows predicted by this head version
+            embedder: Only segments written with this embedder (e.g. settings.MBERT_MODEL)
+            positions: Also yield "segment" (name) and "row" (index in the
+                segment) per row, to resume from committed_rows() later
+
+        Yields:
+            Dict of column name -> array with the same number of rows;
+            text_hash is returned as str
+        """
+        columns = list(columns) if columns else [EMBEDDING, *COLUMNS]
+        unknown = set(columns) - {EMBEDDING, *COLUMNS}
+        if unknown:
+            raise ValueError(f"Unknown columns: {', '.join(sorted(unknown))}")
+
+        for segment in self.segments:
+            if not segment["rows"] or (embedder is not None and segment["embedder"] != embedder):
+                continue
+
+            arrays = {name: self._column(segment, name) for name in columns}
+            versions = self._column(segment, "model_version") if model_version is not None else None
+
+            for start in range(0, segment["rows"], batch_size):
+                stop = start + batch_size
+                mask = slice(None)
+                if versions is not None:
+                    mask = versions[start:stop] == model_version
+                    if not mask.any():
+                        continue
+                batch = {name: np.array(array[start:stop][mask]) for name, array in arrays.items()}
+
+                if positions:
+                    rows = np.arange(start, min(stop, segment["rows"]))[mask]
+                    batch["segment"] = np.full(len(rows), segment["name"])
+                    batch["row"] = rows
+                if "text_hash" in batch:
+                    batch["text_hash"] = batch["text_hash"].astype(str)
+                yield batch
+
+    def committed_rows(self) -> Dict[str, int]:
+        """Committed row count per segment name"""
+        return {segment["name"]: segment["rows"] for segment in self.segments}
+
+    def read(self, columns: Optional[Sequence[str]] = None, **filters) -> Dict[str, np.ndarray]:
+        """Every matching row in memory at once (small stores and analytics)"""
+        batches = list(self.iter_batches(columns=columns, **filters))
+        if not batches:
+            return {}
+        return {name: np.concatenate([batch[name] for batch in batches]) for name in batches[0]}
+
+    def stats(self) -> Dict[str, Any]:
+        """Row counts per segment, embedder and dimension"""
+        return {
+            "rows": len(self),
+            "segments": [
+                {key: segment[key] for key in ("name", "rows", "dim", "dtype", "embedder", "sealed")}
+                for segment in self.segments
+            ],
+        }
+
+
+# Global store fed by the text classification service
+embedding_store = EmbeddingStore()
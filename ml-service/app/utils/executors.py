@@ -0,0 +1,112 @@
+"""
+Inference Executors
+Priority-scheduled thread pools so model inference does not block the event loop
+"""
+
+import asyncio
+import contextvars
+import functools
+import time
+from typing import Any, Callable
+
+from app.config import settings, parse_cpu_list, pin_current_thread
+from app.utils.deadline import (
+    DeadlineExceeded,
+    RequestAborted,
+    current_deadline,
+)
+from app.utils.metrics import metrics
+from app.utils.timing import record_stage
+from app.utils.scheduler import (
+    BULK,
+    INTERACTIVE,
+    PriorityClass,
+    PriorityScheduler,
+    current_priority,
+)
+
+
+def _priority_classes(workers: int) -> dict:
+    """Interactive and bulk classes sized for a pool of `workers` threads"""
+    bulk_concurrency = settings.PRIORITY_BULK_MAX_CONCURRENCY or max(1, workers - 1)
+    return {
+        INTERACTIVE: PriorityClass(
+            name=INTERACTIVE,
+            weight=settings.PRIORITY_INTERACTIVE_WEIGHT,
+            max_concurrency=workers,
+            max_queue=settings.PRIORITY_INTERACTIVE_MAX_QUEUE
+        ),
+        BULK: PriorityClass(
+            name=BULK,
+            weight=settings.PRIORITY_BULK_WEIGHT,
+            max_concurrency=min(bulk_concurrency, workers),
+            max_queue=settings.PRIORITY_BULK_MAX_QUEUE
+        ),
+    }
+
+
+# Text (embedder + head) and image (decode + CNN) pipelines get separate
+# pools so a slow CNN call never queues behind text requests or vice versa
+text_executor = PriorityScheduler(
+    "text",
+    workers=settings.TEXT_WORKERS,
+    classes=_priority_classes(settings.TEXT_WORKERS),
+    shed_threshold=settings.PRIORITY_SHED_BULK_AT,
+    initializer=functools.partial(pin_current_thread, parse_cpu_list(settings.TEXT_CPU_AFFINITY))
+)
+image_executor = PriorityScheduler(
+    "image",
+    workers=settings.IMAGE_WORKERS,
+    classes=_priority_classes(settings.IMAGE_WORKERS),
+    shed_threshold=settings.PRIORITY_SHED_BULK_AT,
+    initializer=functools.partial(pin_current_thread, parse_cpu_list(settings.IMAGE_CPU_AFFINITY))
+)
+
+
+def _run_guarded(submitted: float, fn: Callable[..., Any], *args, **kwargs) -> Any:
+    """Drop work whose request expired or disconnected while it was queued"""
+    record_stage("queue", time.perf_counter() - submitted)
+    deadline = current_deadline.get()
+    if deadline is not None:
+        try:
+            deadline.check()
+        except RequestAborted as e:
+            reason = "expired" if isinstance(e, DeadlineExceeded) else "cancelled"
+            metrics.increment("requests_dropped_total", reason=reason, stage="queued")
+            raise
+    return fn(*args, **kwargs)
+
+
+async def run_in_executor(
+    executor: PriorityScheduler,
+    fn: Callable[..., Any],
+    *args,
+    **kwargs
+) -> Any:
+    """
+    Run a blocking function on an executor and await its result
+
+    Work is queued under the request's priority class (see
+    priority_dependency). The caller's context variables (including
+    the request deadline) are
+    copied into the worker thread. When the request has a deadline, the
+    wait gives up with 504 once it passes or 499 if the client
+    disconnects, and queued work is dropped before inference starts.
+    """
+    deadline = current_deadline.get()
+    if deadline is not None:
+        deadline.check()
+
+    context = contextvars.copy_context()
+    call = functools.partial(context.run, _run_guarded, time.perf_counter(), fn, *args, **kwargs)
+    future = executor.submit(current_priority.get(), call)
+
+    if deadline is None:
+        return await asyncio.wrap_future(future)
+    return await deadline.wait(future)
+
+
+def shutdown_executors() -> None:
+    """Stop accepting work and release worker threads"""
+    text_executor.shutdown()
+    image_executor.shutdown()
@@ -0,0 +1,223 @@
+"""
+Perceptual Image Hashing Utilities
+Computes 64-bit perceptual hashes and indexes them for near-duplicate search
+"""
+
+import threading
+from collections import deque
+from typing import Any, List, Optional, Tuple
+
+import cv2
+import numpy as np
+
+# ITU-R BT.601 luma weights (same as PIL's "L" conversion)
+_LUMA_WEIGHTS = np.array([0.299, 0.587, 0.114], dtype=np.float32)
+
+
+def _to_grayscale(image: np.ndarray) -> np.ndarray:
+    """Convert an HxWx3 (or HxW) array to a float32 grayscale array"""
+    image = np.asarray(image, dtype=np.float32)
+    if image.ndim == 3:
+        image = image @ _LUMA_WEIGHTS
+    return image
+
+
+def _bits_to_int(bits: np.ndarray) -> int:
+    """Pack a boolean array (row-major) into a Python int"""
+    return int.from_bytes(np.packbits(bits.ravel()).tobytes(), "big")
+
+
+def dhash(image: np.ndarray, hash_size: int = 8) -> int:
+    """
+    Difference hash: compares horizontally adjacent pixels of a downscaled image
+
+    Args:
+        image: Image array (HxWx3 or HxW), any value range
+        hash_size: Hash side length (8 -> 64-bit hash)
+
+    Returns:
+        Hash as an integer
+    """
+    gray = _to_grayscale(image)
+    small = cv2.resize(gray, (hash_size + 1, hash_size), interpolation=cv2.INTER_AREA)
+    return _bits_to_int(small[:, 1:] > small[:, :-1])
+
+
+def phash(image: np.ndarray, hash_size: int = 8, highfreq_factor: int = 4) -> int:
+    """
+    Perceptual hash: thresholds the low-frequency DCT coefficients at their median
+
+    Args:
+        image: Image array (HxWx3 or HxW), any value range
+        hash_size: Hash side length (8 -> 64-bit hash)
+        highfreq_factor: Downscale size multiplier before the DCT
+
+    Returns:
+        Hash as an integer
+    """
+    side = hash_size * highfreq_factor
+    gray = _to_grayscale(image)
+    small = cv2.resize(gray, (side, side), interpolation=cv2.INTER_AREA)
+    low_freq = cv2.dct(small)[:hash_size, :hash_size]
+    # Exclude the DC term so overall brightness does not skew the median
+    median = np.median(low_freq.ravel()[1:])
+    return _bits_to_int(low_freq > median)
+
+
+HASH_FUNCTIONS = {
+    "dhash": dhash,
+    "phash": phash,
+}
+
+
+def compute_image_hash(image: np.ndarray, algorithm: str = "dhash") -> int:
+    """Compute a perceptual hash with the named algorithm"""
+    try:
+        hash_fn = HASH_FUNCTIONS[algorithm]
+    except KeyError:
+        raise ValueError(
+            f"Unknown hash algorithm '{algorithm}'. "
+            f"Supported: {', '.join(HASH_FUNCTIONS)}"
+        )
+    return hash_fn(image)
+
+
+def hamming_distance(a: int, b: int) -> int:
+    """Number of differing bits between two hashes"""
+    return (a ^ b).bit_count()
+
+
+def hash_to_hex(value: int, bits: int = 64) -> str:
+    """Format a hash as a fixed-width hex string"""
+    return f"{value:0{bits // 4}x}"
+
+
+def hex_to_hash(value: str) -> int:
+    """Parse a hex-formatted hash"""
+    return int(value, 16)
+
+
+class BKTree:
+    """
+    Burkhard-Keller tree over Hamming distance
+
+    Each node stores a hash and its children keyed by their distance to it.
+    The triangle inequality prunes every subtree whose edge distance lies
+    outside [d - radius, d + radius], so radius queries touch a small
+    fraction of the indexed hashes.
+    """
+
+    def __init__(self):
+        self._root: Optional[list] = None
+        self._size = 0
+
+    def __len__(self) -> int:
+        return self._size
+
+    def add(self, value: int, item: Any) -> None:
+        """Insert a hash with its associated item"""
+        self._size += 1
+        if self._root is None:
+            # Node layout: [hash, items, children]
+            self._root = [value, [item], {}]
+            return
+
+        node = self._root
+        while True:
+            distance = hamming_distance(value, node[0])
+            if distance == 0:
+                node[1].append(item)
+                return
+            child = node[2].get(distance)
+            if child is None:
+                node[2][distance] = [value, [item], {}]
+                return
+            node = child
+
+    def search(self, value: int, radius: int) -> List[Tuple[int, int, Any]]:
+        """
+        Find all items within a Hamming radius
+
+        Returns:
+            List of (distance, hash, item) sorted by distance
+        """
+        if self._root is None:
+            return []
+
+        matches = []
+        stack = [self._root]
+        while stack:
+            node_hash, items, children = stack.pop()
+            distance = hamming_distance(value, node_hash)
+            if distance <= radius:
+                matches.extend((distance, node_hash, item) for item in items)
+            low, high = distance - radius, distance + radius
+            stack.extend(
+                child for edge, child in children.items() if low <= edge <= high
+            )
+
+        matches.sort(key=lambda match: match[0])
+        return matches
+
+
+class ImageHashIndex:
+    """
+    Thread-safe, size-bounded perceptual hash index
+
+    BK-trees do not support deletion, so entries are kept in generations:
+    one BKTree per max_size / 4 insertions. New hashes go into the newest
+    tree; once max_size is exceeded the oldest generation is dropped whole,
+    so adding never rebuilds a tree (and never holds the lock for long).
+    Searches query every generation (at most five trees).
+    """
+
+    def __init__(self, max_size: int = 50000):
+        self.max_size = max_size
+        self.generation_size = max(1, max_size // 4) if max_size else None
+        self._generations: deque = deque([BKTree()])  # Oldest first
+        self._size = 0
+        self._lock = threading.Lock()
+
+    def __len__(self) -> int:
+        return self._size
+
+    def add(self, value: int, item: Any) -> None:
+        """Index a hash with its associated item"""
+        with self._lock:
+            newest = self._generations[-1]
+            if self.generation_size is not None and len(newest) >= self.generation_size:
+                newest = BKTree()
+                self._generations.append(newest)
+            newest.add(value, item)
+            self._size += 1
+
+            if self.max_size and self._size > self.max_size:
+                # Drop the oldest quarter at once
+                self._size -= len(self._generations.popleft())
+
+    def search(
+        self,
+        value: int,
+        radius: int,
+        limit: Optional[int] = None
+    ) -> List[Tuple[int, int, Any]]:
+        """Find up to `limit` items within a Hamming radius, closest first"""
+        with self._lock:
+            matches = [
+                match
+                for generation in self._generations
+                for match in generation.search(value, radius)
+            ]
+        matches.sort(key=lambda match: match[0])
+        return matches[:limit] if limit else matches
+
+    def nearest(self, value: int, radius: int) -> Optional[Tuple[int, int, Any]]:
+        """Return the closest match within radius, or None"""
+        matches = self.search(value, radius, limit=1)
+        return matches[0] if matches else None
+
+    def clear(self) -> None:
+        """Remove all entries"""
+        with self._lock:
+            self._generations = deque([BKTree()])
+            self._size = 0
@@ -0,0 +1,274 @@
+"""
+Job Queue
+Durable queue of classification jobs in a local SQLite database (WAL mode),
+shared by every service process on the host, with leases so jobs held by a
+crashed worker are picked up again and finished results kept under a TTL
+
+States: queued -> running -> done | failed
+"""
+
+import json
+import sqlite3
+import threading
+import time
+import uuid
+from pathlib import Path
+from typing import Any, Dict, List, Optional, Union
+
+QUEUED = "queued"
+RUNNING = "running"
+DONE = "done"
+FAILED = "failed"
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS jobs (
+    id TEXT PRIMARY KEY,
+    kind TEXT NOT NULL,
+    status TEXT NOT NULL,
+    payload TEXT NOT NULL,
+    image BLOB,
+    attempts INTEGER NOT NULL DEFAULT 0,
+    created_at REAL NOT NULL,
+    started_at REAL,
+    lease_until REAL,
+    finished_at REAL,
+    expires_at REAL,
+    result TEXT,
+    error TEXT
+);
+CREATE INDEX IF NOT EXISTS jobs_status_created ON jobs (status, created_at);
+CREATE INDEX IF NOT EXISTS jobs_expires ON jobs (expires_at);
+"""
+
+# Columns returned by get(): everything but the payload and image
+_PUBLIC_COLUMNS = (
+    "id", "kind", "status", "attempts", "created_at", "started_at",
+    "finished_at", "expires_at", "result", "error",
+)
+
+
+class QueueFull(Exception):
+    """The queue already holds JOBS_MAX_QUEUED unfinished jobs"""
+
+
+class JobQueue:
+    """
+    SQLite-backed job queue
+
+    One connection per instance, serialized by a lock; concurrent
+    processes are serialized by SQLite itself. Claims run in an
+    IMMEDIATE transaction, so a job is handed to exactly one worker
+    until its lease runs out; workers renew() leases while they run.
+    Results are stored against the attempt number of the claim, so a
+    worker that lost its lease cannot overwrite a newer run.
+    """
+
+    def __init__(self, path: Union[str, Path], max_queued: int, result_ttl_s: float):
+        self.path = Path(path)
+        self.max_queued = max_queued
+        self.result_ttl_s = result_ttl_s
+        self._lock = threading.Lock()
+
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        self._conn = sqlite3.connect(
+            str(self.path),
+            timeout=30.0,
+            isolation_level=None,
+            check_same_thread=False
+        )
+        self._conn.row_factory = sqlite3.Row
+        # WAL: readers (GET /jobs) never wait for the workers' writes
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        self._conn.executescript(_SCHEMA)
+
+    def close(self) -> None:
+        with self._lock:
+            self._conn.close()
+
+    def submit(self, kind: str, payload: Dict[str, Any], image: Optional[bytes] = None) -> Dict[str, Any]:
+        """
+        Queue a job
+
+        Raises:
+            QueueFull: If max_queued jobs are already waiting or running
+        """
+        job_id = uuid.uuid4().hex
+        now = time.time()
+
+        with self._lock:
+            self._conn.execute("BEGIN IMMEDIATE")
+            try:
+                (unfinished,) = self._conn.execute(
+                    "SELECT COUNT(*) FROM jobs WHERE status IN (?, ?)", (QUEUED, RUNNING)
+                ).fetchone()
+                if unfinished >= self.max_queued:
+                    raise QueueFull(f"{unfinished} jobs already queued")
+
+                self._conn.execute(
+                    "INSERT INTO jobs (id, kind, status, payload, image, created_at) VALUES (?, ?, ?, ?, ?, ?)",
+                    (job_id, kind, QUEUED, json.dumps(payload, ensure_ascii=False), image, now)
+                )
+                self._conn.execute("COMMIT")
+            except BaseException:
+                self._conn.execute("ROLLBACK")
+                raise
+
+        return {"id": job_id, "kind": kind, "status": QUEUED, "created_at": now}
+
+    def claim(self, limit: int, lease_s: float, max_attempts: int) -> List[Dict[str, Any]]:
+        """
+        Take up to `limit` jobs, oldest first, for `lease_s` seconds
+
+        Jobs whose lease ran out (their worker died) are claimed again;
+        after max_attempts claims they are failed instead.
+
+        Returns:
+            Claimed jobs with their payload and image
+        """
+        now = time.time()
+
+        with self._lock:
+            self._conn.execute("BEGIN IMMEDIATE")
+            try:
+                self._conn.execute(
+                    "UPDATE jobs SET status = ?, finished_at = ?, expires_at = ?, lease_until = NULL, "
+                    "image = NULL, error = ? WHERE status = ? AND lease_until < ? AND attempts >= ?",
+                    (
+                        FAILED, now, now + self.result_ttl_s,
+                        f"Job did not finish in {max_attempts} attempts",
+                        RUNNING, now, max_attempts,
+                    )
+                )
+                rows = self._conn.execute(
+                    "SELECT id, kind, payload, image, attempts, created_at FROM jobs "
+                    "WHERE status = ? OR (status = ? AND lease_until < ?) "
+                    "ORDER BY created_at LIMIT ?",
+                    (QUEUED, RUNNING, now, limit)
+                ).fetchall()
+                self._conn.executemany(
+                    "UPDATE jobs SET status = ?, started_at = ?, lease_until = ?, attempts = attempts + 1 "
+                    "WHERE id = ?",
+                    [(RUNNING, now, now + lease_s, row["id"]) for row in rows]
+                )
+                self._conn.execute("COMMIT")
+            except BaseException:
+                self._conn.execute("ROLLBACK")
+                raise
+
+        return [
+            {
+                "id": row["id"],
+                "kind": row["kind"],
+                "payload": json.loads(row["payload"]),
+                "image": row["image"],
+                "attempts": row["attempts"] + 1,
+                "created_at": row["created_at"],
+                "started_at": now,
+            }
+            for row in rows
+        ]
+
+    def finish(self, results: Dict[str, Dict[str, Any]], attempts: Dict[str, int]) -> int:
+        """
+        Store results of claimed jobs, keyed by job id
+
+        A result with success=False fails its job with the result's error.
+        Images are dropped once the job is finished. Only the claim that
+        is still current is stored: a job whose lease ran out and was
+        claimed again (`attempts` no longer matches) keeps its new run.
+
+        Args:
+            results: Result per job id
+            attempts: Attempt number each job was claimed with
+
+        Returns:
+            Number of results stored
+        """
+        now = time.time()
+        rows = []
+        for job_id, result in results.items():
+            status = DONE if result.get("success", True) else FAILED
+            rows.append((
+                status, now, now + self.result_ttl_s,
+                json.dumps(result, ensure_ascii=False, default=str),
+                None if status == DONE else str(result.get("error")),
+                job_id, RUNNING, attempts[job_id],
+            ))
+
+        with self._lock:
+            self._conn.execute("BEGIN IMMEDIATE")
+            try:
+                before = self._conn.total_changes
+                self._conn.executemany(
+                    "UPDATE jobs SET status = ?, finished_at = ?, expires_at = ?, lease_until = NULL, "
+                    "image = NULL, result = ?, error = ? WHERE id = ? AND status = ? AND attempts = ?",
+                    rows
+                )
+                stored = self._conn.total_changes - before
+                self._conn.execute("COMMIT")
+            except BaseException:
+                self._conn.execute("ROLLBACK")
+                raise
+
+        return stored
+
+    def renew(self, attempts: Dict[str, int], lease_s: float) -> int:
+        """
+        Extend the lease of jobs still held under the given attempt numbers
+
+        Returns:
+            Number of leases renewed
+        """
+        lease_until = time.time() + lease_s
+        with self._lock:
+            before = self._conn.total_changes
+            self._conn.executemany(
+                "UPDATE jobs SET lease_until = ? WHERE id = ? AND status = ? AND attempts = ?",
+                [(lease_until, job_id, RUNNING, attempt) for job_id, attempt in attempts.items()]
+            )
+            return self._conn.total_changes - before
+
+    def release(self, attempts: Dict[str, int], count_attempt: bool = False) -> None:
+        """
+        Put claimed jobs (id -> claimed attempt) back in the queue
+
+        The attempt is not counted unless `count_attempt`, so work that was
+        never run (shed, or cut short by shutdown) is not failed for it.
+        """
+        refund = 0 if count_attempt else 1
+        with self._lock:
+            self._conn.executemany(
+                "UPDATE jobs SET status = ?, started_at = NULL, lease_until = NULL, "
+                "attempts = attempts - ? WHERE id = ? AND status = ? AND attempts = ?",
+                [(QUEUED, refund, job_id, RUNNING, attempt) for job_id, attempt in attempts.items()]
+            )
+
+    def get(self, job_id: str) -> Optional[Dict[str, Any]]:
+        """Job status and (once finished) result; None if unknown or expired"""
+        with self._lock:
+            row = self._conn.execute(
+                f"SELECT {', '.join(_PUBLIC_COLUMNS)} FROM jobs WHERE id = ?", (job_id,)
+            ).fetchone()
+
+        if row is None or (row["expires_at"] is not None and row["expires_at"] < time.time()):
+            return None
+
+        job = dict(row)
+        if job["result"] is not None:
+            job["result"] = json.loads(job["result"])
+        return job
+
+    def purge(self) -> int:
+        """Delete finished jobs past their TTL; returns how many"""
+        with self._lock:
+            cursor = self._conn.execute("DELETE FROM jobs WHERE expires_at < ?", (time.time(),))
+        return cursor.rowcount
+
+    def counts(self) -> Dict[str, int]:
+        """Number of jobs per status"""
+        with self._lock:
+            rows = self._conn.execute("SELECT status, COUNT(*) FROM jobs GROUP BY status").fetchall()
+        counts = {status: 0 for status in (QUEUED, RUNNING, DONE, FAILED)}
+        counts.update({status: count for status, count in rows})
+        return counts
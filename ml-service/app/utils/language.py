@@ -0,0 +1,264 @@
+"""
+Script and Language Detection
+Cheap Hindi/Marathi/English identification for routing complaints to
+per-language text backends: the script from the Devanagari letter ratio,
+the language within a script from character n-gram profiles (trained by
+train_language_backend.py --train-profiles), or from a keyword/suffix
+heuristic when no profiles are installed
+"""
+
+import json
+import math
+import re
+import threading
+from collections import Counter
+from dataclasses import dataclass
+from pathlib import Path
+from typing import Dict, List, Optional, Sequence, Tuple, Union
+
+from app.config import settings
+
+DEVANAGARI = re.compile(r"[\u0900-\u097F]")
+LATIN = re.compile(r"[a-zA-Z]")
+
+# Languages a text can be routed by
+ENGLISH = "en"
+HINDI = "hi"
+MARATHI = "mr"
+ROMANIZED_HINDI = "hi-latn"  # Hinglish / romanized Marathi
+MIXED = "mixed"
+UNKNOWN = "unknown"
+LANGUAGES = (ENGLISH, HINDI, MARATHI, ROMANIZED_HINDI, MIXED, UNKNOWN)
+
+# Keyword heuristic (fallback without LANGUAGE_PROFILES_PATH): weighted words
+# and suffixes that separate Hindi from Marathi (both use Devanagari).
+# Weights favour function words over topic words.
+HINDI_WORDS: Dict[str, float] = {
+    "है": 3, "हैं": 3, "नहीं": 3, "में": 2, "गया": 2, "गई": 2, "गए": 2,
+    "रहा": 2, "रही": 2, "हुआ": 2, "हुई": 2, "और": 2, "की": 1, "का": 1,
+    "के": 1, "को": 1, "से": 1, "पर": 1, "बहुत": 1, "सड़क": 2, "कूड़ा": 2,
+    "पेड़": 2, "गड्ढे": 2, "कृपया": 1, "यहाँ": 2, "वहाँ": 2,
+}
+MARATHI_WORDS: Dict[str, float] = {
+    "आहे": 3, "आहेत": 3, "नाही": 3, "आणि": 3, "मध्ये": 3, "झाले": 2,
+    "झाला": 2, "झाली": 2, "पडले": 2, "पडलेत": 2, "पडला": 2, "गेले": 2,
+    "येथे": 2, "इथे": 2, "खूप": 1, "करा": 1, "रस्त्यावर": 2, "रस्ता": 2,
+    "खड्डे": 2, "झाड": 2, "खांब": 2,
+}
+HINDI_SUFFIXES: Dict[str, float] = {"ों": 1, "ें": 1, "ियों": 1}
+MARATHI_SUFFIXES: Dict[str, float] = {"च्या": 2, "ाचे": 1, "ाची": 1, "ाचा": 1, "ांना": 2, "ाला": 1, "ात": 0.5}
+MARATHI_LETTERS: Dict[str, float] = {"ळ": 2}
+
+# Common romanized Hindi/Marathi tokens seen in Latin-script complaints
+ROMANIZED_WORDS = {
+    "hai", "hain", "nahi", "nahin", "mein", "ka", "ki", "ke", "ko", "se",
+    "gaya", "gayi", "raha", "rahi", "bahut", "kachra", "kachara", "sadak",
+    "gaddha", "gadde", "ped", "khamba", "aahe", "zhala", "rasta",
+    "kripya", "yaha", "yahan", "wala", "wali",
+}
+
+
+@dataclass
+class LanguageGuess:
+    """Detected language with the evidence behind it"""
+    language: str
+    script: str  # "devanagari", "latin", "mixed" or "none"
+    devanagari_ratio: float  # Share of letters that are Devanagari
+    confidence: float  # 0-1, profile posterior (or share of keyword evidence) of the winner
+
+
+class LanguageProfiles:
+    """
+    Character n-gram language profiles (multinomial naive Bayes)
+
+    Each language keeps the log-probabilities of its most frequent 1- to
+    n-grams of space-padded tokens, plus one log-probability for grams
+    outside its table. A text is scored against the candidate languages
+    of its script only, so Hindi is told from Marathi and English from
+    romanized Hindi. The table is a small JSON file.
+    """
+
+    def __init__(
+        self,
+        n: int,
+        log_probs: Dict[str, Dict[str, float]],
+        unseen: Dict[str, float],
+        log_priors: Dict[str, float]
+    ):
+        self.n = n
+        self.log_probs = log_probs
+        self.unseen = unseen
+        self.log_priors = log_priors
+
+    @property
+    def languages(self) -> List[str]:
+        return list(self.log_probs)
+
+    @staticmethod
+    def ngrams(text: str, n: int) -> List[str]:
+        grams = []
+        for token in text.lower().split():
+            padded = f" {token} "
+            for size in range(1, n + 1):
+                grams.extend(padded[start:start + size] for start in range(len(padded) - size + 1))
+        return grams
+
+    @classmethod
+    def fit(
+        cls,
+        texts: Sequence[str],
+        languages: Sequence[str],
+        n: int = 3,
+        max_grams: int = 3000,
+        alpha: float = 1.0
+    ) -> "LanguageProfiles":
+        """
+        Count n-grams per language and keep the max_grams most frequent
+
+        Args:
+            texts: Cleaned texts
+            languages: Language of each text (values of LANGUAGES)
+            n: Longest n-gram
+            max_grams: Table size per language
+            alpha: Additive smoothing
+        """
+        counts: Dict[str, Counter] = {}
+        documents = Counter(languages)
+        for text, language in zip(texts, languages):
+            counts.setdefault(language, Counter()).update(cls.ngrams(text, n))
+
+        log_probs, unseen, log_priors = {}, {}, {}
+        for language, grams in counts.items():
+            total = sum(grams.values())
+            denominator = total + alpha * (len(grams) + 1)
+            log_probs[language] = {
+                gram: round(math.log((count + alpha) / denominator), 4)
+                for gram, count in grams.most_common(max_grams)
+            }
+            unseen[language] = round(math.log(alpha / denominator), 4)
+            log_priors[language] = round(math.log(documents[language] / len(languages)), 4)
+        return cls(n, log_probs, unseen, log_priors)
+
+    def classify(self, text: str, candidates: Sequence[str]) -> Optional[Tuple[str, float]]:
+        """
+        Most likely of `candidates` (languages without a profile are skipped)
+
+        Returns:
+            (language, posterior probability), or None if no candidate has
+            a profile or the text has no letters
+        """
+        candidates = [language for language in candidates if language in self.log_probs]
+        grams = self.ngrams(text, self.n)
+        if not candidates or not grams:
+            return None
+
+        scores = {}
+        for language in candidates:
+            table, unseen = self.log_probs[language], self.unseen[language]
+            scores[language] = self.log_priors[language] + sum(table.get(gram, unseen) for gram in grams)
+
+        best = max(scores, key=scores.get)
+        # Softmax over the log-likelihoods, shifted by the best for stability
+        total = sum(math.exp(score - scores[best]) for score in scores.values())
+        return best, 1.0 / total
+
+    def save(self, path: Union[str, Path]) -> None:
+        Path(path).write_text(
+            json.dumps({
+                "n": self.n,
+                "log_probs": self.log_probs,
+                "unseen": self.unseen,
+                "log_priors": self.log_priors,
+            }, ensure_ascii=False),
+            encoding="utf-8"
+        )
+
+    @classmethod
+    def load(cls, path: Union[str, Path]) -> "LanguageProfiles":
+        data = json.loads(Path(path).read_text(encoding="utf-8"))
+        return cls(data["n"], data["log_probs"], data["unseen"], data["log_priors"])
+
+
+_profiles: Optional[LanguageProfiles] = None
+_profiles_loaded = False
+_profiles_lock = threading.Lock()
+
+
+def language_profiles() -> Optional[LanguageProfiles]:
+    """Profiles from LANGUAGE_PROFILES_PATH (read once), or None if not trained"""
+    global _profiles, _profiles_loaded
+    if not _profiles_loaded:
+        with _profiles_lock:
+            if not _profiles_loaded:
+                path = settings.LANGUAGE_PROFILES_PATH
+                _profiles = LanguageProfiles.load(path) if path.exists() else None
+                _profiles_loaded = True
+    return _profiles
+
+
+def _score(tokens, words: Dict[str, float], suffixes: Dict[str, float]) -> float:
+    score = 0.0
+    for token in tokens:
+        score += words.get(token, 0.0)
+        for suffix, weight in suffixes.items():
+            if len(token) > len(suffix) and token.endswith(suffix):
+                score += weight
+                break
+    return score
+
+
+def _keyword_latin(tokens: List[str], ratio: float) -> LanguageGuess:
+    romanized = sum(1 for token in tokens if token in ROMANIZED_WORDS)
+    if tokens and romanized / len(tokens) >= 0.15:
+        return LanguageGuess(ROMANIZED_HINDI, "latin", ratio, min(1.0, romanized / len(tokens) * 3))
+    return LanguageGuess(ENGLISH, "latin", ratio, 1.0 - ratio)
+
+
+def _keyword_devanagari(text: str, tokens: List[str], ratio: float) -> LanguageGuess:
+    hindi = _score(tokens, HINDI_WORDS, HINDI_SUFFIXES)
+    marathi = _score(tokens, MARATHI_WORDS, MARATHI_SUFFIXES)
+    marathi += sum(text.count(letter) * weight for letter, weight in MARATHI_LETTERS.items())
+
+    total = hindi + marathi
+    if total == 0:
+        return LanguageGuess(UNKNOWN, "devanagari", ratio, 0.0)
+    if marathi > hindi:
+        return LanguageGuess(MARATHI, "devanagari", ratio, marathi / total)
+    return LanguageGuess(HINDI, "devanagari", ratio, hindi / total)
+
+
+def detect_language(text: str) -> LanguageGuess:
+    """
+    Identify the script from the Devanagari letter ratio, then the
+    language within the script from the n-gram profiles if installed,
+    otherwise from the keyword/suffix heuristic
+
+    Args:
+        text: Raw or cleaned complaint text
+
+    Returns:
+        LanguageGuess (language is one of LANGUAGES)
+    """
+    devanagari = len(DEVANAGARI.findall(text))
+    latin = len(LATIN.findall(text))
+    letters = devanagari + latin
+
+    if letters == 0:
+        return LanguageGuess(UNKNOWN, "none", 0.0, 0.0)
+
+    ratio = devanagari / letters
+    if 0.2 <= ratio < 0.8:
+        return LanguageGuess(MIXED, "mixed", ratio, 1.0 - abs(ratio - 0.5) * 2)
+
+    script = "latin" if ratio < 0.2 else "devanagari"
+    candidates = (ENGLISH, ROMANIZED_HINDI) if script == "latin" else (HINDI, MARATHI)
+    profiles = language_profiles()
+    # Both languages of the script need a profile; a one-sided table cannot decide
+    if profiles is not None and all(language in profiles.log_probs for language in candidates):
+        language, confidence = profiles.classify(text, candidates)
+        return LanguageGuess(language, script, ratio, confidence)
+
+    tokens = text.lower().split()
+    if script == "latin":
+        return _keyword_latin(tokens, ratio)
+    return _keyword_devanagari(text, tokens, ratio)
@@ -0,0 +1,175 @@
+"""
+Logging Setup
+Background (enqueued) loguru sink with optional JSON output, and a sampled
+logger for per-request info lines on the inference hot path
+"""
+
+import json
+import queue
+import random
+import sys
+import threading
+from typing import Any, Callable, Dict, Optional
+
+from loguru import logger
+
+from app.config import settings
+from app.utils.metrics import metrics
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+TEXT_FORMAT = (
+    "<green>{time:YYYY-MM-DD HH:mm:ss}</green> | <level>{level: <8}</level> | "
+    "<cyan>{name}</cyan>:<cyan>{function}</cyan> - <level>{message}</level>"
+)
+
+
+def _json_line(record: Dict[str, Any]) -> str:
+    """One log record as a single-line JSON object"""
+    payload = {
+        "time": record["time"].isoformat(),
+        "level": record["level"].name,
+        "logger": record["name"],
+        "function": record["function"],
+        "line": record["line"],
+        "message": record["message"],
+        "process": record["process"].id,
+        "thread": record["thread"].name,
+    }
+    payload.update(record["extra"])
+    if record["exception"] is not None:
+        exception = record["exception"]
+        payload["exception"] = f"{exception.type.__name__}: {exception.value}" if exception.type else None
+
+    if orjson is not None:
+        return orjson.dumps(payload, default=str).decode()
+    return json.dumps(payload, default=str, ensure_ascii=False)
+
+
+def write_text(message) -> None:
+    sys.stdout.write(message)
+    sys.stdout.flush()
+
+
+def write_json(message) -> None:
+    sys.stdout.write(_json_line(message.record) + "\n")
+    sys.stdout.flush()
+
+
+class BackgroundSink:
+    """
+    Loguru sink that hands messages to a writer thread
+
+    The calling thread only puts the formatted message on an in-process
+    queue (loguru's own enqueue=True pickles every record through a pipe,
+    which costs more than the write it saves). JSON serialization and
+    the stdout write happen on the writer thread. When the queue is full,
+    lines below WARNING are dropped and counted; warnings and errors wait
+    for room, so they are never lost.
+    """
+
+    def __init__(self, write: Callable[[Any], None], max_queue: int):
+        self._write = write
+        self._queue: queue.Queue = queue.Queue(maxsize=max_queue)
+        self._thread = threading.Thread(target=self._run, name="log-writer", daemon=True)
+        self._thread.start()
+
+    def write(self, message) -> None:
+        try:
+            self._queue.put_nowait(message)
+        except queue.Full:
+            if message.record["level"].no >= 30:  # WARNING and above
+                self._queue.put(message)
+            else:
+                metrics.increment("log_lines_dropped_total")
+
+    def _run(self) -> None:
+        while True:
+            message = self._queue.get()
+            try:
+                if message is None:
+                    return
+                self._write(message)
+            except Exception:
+                pass
+            finally:
+                self._queue.task_done()
+
+    def drain(self) -> None:
+        """Block until every queued line is written"""
+        self._queue.join()
+
+    def stop(self) -> None:
+        """Called by logger.remove(): write what is queued, then end the thread"""
+        self._queue.put(None)
+        self._thread.join(timeout=5)
+
+
+_background_sink: Optional[BackgroundSink] = None
+
+
+def configure_logging() -> None:
+    """
+    Replace loguru's default handler with the configured stdout sink
+
+    With LOG_ENQUEUE the calling thread only formats the message and puts
+    it on a queue; a writer thread does the JSON serialization and the
+    write, so a slow stdout consumer never stalls inference.
+    """
+    global _background_sink
+
+    logger.remove()
+    write = write_json if settings.LOG_FORMAT == "json" else write_text
+    log_format = "{message}" if settings.LOG_FORMAT == "json" else TEXT_FORMAT
+    colorize = settings.LOG_FORMAT != "json" and sys.stdout.isatty()
+
+    if settings.LOG_ENQUEUE:
+        _background_sink = BackgroundSink(write, settings.LOG_QUEUE_SIZE)
+        sink = _background_sink
+    else:
+        _background_sink = None
+        sink = write
+
+    logger.add(sink, format=log_format, level=settings.LOG_LEVEL, colorize=colorize, catch=True)
+
+
+def flush_logging() -> None:
+    """Wait for the background sink to write everything queued so far"""
+    if _background_sink is not None:
+        _background_sink.drain()
+
+
+class SampledLogger:
+    """
+    Per-request info/success logging that keeps LOG_SAMPLE_RATE of the calls
+
+    Use format arguments instead of f-strings, e.g.
+        sampled_logger.info("Processing text ({} -> {})", language, backend)
+    so skipped calls never format their message. Warnings and errors
+    should go to `logger` directly, which always logs them.
+    """
+
+    def __init__(self, rate: float):
+        self.rate = rate
+
+    def _keep(self) -> bool:
+        return self.rate >= 1.0 or (self.rate > 0.0 and random.random() < self.rate)
+
+    def debug(self, message: str, *args, **kwargs) -> None:
+        if self._keep():
+            logger.opt(depth=1).debug(message, *args, **kwargs)
+
+    def info(self, message: str, *args, **kwargs) -> None:
+        if self._keep():
+            logger.opt(depth=1).info(message, *args, **kwargs)
+
+    def success(self, message: str, *args, **kwargs) -> None:
+        if self._keep():
+            logger.opt(depth=1).success(message, *args, **kwargs)
+
+
+# Hot-path logger for per-request lines in routes and services
+sampled_logger = SampledLogger(settings.LOG_SAMPLE_RATE)
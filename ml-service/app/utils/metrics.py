@@ -0,0 +1,84 @@
+"""
+In-process Metrics Registry
+Thread-safe counters and latency summaries exposed at /metrics
+"""
+
+import threading
+from collections import defaultdict
+from typing import Dict
+
+
+def _metric_key(name: str, labels: Dict[str, object]) -> str:
+    """Format a metric name with sorted labels, e.g. name{stage="fast"}"""
+    if not labels:
+        return name
+    label_str = ",".join(f'{key}="{value}"' for key, value in sorted(labels.items()))
+    return f"{name}{{{label_str}}}"
+
+
+class Metrics:
+    """Collects counters and timing summaries for the running process"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._counters: Dict[str, float] = defaultdict(float)
+        self._gauges: Dict[str, float] = {}
+        self._timings: Dict[str, Dict[str, float]] = {}
+
+    def increment(self, name: str, value: float = 1, **labels) -> None:
+        """Increase a counter"""
+        key = _metric_key(name, labels)
+        with self._lock:
+            self._counters[key] += value
+
+    def set_gauge(self, name: str, value: float, **labels) -> None:
+        """Set a gauge to an absolute value"""
+        key = _metric_key(name, labels)
+        with self._lock:
+            self._gauges[key] = value
+
+    def observe(self, name: str, seconds: float, **labels) -> None:
+        """Record a duration in seconds"""
+        key = _metric_key(name, labels)
+        with self._lock:
+            summary = self._timings.get(key)
+            if summary is None:
+                summary = self._timings[key] = {"count": 0, "sum": 0.0, "max": 0.0}
+            summary["count"] += 1
+            summary["sum"] += seconds
+            if seconds > summary["max"]:
+                summary["max"] = seconds
+
+    def get_counter(self, name: str, **labels) -> float:
+        """Read the current value of a counter"""
+        with self._lock:
+            return self._counters.get(_metric_key(name, labels), 0)
+
+    def snapshot(self) -> dict:
+        """Return a JSON-serializable copy of all metrics"""
+        with self._lock:
+            timings = {
+                key: {
+                    "count": summary["count"],
+                    "sum_ms": round(summary["sum"] * 1000, 3),
+                    "avg_ms": round(summary["sum"] * 1000 / summary["count"], 3),
+                    "max_ms": round(summary["max"] * 1000, 3),
+                }
+                for key, summary in self._timings.items()
+            }
+            return {
+                "counters": dict(self._counters),
+                "gauges": dict(self._gauges),
+                "timings": timings,
+            }
+
+    def reset(self) -> None:
+        """Clear all metrics"""
+        with self._lock:
+            self._counters.clear()
+            self._gauges.clear()
+            self._timings.clear()
+
+
+# Global metrics registry
+metrics = Metrics()
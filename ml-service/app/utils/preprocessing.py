@@ -7,10 +7,11 @@ import re
 import numpy as np
 from PIL import Image
 import cv2
-from typing import Union
+from typing import Tuple, Union
 from io import BytesIO
 
 from app.config import settings
+from app.utils.language import LanguageGuess, detect_language
 
 
 class TextPreprocessor:
@@ -48,6 +49,22 @@ class TextPreprocessor:
         
         return text
     
+    @staticmethod
+    def clean_and_detect(text: str) -> Tuple[str, LanguageGuess]:
+        """
+        Clean text with clean_text(), then detect the language of the
+        cleaned text with detect_language()
+        
+        Args:
+            text: Raw input text in any language
+            
+        Returns:
+            (cleaned text, LanguageGuess) - detection runs on the cleaned
+            text, so URLs and emails do not count as English
+        """
+        cleaned = TextPreprocessor.clean_text(text)
+        return cleaned, detect_language(cleaned)
+    
     @staticmethod
     def truncate_text(text: str, max_length: int = None) -> str:
         """
@@ -0,0 +1,252 @@
+"""
+Priority Scheduler
+Weighted fair queuing with per-class concurrency limits and load shedding
+in front of an inference thread pool
+"""
+
+import contextvars
+import threading
+import time
+from collections import deque
+from concurrent.futures import Future, ThreadPoolExecutor
+from dataclasses import dataclass
+from typing import Any, Callable, Dict, Optional
+
+from fastapi import HTTPException, Request
+
+from app.utils.metrics import metrics
+
+PRIORITY_HEADER = "X-Priority"
+INTERACTIVE = "interactive"
+BULK = "bulk"
+
+
+class SchedulerOverloaded(HTTPException):
+    """Work was shed because its priority class queue is full"""
+
+    def __init__(self, priority: str):
+        super().__init__(
+            status_code=429,
+            detail=f"Server overloaded, {priority} work rejected. Retry later.",
+            headers={"Retry-After": "1"}
+        )
+
+
+class SchedulerShutdown(RuntimeError):
+    """Work was submitted after the scheduler was shut down"""
+
+
+@dataclass
+class PriorityClass:
+    """Scheduling parameters of one traffic class"""
+    name: str
+    weight: float  # Share of capacity under contention
+    max_concurrency: int  # Worker slots this class may hold at once
+    max_queue: int  # Queued items before new work is shed
+
+
+class _WorkItem:
+    __slots__ = ("future", "fn", "finish_tag", "enqueued_at")
+
+    def __init__(self, future: Future, fn: Callable[[], Any], finish_tag: float):
+        self.future = future
+        self.fn = fn
+        self.finish_tag = finish_tag
+        self.enqueued_at = time.monotonic()
+
+
+class PriorityScheduler:
+    """
+    Dispatches work onto a fixed thread pool in weighted-fair order
+
+    Each class gets virtual finish tags spaced 1/weight apart, and the
+    eligible queue head with the smallest tag runs next. With weights
+    interactive=8, bulk=1, interactive work gets ~8 of every 9 free
+    slots under contention, while bulk uses all idle capacity otherwise.
+    A class never holds more than max_concurrency slots, so a bulk
+    backlog cannot occupy every worker. When the interactive queue
+    backs up beyond shed_threshold, queued bulk work is rejected first.
+    """
+
+    def __init__(
+        self,
+        name: str,
+        workers: int,
+        classes: Dict[str, PriorityClass],
+        shed_threshold: Optional[int] = None,
+        shed_class: str = BULK,
+        initializer: Optional[Callable[[], None]] = None
+    ):
+        self.name = name
+        self.workers = workers
+        self.classes = classes
+        self.shed_threshold = shed_threshold
+        self.shed_class = shed_class
+
+        self._executor = ThreadPoolExecutor(
+            max_workers=workers,
+            thread_name_prefix=f"{name}-inference",
+            initializer=initializer
+        )
+        self._lock = threading.Lock()
+        self._queues: Dict[str, deque] = {cls: deque() for cls in classes}
+        self._running: Dict[str, int] = {cls: 0 for cls in classes}
+        self._last_finish: Dict[str, float] = {cls: 0.0 for cls in classes}
+        self._virtual_time = 0.0
+        self._total_running = 0
+        self._shutdown = False
+
+    def submit(self, priority: str, fn: Callable[[], Any]) -> Future:
+        """
+        Queue work under a priority class
+
+        Raises:
+            SchedulerOverloaded: If the class queue is full or bulk work
+                is being shed to protect interactive latency
+            SchedulerShutdown: If the scheduler is shut down
+        """
+        if priority not in self.classes:
+            raise ValueError(f"Unknown priority class '{priority}'")
+
+        future: Future = Future()
+
+        with self._lock:
+            if self._shutdown:
+                raise SchedulerShutdown(f"Scheduler '{self.name}' is shut down")
+
+            queue = self._queues[priority]
+            if len(queue) >= self.classes[priority].max_queue or (
+                priority == self.shed_class and self._interactive_backlogged()
+            ):
+                metrics.increment("scheduler_shed_total", pool=self.name, priority=priority)
+                raise SchedulerOverloaded(priority)
+
+            start = max(self._virtual_time, self._last_finish[priority])
+            finish = start + 1.0 / self.classes[priority].weight
+            self._last_finish[priority] = finish
+            queue.append(_WorkItem(future, fn, finish))
+
+            if self._interactive_backlogged():
+                self._shed_queued()
+
+            self._dispatch()
+            self._update_gauges()
+
+        return future
+
+    def _interactive_backlogged(self) -> bool:
+        """True when non-shed classes have more queued work than shed_threshold"""
+        if self.shed_threshold is None:
+            return False
+        backlog = sum(
+            len(queue) for cls, queue in self._queues.items()
+            if cls != self.shed_class
+        )
+        return backlog > self.shed_threshold
+
+    def _shed_queued(self) -> None:
+        """Reject every queued item of the shed class (lock held)"""
+        queue = self._queues.get(self.shed_class)
+        while queue:
+            item = queue.popleft()
+            if item.future.set_running_or_notify_cancel():
+                item.future.set_exception(SchedulerOverloaded(self.shed_class))
+                metrics.increment("scheduler_shed_total", pool=self.name, priority=self.shed_class)
+
+    def _dispatch(self) -> None:
+        """Start queued work while worker slots are free (lock held)"""
+        while self._total_running < self.workers:
+            best_cls = None
+            best_tag = None
+            for cls, queue in self._queues.items():
+                # Drop items cancelled while queued (deadline or disconnect)
+                while queue and queue[0].future.cancelled():
+                    queue.popleft()
+                if not queue or self._running[cls] >= self.classes[cls].max_concurrency:
+                    continue
+                if best_tag is None or queue[0].finish_tag < best_tag:
+                    best_cls, best_tag = cls, queue[0].finish_tag
+
+            if best_cls is None:
+                return
+
+            item = self._queues[best_cls].popleft()
+            if not item.future.set_running_or_notify_cancel():
+                continue
+
+            self._virtual_time = max(
+                self._virtual_time,
+                item.finish_tag - 1.0 / self.classes[best_cls].weight
+            )
+            self._running[best_cls] += 1
+            self._total_running += 1
+            metrics.observe(
+                "scheduler_wait_seconds",
+                time.monotonic() - item.enqueued_at,
+                pool=self.name,
+                priority=best_cls
+            )
+            self._executor.submit(self._run, best_cls, item)
+
+    def _run(self, priority: str, item: _WorkItem) -> None:
+        """Execute one item on a worker thread and dispatch the next"""
+        try:
+            item.future.set_result(item.fn())
+        except BaseException as e:
+            item.future.set_exception(e)
+        finally:
+            with self._lock:
+                self._running[priority] -= 1
+                self._total_running -= 1
+                if not self._shutdown:
+                    self._dispatch()
+                self._update_gauges()
+
+    def _update_gauges(self) -> None:
+        """Publish queue depth and running counts (lock held)"""
+        for cls in self.classes:
+            metrics.set_gauge("scheduler_queue_depth", len(self._queues[cls]), pool=self.name, priority=cls)
+            metrics.set_gauge("scheduler_running", self._running[cls], pool=self.name, priority=cls)
+
+    def stats(self) -> Dict[str, Dict[str, int]]:
+        """Current queue depth and running count per class"""
+        with self._lock:
+            return {
+                cls: {"queued": len(self._queues[cls]), "running": self._running[cls]}
+                for cls in self.classes
+            }
+
+    def shutdown(self) -> None:
+        """Cancel queued work and stop the worker pool"""
+        with self._lock:
+            self._shutdown = True
+            for queue in self._queues.values():
+                while queue:
+                    queue.popleft().future.cancel()
+        self._executor.shutdown(wait=False, cancel_futures=True)
+
+
+# Priority class of the request being handled
+current_priority: contextvars.ContextVar[str] = contextvars.ContextVar(
+    "current_priority",
+    default=INTERACTIVE
+)
+
+
+def priority_dependency(default: str = INTERACTIVE):
+    """
+    Build a FastAPI dependency that sets the request's priority class
+
+    The X-Priority header (interactive|bulk) overrides the route default.
+    """
+    async def attach_priority(request: Request) -> str:
+        priority = request.headers.get(PRIORITY_HEADER, default).lower()
+        if priority not in (INTERACTIVE, BULK):
+            raise HTTPException(
+                status_code=400,
+                detail=f"Invalid {PRIORITY_HEADER} header: {priority} (use {INTERACTIVE} or {BULK})"
+            )
+        current_priority.set(priority)
+        return priority
+
+    return attach_priority
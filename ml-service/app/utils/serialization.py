@@ -0,0 +1,146 @@
+"""
+Response Serialization
+Field projection (slim responses) and fast orjson/msgpack rendering for
+high-volume classification traffic
+"""
+
+from dataclasses import dataclass
+from typing import Any, Dict, List, Optional, Tuple
+
+from fastapi import HTTPException, Query, Request
+from fastapi.responses import JSONResponse, Response
+
+from app.config import settings
+from app.utils.categories import canonical_category
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+try:
+    import msgpack
+except ImportError:
+    msgpack = None
+
+MSGPACK_MEDIA_TYPES = ("application/msgpack", "application/x-msgpack")
+
+# Fields a projected response may contain
+PROJECTABLE_FIELDS = (
+    "prediction",
+    "confidence",
+    "probabilities",
+    "stage",
+    "language",
+    "backend",
+    "image_hash",
+    "image_skipped",
+)
+SLIM_FIELDS = ("prediction", "confidence")
+
+
+class ORJSONResponse(JSONResponse):
+    """JSON rendered by orjson (falls back to the stdlib encoder if not installed)"""
+
+    def render(self, content: Any) -> bytes:
+        if orjson is None:
+            return super().render(content)
+        return orjson.dumps(content, option=orjson.OPT_SERIALIZE_NUMPY)
+
+
+class MsgpackResponse(Response):
+    """MessagePack-encoded response body"""
+    media_type = MSGPACK_MEDIA_TYPES[0]
+
+    def render(self, content: Any) -> bytes:
+        return msgpack.packb(content, use_bin_type=True)
+
+
+def wants_msgpack(request: Request) -> bool:
+    """True when the client accepts MessagePack and msgpack is installed"""
+    accept = request.headers.get("accept", "")
+    return msgpack is not None and any(media in accept for media in MSGPACK_MEDIA_TYPES)
+
+
+def fast_response(content: Any, request: Request, status_code: int = 200) -> Response:
+    """Render with msgpack if the client asked for it, otherwise orjson"""
+    if wants_msgpack(request):
+        return MsgpackResponse(content, status_code=status_code)
+    return ORJSONResponse(content, status_code=status_code)
+
+
+def probabilities_array(probabilities: Optional[Dict[str, float]]) -> Optional[List[float]]:
+    """
+    Class probabilities as a list in /categories order
+
+    Model labels are canonicalized first, so "pothole" from the text
+    head lands at the index of "potholes".
+    """
+    if not probabilities:
+        return None
+    values = [0.0] * len(settings.CATEGORIES)
+    for label, probability in probabilities.items():
+        category = canonical_category(str(label))
+        if category in settings.CATEGORIES:
+            values[settings.CATEGORIES.index(category)] = float(probability)
+    return values
+
+
+@dataclass
+class ResponseProjection:
+    """Fields to keep in each classification result (None keeps everything)"""
+    fields: Optional[Tuple[str, ...]] = None
+
+    @property
+    def is_full(self) -> bool:
+        return self.fields is None
+
+    def apply(self, result: Dict[str, Any]) -> Dict[str, Any]:
+        """
+        Reduce one result to the selected fields
+
+        Failed results keep only their error. The label is canonicalized
+        and probabilities become a fixed-order array (see /categories).
+        """
+        if self.is_full:
+            return result
+        if not result.get("success", True):
+            return {"error": result.get("error")}
+
+        projected = {}
+        for field in self.fields:
+            value = result.get(field)
+            if field == "prediction" and value is not None:
+                value = canonical_category(str(value))
+            elif field == "probabilities":
+                value = probabilities_array(value)
+            projected[field] = value
+        return projected
+
+
+def projection_dependency(
+    fields: Optional[str] = Query(
+        None,
+        description=f"Comma-separated fields to return: {', '.join(PROJECTABLE_FIELDS)}"
+    ),
+    profile: str = Query(
+        "full",
+        description="full (default) or slim (prediction and confidence only)"
+    )
+) -> ResponseProjection:
+    """Parse ?fields= / ?profile= into a ResponseProjection"""
+    if fields:
+        selected = tuple(field.strip() for field in fields.split(",") if field.strip())
+        unknown = [field for field in selected if field not in PROJECTABLE_FIELDS]
+        if unknown:
+            raise HTTPException(
+                status_code=400,
+                detail=f"Unknown fields: {', '.join(unknown)} (allowed: {', '.join(PROJECTABLE_FIELDS)})"
+            )
+        return ResponseProjection(selected)
+
+    if profile == "slim":
+        return ResponseProjection(SLIM_FIELDS)
+    if profile != "full":
+        raise HTTPException(status_code=400, detail=f"Unknown profile '{profile}' (use full or slim)")
+    return ResponseProjection()
@@ -0,0 +1,152 @@
+"""
+Per-Request Stage Timings
+Monotonic-clock stage durations collected by the services and reported in
+a Server-Timing response header (and an optional `timings` response field)
+"""
+
+import contextvars
+import threading
+import time
+from contextlib import contextmanager
+from typing import Any, Dict, Iterator, Optional
+
+from fastapi import Query
+
+SERVER_TIMING_HEADER = b"server-timing"
+
+
+class RequestTimings:
+    """
+    Stage durations and notes for one request
+
+    Durations of a stage that runs more than once (e.g. one embedding pass
+    per length bucket) are summed. Thread-safe, since text and image
+    pipelines of a multimodal request record from different executor threads.
+    """
+
+    def __init__(self):
+        self.started = time.perf_counter()
+        self.stages: Dict[str, float] = {}  # stage -> milliseconds
+        self.notes: Dict[str, Any] = {}
+        self._lock = threading.Lock()
+
+    def add(self, stage: str, seconds: float) -> None:
+        self.merge({stage: seconds * 1000})
+
+    def merge(self, stages: Dict[str, float]) -> None:
+        """Add stage durations in milliseconds (e.g. reported by a worker process)"""
+        with self._lock:
+            for stage, ms in stages.items():
+                self.stages[stage] = self.stages.get(stage, 0.0) + ms
+
+    def note(self, key: str, value: Any) -> None:
+        """Record a non-duration fact, e.g. cache="hit" or batch=8"""
+        with self._lock:
+            self.notes[key] = value
+
+    def total_ms(self) -> float:
+        return (time.perf_counter() - self.started) * 1000
+
+    def as_dict(self) -> Dict[str, Any]:
+        """JSON form for the `timings` response field"""
+        with self._lock:
+            return {
+                "total_ms": round(self.total_ms(), 3),
+                "stages_ms": {stage: round(ms, 3) for stage, ms in self.stages.items()},
+                **self.notes,
+            }
+
+    def header(self) -> str:
+        """
+        Server-Timing header value, e.g.
+        queue;dur=0.4, embed;dur=12.1, cache;desc="miss", total;dur=14.0
+        """
+        with self._lock:
+            entries = [f"{stage};dur={ms:.3f}" for stage, ms in self.stages.items()]
+            entries.extend(f'{key};desc="{value}"' for key, value in self.notes.items())
+        entries.append(f"total;dur={self.total_ms():.3f}")
+        return ", ".join(entries)
+
+
+# Timings of the request being handled (copied into executor threads)
+current_timings: contextvars.ContextVar[Optional[RequestTimings]] = contextvars.ContextVar(
+    "current_timings",
+    default=None
+)
+
+
+@contextmanager
+def timed(stage: str) -> Iterator[None]:
+    """Time a block as `stage` of the current request (no-op outside requests)"""
+    timings = current_timings.get()
+    if timings is None:
+        yield
+        return
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        timings.add(stage, time.perf_counter() - start)
+
+
+def record_stage(stage: str, seconds: float) -> None:
+    """Add a duration measured elsewhere (e.g. executor queue wait)"""
+    timings = current_timings.get()
+    if timings is not None:
+        timings.add(stage, seconds)
+
+
+def note_timing(key: str, value: Any) -> None:
+    """Attach a note (cache hit/miss, batch size) to the current request"""
+    timings = current_timings.get()
+    if timings is not None:
+        timings.note(key, value)
+
+
+class ServerTimingMiddleware:
+    """
+    ASGI middleware that collects stage timings for requests under `prefix`
+    and sends them in a Server-Timing header
+
+    The timings object is created before the route runs, so the deadline
+    and executor helpers copy it into worker threads like the deadline.
+    """
+
+    def __init__(self, app, prefix: str = "/ml/"):
+        self.app = app
+        self.prefix = prefix
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http" or not scope["path"].startswith(self.prefix):
+            await self.app(scope, receive, send)
+            return
+
+        timings = RequestTimings()
+        token = current_timings.set(timings)
+
+        async def timing_send(message):
+            if message["type"] == "http.response.start":
+                headers = list(message.get("headers", []))
+                headers.append((SERVER_TIMING_HEADER, timings.header().encode("latin-1")))
+                message = {**message, "headers": headers}
+            await send(message)
+
+        try:
+            await self.app(scope, receive, timing_send)
+        finally:
+            current_timings.reset(token)
+
+
+def timings_dependency(
+    timings: bool = Query(False, description="Include per-stage timings in the response body")
+) -> bool:
+    """Parse ?timings=true (the Server-Timing header is always sent)"""
+    return timings
+
+
+def attach_timings(content: Dict[str, Any], include: bool) -> Dict[str, Any]:
+    """Add the current request's timings to a response body when asked for"""
+    timings = current_timings.get()
+    if include and timings is not None:
+        content = {**content, "timings": timings.as_dict()}
+    return content
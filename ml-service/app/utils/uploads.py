@@ -0,0 +1,172 @@
+"""
+Image Upload Handling
+Rejects oversized, mislabeled or decompression-bomb uploads from the request
+stream and image header, before any pixel data is decoded
+"""
+
+from typing import BinaryIO, Optional
+
+from fastapi import HTTPException, UploadFile
+from fastapi.responses import JSONResponse
+from PIL import Image
+
+from app.config import settings
+
+# Leading bytes of each accepted format (the client content_type is not trusted)
+IMAGE_SIGNATURES = {
+    b"\xff\xd8\xff": "JPEG",
+    b"\x89PNG\r\n\x1a\n": "PNG",
+}
+SNIFF_BYTES = max(len(signature) for signature in IMAGE_SIGNATURES)
+
+# PIL's own bomb check raises at 2x this limit and warns above it
+Image.MAX_IMAGE_PIXELS = settings.IMAGE_MAX_PIXELS
+
+
+class UploadTooLarge(HTTPException):
+    """The request body is over the size limit"""
+
+    def __init__(self, limit: int):
+        super().__init__(
+            status_code=413,
+            detail=f"Upload too large. Maximum size: {limit // (1024 * 1024)}MB"
+        )
+
+
+class UnsupportedImage(HTTPException):
+    """The upload is not a JPEG or PNG image"""
+
+    def __init__(self):
+        super().__init__(
+            status_code=415,
+            detail="Invalid file type. Allowed: JPEG, PNG"
+        )
+
+
+def sniff_image_format(header: bytes) -> Optional[str]:
+    """Image format from the file's magic bytes, or None if unsupported"""
+    for signature, image_format in IMAGE_SIGNATURES.items():
+        if header.startswith(signature):
+            return image_format
+    return None
+
+
+def open_image_upload(file: UploadFile) -> Image.Image:
+    """
+    Validate an uploaded image and open it lazily from the spooled file
+
+    PIL only parses the header here; pixels are decoded later (on the
+    image executor) straight from the upload's spooled temp file,
+    without copying it into memory first.
+    """
+    return open_image_stream(file.file, file.size)
+
+
+def open_image_stream(stream: BinaryIO, size: Optional[int] = None) -> Image.Image:
+    """
+    Validate an image file object and open it lazily
+
+    Checks run in order of cost: byte size, magic bytes, then the
+    dimensions from the image header.
+
+    Args:
+        stream: Seekable binary file object (spooled upload, BytesIO, ...)
+        size: Size in bytes if known
+
+    Raises:
+        UploadTooLarge: File is larger than MAX_UPLOAD_BYTES
+        UnsupportedImage: Not a JPEG/PNG, whatever content_type claims
+        HTTPException: 400 if the header is unreadable or dimensions are out of range
+    """
+    if size is not None and size > settings.MAX_UPLOAD_BYTES:
+        raise UploadTooLarge(settings.MAX_UPLOAD_BYTES)
+
+    stream.seek(0)
+    image_format = sniff_image_format(stream.read(SNIFF_BYTES))
+    stream.seek(0)
+    if image_format is None:
+        raise UnsupportedImage()
+
+    try:
+        image = Image.open(stream, formats=[image_format])
+    except Image.DecompressionBombError:
+        raise HTTPException(status_code=400, detail="Image dimensions too large")
+    except Exception:
+        raise HTTPException(status_code=400, detail="Corrupt or unreadable image")
+
+    width, height = image.size
+    if (
+        width > settings.IMAGE_MAX_DIMENSION
+        or height > settings.IMAGE_MAX_DIMENSION
+        or width * height > settings.IMAGE_MAX_PIXELS
+    ):
+        raise HTTPException(
+            status_code=400,
+            detail=(
+                f"Image dimensions too large: {width}x{height} "
+                f"(max {settings.IMAGE_MAX_DIMENSION}px per side, "
+                f"{settings.IMAGE_MAX_PIXELS} pixels)"
+            )
+        )
+
+    return image
+
+
+class RequestSizeLimitMiddleware:
+    """
+    ASGI middleware that caps request bodies while they stream in
+
+    Requests declaring a Content-Length over the limit are answered with
+    413 before the body is read. Chunked bodies are counted as they
+    arrive and aborted as soon as they cross the limit, so an oversized
+    upload never gets fully buffered or spooled to disk.
+    """
+
+    def __init__(self, app, max_body_bytes: int):
+        self.app = app
+        self.max_body_bytes = max_body_bytes
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        for name, value in scope["headers"]:
+            if name == b"content-length":
+                if value.isdigit() and int(value) > self.max_body_bytes:
+                    await self._reject(scope, receive, send)
+                    return
+                break
+
+        received = 0
+        response_started = False
+
+        async def limited_receive():
+            nonlocal received
+            message = await receive()
+            if message["type"] == "http.request":
+                received += len(message.get("body", b""))
+                if received > self.max_body_bytes:
+                    raise UploadTooLarge(self.max_body_bytes)
+            return message
+
+        async def tracking_send(message):
+            nonlocal response_started
+            if message["type"] == "http.response.start":
+                response_started = True
+            await send(message)
+
+        try:
+            await self.app(scope, limited_receive, tracking_send)
+        except UploadTooLarge:
+            if response_started:
+                raise
+            await self._reject(scope, receive, send)
+
+    async def _reject(self, scope, receive, send):
+        response = JSONResponse(
+            status_code=413,
+            content={"detail": UploadTooLarge(self.max_body_bytes).detail},
+            headers={"Connection": "close"}
+        )
+        await response(scope, receive, send)
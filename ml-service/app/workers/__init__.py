@@ -0,0 +1,7 @@
+"""
+Inference Worker Processes
+"""
+from .pool import WorkerUnavailable
+from .remote import inference_workers
+
+__all__ = ["WorkerUnavailable", "inference_workers"]
@@ -0,0 +1,167 @@
+"""
+Worker Process Entry Point
+Loads the models for one role, then serves calls from the API process:
+    text   mBERT / per-language encoders: cleaned texts -> embeddings
+    image  decode, validate, resize, hash, enhance: image bytes -> tensor
+    cnn    compiled CNN: tensor -> class probabilities
+"""
+
+from io import BytesIO
+from typing import Any, Callable, Dict, Tuple
+
+import numpy as np
+from fastapi import HTTPException
+from loguru import logger
+
+from app.config import configure_runtime, parse_cpu_list, pin_current_thread, settings
+from app.utils.logs import configure_logging
+from app.utils.timing import RequestTimings, current_timings
+from app.workers.shm_ring import SlotRing
+
+Handler = Callable[[str, SlotRing, int, Dict[str, Any]], Dict[str, Any]]
+
+
+def _text_worker() -> Tuple[Handler, Dict[str, Any]]:
+    pin_current_thread(parse_cpu_list(settings.TEXT_CPU_AFFINITY))
+    configure_runtime()
+
+    from app.models.model_loader import model_loader
+    from app.services.text_service import TextClassificationService
+
+    service = TextClassificationService()
+
+    def embedder_for(backend_name):
+        if not backend_name:
+            return service.embedder
+        backend = model_loader.load_text_backend(backend_name)
+        if backend is None:
+            raise RuntimeError(f"Text backend '{backend_name}' is unavailable")
+        return backend.embedder
+
+    def handle(op, ring, slot, payload):
+        embedder = embedder_for(payload.get("backend"))
+        if op == "info":
+            return {"dim": embedder.get_sentence_embedding_dimension()}
+        if op != "encode":
+            raise ValueError(f"Unknown text op '{op}'")
+
+        embeddings = service.encode_texts(
+            payload["texts"],
+            normalize=payload.get("normalize", False),
+            embedder=embedder
+        )
+        return {"output": ring.write(slot, embeddings)}
+
+    return handle, {"dim": service.embedder.get_sentence_embedding_dimension()}
+
+
+def _image_worker() -> Tuple[Handler, Dict[str, Any]]:
+    pin_current_thread(parse_cpu_list(settings.IMAGE_CPU_AFFINITY))
+
+    import cv2
+    from app.services.image_service import ImageClassificationService
+    from app.utils.uploads import open_image_stream
+
+    # Scale with processes, not OpenCV threads
+    cv2.setNumThreads(1)
+    service = ImageClassificationService()
+
+    def handle(op, ring, slot, payload):
+        if op != "prepare":
+            raise ValueError(f"Unknown image op '{op}'")
+
+        # Inputs larger than a slot arrive through the pipe
+        data = payload["data"] if "data" in payload else ring.read_bytes(slot, payload["length"])
+        try:
+            image = open_image_stream(BytesIO(data), len(data))
+        except HTTPException as e:
+            return {"success": False, "error": e.detail}
+
+        prepared = service.prepare(image, enhance=payload.get("enhance", False))
+        if not prepared["success"]:
+            return prepared
+        return {
+            "success": True,
+            "output": ring.write(slot, prepared["image"]),
+            "image_size": prepared["image_size"],
+            "image_hash": prepared["image_hash"],
+            "enhanced": prepared["enhanced"],
+        }
+
+    return handle, {}
+
+
+def _cnn_worker() -> Tuple[Handler, Dict[str, Any]]:
+    pin_current_thread(parse_cpu_list(settings.IMAGE_CPU_AFFINITY))
+    configure_runtime()
+
+    from app.models.model_loader import model_loader
+
+    model = model_loader.load_image_classifier()
+    if model is None:
+        raise RuntimeError("Image classifier could not be loaded")
+
+    def handle(op, ring, slot, payload):
+        if op != "predict":
+            raise ValueError(f"Unknown cnn op '{op}'")
+        # Through the loader, which reloads the model if it was evicted
+        model = model_loader.load_image_classifier()
+        if model is None:
+            raise RuntimeError("Image classifier could not be reloaded")
+        probabilities = np.asarray(model(ring.view(slot, payload["input"])))
+        return {"output": ring.write(slot, probabilities)}
+
+    return handle, {"batch_sizes": list(model.batch_sizes), "input_shape": list(model.input_shape)}
+
+
+ROLES = {
+    "text": _text_worker,
+    "image": _image_worker,
+    "cnn": _cnn_worker,
+}
+
+
+def worker_main(role: str, conn, shm_name: str, slots: int, slot_bytes: int) -> None:
+    """
+    Process target: load models, report ready, then serve calls until the
+    API process sends None or goes away
+
+    Messages are (request_id, op, slot, payload); replies are
+    (request_id, ok, metadata or error string). Metadata carries the
+    stage timings recorded while handling the call under "timings".
+    """
+    configure_logging()
+    ring = SlotRing(slots, slot_bytes, name=shm_name)
+    try:
+        handle, info = ROLES[role]()
+    except Exception as e:
+        conn.send(("error", f"{type(e).__name__}: {e}"))
+        conn.close()
+        ring.close()
+        logger.remove()
+        return
+
+    conn.send(("ready", info))
+    while True:
+        try:
+            message = conn.recv()
+        except (EOFError, OSError):
+            break
+        if message is None:
+            break
+
+        request_id, op, slot, payload = message
+        timings = RequestTimings()
+        current_timings.set(timings)
+        try:
+            result = handle(op, ring, slot, payload)
+            result["timings"] = timings.stages
+            reply = (request_id, True, result)
+        except Exception as e:
+            reply = (request_id, False, f"{type(e).__name__}: {e}")
+        conn.send(reply)
+
+    conn.close()
+    ring.close()
+    # multiprocessing skips atexit, so flush the background sink here
+    logger.remove()
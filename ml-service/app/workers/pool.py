@@ -0,0 +1,374 @@
+"""
+Supervised Worker Processes
+Each worker is a spawned process with its own shared-memory slot ring and
+a pipe for small control messages. A reader thread resolves call futures;
+crashed or hung workers are restarted with backoff.
+"""
+
+import itertools
+import multiprocessing
+import threading
+import time
+from concurrent.futures import Future, TimeoutError as FutureTimeout
+from typing import Any, BinaryIO, Dict, List, Optional, Tuple, Union
+
+import numpy as np
+from loguru import logger
+
+from app.config import settings
+from app.models.memory import MB, process_rss_bytes
+from app.utils.deadline import DeadlineExceeded, RequestCancelled, current_deadline
+from app.utils.metrics import metrics
+from app.utils.timing import current_timings
+from app.workers.shm_ring import SlotFull, SlotRing
+
+# Worker states reported in /health
+STARTING = "starting"
+RUNNING = "running"
+RESTARTING = "restarting"
+FAILED = "failed"  # Did not start (e.g. model file missing); not retried
+STOPPED = "stopped"
+
+
+class WorkerUnavailable(Exception):
+    """No worker process can take the call (failed, restarting or crashed mid-call)"""
+
+
+class WorkerProcess:
+    """One supervised worker process and its slot ring"""
+
+    def __init__(self, role: str, index: int, slots: int, slot_bytes: int):
+        self.role = role
+        self.index = index
+        self.ring = SlotRing(slots, slot_bytes)
+        self.state = STOPPED
+        self.info: Dict[str, Any] = {}
+        self.restarts = 0
+        self.process = None
+        self._conn = None
+        self._send_lock = threading.Lock()
+        self._pending: Dict[int, Tuple[Future, float]] = {}
+        self._pending_lock = threading.Lock()
+        self._ids = itertools.count()
+        self._stopping = False
+
+    @property
+    def name(self) -> str:
+        return f"{self.role}-{self.index}"
+
+    def start(self) -> None:
+        """
+        Spawn the process and wait for its ready message
+
+        Raises:
+            WorkerUnavailable: If it fails to load its models or start in time
+        """
+        from app.workers.child import worker_main
+
+        self.state = STARTING
+        context = multiprocessing.get_context("spawn")
+        parent_conn, child_conn = context.Pipe()
+        self.process = context.Process(
+            target=worker_main,
+            args=(self.role, child_conn, self.ring.name, self.ring.slots, self.ring.slot_bytes),
+            name=f"ml-worker-{self.name}",
+            daemon=True
+        )
+        self.process.start()
+        child_conn.close()
+
+        try:
+            if not parent_conn.poll(settings.WORKER_START_TIMEOUT_S):
+                raise WorkerUnavailable(f"{self.name} did not start within {settings.WORKER_START_TIMEOUT_S}s")
+            status, info = parent_conn.recv()
+            if status != "ready":
+                raise WorkerUnavailable(f"{self.name} failed to start: {info}")
+        except (EOFError, OSError, WorkerUnavailable) as e:
+            self.process.kill()
+            self.process.join()
+            parent_conn.close()
+            self.state = FAILED
+            if isinstance(e, WorkerUnavailable):
+                raise
+            raise WorkerUnavailable(f"{self.name} exited during startup (code {self.process.exitcode})")
+
+        self._conn = parent_conn
+        self.info = info
+        self.state = RUNNING
+        threading.Thread(target=self._read_replies, name=f"ml-worker-{self.name}-reader", daemon=True).start()
+        logger.success(f"✓ Worker {self.name} ready (pid {self.process.pid})")
+
+    def submit(self, op: str, slot: int, payload: Dict[str, Any]) -> Future:
+        """Send one call; the future resolves to the worker's reply metadata"""
+        if self.state != RUNNING:
+            raise WorkerUnavailable(f"Worker {self.name} is {self.state}")
+
+        future: Future = Future()
+        request_id = next(self._ids)
+        with self._pending_lock:
+            self._pending[request_id] = (future, time.monotonic())
+        try:
+            with self._send_lock:
+                self._conn.send((request_id, op, slot, payload))
+        except (OSError, ValueError) as e:
+            with self._pending_lock:
+                self._pending.pop(request_id, None)
+            raise WorkerUnavailable(f"Worker {self.name} is unreachable: {e}")
+        return future
+
+    def pending(self) -> int:
+        with self._pending_lock:
+            return len(self._pending)
+
+    def oldest_call_age(self) -> float:
+        """Seconds the oldest unanswered call has been waiting (0 if idle)"""
+        with self._pending_lock:
+            if not self._pending:
+                return 0.0
+            return time.monotonic() - min(started for _, started in self._pending.values())
+
+    def kill(self) -> None:
+        """Terminate the process; the reader thread notices and restarts it"""
+        if self.process is not None and self.process.is_alive():
+            self.process.kill()
+
+    def stop(self) -> None:
+        self._stopping = True
+        if self._conn is not None:
+            try:
+                with self._send_lock:
+                    self._conn.send(None)
+            except (OSError, ValueError):
+                pass
+        if self.process is not None:
+            self.process.join(timeout=5)
+            self.kill()
+        self.state = STOPPED
+        self.ring.close()
+
+    def _read_replies(self) -> None:
+        conn = self._conn
+        while True:
+            try:
+                request_id, ok, result = conn.recv()
+            except (EOFError, OSError):
+                break
+            with self._pending_lock:
+                future, _ = self._pending.pop(request_id, (None, None))
+            if future is None:
+                continue
+            if ok:
+                future.set_result(result)
+            else:
+                future.set_exception(RuntimeError(result))
+
+        conn.close()
+        self._on_exit()
+
+    def _on_exit(self) -> None:
+        """Fail in-flight calls, then restart unless shutting down"""
+        if not self._stopping:
+            self.state = RESTARTING
+        with self._pending_lock:
+            pending = list(self._pending.values())
+            self._pending.clear()
+        for future, _ in pending:
+            future.set_exception(WorkerUnavailable(f"Worker {self.name} exited during the call"))
+
+        if self._stopping:
+            return
+
+        self.process.join(timeout=1.0)
+        exit_code = self.process.exitcode
+        logger.error(f"Worker {self.name} exited (code {exit_code}), {len(pending)} call(s) failed")
+        metrics.increment("worker_restarts_total", role=self.role)
+
+        delay = 1.0
+        while not self._stopping:
+            time.sleep(delay)
+            self.restarts += 1
+            try:
+                self.start()
+                return
+            except WorkerUnavailable as e:
+                if self._stopping:
+                    return
+                logger.error(f"Restart of worker {self.name} failed: {str(e)}")
+                self.state = RESTARTING
+                delay = min(delay * 2, 30.0)
+
+
+def _byte_length(data: Union[bytes, BinaryIO]) -> int:
+    """Length of bytes, or of a seekable stream from its current position"""
+    if isinstance(data, bytes):
+        return len(data)
+    position = data.tell()
+    end = data.seek(0, 2)
+    data.seek(position)
+    return end - position
+
+
+class WorkerPool:
+    """
+    Worker processes sharing one role (text, image or cnn)
+
+    call() is blocking and meant for the executor threads: it writes the
+    input into a free slot of the least busy worker, waits for the reply
+    within the request deadline and copies the output back out.
+    """
+
+    def __init__(self, role: str, processes: int, slots: int, slot_bytes: int):
+        self.role = role
+        self.workers: List[WorkerProcess] = [
+            WorkerProcess(role, index, slots, slot_bytes) for index in range(processes)
+        ]
+
+    @property
+    def info(self) -> Dict[str, Any]:
+        """Ready-message info of the first running worker (model dimensions etc.)"""
+        for worker in self.workers:
+            if worker.info:
+                return worker.info
+        return {}
+
+    @property
+    def slot_bytes(self) -> int:
+        return self.workers[0].ring.slot_bytes
+
+    def available(self) -> bool:
+        return any(worker.state in (RUNNING, RESTARTING) for worker in self.workers)
+
+    def start(self) -> None:
+        """Start every worker; a pool where none start is left FAILED"""
+        for worker in self.workers:
+            try:
+                worker.start()
+            except WorkerUnavailable as e:
+                logger.error(str(e))
+
+    def stop(self) -> None:
+        for worker in self.workers:
+            worker.stop()
+
+    def supervise(self) -> None:
+        """Kill workers whose oldest call exceeds WORKER_HANG_TIMEOUT_S (called periodically)"""
+        for worker in self.workers:
+            if worker.state == RUNNING and worker.oldest_call_age() > settings.WORKER_HANG_TIMEOUT_S:
+                logger.error(f"Worker {worker.name} hung for {worker.oldest_call_age():.0f}s, restarting")
+                worker.kill()
+
+    def call(
+        self,
+        op: str,
+        payload: Optional[Dict[str, Any]] = None,
+        array: Optional[np.ndarray] = None,
+        data: Optional[Union[bytes, BinaryIO]] = None
+    ) -> Tuple[Dict[str, Any], Optional[np.ndarray]]:
+        """
+        Run one operation on a worker
+
+        Args:
+            op: Operation name understood by the worker role
+            payload: Small picklable arguments
+            array: Input tensor, passed through shared memory
+            data: Input bytes (e.g. an encoded image) or a seekable binary
+                file holding them, passed through shared memory; inputs
+                larger than a slot go through the pipe instead
+
+        Returns:
+            (reply metadata, output tensor or None)
+
+        Raises:
+            WorkerUnavailable: No running worker, or it crashed mid-call
+            DeadlineExceeded / RequestCancelled: The request gave up waiting
+        """
+        running = [worker for worker in self.workers if worker.state == RUNNING]
+        if not running:
+            raise WorkerUnavailable(f"No {self.role} worker is running")
+        worker = min(running, key=lambda candidate: candidate.pending())
+
+        deadline = current_deadline.get()
+        timeout = deadline.remaining() if deadline is not None else settings.WORKER_HANG_TIMEOUT_S
+
+        try:
+            slot = worker.ring.acquire(timeout=max(timeout, 0.0))
+        except SlotFull:
+            raise WorkerUnavailable(f"Worker {worker.name} has no free shared-memory slot")
+
+        future = None
+        started = time.perf_counter()
+        try:
+            payload = dict(payload or {})
+            if array is not None:
+                payload["input"] = worker.ring.write(slot, array)
+            elif data is not None:
+                if _byte_length(data) <= worker.ring.slot_bytes:
+                    payload["length"] = worker.ring.write_bytes(slot, data)
+                else:
+                    # Rare oversized input: pickled through the pipe instead
+                    payload["data"] = data if isinstance(data, bytes) else data.read()
+                    metrics.increment("worker_pipe_transfers_total", role=self.role, op=op)
+
+            future = worker.submit(op, slot, payload)
+            reply = self._wait(future, deadline)
+
+            output = None
+            if reply.get("output") is not None:
+                output = worker.ring.read(slot, reply["output"])
+
+            # Stages the worker ran (decode, resize, tokenize, embed...)
+            timings = current_timings.get()
+            if timings is not None and reply.get("timings"):
+                timings.merge(reply["timings"])
+            metrics.observe("worker_call_seconds", time.perf_counter() - started, role=self.role, op=op)
+            return reply, output
+
+        finally:
+            if future is None:
+                worker.ring.release(slot)
+            else:
+                # The worker may still be writing into the slot after a
+                # timeout; only reuse it once its reply has arrived
+                future.add_done_callback(lambda _: worker.ring.release(slot))
+
+    @staticmethod
+    def _wait(future: Future, deadline) -> Dict[str, Any]:
+        """Wait for a reply, giving up when the request expires or disconnects"""
+        if deadline is None:
+            try:
+                return future.result(timeout=settings.WORKER_HANG_TIMEOUT_S)
+            except FutureTimeout:
+                raise WorkerUnavailable(f"No reply within {settings.WORKER_HANG_TIMEOUT_S}s")
+
+        while True:
+            if deadline.cancelled:
+                raise RequestCancelled()
+            remaining = deadline.remaining()
+            if remaining <= 0:
+                deadline.cancel()
+                raise DeadlineExceeded()
+            try:
+                return future.result(timeout=min(remaining, settings.DISCONNECT_POLL_INTERVAL_S))
+            except FutureTimeout:
+                continue
+
+    @staticmethod
+    def _rss_mb(worker: WorkerProcess) -> Optional[float]:
+        if worker.state != RUNNING:
+            return None
+        rss = process_rss_bytes(worker.process.pid)
+        return round(rss / MB, 1) if rss is not None else None
+
+    def status(self) -> List[Dict[str, Any]]:
+        return [
+            {
+                "worker": worker.name,
+                "state": worker.state,
+                "pid": worker.process.pid if worker.process is not None else None,
+                "restarts": worker.restarts,
+                "pending": worker.pending(),
+                "slots_in_use": worker.ring.in_use(),
+                "rss_mb": self._rss_mb(worker),
+            }
+            for worker in self.workers
+        ]
@@ -0,0 +1,194 @@
+"""
+Process-Mode Model Proxies
+Stand-ins for the embedder and CNN that forward to worker processes, so the
+services keep their in-process code paths when INFERENCE_PROCESSES is on
+"""
+
+import os
+import threading
+from typing import Any, BinaryIO, Dict, List, Optional, Union
+
+import numpy as np
+from loguru import logger
+from PIL import Image
+
+from app.config import settings
+from app.workers.pool import WorkerPool, WorkerUnavailable
+
+
+class RemoteEmbedder:
+    """
+    SentenceTransformer-like encoder running in the text worker processes
+
+    Has no `tokenizer`, so TextClassificationService.encode_texts hands it
+    whole batches; the worker does the length bucketing.
+    """
+
+    def __init__(self, pool: WorkerPool, backend: Optional[str] = None):
+        self.pool = pool
+        self.backend = backend
+        self._dim: Optional[int] = None
+
+    def get_sentence_embedding_dimension(self) -> int:
+        if self._dim is None:
+            if self.backend is None:
+                self._dim = int(self.pool.info["dim"])
+            else:
+                reply, _ = self.pool.call("info", {"backend": self.backend})
+                self._dim = int(reply["dim"])
+        return self._dim
+
+    def encode(
+        self,
+        sentences: Union[str, List[str]],
+        normalize_embeddings: bool = False,
+        **kwargs
+    ) -> np.ndarray:
+        single = isinstance(sentences, str)
+        texts = [sentences] if single else list(sentences)
+
+        # Keep each reply within one shared-memory slot
+        rows = max(1, self.pool.slot_bytes // (self.get_sentence_embedding_dimension() * 4))
+        chunks = []
+        for start in range(0, len(texts), rows):
+            _, embeddings = self.pool.call("encode", {
+                "texts": texts[start:start + rows],
+                "backend": self.backend,
+                "normalize": normalize_embeddings,
+            })
+            chunks.append(embeddings)
+
+        if not chunks:
+            return np.empty((0, self.get_sentence_embedding_dimension()), dtype=np.float32)
+        embeddings = np.concatenate(chunks)
+        return embeddings[0] if single else embeddings
+
+
+class RemoteImageModel:
+    """CompiledImageModel-like callable running in the cnn worker process"""
+
+    def __init__(self, pool: WorkerPool):
+        self.pool = pool
+        self.batch_sizes = pool.info.get("batch_sizes", [1])
+        self.input_shape = tuple(pool.info.get("input_shape", ()))
+
+    def __call__(self, images: np.ndarray) -> np.ndarray:
+        _, probabilities = self.pool.call("predict", array=np.ascontiguousarray(images, dtype=np.float32))
+        return probabilities
+
+
+def encoded_image_source(image: Union[bytes, Image.Image]) -> Optional[Union[bytes, BinaryIO]]:
+    """
+    Original file of an upload: bytes, or the rewound stream a lazily
+    opened PIL image reads from (e.g. the spooled upload file), which the
+    worker pool copies straight into shared memory
+
+    Returns None for images that only exist decoded in memory.
+    """
+    if isinstance(image, bytes):
+        return image
+    stream = getattr(image, "fp", None)
+    if stream is None:
+        return None
+    stream.seek(0)
+    return stream
+
+
+class InferenceWorkers:
+    """
+    The text, image-preprocessing and CNN worker pools
+
+    Disabled (and never started) unless INFERENCE_PROCESSES is set.
+    """
+
+    def __init__(self):
+        self.text: Optional[WorkerPool] = None
+        self.image: Optional[WorkerPool] = None
+        self.cnn: Optional[WorkerPool] = None
+        self._supervisor: Optional[threading.Thread] = None
+        self._stopping = threading.Event()
+
+    @property
+    def enabled(self) -> bool:
+        return self.text is not None
+
+    def start(self) -> None:
+        """Spawn every pool and wait until their models are loaded (blocking)"""
+        image_bytes = int(np.prod(settings.IMAGE_SIZE)) * 3 * 4
+        preprocess_processes = settings.IMAGE_PREPROCESS_PROCESSES or max(1, (os.cpu_count() or 2) // 2)
+
+        self.text = WorkerPool(
+            "text", settings.TEXT_PROCESSES, settings.WORKER_QUEUE_DEPTH, settings.WORKER_TEXT_SLOT_BYTES
+        )
+        # Slots fit a typical upload and the resized tensor; larger uploads use the pipe
+        self.image = WorkerPool(
+            "image", preprocess_processes, settings.WORKER_QUEUE_DEPTH,
+            max(settings.WORKER_IMAGE_SLOT_BYTES, image_bytes)
+        )
+        self.cnn = WorkerPool(
+            "cnn", settings.CNN_PROCESSES, settings.WORKER_QUEUE_DEPTH,
+            image_bytes * max(settings.IMAGE_BATCH_SIZES)
+        )
+
+        logger.info(
+            f"Starting inference workers: {settings.TEXT_PROCESSES} text, "
+            f"{preprocess_processes} image preprocessing, {settings.CNN_PROCESSES} cnn"
+        )
+        for pool in (self.text, self.image, self.cnn):
+            pool.start()
+
+        self._supervisor = threading.Thread(target=self._supervise, name="ml-worker-supervisor", daemon=True)
+        self._supervisor.start()
+
+    def stop(self) -> None:
+        self._stopping.set()
+        for pool in (self.text, self.image, self.cnn):
+            if pool is not None:
+                pool.stop()
+
+    def _supervise(self) -> None:
+        while not self._stopping.wait(settings.WORKER_HEALTH_INTERVAL_S):
+            for pool in (self.text, self.image, self.cnn):
+                pool.supervise()
+
+    def embedder(self, backend: Optional[str] = None) -> Optional[RemoteEmbedder]:
+        """Proxy for the multilingual embedder (or a per-language backend's encoder)"""
+        if not self.text.available():
+            return None
+        return RemoteEmbedder(self.text, backend)
+
+    def image_model(self) -> Optional[RemoteImageModel]:
+        """Proxy for the CNN, or None if its worker could not load it"""
+        if not self.cnn.available():
+            return None
+        return RemoteImageModel(self.cnn)
+
+    def prepare_image(self, data: Union[bytes, BinaryIO], enhance: bool = False) -> Dict[str, Any]:
+        """ImageClassificationService.prepare() on an image worker (file bytes or stream)"""
+        try:
+            reply, tensor = self.image.call("prepare", {"enhance": enhance}, data=data)
+        except WorkerUnavailable as e:
+            return {"success": False, "error": f"Preprocessing error: {str(e)}"}
+        if not reply["success"]:
+            return reply
+        return {
+            "success": True,
+            "image": tensor,
+            "image_size": tuple(reply["image_size"]),
+            "image_hash": reply["image_hash"],
+            "enhanced": reply["enhanced"],
+        }
+
+    def status(self) -> Dict[str, Any]:
+        if not self.enabled:
+            return {"enabled": False}
+        return {
+            "enabled": True,
+            "text": self.text.status(),
+            "image": self.image.status(),
+            "cnn": self.cnn.status(),
+        }
+
+
+# Global worker pools (started from app startup when INFERENCE_PROCESSES)
+inference_workers = InferenceWorkers()
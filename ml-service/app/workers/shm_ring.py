@@ -0,0 +1,128 @@
+"""
+Shared-Memory Slot Ring
+Fixed-size slots in one shared memory block. The API process writes an
+input tensor (or encoded image) into a slot, the worker process reads it
+in place and writes its output tensor back into the same slot, so arrays
+cross the process boundary without pickling.
+"""
+
+import threading
+from multiprocessing import shared_memory
+from typing import BinaryIO, List, Optional, Tuple, Union
+
+import numpy as np
+
+# (shape, dtype) of an array stored in a slot
+ArraySpec = Tuple[Tuple[int, ...], str]
+
+
+class SlotFull(Exception):
+    """No free slot became available in time"""
+
+
+class SlotRing:
+    """
+    A ring of equally sized slots over one SharedMemory block
+
+    The creating (API) process owns the block and hands out slots
+    round-robin; each slot carries one in-flight call. Worker processes
+    attach by name and only read/write the slot a message points at.
+    """
+
+    def __init__(self, slots: int, slot_bytes: int, name: Optional[str] = None):
+        self.slots = slots
+        self.slot_bytes = slot_bytes
+        self.owner = name is None
+        # Spawned workers share the API process's resource tracker, so
+        # attaching does not hand them ownership of the block
+        self.shm = shared_memory.SharedMemory(name=name, create=self.owner, size=slots * slot_bytes)
+
+        self._condition = threading.Condition()
+        self._free: List[bool] = [True] * slots
+        self._cursor = 0
+
+    @property
+    def name(self) -> str:
+        return self.shm.name
+
+    def acquire(self, timeout: Optional[float] = None) -> int:
+        """
+        Take the next free slot
+
+        Raises:
+            SlotFull: If every slot stays busy for `timeout` seconds
+        """
+        with self._condition:
+            if not self._condition.wait_for(lambda: any(self._free), timeout=timeout):
+                raise SlotFull(f"All {self.slots} shared-memory slots busy")
+            for step in range(self.slots):
+                slot = (self._cursor + step) % self.slots
+                if self._free[slot]:
+                    self._free[slot] = False
+                    self._cursor = (slot + 1) % self.slots
+                    return slot
+
+    def release(self, slot: int) -> None:
+        with self._condition:
+            self._free[slot] = True
+            self._condition.notify()
+
+    def in_use(self) -> int:
+        with self._condition:
+            return self._free.count(False)
+
+    def view(self, slot: int, spec: ArraySpec) -> np.ndarray:
+        """Zero-copy array over a slot (valid until the slot is reused)"""
+        shape, dtype = spec
+        return np.ndarray(shape, dtype=np.dtype(dtype), buffer=self.shm.buf, offset=slot * self.slot_bytes)
+
+    def write(self, slot: int, array: np.ndarray) -> ArraySpec:
+        """Copy an array into a slot and return its spec"""
+        array = np.asarray(array)
+        if array.nbytes > self.slot_bytes:
+            raise ValueError(
+                f"Array of {array.nbytes} bytes does not fit a {self.slot_bytes}-byte slot"
+            )
+        spec = (tuple(array.shape), array.dtype.str)
+        self.view(slot, spec)[...] = array
+        return spec
+
+    def read(self, slot: int, spec: ArraySpec) -> np.ndarray:
+        """Copy an array out of a slot"""
+        return self.view(slot, spec).copy()
+
+    def write_bytes(self, slot: int, data: Union[bytes, BinaryIO]) -> int:
+        """
+        Copy raw bytes, or a binary stream from its current position to
+        its end, into a slot and return their length
+
+        Streams are read straight into shared memory (readinto), without
+        an intermediate bytes copy.
+        """
+        start = slot * self.slot_bytes
+        if isinstance(data, (bytes, bytearray, memoryview)):
+            if len(data) > self.slot_bytes:
+                raise ValueError(f"{len(data)} bytes do not fit a {self.slot_bytes}-byte slot")
+            self.shm.buf[start:start + len(data)] = data
+            return len(data)
+
+        length = 0
+        with self.shm.buf[start:start + self.slot_bytes] as target:
+            while length < self.slot_bytes:
+                count = data.readinto(target[length:])
+                if not count:
+                    return length
+                length += count
+        if data.read(1):
+            raise ValueError(f"Stream does not fit a {self.slot_bytes}-byte slot")
+        return length
+
+    def read_bytes(self, slot: int, length: int) -> bytes:
+        start = slot * self.slot_bytes
+        return bytes(self.shm.buf[start:start + length])
+
+    def close(self) -> None:
+        """Detach (and free the block if this process created it)"""
+        self.shm.close()
+        if self.owner:
+            self.shm.unlink()
@@ -0,0 +1,174 @@
+"""
+Thread Autotuner - Finds the best worker/thread/batch settings for this host
+Runs benchmarks.bench_threads for each candidate in a fresh process and writes
+the winning configuration to .env.runtime (loaded by app/config.py; values in
+.env still take precedence)
+
+Usage:
+    python autotune.py
+    python autotune.py --pipeline text --duration 10 --max-p95-ms 250
+    python autotune.py --pin --output .env.runtime
+"""
+
+import argparse
+import itertools
+import json
+import os
+import platform
+import subprocess
+import sys
+from datetime import datetime, timezone
+from pathlib import Path
+
+from app.config import cpu_topology, format_cpu_list
+
+# Padded-token budget per text when a batch-size candidate sets
+# EMBED_MAX_BATCH_TOKENS (the defaults, 32 texts / 4096 tokens, allow 128)
+TOKENS_PER_TEXT = 128
+
+
+def split_cpus(available: list) -> tuple:
+    """Disjoint CPU sets for the text and image pools (first half / second half)"""
+    half = max(1, len(available) // 2)
+    text = available[:half]
+    image = available[half:] or available[:half]
+    return text, image
+
+
+def candidates(cores: int, batch_sizes: list) -> list:
+    """(workers, threads, batch_size) with workers * threads within the pipeline's cores"""
+    options = sorted({1, 2, 4, 8, 16, cores} & set(range(1, cores + 1)))
+    return [
+        (workers, threads, batch)
+        for workers, threads in itertools.product(options, options)
+        if workers * threads <= cores
+        for batch in batch_sizes
+    ]
+
+
+def bench(pipeline: str, workers: int, threads: int, batch: int, args, cpus) -> dict:
+    """Run one benchmark subprocess and return its JSON result"""
+    env = dict(os.environ)
+    if pipeline == "text":
+        env.update(TEXT_WORKERS=str(workers), TORCH_NUM_THREADS=str(threads), TORCH_INTEROP_THREADS="1")
+        # Without these encode_texts would split the batch at the configured caps
+        env.update(EMBED_BATCH_SIZE=str(batch), EMBED_MAX_BATCH_TOKENS=str(batch * TOKENS_PER_TEXT))
+        if cpus:
+            env["TEXT_CPU_AFFINITY"] = format_cpu_list(cpus)
+    else:
+        env.update(IMAGE_WORKERS=str(workers), TF_INTRA_OP_THREADS=str(threads), TF_INTER_OP_THREADS="1")
+        if cpus:
+            env["IMAGE_CPU_AFFINITY"] = format_cpu_list(cpus)
+
+    command = [
+        sys.executable, "-m", "benchmarks.bench_threads",
+        "--pipeline", pipeline,
+        "--batch-size", str(batch),
+        "--duration", str(args.duration),
+        "--json",
+    ]
+    completed = subprocess.run(command, env=env, capture_output=True, text=True)
+    if completed.returncode != 0:
+        raise RuntimeError(completed.stderr.strip().splitlines()[-1] if completed.stderr else "benchmark failed")
+    return json.loads(completed.stdout.strip().splitlines()[-1])
+
+
+def tune(pipeline: str, cores: int, batch_sizes: list, args, cpus) -> dict:
+    """Sweep candidates for one pipeline and return the best result"""
+    print(f"\n🔧 Tuning {pipeline} pipeline ({cores} cores)")
+    best = None
+
+    for workers, threads, batch in candidates(cores, batch_sizes):
+        try:
+            result = bench(pipeline, workers, threads, batch, args, cpus)
+        except RuntimeError as e:
+            print(f"  {workers}w x {threads}t, batch {batch:3d}: failed ({e})")
+            continue
+
+        eligible = args.max_p95_ms is None or result["p95_ms"] <= args.max_p95_ms
+        print(
+            f"  {workers}w x {threads}t, batch {batch:3d}: "
+            f"{result['items_per_s']:8.1f} items/s, p95 {result['p95_ms']:7.1f} ms"
+            f"{'' if eligible else '  (over latency budget)'}"
+        )
+        if eligible and (best is None or result["items_per_s"] > best["items_per_s"]):
+            best = result
+
+    if best is None:
+        raise SystemExit(f"No {pipeline} configuration succeeded within the latency budget")
+
+    print(f"✓ Best {pipeline}: {best['workers']} workers, batch {best['batch_size']}, "
+          f"{best['items_per_s']:.1f} items/s")
+    return best
+
+
+def write_env(path: Path, text: dict, image: dict, text_cpus, image_cpus, topology: dict):
+    """Write the chosen settings with enough host context to reproduce them"""
+    lines = [
+        "# Generated by autotune.py - rerun on each machine size",
+        f"# Host: {platform.node()} ({platform.machine()}), "
+        f"{topology['physical_cores']} cores / {topology['logical_cpus']} logical CPUs",
+        f"# Date: {datetime.now(timezone.utc).isoformat(timespec='seconds')}",
+        f"# Command: python autotune.py {' '.join(sys.argv[1:])}".rstrip(),
+        "RUNTIME_AUTO_THREADS=false",
+    ]
+
+    if text is not None:
+        lines += [
+            f"# text: {text['items_per_s']:.1f} texts/s, p95 {text['p95_ms']:.1f} ms",
+            f"TEXT_WORKERS={text['workers']}",
+            f"TORCH_NUM_THREADS={text['torch_num_threads']}",
+            "TORCH_INTEROP_THREADS=1",
+            f"EMBED_BATCH_SIZE={text['batch_size']}",
+            f"EMBED_MAX_BATCH_TOKENS={text['batch_size'] * TOKENS_PER_TEXT}",
+        ]
+        if text_cpus:
+            lines.append(f"TEXT_CPU_AFFINITY={format_cpu_list(text_cpus)}")
+
+    if image is not None:
+        lines += [
+            f"# image: {image['items_per_s']:.1f} images/s, p95 {image['p95_ms']:.1f} ms",
+            f"IMAGE_WORKERS={image['workers']}",
+            f"TF_INTRA_OP_THREADS={image['tf_intra_op_threads']}",
+            "TF_INTER_OP_THREADS=1",
+        ]
+        if image_cpus:
+            lines.append(f"IMAGE_CPU_AFFINITY={format_cpu_list(image_cpus)}")
+
+    path.write_text("\n".join(lines) + "\n", encoding="utf-8")
+    print(f"\n✓ Wrote {path}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Autotune thread and batch settings for this host")
+    parser.add_argument("--pipeline", choices=["text", "image", "both"], default="both")
+    parser.add_argument("--text-batch-sizes", default="8,16,32,64",
+                        help="Comma-separated EMBED_BATCH_SIZE candidates")
+    parser.add_argument("--duration", type=float, default=5.0, help="Seconds per candidate")
+    parser.add_argument("--max-p95-ms", type=float, default=None,
+                        help="Ignore configurations whose p95 latency exceeds this")
+    parser.add_argument("--pin", action="store_true",
+                        help="Pin text and image pools to disjoint CPU halves")
+    parser.add_argument("--output", default=".env.runtime")
+    args = parser.parse_args()
+
+    topology = cpu_topology()
+    print(f"Host: {topology['physical_cores']} cores, {topology['logical_cpus']} logical CPUs")
+
+    # Both pipelines share the machine, so each is tuned on its half of the cores
+    cores = max(1, topology["physical_cores"] // 2) if args.pipeline == "both" else topology["physical_cores"]
+    text_cpus, image_cpus = split_cpus(topology["available"]) if args.pin else (None, None)
+
+    text = image = None
+    if args.pipeline in ("text", "both"):
+        batch_sizes = [int(size) for size in args.text_batch_sizes.split(",")]
+        text = tune("text", cores, batch_sizes, args, text_cpus)
+    if args.pipeline in ("image", "both"):
+        # Image requests carry one photo each, so only threads are swept
+        image = tune("image", cores, [1], args, image_cpus)
+
+    write_env(Path(args.output), text, image, text_cpus, image_cpus, topology)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,4 @@
+"""
+Microbenchmarks for the ML service
+Run from the ml-service directory, e.g. python -m benchmarks.bench_batching
+"""
@@ -0,0 +1,124 @@
+"""
+Logging Overhead Benchmark
+Measures what the per-request log lines of a text classification cost the
+inference thread: the old synchronous colored stdout sink versus the
+enqueued JSON sink with hot-path sampling
+
+Usage:
+    python -m benchmarks.bench_logging
+    python -m benchmarks.bench_logging --requests 20000 --sink-delay-us 50   # slow log consumer
+    python -m benchmarks.bench_logging --output /tmp/ml.log
+"""
+
+import argparse
+import os
+import statistics
+import time
+
+from loguru import logger
+
+from app.utils import logs
+from app.utils.logs import BackgroundSink, SampledLogger, TEXT_FORMAT
+
+TEXT = "रस्त्यावर मोठे खड्डे पडलेत, there is a huge pothole near the bus stop"
+
+
+def slow_writer(stream, delay_us: float):
+    """File sink that also blocks for `delay_us` per line (pipe back-pressure, slow disk)"""
+    def write(message):
+        stream.write(message)
+        if delay_us:
+            time.sleep(delay_us / 1e6)
+    return write
+
+
+def json_writer(stream, delay_us: float):
+    write = slow_writer(stream, delay_us)
+
+    def sink(message):
+        write(logs._json_line(message.record) + "\n")
+    return sink
+
+
+def before(language: str, backend: str, prediction: str) -> None:
+    """Per-request lines as emitted before sampling (f-strings, always formatted)"""
+    logger.info(f"Received text classification request")
+    logger.info(f"Processing text ({language} -> {backend}): '{TEXT[:50]}...'")
+    logger.success(f"✓ Predicted category: {prediction}")
+
+
+def after(sampled: SampledLogger):
+    def emit(language: str, backend: str, prediction: str) -> None:
+        sampled.info("Received text classification request")
+        sampled.info("Processing text ({} -> {}): '{:.50}...'", language, backend, TEXT)
+        sampled.success("✓ Predicted category: {}", prediction)
+    return emit
+
+
+def run(emit, requests: int) -> list:
+    """Per-request logging cost in µs on the calling thread"""
+    samples = []
+    for _ in range(requests):
+        start = time.perf_counter()
+        emit("mixed", "multilingual", "pothole")
+        samples.append((time.perf_counter() - start) * 1e6)
+    return samples
+
+
+def bench_logging(requests: int = 10000, output: str = os.devnull, sink_delay_us: float = 0.0):
+    # (name, sink mode, format, sample rate); "loguru" is loguru's enqueue=True
+    configurations = [
+        ("sync text (before)", "sync", "text", 1.0),
+        ("loguru enqueue, text", "loguru", "text", 1.0),
+        ("background text", "background", "text", 1.0),
+        ("background json", "background", "json", 1.0),
+        ("background json, 10%", "background", "json", 0.1),
+        ("background json, 1%", "background", "json", 0.01),
+    ]
+
+    print(f"{requests} requests x 3 lines, sink {output}, sink delay {sink_delay_us:g} µs/line\n")
+    print(f"{'configuration':<28} {'mean µs':>8} {'p50 µs':>7} {'p99 µs':>8} {'flush ms':>9}")
+
+    with open(output, "w", encoding="utf-8") as stream:
+        for name, mode, log_format, rate in configurations:
+            logger.remove()
+            if log_format == "json":
+                write, log_format = json_writer(stream, sink_delay_us), "{message}"
+            else:
+                write, log_format = slow_writer(stream, sink_delay_us), TEXT_FORMAT
+
+            background = BackgroundSink(write, max_queue=requests * 3) if mode == "background" else None
+            logger.add(
+                background or write,
+                format=log_format,
+                colorize=log_format == TEXT_FORMAT,
+                enqueue=mode == "loguru"
+            )
+
+            emit = before if name.startswith("sync") else after(SampledLogger(rate))
+            run(emit, min(200, requests))  # warm up
+            samples = sorted(run(emit, requests))
+
+            # Time until the writer thread has caught up
+            start = time.perf_counter()
+            if background is not None:
+                background.drain()
+            logger.complete()
+            flush_ms = (time.perf_counter() - start) * 1000
+
+            print(
+                f"{name:<28} {statistics.fmean(samples):>8.2f} {samples[len(samples) // 2]:>7.2f} "
+                f"{samples[int(len(samples) * 0.99)]:>8.2f} {flush_ms:>9.1f}"
+            )
+
+    logger.remove()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Benchmark per-request logging overhead")
+    parser.add_argument("--requests", type=int, default=10000)
+    parser.add_argument("--output", default=os.devnull, help="File the sink writes to")
+    parser.add_argument("--sink-delay-us", type=float, default=0.0, help="Extra blocking time per written line")
+    args = parser.parse_args()
+
+    bench_logging(args.requests, args.output, args.sink_delay_us)
@@ -0,0 +1,230 @@
+"""
+RPC Conformance and Benchmark
+Checks that every RPC method returns the same results as its HTTP route,
+then compares throughput and latency of both interfaces
+
+Usage:
+    python -m benchmarks.bench_rpc                  # spawn a local server on free ports
+    python -m benchmarks.bench_rpc --http-url http://localhost:8000 --rpc-port 8001
+    python -m benchmarks.bench_rpc --requests 500 --concurrency 16
+"""
+
+import argparse
+import asyncio
+import base64
+import io
+import os
+import socket
+import subprocess
+import sys
+import time
+
+import httpx
+import numpy as np
+from PIL import Image
+
+from app.rpc.client import RpcClient
+from app.rpc.protocol import RpcError
+from benchmarks.bench_batching import synthetic_complaints
+
+failures = []
+
+
+def check(name: str, condition: bool, detail: str = ""):
+    print(f"  {'PASS' if condition else 'FAIL'}  {name}{f' ({detail})' if detail and not condition else ''}")
+    if not condition:
+        failures.append(name)
+
+
+def sample_image() -> bytes:
+    rng = np.random.default_rng(0)
+    pixels = (rng.random((240, 320, 3)) * 255).astype(np.uint8)
+    buffer = io.BytesIO()
+    Image.fromarray(pixels).save(buffer, format="PNG")
+    return buffer.getvalue()
+
+
+def free_port() -> int:
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+def spawn_server(http_port: int, rpc_port: int) -> subprocess.Popen:
+    """Start the service with RPC enabled and wait until /health answers"""
+    env = dict(os.environ, RPC_ENABLED="true", RPC_HOST="127.0.0.1", RPC_PORT=str(rpc_port))
+    process = subprocess.Popen(
+        [sys.executable, "-m", "uvicorn", "app.main:app", "--host", "127.0.0.1", "--port", str(http_port)],
+        env=env,
+        stdout=subprocess.DEVNULL,
+        stderr=subprocess.DEVNULL
+    )
+    deadline = time.monotonic() + 300
+    while time.monotonic() < deadline:
+        if process.poll() is not None:
+            raise SystemExit("Service exited during startup")
+        try:
+            httpx.get(f"http://127.0.0.1:{http_port}/health", timeout=1.0)
+            with socket.create_connection(("127.0.0.1", rpc_port), timeout=1.0):
+                return process
+        except (httpx.HTTPError, OSError):
+            time.sleep(0.5)
+    process.kill()
+    raise SystemExit("Service did not start within 300s")
+
+
+async def rpc_status(coroutine) -> int:
+    try:
+        await coroutine
+        return 200
+    except RpcError as e:
+        return e.status
+
+
+async def conformance(http: httpx.AsyncClient, rpc: RpcClient, image: bytes):
+    print("Conformance")
+    texts = synthetic_complaints(40, seed=3)
+
+    pong = await rpc.call("ping")
+    categories = (await http.get("/categories")).json()["categories"]
+    check("ping returns /categories", pong["categories"] == categories)
+
+    http_result = (await http.post("/ml/text/classify", json={"text": texts[0]})).json()
+    rpc_result = await rpc.call("text.classify", {"text": texts[0]})
+    check(
+        "text.classify matches /ml/text/classify",
+        rpc_result["prediction"] == http_result["prediction"]
+        and abs(rpc_result["confidence"] - http_result["confidence"]) < 1e-6
+        and rpc_result.get("stage") == http_result.get("stage")
+    )
+
+    http_slim = (await http.post("/ml/text/classify?fields=prediction,probabilities", json={"text": texts[0]})).json()
+    rpc_slim = await rpc.call("text.classify", {"text": texts[0], "fields": ["prediction", "probabilities"]})
+    check(
+        "fields projection matches ?fields=",
+        rpc_slim["prediction"] == http_slim["prediction"]
+        and np.allclose(rpc_slim["probabilities"], http_slim["probabilities"])
+    )
+
+    http_batch = (await http.post("/ml/text/classify-batch", json={"texts": texts})).json()["results"]
+    rpc_batch = (await rpc.call("text.classify_batch", {"texts": texts}))["results"]
+    check(
+        "text.classify_batch matches /ml/text/classify-batch",
+        [r.get("prediction") for r in rpc_batch] == [r.get("prediction") for r in http_batch]
+    )
+
+    streamed = [item async for item in rpc.stream("text.classify_stream", {"texts": texts})]
+    check(
+        "text.classify_stream yields batch results in order",
+        [r.get("prediction") for r in streamed] == [r.get("prediction") for r in rpc_batch]
+    )
+
+    http_embed = (await http.post("/ml/text/embed", json={"texts": texts[:8]})).json()
+    http_vectors = np.frombuffer(base64.b64decode(http_embed["data"]), dtype=http_embed["dtype"])
+    rpc_embed = await rpc.call("text.embed", {"texts": texts[:8]})
+    rpc_vectors = np.frombuffer(rpc_embed["data"], dtype=rpc_embed["dtype"])
+    check("text.embed matches /ml/text/embed", np.allclose(rpc_vectors, http_vectors, atol=1e-5))
+
+    chunks = [item async for item in rpc.stream("text.embed_stream", {"texts": texts[:8]})]
+    stream_vectors = np.concatenate([np.frombuffer(c["data"], dtype=c["dtype"]) for c in chunks])
+    check("text.embed_stream concatenates to text.embed", np.allclose(stream_vectors, rpc_vectors, atol=1e-5))
+
+    http_image = await http.post("/ml/image/classify", files={"file": ("a.png", image, "image/png")})
+    try:
+        rpc_image = await rpc.call("image.classify", {"image": image})
+        rpc_image_status = 200
+    except RpcError as e:
+        rpc_image, rpc_image_status = None, e.status
+    check("image.classify status matches", rpc_image_status == http_image.status_code,
+          f"rpc {rpc_image_status}, http {http_image.status_code}")
+    if rpc_image is not None and http_image.status_code == 200:
+        check("image.classify matches /ml/image/classify",
+              rpc_image["prediction"] == http_image.json()["prediction"])
+
+    bogus = b"not an image at all"
+    http_bogus = await http.post("/ml/image/classify", files={"file": ("a.png", bogus, "image/png")})
+    check("bogus image rejected alike",
+          await rpc_status(rpc.call("image.classify", {"image": bogus})) == http_bogus.status_code)
+
+    check("unknown method is 404", await rpc_status(rpc.call("no.such.method")) == 404)
+
+
+async def load(name: str, send, requests: int, concurrency: int):
+    latencies = []
+    semaphore = asyncio.Semaphore(concurrency)
+
+    async def one():
+        async with semaphore:
+            start = time.perf_counter()
+            await send()
+            latencies.append(time.perf_counter() - start)
+
+    started = time.perf_counter()
+    await asyncio.gather(*(one() for _ in range(requests)))
+    elapsed = time.perf_counter() - started
+
+    latencies.sort()
+    p50 = latencies[len(latencies) // 2] * 1000
+    p95 = latencies[int(len(latencies) * 0.95)] * 1000
+    print(f"  {name:28s} {requests / elapsed:8.1f} req/s   p50 {p50:7.2f} ms   p95 {p95:7.2f} ms")
+
+
+async def benchmark(http: httpx.AsyncClient, rpc: RpcClient, requests: int, concurrency: int):
+    print(f"\nBenchmark ({requests} requests, concurrency {concurrency})")
+    text = synthetic_complaints(1, seed=5)[0]
+    texts = synthetic_complaints(32, seed=6)
+
+    await load("http text.classify", lambda: http.post("/ml/text/classify", json={"text": text}), requests, concurrency)
+    await load("rpc  text.classify", lambda: rpc.call("text.classify", {"text": text}), requests, concurrency)
+
+    batches = max(1, requests // 10)
+    await load(
+        "http classify-batch (slim)",
+        lambda: http.post("/ml/text/classify-batch?profile=slim", json={"texts": texts}),
+        batches, concurrency
+    )
+    await load(
+        "rpc  classify_batch (slim)",
+        lambda: rpc.call("text.classify_batch", {"texts": texts, "fields": ["prediction", "confidence"]}),
+        batches, concurrency
+    )
+
+
+async def main(args):
+    process = None
+    http_url, rpc_host, rpc_port = args.http_url, args.rpc_host, args.rpc_port
+    if http_url is None:
+        http_port, rpc_port = free_port(), free_port()
+        print(f"Starting local service (http {http_port}, rpc {rpc_port})...")
+        process = spawn_server(http_port, rpc_port)
+        http_url, rpc_host = f"http://127.0.0.1:{http_port}", "127.0.0.1"
+
+    try:
+        async with httpx.AsyncClient(base_url=http_url, timeout=120.0) as http:
+            rpc = await RpcClient.connect(rpc_host, rpc_port)
+            try:
+                await conformance(http, rpc, sample_image())
+                if not args.skip_benchmark:
+                    await benchmark(http, rpc, args.requests, args.concurrency)
+            finally:
+                await rpc.close()
+    finally:
+        if process is not None:
+            process.terminate()
+            process.wait()
+
+    if failures:
+        print(f"\n✗ {len(failures)} conformance check(s) failed")
+        sys.exit(1)
+    print("\n✓ RPC conforms to the HTTP API")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="RPC conformance test and HTTP vs RPC benchmark")
+    parser.add_argument("--http-url", default=None, help="Running service (default: spawn a local one)")
+    parser.add_argument("--rpc-host", default="127.0.0.1")
+    parser.add_argument("--rpc-port", type=int, default=8001)
+    parser.add_argument("--requests", type=int, default=200)
+    parser.add_argument("--concurrency", type=int, default=8)
+    parser.add_argument("--skip-benchmark", action="store_true")
+    asyncio.run(main(parser.parse_args()))
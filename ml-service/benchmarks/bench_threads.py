@@ -0,0 +1,115 @@
+"""
+Thread Configuration Microbenchmark
+Measures steady-state throughput of one pipeline under the thread settings
+taken from the environment (TEXT_WORKERS, TORCH_NUM_THREADS, IMAGE_WORKERS,
+TF_INTRA_OP_THREADS, ...), the same way the service applies them
+
+Usage:
+    python -m benchmarks.bench_threads --pipeline text
+    TORCH_NUM_THREADS=2 TEXT_WORKERS=4 python -m benchmarks.bench_threads --pipeline text --json
+
+autotune.py runs this once per candidate configuration in a fresh process,
+since both frameworks fix their thread pools at first use.
+"""
+
+import argparse
+import json
+import threading
+import time
+
+import numpy as np
+
+from app.config import settings, configure_runtime, format_cpu_list, pin_current_thread, parse_cpu_list
+from benchmarks.bench_batching import synthetic_complaints
+
+
+def _text_workload(batch_size: int):
+    """
+    encode_texts over a fixed batch of synthetic complaints: one forward
+    pass only if EMBED_BATCH_SIZE and EMBED_MAX_BATCH_TOKENS admit the
+    whole batch (autotune.py sets both), otherwise several
+    """
+    from app.services.text_service import text_classification_service as service
+
+    service.load_models()
+    texts = synthetic_complaints(batch_size, seed=7)
+    return lambda: service.encode_texts(texts), parse_cpu_list(settings.TEXT_CPU_AFFINITY), settings.TEXT_WORKERS
+
+
+def _image_workload(batch_size: int):
+    """One CNN forward pass over a fixed batch of random images"""
+    from app.models.model_loader import model_loader
+
+    model = model_loader.load_image_classifier()
+    rng = np.random.default_rng(7)
+    batch = rng.random((batch_size, *settings.IMAGE_SIZE, 3), dtype=np.float32)
+    return lambda: model(batch), parse_cpu_list(settings.IMAGE_CPU_AFFINITY), settings.IMAGE_WORKERS
+
+
+def run(pipeline: str, batch_size: int, duration: float, warmup: int) -> dict:
+    runtime = configure_runtime()
+    step, cpus, workers = (_text_workload if pipeline == "text" else _image_workload)(batch_size)
+
+    for _ in range(warmup):
+        step()
+
+    latencies = []
+    lock = threading.Lock()
+    stop_at = time.perf_counter() + duration
+
+    def worker():
+        pin_current_thread(cpus)
+        local = []
+        while time.perf_counter() < stop_at:
+            start = time.perf_counter()
+            step()
+            local.append(time.perf_counter() - start)
+        with lock:
+            latencies.extend(local)
+
+    threads = [threading.Thread(target=worker) for _ in range(workers)]
+    started = time.perf_counter()
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    elapsed = time.perf_counter() - started
+
+    latencies.sort()
+    p50 = latencies[len(latencies) // 2] if latencies else 0.0
+    p95 = latencies[min(len(latencies) - 1, int(len(latencies) * 0.95))] if latencies else 0.0
+
+    return {
+        "pipeline": pipeline,
+        "workers": workers,
+        "batch_size": batch_size,
+        "torch_num_threads": runtime["torch_num_threads"],
+        "tf_intra_op_threads": runtime["tf_intra_op_threads"],
+        "cpus": format_cpu_list(cpus) if cpus else None,
+        "calls": len(latencies),
+        "items_per_s": len(latencies) * batch_size / elapsed,
+        "p50_ms": p50 * 1000,
+        "p95_ms": p95 * 1000,
+    }
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Benchmark one pipeline under the configured thread settings")
+    parser.add_argument("--pipeline", choices=["text", "image"], default="text")
+    parser.add_argument("--batch-size", type=int, default=None,
+                        help="Items per forward pass (default: EMBED_BATCH_SIZE for text, 1 for image)")
+    parser.add_argument("--duration", type=float, default=5.0, help="Seconds of measurement")
+    parser.add_argument("--warmup", type=int, default=2, help="Untimed forward passes before measuring")
+    parser.add_argument("--json", action="store_true", help="Print one JSON line (used by autotune.py)")
+    args = parser.parse_args()
+
+    batch_size = args.batch_size or (settings.EMBED_BATCH_SIZE if args.pipeline == "text" else 1)
+    result = run(args.pipeline, batch_size, args.duration, args.warmup)
+
+    if args.json:
+        print(json.dumps(result))
+    else:
+        threads = result["torch_num_threads"] if args.pipeline == "text" else result["tf_intra_op_threads"]
+        print(f"{args.pipeline}: {result['workers']} workers x {threads} threads, batch {batch_size}")
+        print(f"  throughput: {result['items_per_s']:8.1f} items/s ({result['calls']} calls)")
+        print(f"  latency:    p50 {result['p50_ms']:.1f} ms, p95 {result['p95_ms']:.1f} ms")
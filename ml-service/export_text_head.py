@@ -0,0 +1,138 @@
+"""
+Text Head Exporter - Converts the pickled classifier head to a NumPy .npz
+Folds the label encoder and a PCA projection into one weight matrix, checks
+parity against the scikit-learn model and compares per-request head cost
+
+Usage:
+    python export_text_head.py
+    python export_text_head.py --embeddings corpus.npz   # parity on real embeddings
+"""
+
+import argparse
+import os
+import time
+from pathlib import Path
+
+import joblib
+import numpy as np
+
+from app.config import settings
+from app.models.linear_head import LinearHead, source_digest
+from app.models.projection import EmbeddingProjection
+
+
+def per_call_us(function, batch: np.ndarray, repeats: int) -> float:
+    function(batch)
+    start = time.perf_counter()
+    for _ in range(repeats):
+        function(batch)
+    return (time.perf_counter() - start) / repeats * 1e6
+
+
+def export_text_head(
+    model_path: str = None,
+    label_encoder_path: str = None,
+    projection_path: str = None,
+    output_path: str = None,
+    embeddings_path: str = None,
+    samples: int = 2000,
+    tolerance: float = 1e-5
+):
+    """
+    Export, verify and save the NumPy head
+
+    Args:
+        model_path: Pickled head (default TEXT_MODEL_PATH)
+        label_encoder_path: Pickled LabelEncoder (default LABEL_ENCODER_PATH, if present)
+        projection_path: Projection .npz (default TEXT_PROJECTION_PATH, if present);
+            PCA is folded into the head, truncation stays a separate stage
+        output_path: Where to write the .npz (default TEXT_HEAD_PATH)
+        embeddings_path: .npz with an 'embeddings' array (from
+            train_projection.py --save-embeddings) to check parity on;
+            random vectors are used otherwise
+        samples: Number of random vectors for the parity check
+        tolerance: Max absolute probability difference allowed
+
+    Raises:
+        SystemExit: If parity fails (nothing is written)
+    """
+    model_path = Path(model_path or settings.TEXT_MODEL_PATH)
+    label_encoder_path = Path(label_encoder_path or settings.LABEL_ENCODER_PATH)
+    projection_path = Path(projection_path or settings.TEXT_PROJECTION_PATH)
+    output_path = Path(output_path or settings.TEXT_HEAD_PATH)
+
+    model = joblib.load(model_path)
+    label_encoder = joblib.load(label_encoder_path) if label_encoder_path.exists() else None
+    projection = EmbeddingProjection.load(projection_path) if projection_path.exists() else None
+    print(f"Loaded {type(model).__name__} from {model_path}")
+
+    fold = projection if projection is not None and projection.kind == "pca" else None
+    head = LinearHead.from_sklearn(model, label_encoder, fold)
+    head.source_digest = source_digest([model_path, label_encoder_path, projection_path])
+    print(f"✓ Converted: {head}" + (f" (folded {projection!r})" if fold is not None else ""))
+
+    # Parity inputs in embedding space (before any projection)
+    if embeddings_path:
+        with np.load(embeddings_path, allow_pickle=False) as data:
+            embeddings = np.asarray(data["embeddings"], dtype=np.float32)
+    else:
+        input_dim = fold.mean.shape[0] if fold is not None else int(model.n_features_in_)
+        embeddings = np.random.default_rng(0).standard_normal((samples, input_dim)).astype(np.float32)
+
+    def sklearn_path(batch):
+        if projection is not None:
+            batch = projection.transform(batch)
+        return model.predict_proba(batch)
+
+    def numpy_path(batch):
+        if projection is not None and fold is None:
+            batch = projection.transform(batch)
+        return head.predict_proba(batch)
+
+    expected = sklearn_path(embeddings)
+    actual = numpy_path(embeddings)
+    max_diff = float(np.abs(expected - actual).max())
+    agreement = float((expected.argmax(axis=1) == actual.argmax(axis=1)).mean())
+    print(f"Parity on {len(embeddings)} vectors: max |Δp| {max_diff:.2e}, argmax agreement {agreement:.2%}")
+    if max_diff > tolerance or agreement < 1.0:
+        raise SystemExit(f"✗ Parity check failed (tolerance {tolerance}); {output_path} not written")
+
+    print(f"\n{'batch':>5} {'sklearn µs':>11} {'numpy µs':>9}")
+    for batch_size in (1, 8, 64):
+        batch = embeddings[:batch_size]
+        repeats = max(20, 2000 // batch_size)
+        # The service used to call predict and predict_proba
+        sklearn_us = per_call_us(lambda b: (model.predict(b), sklearn_path(b)), batch, repeats)
+        numpy_us = per_call_us(numpy_path, batch, repeats)
+        print(f"{batch_size:>5} {sklearn_us:>11.1f} {numpy_us:>9.1f}")
+
+    # np.savez appends .npz to names without it, so keep the suffix on the temp file
+    temp_path = output_path.with_name(f".{output_path.stem}.tmp.npz")
+    head.save(temp_path)
+    LinearHead.load(temp_path)
+    os.replace(temp_path, output_path)
+    print(f"\n✓ Head saved: {output_path} ({output_path.stat().st_size / 1024:.1f} KB)")
+
+    return head
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Export the text classifier head to a NumPy .npz")
+    parser.add_argument("--model", default=None, help="Pickled head (default: TEXT_MODEL_PATH)")
+    parser.add_argument("--label-encoder", default=None, help="Default: LABEL_ENCODER_PATH")
+    parser.add_argument("--projection", default=None, help="Default: TEXT_PROJECTION_PATH")
+    parser.add_argument("--output", default=None, help="Default: TEXT_HEAD_PATH")
+    parser.add_argument("--embeddings", default=None, help=".npz with an 'embeddings' array for the parity check")
+    parser.add_argument("--samples", type=int, default=2000, help="Random vectors for the parity check")
+    parser.add_argument("--tolerance", type=float, default=1e-5)
+    args = parser.parse_args()
+
+    export_text_head(
+        model_path=args.model,
+        label_encoder_path=args.label_encoder,
+        projection_path=args.projection,
+        output_path=args.output,
+        embeddings_path=args.embeddings,
+        samples=args.samples,
+        tolerance=args.tolerance,
+    )
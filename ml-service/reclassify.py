@@ -0,0 +1,272 @@
+"""
+Bulk Reclassification - Reclassifies a complaint archive offline after retraining
+Streams complaints from JSONL, CSV or Parquet, runs the text (and optionally
+image) classification services in a process pool, writes results to JSONL
+as chunks finish and can resume from its checkpoint after an interruption
+
+Usage:
+    python reclassify.py --input complaints.jsonl --output reclassified.jsonl
+    python reclassify.py --input archive.parquet --output out.jsonl --image-column image_path --image-root uploads/
+    python reclassify.py --input complaints.csv --output out.jsonl --resume
+"""
+
+import argparse
+import itertools
+import json
+import multiprocessing
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor
+from pathlib import Path
+
+from app.utils.datasets import iter_records
+
+# Set per worker process by _init_worker
+_options = {}
+
+
+def _init_worker(threads: int, options: dict):
+    """Load models once per process, each process limited to `threads` threads"""
+    from app.config import settings, configure_runtime
+
+    # N single-threaded processes saturate N cores without oversubscription
+    settings.TORCH_NUM_THREADS = threads
+    settings.TORCH_INTEROP_THREADS = 1
+    settings.TF_INTRA_OP_THREADS = threads
+    settings.TF_INTER_OP_THREADS = 1
+    configure_runtime()
+
+    from app.services.text_service import text_classification_service
+    text_classification_service.load_models()
+
+    if options["image_column"]:
+        from app.services.image_service import image_classification_service
+
+        # Compile the CNN for chunk-sized batches (before the model is traced)
+        settings.IMAGE_BATCH_SIZES = sorted({1, options["image_batch_size"]})
+        image_classification_service.load_model()
+
+    _options.update(options)
+
+
+def _read_image(value: str):
+    """Image bytes for an archive path (relative to --image-root), or None"""
+    if not value:
+        return None
+    path = Path(value)
+    if not path.is_absolute() and _options["image_root"]:
+        path = Path(_options["image_root"]) / path
+    if not path.exists():
+        raise FileNotFoundError(f"Image not found: {path}")
+    return path.read_bytes()
+
+
+def classify_chunk(rows: list) -> list:
+    """
+    Classify one chunk of archive rows in a worker process
+
+    Texts go through one TextClassificationService.batch_predict call
+    (cascade + length-bucketed embedding); images are read up front and
+    go through one ImageClassificationService.predict_batch call
+    (CNN passes of --image-batch-size).
+    """
+    from app.services.text_service import text_classification_service
+    from app.services.multimodal_service import fuse_probabilities
+    from app.utils.categories import canonical_category
+
+    id_column = _options["id_column"]
+    image_column = _options["image_column"]
+
+    texts = [str(row.get(_options["text_column"]) or "") for row in rows]
+    text_results = text_classification_service.batch_predict(texts)
+
+    image_results = [None] * len(rows)
+    if image_column:
+        from app.services.image_service import image_classification_service
+
+        readable, images = [], []
+        for index, row in enumerate(rows):
+            if not row.get(image_column):
+                continue
+            try:
+                images.append(_read_image(row[image_column]))
+                readable.append(index)
+            except Exception as e:
+                image_results[index] = {"success": False, "error": str(e)}
+
+        if images:
+            try:
+                classified = image_classification_service.predict_batch(
+                    images,
+                    references=[str(rows[index].get(id_column)) for index in readable]
+                )
+            except Exception as e:
+                classified = [{"success": False, "error": str(e)}] * len(images)
+            for index, image_result in zip(readable, classified):
+                image_results[index] = image_result
+
+    records = []
+    for row, text_result, image_result in zip(rows, text_results, image_results):
+        record = {"id": row.get(id_column)}
+
+        if text_result["success"]:
+            record.update(
+                text_prediction=canonical_category(text_result["prediction"]),
+                text_confidence=text_result["confidence"],
+                stage=text_result.get("stage")
+            )
+        else:
+            record["text_error"] = text_result["error"]
+
+        if image_result is not None:
+            if image_result["success"]:
+                record.update(
+                    image_prediction=image_result["prediction"],
+                    image_confidence=image_result["confidence"]
+                )
+            else:
+                record["image_error"] = image_result["error"]
+
+        fused = fuse_probabilities(
+            text_result.get("probabilities") if text_result["success"] else None,
+            image_result.get("probabilities") if image_result and image_result["success"] else None,
+            _options["text_weight"]
+        )
+        if fused:
+            prediction = max(fused, key=fused.get)
+            record["prediction"] = prediction
+            record["confidence"] = fused[prediction]
+
+        records.append(record)
+
+    return records
+
+
+def load_checkpoint(path: Path, input_path: Path) -> dict:
+    """Rows already written and the output size they correspond to"""
+    if not path.exists():
+        return {"rows_done": 0, "output_bytes": 0}
+    checkpoint = json.loads(path.read_text(encoding="utf-8"))
+    if checkpoint.get("input") != str(input_path.resolve()):
+        raise SystemExit(f"Checkpoint {path} belongs to {checkpoint.get('input')}, not {input_path}")
+    return checkpoint
+
+
+def save_checkpoint(path: Path, input_path: Path, rows_done: int, output_bytes: int):
+    """Atomically record progress (written only after the output is flushed)"""
+    tmp = path.with_suffix(path.suffix + ".tmp")
+    tmp.write_text(json.dumps({
+        "input": str(input_path.resolve()),
+        "rows_done": rows_done,
+        "output_bytes": output_bytes
+    }), encoding="utf-8")
+    os.replace(tmp, path)
+
+
+def chunked(records, size: int):
+    """Group an iterator into lists of `size` rows"""
+    iterator = iter(records)
+    while True:
+        chunk = list(itertools.islice(iterator, size))
+        if not chunk:
+            return
+        yield chunk
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Reclassify a complaint archive with the current models")
+    parser.add_argument("--input", required=True, help="Archive (.jsonl, .csv or .parquet)")
+    parser.add_argument("--output", required=True, help="Results file (.jsonl)")
+    parser.add_argument("--id-column", default="id")
+    parser.add_argument("--text-column", default="text")
+    parser.add_argument("--image-column", default=None, help="Column with image file paths (optional)")
+    parser.add_argument("--image-root", default=None, help="Base directory for relative image paths")
+    parser.add_argument("--text-weight", type=float, default=0.5, help="Text weight when fusing with images")
+    parser.add_argument("--workers", type=int, default=os.cpu_count() or 1, help="Worker processes")
+    parser.add_argument("--threads", type=int, default=1, help="Framework threads per worker")
+    parser.add_argument("--chunk-size", type=int, default=256, help="Rows per worker batch")
+    parser.add_argument("--image-batch-size", type=int, default=16, help="Images per CNN forward pass")
+    parser.add_argument("--checkpoint", default=None, help="Checkpoint file (default: <output>.ckpt)")
+    parser.add_argument("--resume", action="store_true", help="Continue from the checkpoint")
+    args = parser.parse_args()
+
+    input_path = Path(args.input)
+    output_path = Path(args.output)
+    checkpoint_path = Path(args.checkpoint or f"{args.output}.ckpt")
+
+    checkpoint = {"rows_done": 0, "output_bytes": 0}
+    if args.resume:
+        checkpoint = load_checkpoint(checkpoint_path, input_path)
+    elif checkpoint_path.exists():
+        raise SystemExit(f"{checkpoint_path} exists; pass --resume to continue or delete it to start over")
+
+    rows_done = checkpoint["rows_done"]
+    if rows_done:
+        print(f"Resuming after {rows_done} rows")
+
+    options = {
+        "id_column": args.id_column,
+        "text_column": args.text_column,
+        "image_column": args.image_column,
+        "image_root": args.image_root,
+        "text_weight": args.text_weight,
+        "image_batch_size": args.image_batch_size,
+    }
+
+    rows = itertools.islice(iter_records(input_path), rows_done, None)
+    chunks = chunked(rows, args.chunk_size)
+
+    # TensorFlow and PyTorch are not fork-safe once initialized
+    context = multiprocessing.get_context("spawn")
+
+    # Drop anything written after the last checkpoint
+    with open(output_path, "ab") as out:
+        out.truncate(checkpoint["output_bytes"])
+
+    started = time.perf_counter()
+    processed = 0
+
+    with ProcessPoolExecutor(
+        max_workers=args.workers,
+        mp_context=context,
+        initializer=_init_worker,
+        initargs=(args.threads, options)
+    ) as pool, open(output_path, "ab") as out:
+        print(f"Classifying with {args.workers} workers x {args.threads} threads, chunks of {args.chunk_size}")
+
+        # Keep a bounded window of chunks in flight and write them in input
+        # order, so the checkpoint is a simple row count
+        pending = []
+        window = args.workers * 2
+
+        def drain_one():
+            nonlocal rows_done, processed
+            chunk_rows, future = pending.pop(0)
+            for record in future.result():
+                out.write((json.dumps(record, ensure_ascii=False) + "\n").encode("utf-8"))
+            out.flush()
+            os.fsync(out.fileno())
+
+            rows_done += chunk_rows
+            processed += chunk_rows
+            save_checkpoint(checkpoint_path, input_path, rows_done, out.tell())
+
+            elapsed = time.perf_counter() - started
+            print(f"  {rows_done} rows done, {processed / elapsed:.1f} rows/s")
+
+        for chunk in chunks:
+            pending.append((len(chunk), pool.submit(classify_chunk, chunk)))
+            if len(pending) >= window:
+                drain_one()
+
+        while pending:
+            drain_one()
+
+    elapsed = time.perf_counter() - started
+    rate = processed / elapsed if elapsed > 0 else 0.0
+    print(f"\n✓ Reclassified {processed} rows in {elapsed:.1f}s ({rate:.1f} rows/s)")
+    print(f"✓ Results: {output_path} ({rows_done} rows total)")
+
+
+if __name__ == "__main__":
+    main()
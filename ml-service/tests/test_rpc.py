@@ -0,0 +1,195 @@
+"""
+RPC Conformance Tests
+Starts an RpcServer on an ephemeral port next to the in-process HTTP app
+and checks every method against its HTTP route, including the request caps
+
+Usage (needs the models, like the service itself):
+    python -m pytest tests/test_rpc.py
+"""
+
+import asyncio
+import base64
+import io
+
+import httpx
+import numpy as np
+import pytest
+from PIL import Image
+
+from app.config import settings
+from app.main import app
+from app.rpc.client import RpcClient
+from app.rpc.protocol import RpcError
+from app.rpc.server import MAX_BATCH_TEXTS, RpcServer
+
+TEXTS = [
+    "There is a huge pothole on the main road near the school",
+    "Garbage has not been collected for a week in our street",
+    "A tree fell on the road after the storm last night",
+    "The electric pole near the market is leaning dangerously",
+    "रस्त्यावर मोठे खड्डे पडले आहेत",
+    "सड़क पर कचरा जमा हो गया है",
+]
+
+
+def sample_image(seed: int = 0) -> bytes:
+    pixels = (np.random.default_rng(seed).random((240, 320, 3)) * 255).astype(np.uint8)
+    buffer = io.BytesIO()
+    Image.fromarray(pixels).save(buffer, format="PNG")
+    return buffer.getvalue()
+
+
+def run(check) -> None:
+    """Run `check(http, rpc)` against a fresh RpcServer on 127.0.0.1:0"""
+    async def main():
+        server = RpcServer("127.0.0.1", 0, settings.MAX_REQUEST_BYTES)
+        await server.start()
+        rpc = await RpcClient.connect("127.0.0.1", server.port)
+        transport = httpx.ASGITransport(app=app)
+        try:
+            async with httpx.AsyncClient(transport=transport, base_url="http://test", timeout=120.0) as http:
+                await check(http, rpc)
+        finally:
+            await rpc.close()
+            await server.stop()
+
+    asyncio.run(main())
+
+
+async def rpc_status(coroutine) -> int:
+    try:
+        await coroutine
+        return 200
+    except RpcError as e:
+        return e.status
+
+
+async def stream_status(rpc: RpcClient, method: str, params) -> int:
+    try:
+        async for _ in rpc.stream(method, params):
+            pass
+        return 200
+    except RpcError as e:
+        return e.status
+
+
+def test_ping():
+    async def check(http, rpc):
+        pong = await rpc.call("ping")
+        assert pong["categories"] == (await http.get("/categories")).json()["categories"]
+
+    run(check)
+
+
+def test_text_classify():
+    async def check(http, rpc):
+        expected = (await http.post("/ml/text/classify", json={"text": TEXTS[0]})).json()
+        result = await rpc.call("text.classify", {"text": TEXTS[0]})
+        assert result["prediction"] == expected["prediction"]
+        assert result["confidence"] == pytest.approx(expected["confidence"], abs=1e-6)
+
+        slim = (await http.post("/ml/text/classify?fields=prediction,probabilities", json={"text": TEXTS[0]})).json()
+        projected = await rpc.call("text.classify", {"text": TEXTS[0], "fields": ["prediction", "probabilities"]})
+        assert set(projected) == set(slim)
+        assert np.allclose(projected["probabilities"], slim["probabilities"])
+
+        assert await rpc_status(rpc.call("text.classify", {"text": TEXTS[0], "fields": ["nope"]})) == 400
+
+    run(check)
+
+
+def test_text_classify_batch_and_stream():
+    async def check(http, rpc):
+        expected = (await http.post("/ml/text/classify-batch", json={"texts": TEXTS})).json()["results"]
+        batch = (await rpc.call("text.classify_batch", {"texts": TEXTS}))["results"]
+        assert [r.get("prediction") for r in batch] == [r.get("prediction") for r in expected]
+
+        streamed = [item async for item in rpc.stream("text.classify_stream", {"texts": TEXTS})]
+        assert [r.get("prediction") for r in streamed] == [r.get("prediction") for r in expected]
+
+    run(check)
+
+
+def test_text_embed_and_stream():
+    async def check(http, rpc):
+        expected = (await http.post("/ml/text/embed", json={"texts": TEXTS})).json()
+        http_vectors = np.frombuffer(base64.b64decode(expected["data"]), dtype=expected["dtype"])
+
+        embedded = await rpc.call("text.embed", {"texts": TEXTS})
+        vectors = np.frombuffer(embedded["data"], dtype=embedded["dtype"])
+        assert embedded["shape"] == [len(TEXTS), expected["dimension"]]
+        assert np.allclose(vectors, http_vectors, atol=1e-5)
+
+        chunks = [item async for item in rpc.stream("text.embed_stream", {"texts": TEXTS})]
+        streamed = np.concatenate([np.frombuffer(c["data"], dtype=c["dtype"]) for c in chunks])
+        assert [c["offset"] for c in chunks] == list(range(0, len(TEXTS), settings.EMBED_BATCH_SIZE))
+        assert np.allclose(streamed, vectors, atol=1e-5)
+
+    run(check)
+
+
+def test_image_classify_and_stream():
+    async def check(http, rpc):
+        image = sample_image()
+        response = await http.post("/ml/image/classify", files={"file": ("a.png", image, "image/png")})
+        status = await rpc_status(rpc.call("image.classify", {"image": image}))
+        assert status == response.status_code
+        if status != 200:
+            return
+
+        result = await rpc.call("image.classify", {"image": image})
+        assert result["prediction"] == response.json()["prediction"]
+
+        bogus = b"not an image at all"
+        rejected = await http.post("/ml/image/classify", files={"file": ("a.png", bogus, "image/png")})
+        assert await rpc_status(rpc.call("image.classify", {"image": bogus})) == rejected.status_code
+
+        items = [item async for item in rpc.stream("image.classify_stream", {"images": [image, bogus]})]
+        assert items[0]["prediction"] == result["prediction"]
+        assert items[1]["success"] is False
+
+    run(check)
+
+
+def test_classify():
+    async def check(http, rpc):
+        image = sample_image(1)
+        response = await http.post(
+            "/ml/classify",
+            data={"text": TEXTS[1]},
+            files={"file": ("a.png", image, "image/png")}
+        )
+        status = await rpc_status(rpc.call("classify", {"text": TEXTS[1], "image": image}))
+        assert status == response.status_code
+        if status == 200:
+            result = await rpc.call("classify", {"text": TEXTS[1], "image": image})
+            assert result["prediction"] == response.json()["prediction"]
+
+        text_only = (await http.post("/ml/classify", data={"text": TEXTS[1]})).json()
+        assert (await rpc.call("classify", {"text": TEXTS[1]}))["prediction"] == text_only["prediction"]
+
+    run(check)
+
+
+def test_request_caps():
+    async def check(http, rpc):
+        too_many = [TEXTS[0]] * (MAX_BATCH_TEXTS + 1)
+        response = await http.post("/ml/text/classify-batch", json={"texts": too_many})
+        # 422 from the request model's max_items, before the route's own 400 check
+        assert response.status_code in (400, 422)
+        assert await rpc_status(rpc.call("text.classify_batch", {"texts": too_many})) == 400
+
+        too_many = [TEXTS[0]] * (settings.EMBED_MAX_TEXTS + 1)
+        assert (await http.post("/ml/text/embed", json={"texts": too_many})).status_code == 400
+        assert await rpc_status(rpc.call("text.embed", {"texts": too_many})) == 400
+        assert await stream_status(rpc, "text.embed_stream", {"texts": too_many}) == 400
+        assert await stream_status(rpc, "text.classify_stream", {"texts": too_many}) == 400
+
+        images = [b"x"] * (settings.RPC_MAX_STREAM_IMAGES + 1)
+        assert await stream_status(rpc, "image.classify_stream", {"images": images}) == 400
+
+        assert await rpc_status(rpc.call("text.classify_batch", {"texts": TEXTS[0]})) == 400
+        assert await rpc_status(rpc.call("text.classify")) == 400
+        assert await rpc_status(rpc.call("no.such.method")) == 404
+
+    run(check)
@@ -0,0 +1,223 @@
+"""
+Cascade Trainer - Trains the fast first-stage text classifier
+Fits a calibrated char n-gram linear model on the same labels as the mBERT head
+and reports how much traffic it can answer at each confidence threshold
+
+Usage:
+    python train_cascade.py --data complaints.csv
+    python train_cascade.py --data complaints.jsonl --compare-full
+"""
+
+import argparse
+import time
+from pathlib import Path
+
+import joblib
+import numpy as np
+from sklearn.calibration import CalibratedClassifierCV
+from sklearn.feature_extraction.text import HashingVectorizer
+from sklearn.linear_model import SGDClassifier
+from sklearn.model_selection import train_test_split
+from sklearn.pipeline import Pipeline
+
+from app.config import settings
+from app.utils.datasets import load_labeled_texts
+from app.utils.preprocessing import TextPreprocessor
+
+DEFAULT_THRESHOLDS = [0.5, 0.6, 0.7, 0.8, 0.85, 0.9, 0.95, 0.98]
+
+
+def build_fast_classifier(n_features: int = 2 ** 18) -> Pipeline:
+    """
+    Char n-gram hashed linear model with sigmoid-calibrated probabilities
+
+    char_wb n-grams work on Devanagari and Latin text alike and need no
+    vocabulary, so the pickled model stays small.
+    """
+    vectorizer = HashingVectorizer(
+        analyzer="char_wb",
+        ngram_range=(2, 4),
+        n_features=n_features,
+        alternate_sign=False,
+        norm="l2",
+    )
+    linear = SGDClassifier(
+        loss="hinge",
+        alpha=1e-5,
+        max_iter=50,
+        tol=1e-4,
+        random_state=42,
+    )
+    return Pipeline([
+        ("vectorizer", vectorizer),
+        ("classifier", CalibratedClassifierCV(linear, method="sigmoid", cv=3)),
+    ])
+
+
+def full_model_predictions(texts: list) -> np.ndarray:
+    """Predict with the deployed mBERT embedder + classifier head"""
+    from app.services.text_service import text_classification_service as service
+
+    service.load_models()
+    results = service.classify_embeddings(service.embed_texts(texts))
+    return np.asarray([result["prediction"] for result in results]).astype(str)
+
+
+def cascade_report(
+    fast_proba: np.ndarray,
+    fast_classes: np.ndarray,
+    y_true: np.ndarray,
+    thresholds: list,
+    full_pred: np.ndarray = None
+) -> list:
+    """Coverage and accuracy of the cascade at each threshold"""
+    fast_conf = fast_proba.max(axis=1)
+    fast_pred = fast_classes[fast_proba.argmax(axis=1)]
+
+    rows = []
+    for threshold in thresholds:
+        served = fast_conf >= threshold
+        coverage = float(served.mean())
+        fast_acc = float((fast_pred[served] == y_true[served]).mean()) if served.any() else None
+
+        cascade_acc = None
+        if full_pred is not None:
+            combined = np.where(served, fast_pred, full_pred)
+            cascade_acc = float((combined == y_true).mean())
+
+        rows.append({
+            "threshold": threshold,
+            "fast_fraction": coverage,
+            "full_fraction": 1.0 - coverage,
+            "fast_accuracy": fast_acc,
+            "cascade_accuracy": cascade_acc,
+        })
+    return rows
+
+
+def train_cascade(
+    data_path: str,
+    output_path: str = None,
+    text_column: str = "text",
+    label_column: str = "label",
+    test_size: float = 0.2,
+    thresholds: list = None,
+    compare_full: bool = False,
+    tolerance: float = 0.005
+):
+    """
+    Train, evaluate and export the fast first-stage classifier
+
+    Args:
+        data_path: Labeled CSV/JSONL file
+        output_path: Where to save the model (default TEXT_FAST_MODEL_PATH)
+        test_size: Holdout fraction used for the report
+        thresholds: Confidence thresholds to evaluate
+        compare_full: Also run the mBERT head on the holdout to measure
+            cascade accuracy against the full model
+        tolerance: Max accuracy drop vs the full model when recommending
+            a threshold
+    """
+    output_path = Path(output_path or settings.TEXT_FAST_MODEL_PATH)
+    thresholds = thresholds or DEFAULT_THRESHOLDS
+
+    texts, labels = load_labeled_texts(data_path, text_column, label_column)
+    cleaned = [TextPreprocessor.clean_text(text) for text in texts]
+    labels = np.asarray(labels)
+    print(f"Loaded {len(cleaned)} labeled texts, {len(set(labels))} classes")
+
+    train_idx, test_idx = train_test_split(
+        np.arange(len(cleaned)),
+        test_size=test_size,
+        stratify=labels,
+        random_state=42,
+    )
+    x_train = [cleaned[i] for i in train_idx]
+    x_test = [cleaned[i] for i in test_idx]
+    y_train, y_test = labels[train_idx], labels[test_idx]
+
+    model = build_fast_classifier()
+    start = time.perf_counter()
+    model.fit(x_train, y_train)
+    print(f"✓ Trained fast classifier in {time.perf_counter() - start:.1f}s")
+
+    start = time.perf_counter()
+    fast_proba = model.predict_proba(x_test)
+    per_text_us = (time.perf_counter() - start) / len(x_test) * 1e6
+    fast_classes = np.asarray(model.classes_).astype(str)
+    fast_accuracy = float((fast_classes[fast_proba.argmax(axis=1)] == y_test).mean())
+
+    full_pred = None
+    full_accuracy = None
+    if compare_full:
+        start = time.perf_counter()
+        full_pred = full_model_predictions([texts[i] for i in test_idx])
+        full_ms = (time.perf_counter() - start) / len(x_test) * 1000
+        full_accuracy = float((full_pred == y_test).mean())
+        print(f"Full model: accuracy {full_accuracy:.4f}, {full_ms:.2f} ms/text")
+
+    print(f"Fast stage: accuracy {fast_accuracy:.4f}, {per_text_us:.0f} µs/text")
+
+    rows = cascade_report(fast_proba, fast_classes, y_test, thresholds, full_pred)
+
+    print(f"\n{'threshold':>9} {'fast %':>8} {'full %':>8} {'fast acc':>9} {'cascade acc':>12}")
+    for row in rows:
+        fast_acc = f"{row['fast_accuracy']:.4f}" if row["fast_accuracy"] is not None else "-"
+        cascade_acc = f"{row['cascade_accuracy']:.4f}" if row["cascade_accuracy"] is not None else "-"
+        print(
+            f"{row['threshold']:>9.2f} {row['fast_fraction']:>8.1%} "
+            f"{row['full_fraction']:>8.1%} {fast_acc:>9} {cascade_acc:>12}"
+        )
+
+    if full_accuracy is not None:
+        acceptable = [
+            row for row in rows
+            if row["cascade_accuracy"] >= full_accuracy - tolerance
+        ]
+        if acceptable:
+            best = max(acceptable, key=lambda row: row["fast_fraction"])
+            print(
+                f"\nRecommended TEXT_CASCADE_THRESHOLD={best['threshold']} "
+                f"({best['fast_fraction']:.1%} served by fast stage, "
+                f"accuracy {best['cascade_accuracy']:.4f} vs {full_accuracy:.4f})"
+            )
+
+    # Refit on all labeled data before export
+    model = build_fast_classifier()
+    model.fit(cleaned, labels)
+    joblib.dump(model, output_path, compress=3)
+    print(f"\n✓ Fast classifier saved: {output_path}")
+
+    return rows
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Train the cascade first-stage text classifier")
+    parser.add_argument("--data", required=True, help="Labeled CSV/JSONL file")
+    parser.add_argument("--output", default=None, help="Output .pkl path")
+    parser.add_argument("--text-column", default="text")
+    parser.add_argument("--label-column", default="label")
+    parser.add_argument("--test-size", type=float, default=0.2)
+    parser.add_argument(
+        "--thresholds",
+        type=float,
+        nargs="+",
+        default=None,
+        help="Confidence thresholds to report"
+    )
+    parser.add_argument(
+        "--compare-full",
+        action="store_true",
+        help="Run the mBERT head on the holdout to report cascade accuracy"
+    )
+    args = parser.parse_args()
+
+    train_cascade(
+        data_path=args.data,
+        output_path=args.output,
+        text_column=args.text_column,
+        label_column=args.label_column,
+        test_size=args.test_size,
+        thresholds=args.thresholds,
+        compare_full=args.compare_full,
+    )
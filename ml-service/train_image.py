@@ -0,0 +1,388 @@
+"""
+Image Trainer - Trains the CNN image classifier from a directory of photos
+Replaces the training notebook: a parallel tf.data input pipeline (decode,
+resize, cache, batched augmentation, AUTOTUNE prefetch), class weights from
+label counts, resumable checkpoints, and a verified .keras export in the
+class order the image service serves (settings.CATEGORIES)
+
+Expected layout (one folder per category, names matched loosely, e.g.
+"electricpoles" -> "electric_poles", "pothole" -> "potholes"):
+    dataset/train/<category>/*.jpg
+    dataset/val/<category>/*.jpg
+    dataset/test/<category>/*.jpg     (optional)
+
+Usage:
+    python train_image.py --data dataset/
+    python train_image.py --data dataset/ --epochs 8 --fine-tune-epochs 5 --batch-size 32
+    python train_image.py --data dataset/ --cache-dir /tmp/civic-cache   # datasets larger than RAM
+    python train_image.py --data dataset/ --benchmark-input 50           # input pipeline only
+"""
+
+import argparse
+import os
+import time
+from pathlib import Path
+from typing import Dict, List, Optional, Tuple
+
+import numpy as np
+import tensorflow as tf
+
+from app.config import settings
+from app.models.compiled_model import CompiledImageModel
+
+IMAGE_EXTENSIONS = {".jpg", ".jpeg", ".png", ".bmp", ".gif", ".webp"}
+
+
+def _category_key(name: str) -> str:
+    """Loose category name: "Electric_Poles" / "electricpoles" -> "electricpole" """
+    return "".join(char for char in name.lower() if char.isalnum()).rstrip("s")
+
+
+def list_images(split_dir: Path) -> Tuple[np.ndarray, np.ndarray]:
+    """
+    File paths and category indices of one split
+
+    Labels index settings.CATEGORIES, the order the image service reads
+    the CNN's outputs in (not the alphabetical folder order).
+
+    Raises:
+        ValueError: If a folder matches no category or a category has no images
+    """
+    categories = {_category_key(category): index for index, category in enumerate(settings.CATEGORIES)}
+    paths, labels = [], []
+
+    for directory in sorted(path for path in split_dir.iterdir() if path.is_dir()):
+        index = categories.get(_category_key(directory.name))
+        if index is None:
+            raise ValueError(f"Folder '{directory.name}' in {split_dir} matches none of {settings.CATEGORIES}")
+        files = sorted(
+            str(path) for path in directory.rglob("*")
+            if path.suffix.lower() in IMAGE_EXTENSIONS
+        )
+        paths.extend(files)
+        labels.extend([index] * len(files))
+
+    labels = np.asarray(labels, dtype=np.int32)
+    missing = [category for index, category in enumerate(settings.CATEGORIES) if not np.any(labels == index)]
+    if missing:
+        raise ValueError(f"No images for {missing} in {split_dir}")
+    return np.asarray(paths), labels
+
+
+def class_weights(labels: np.ndarray) -> Dict[int, float]:
+    """Balanced class weights n / (k * count_c), from the label array in one pass"""
+    counts = np.bincount(labels, minlength=len(settings.CATEGORIES))
+    weights = labels.size / (len(counts) * np.maximum(counts, 1))
+    return {index: float(weight) for index, weight in enumerate(weights)}
+
+
+def build_augmentation(seed: int) -> tf.keras.Model:
+    """Batched augmentation from the notebook (flip, rotation, zoom, contrast)"""
+    return tf.keras.Sequential([
+        tf.keras.layers.RandomFlip("horizontal", seed=seed),
+        tf.keras.layers.RandomRotation(0.1, seed=seed),
+        tf.keras.layers.RandomZoom(0.1, seed=seed),
+        tf.keras.layers.RandomContrast(0.1, seed=seed),
+    ], name="augmentation")
+
+
+def decode_resize(path: tf.Tensor) -> tf.Tensor:
+    """
+    Decode and resize one image to uint8 IMAGE_SIZE
+
+    Lanczos with antialiasing, like the PIL LANCZOS resize at serve time;
+    kept as uint8 so the cache holds a quarter of the float32 bytes.
+    """
+    image = tf.io.decode_image(tf.io.read_file(path), channels=3, expand_animations=False)
+    image = tf.image.resize(image, settings.IMAGE_SIZE, method="lanczos3", antialias=True)
+    image = tf.cast(tf.clip_by_value(tf.round(image), 0.0, 255.0), tf.uint8)
+    image.set_shape((*settings.IMAGE_SIZE, 3))
+    return image
+
+
+def make_dataset(
+    paths: np.ndarray,
+    labels: np.ndarray,
+    batch_size: int,
+    training: bool,
+    seed: int,
+    cache: Optional[str] = None,
+    deterministic: bool = False
+) -> tf.data.Dataset:
+    """
+    Input pipeline for one split
+
+    Decoding runs in parallel and is cached once (in memory, or in files
+    under `cache`); training shuffles the cached images each epoch, then
+    augments whole batches in parallel. Batches are prefetched with
+    AUTOTUNE so the CPU prepares the next batches while the model trains.
+    """
+    n_classes = len(settings.CATEGORIES)
+    dataset = tf.data.Dataset.from_tensor_slices((paths, labels))
+    dataset = dataset.map(
+        lambda path, label: (decode_resize(path), tf.one_hot(label, n_classes)),
+        num_parallel_calls=tf.data.AUTOTUNE
+    )
+    # Unreadable files are skipped instead of failing the epoch
+    dataset = dataset.ignore_errors(log_warning=True)
+    dataset = dataset.cache(cache or "")
+
+    if training:
+        dataset = dataset.shuffle(len(paths), seed=seed, reshuffle_each_iteration=True)
+    dataset = dataset.batch(batch_size)
+
+    images = tf.keras.layers.Rescaling(1.0 / 255)
+    if training:
+        augmentation = build_augmentation(seed)
+        dataset = dataset.map(
+            lambda x, y: (tf.clip_by_value(images(augmentation(tf.cast(x, tf.float32), training=True)), 0.0, 1.0), y),
+            num_parallel_calls=tf.data.AUTOTUNE
+        )
+    else:
+        dataset = dataset.map(
+            lambda x, y: (images(tf.cast(x, tf.float32)), y),
+            num_parallel_calls=tf.data.AUTOTUNE
+        )
+
+    options = tf.data.Options()
+    options.deterministic = deterministic
+    return dataset.prefetch(tf.data.AUTOTUNE).with_options(options)
+
+
+def build_model(weights: Optional[str] = "imagenet") -> Tuple[tf.keras.Model, tf.keras.Model]:
+    """MobileNetV2 backbone (frozen) + the notebook's classification head"""
+    base_model = tf.keras.applications.MobileNetV2(
+        input_shape=(*settings.IMAGE_SIZE, 3),
+        include_top=False,
+        weights=weights
+    )
+    base_model.trainable = False
+
+    model = tf.keras.Sequential([
+        tf.keras.layers.Input(shape=(*settings.IMAGE_SIZE, 3)),
+        base_model,
+        tf.keras.layers.GlobalAveragePooling2D(),
+        tf.keras.layers.BatchNormalization(),
+        tf.keras.layers.Dense(128, activation="relu"),
+        tf.keras.layers.Dropout(0.5),
+        tf.keras.layers.Dense(len(settings.CATEGORIES), activation="softmax")
+    ])
+    return model, base_model
+
+
+def compile_model(model: tf.keras.Model, learning_rate: float) -> None:
+    model.compile(
+        optimizer=tf.keras.optimizers.Adam(learning_rate=learning_rate),
+        loss="categorical_crossentropy",
+        metrics=[
+            "accuracy",
+            tf.keras.metrics.Precision(name="precision"),
+            tf.keras.metrics.Recall(name="recall")
+        ]
+    )
+
+
+class ThroughputCallback(tf.keras.callbacks.Callback):
+    """Prints training images per second after every epoch"""
+
+    def __init__(self, images_per_epoch: int):
+        super().__init__()
+        self.images_per_epoch = images_per_epoch
+        self.rates: List[float] = []
+        self._start = 0.0
+
+    def on_epoch_begin(self, epoch, logs=None):
+        self._start = time.perf_counter()
+
+    def on_epoch_end(self, epoch, logs=None):
+        # Includes validation, which is what an epoch costs on the build box
+        rate = self.images_per_epoch / (time.perf_counter() - self._start)
+        self.rates.append(rate)
+        print(f"  epoch {epoch + 1}: {rate:.1f} images/s")
+
+
+def fit_phase(
+    name: str,
+    model: tf.keras.Model,
+    train_ds: tf.data.Dataset,
+    val_ds: tf.data.Dataset,
+    epochs: int,
+    weights: Dict[int, float],
+    checkpoint_dir: Path,
+    images_per_epoch: int
+) -> ThroughputCallback:
+    """
+    One fit() phase with resumable and best-epoch checkpoints
+
+    BackupAndRestore resumes an interrupted phase at its last finished
+    epoch when the script is re-run with the same --checkpoint-dir.
+    """
+    throughput = ThroughputCallback(images_per_epoch)
+    model.fit(
+        train_ds,
+        validation_data=val_ds,
+        epochs=epochs,
+        class_weight=weights,
+        callbacks=[
+            tf.keras.callbacks.BackupAndRestore(str(checkpoint_dir / f"backup_{name}")),
+            tf.keras.callbacks.ModelCheckpoint(
+                str(checkpoint_dir / f"best_{name}.keras"),
+                monitor="val_loss",
+                save_best_only=True
+            ),
+            tf.keras.callbacks.EarlyStopping(monitor="val_loss", patience=2, restore_best_weights=True),
+            throughput,
+        ],
+        verbose=2
+    )
+    return throughput
+
+
+def evaluate(model: tf.keras.Model, dataset: tf.data.Dataset) -> None:
+    """Overall metrics and per-category accuracy"""
+    y_true, y_pred = [], []
+    for images, labels in dataset:
+        y_true.append(np.argmax(labels.numpy(), axis=1))
+        y_pred.append(np.argmax(model(images, training=False).numpy(), axis=1))
+    y_true, y_pred = np.concatenate(y_true), np.concatenate(y_pred)
+
+    n_classes = len(settings.CATEGORIES)
+    confusion = np.bincount(y_true * n_classes + y_pred, minlength=n_classes ** 2).reshape(n_classes, n_classes)
+    print(f"  accuracy: {np.mean(y_true == y_pred):.4f} ({len(y_true)} images)")
+    for index, category in enumerate(settings.CATEGORIES):
+        total = confusion[index].sum()
+        recall = confusion[index, index] / total if total else 0.0
+        print(f"  {category:<16} {recall:.3f} ({total} images)")
+
+
+def export_model(model: tf.keras.Model, output: Path, sample: np.ndarray) -> None:
+    """
+    Save as .keras and verify it before replacing the served file
+
+    The export is reloaded the way ModelLoader loads it (load_model with
+    compile=False, wrapped in CompiledImageModel) and must reproduce the
+    in-memory model's predictions.
+    """
+    output.parent.mkdir(parents=True, exist_ok=True)
+    tmp = output.with_name(f"{output.stem}.tmp.keras")
+    model.save(str(tmp))
+
+    reloaded = CompiledImageModel(
+        tf.keras.models.load_model(str(tmp), compile=False),
+        batch_sizes=[len(sample)]
+    )
+    expected = model(sample, training=False).numpy()
+    if not np.allclose(reloaded(sample), expected, atol=1e-5):
+        tmp.unlink()
+        raise RuntimeError("Exported model does not reproduce the trained model's predictions")
+
+    os.replace(tmp, output)
+
+
+def benchmark_input(dataset: tf.data.Dataset, batches: int) -> float:
+    """Images per second the input pipeline alone delivers (second pass, after caching)"""
+    for _ in dataset.take(batches):
+        pass
+    count = 0
+    start = time.perf_counter()
+    for images, _ in dataset.take(batches):
+        count += int(images.shape[0])
+    return count / (time.perf_counter() - start)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Train the CNN image classifier")
+    parser.add_argument("--data", required=True, help="Directory with train/, val/ and optional test/")
+    parser.add_argument("--output", default=str(settings.MODELS_DIR / "image_classifier.keras"))
+    parser.add_argument("--epochs", type=int, default=5, help="Epochs with the backbone frozen")
+    parser.add_argument("--fine-tune-epochs", type=int, default=0, help="Epochs with the last layers unfrozen")
+    parser.add_argument("--fine-tune-layers", type=int, default=20)
+    parser.add_argument("--batch-size", type=int, default=32)
+    parser.add_argument("--learning-rate", type=float, default=1e-3)
+    parser.add_argument("--weights", default="imagenet", help="Backbone weights ('none' for random init)")
+    parser.add_argument("--checkpoint-dir", default="checkpoints/image", help="Resumable checkpoints")
+    parser.add_argument("--cache-dir", default=None, help="Cache decoded images on disk instead of in memory")
+    parser.add_argument("--threads", type=int, default=None, help="TensorFlow intra-op threads")
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--deterministic", action="store_true", help="Reproducible run (slower)")
+    parser.add_argument("--benchmark-input", type=int, default=0, metavar="BATCHES",
+                        help="Only measure input pipeline throughput over this many batches")
+    args = parser.parse_args()
+
+    if args.threads:
+        tf.config.threading.set_intra_op_parallelism_threads(args.threads)
+    tf.keras.utils.set_random_seed(args.seed)
+    if args.deterministic:
+        tf.config.experimental.enable_op_determinism()
+
+    data = Path(args.data)
+    train_paths, train_labels = list_images(data / "train")
+    val_paths, val_labels = list_images(data / "val")
+    weights = class_weights(train_labels)
+    print(f"Train: {len(train_paths)} images, val: {len(val_paths)} images")
+    print("Class weights: " + ", ".join(
+        f"{category}={weights[index]:.2f}" for index, category in enumerate(settings.CATEGORIES)
+    ))
+
+    cache = None
+    if args.cache_dir:
+        Path(args.cache_dir).mkdir(parents=True, exist_ok=True)
+        cache = str(Path(args.cache_dir) / "train")
+
+    train_ds = make_dataset(
+        train_paths, train_labels, args.batch_size, True, args.seed,
+        cache=cache, deterministic=args.deterministic
+    )
+    val_ds = make_dataset(
+        val_paths, val_labels, args.batch_size, False, args.seed,
+        cache=str(Path(args.cache_dir) / "val") if args.cache_dir else None,
+        deterministic=args.deterministic
+    )
+
+    if args.benchmark_input:
+        rate = benchmark_input(train_ds, args.benchmark_input)
+        print(f"✓ Input pipeline: {rate:.1f} images/s ({args.batch_size} per batch)")
+        return
+
+    model, base_model = build_model(None if args.weights == "none" else args.weights)
+    compile_model(model, args.learning_rate)
+
+    checkpoint_dir = Path(args.checkpoint_dir)
+    checkpoint_dir.mkdir(parents=True, exist_ok=True)
+
+    started = time.perf_counter()
+    print(f"\nTraining head ({args.epochs} epochs, backbone frozen)...")
+    rates = fit_phase(
+        "head", model, train_ds, val_ds, args.epochs, weights, checkpoint_dir, len(train_paths)
+    ).rates
+
+    if args.fine_tune_epochs:
+        print(f"\nFine-tuning the last {args.fine_tune_layers} backbone layers ({args.fine_tune_epochs} epochs)...")
+        base_model.trainable = True
+        for layer in base_model.layers[:-args.fine_tune_layers]:
+            layer.trainable = False
+        compile_model(model, args.learning_rate / 10)
+        rates += fit_phase(
+            "fine_tune", model, train_ds, val_ds, args.fine_tune_epochs, weights, checkpoint_dir, len(train_paths)
+        ).rates
+
+    elapsed = time.perf_counter() - started
+    print(f"\n✓ Trained in {elapsed / 60:.1f} min, mean {np.mean(rates):.1f} images/s")
+
+    print("\nValidation:")
+    evaluate(model, val_ds)
+    if (data / "test").is_dir():
+        test_paths, test_labels = list_images(data / "test")
+        print("\nTest:")
+        evaluate(model, make_dataset(test_paths, test_labels, args.batch_size, False, args.seed))
+
+    sample = next(iter(val_ds))[0].numpy()[:4]
+    output = Path(args.output)
+    export_model(model, output, sample)
+    print(f"\n✓ Exported {output} (outputs in order {settings.CATEGORIES})")
+    if output.resolve() != settings.IMAGE_MODEL_PATH.resolve():
+        print(f"  Serve it with IMAGE_MODEL_PATH={output}")
+
+
+if __name__ == "__main__":
+    main()
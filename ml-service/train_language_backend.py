@@ -0,0 +1,305 @@
+"""
+Language Backend Trainer - Trains a per-language text backend
+Fits a classifier head on a smaller encoder (e.g. an English-only
+sentence-transformer) for the texts of one detected language, then reports
+per-language accuracy and latency against the multilingual model.
+With --train-profiles it instead fits the character n-gram profiles used
+by language detection from texts with a known language
+
+Usage:
+    python train_language_backend.py --data complaints.csv --language en \\
+        --encoder sentence-transformers/all-MiniLM-L6-v2 --name english
+    python train_language_backend.py --data complaints.csv --report-only
+    python train_language_backend.py --data languages.csv --train-profiles \\
+        --language-column language
+"""
+
+import argparse
+import json
+import time
+from collections import Counter, defaultdict
+from pathlib import Path
+
+import joblib
+import numpy as np
+from sentence_transformers import SentenceTransformer
+from sklearn.linear_model import LogisticRegression
+from sklearn.model_selection import train_test_split
+from sklearn.preprocessing import LabelEncoder
+
+from app.config import settings
+from app.models.linear_head import LinearHead
+from app.models.text_backend import CASCADE, MULTILINGUAL, TextBackend
+from app.utils.categories import canonical_category
+from app.utils.datasets import load_labeled_texts
+from app.utils.language import (
+    ENGLISH, HINDI, LANGUAGES, MARATHI, ROMANIZED_HINDI, LanguageProfiles, detect_language
+)
+from app.utils.preprocessing import TextPreprocessor
+
+
+def language_report(texts: list, labels: np.ndarray, backends: dict) -> list:
+    """
+    Accuracy and latency of each route, per detected language
+
+    Args:
+        texts: Raw holdout texts
+        labels: Their labels
+        backends: {route name: callable(cleaned texts) -> predicted labels}
+
+    Returns:
+        Rows of {language, route, count, accuracy, ms_per_text}
+    """
+    by_language = defaultdict(list)
+    for index, text in enumerate(texts):
+        cleaned, guess = TextPreprocessor.clean_and_detect(text)
+        by_language[guess.language].append((index, cleaned))
+
+    rows = []
+    for language in LANGUAGES:
+        items = by_language.get(language)
+        if not items:
+            continue
+        cleaned = [text for _, text in items]
+        expected = [canonical_category(str(labels[index])) for index, _ in items]
+
+        for route, predict in backends.items():
+            start = time.perf_counter()
+            predicted = predict(cleaned)
+            elapsed = time.perf_counter() - start
+            correct = sum(
+                canonical_category(str(p)) == e for p, e in zip(predicted, expected)
+            )
+            rows.append({
+                "language": language,
+                "route": route,
+                "count": len(items),
+                "accuracy": correct / len(items),
+                "ms_per_text": elapsed / len(items) * 1000,
+            })
+    return rows
+
+
+def print_report(rows: list):
+    print(f"\n{'language':>9} {'route':>14} {'texts':>7} {'accuracy':>9} {'ms/text':>9}")
+    for row in rows:
+        print(
+            f"{row['language']:>9} {row['route']:>14} {row['count']:>7} "
+            f"{row['accuracy']:>9.4f} {row['ms_per_text']:>9.2f}"
+        )
+
+
+def multilingual_predictor():
+    """Predictions from the deployed mBERT embedder + head"""
+    from app.services.text_service import text_classification_service as service
+
+    service.load_models()
+
+    def predict(cleaned: list) -> list:
+        results = service.classify_embeddings(service.encode_texts(cleaned))
+        return [result["prediction"] for result in results]
+
+    return service, predict
+
+
+def backend_predictor(service, backend: TextBackend):
+    def predict(cleaned: list) -> list:
+        embeddings = service.encode_texts(cleaned, embedder=backend.embedder)
+        return [result["prediction"] for result in service.classify_embeddings(embeddings, backend)]
+
+    return predict
+
+
+def train_language_profiles(
+    data_path: str,
+    text_column: str = "text",
+    language_column: str = "language",
+    test_size: float = 0.2
+) -> LanguageProfiles:
+    """
+    Fit the character n-gram profiles and save them to LANGUAGE_PROFILES_PATH
+
+    Reports holdout accuracy of the new profiles against current
+    detection (the keyword heuristic if no profiles are installed yet),
+    then refits on all rows.
+
+    Args:
+        data_path: CSV/JSONL file of texts with their language
+            (en, hi, mr or hi-latn; other values are skipped)
+        language_column: Field holding the language
+        test_size: Holdout fraction used for the report
+    """
+    texts, languages = load_labeled_texts(data_path, text_column, language_column)
+    rows = [
+        (TextPreprocessor.clean_text(text), language)
+        for text, language in zip(texts, languages)
+        if language in (ENGLISH, HINDI, MARATHI, ROMANIZED_HINDI)
+    ]
+    if len({language for _, language in rows}) < 2:
+        raise SystemExit("Need texts of at least two of: en, hi, mr, hi-latn")
+    texts, languages = [text for text, _ in rows], [language for _, language in rows]
+    print(f"Loaded {len(texts)} texts: {dict(Counter(languages))}")
+
+    train_texts, test_texts, train_languages, test_languages = train_test_split(
+        texts, languages, test_size=test_size, stratify=languages, random_state=42
+    )
+    profiles = LanguageProfiles.fit(train_texts, train_languages)
+
+    print(f"\n{'language':>9} {'texts':>7} {'profiles':>9} {'current':>9}")
+    for language in sorted(set(test_languages)):
+        items = [text for text, truth in zip(test_texts, test_languages) if truth == language]
+        candidates = (ENGLISH, ROMANIZED_HINDI) if language in (ENGLISH, ROMANIZED_HINDI) else (HINDI, MARATHI)
+        by_profiles = [profiles.classify(text, candidates) for text in items]
+        profile_accuracy = np.mean([guess is not None and guess[0] == language for guess in by_profiles])
+        current_accuracy = np.mean([detect_language(text).language == language for text in items])
+        print(f"{language:>9} {len(items):>7} {profile_accuracy:>9.3f} {current_accuracy:>9.3f}")
+
+    profiles = LanguageProfiles.fit(texts, languages)
+    path = Path(settings.LANGUAGE_PROFILES_PATH)
+    path.parent.mkdir(parents=True, exist_ok=True)
+    profiles.save(path)
+    print(f"\n✓ Language profiles saved: {path} ({path.stat().st_size / 1024:.0f} KB)")
+    return profiles
+
+
+def train_language_backend(
+    data_path: str,
+    language: str = None,
+    encoder: str = None,
+    name: str = None,
+    text_column: str = "text",
+    label_column: str = "label",
+    test_size: float = 0.2,
+    report_only: bool = False
+):
+    """
+    Train, export and evaluate a per-language backend
+
+    Args:
+        data_path: Labeled CSV/JSONL file
+        language: Only train on texts detected as this language
+        encoder: sentence-transformers model name or path for the backend
+        name: Backend directory under TEXT_BACKENDS_DIR
+        test_size: Holdout fraction used for the report
+        report_only: Skip training; report the multilingual model, the
+            cascade model and any backends already on disk
+    """
+    texts, labels = load_labeled_texts(data_path, text_column, label_column)
+    labels = np.asarray(labels)
+    print(f"Loaded {len(texts)} labeled texts")
+
+    train_idx, test_idx = train_test_split(
+        np.arange(len(texts)),
+        test_size=test_size,
+        stratify=labels,
+        random_state=42,
+    )
+
+    service, predict_multilingual = multilingual_predictor()
+    backends = {MULTILINGUAL: predict_multilingual}
+    if service.fast_model is not None:
+        backends[CASCADE] = lambda cleaned: [
+            service.predict_fast(text, threshold=0.0)["prediction"] for text in cleaned
+        ]
+
+    if not report_only:
+        if not (language and encoder and name):
+            raise SystemExit("--language, --encoder and --name are required unless --report-only")
+
+        train_texts = []
+        train_labels = []
+        for index in train_idx:
+            cleaned, guess = TextPreprocessor.clean_and_detect(texts[index])
+            if guess.language == language:
+                train_texts.append(cleaned)
+                train_labels.append(labels[index])
+        if len(set(train_labels)) < 2:
+            raise SystemExit(f"Need at least two classes of '{language}' texts, found {len(set(train_labels))}")
+        print(f"Training '{name}' on {len(train_texts)} '{language}' texts with {encoder}")
+
+        embedder = SentenceTransformer(encoder)
+        label_encoder = LabelEncoder().fit(train_labels)
+
+        start = time.perf_counter()
+        embeddings = service.encode_texts(train_texts, embedder=embedder)
+        head = LogisticRegression(max_iter=500)
+        head.fit(embeddings, label_encoder.transform(train_labels))
+        print(f"✓ Trained head in {time.perf_counter() - start:.1f}s")
+
+        directory = Path(settings.TEXT_BACKENDS_DIR) / name
+        directory.mkdir(parents=True, exist_ok=True)
+        embedder.save(str(directory / "encoder"))
+        joblib.dump(head, directory / "head.pkl")
+        joblib.dump(label_encoder, directory / "label_encoder.pkl")
+        LinearHead.from_sklearn(head, label_encoder).save(directory / "head.npz")
+        print(f"✓ Backend saved: {directory}")
+
+    backends_dir = Path(settings.TEXT_BACKENDS_DIR)
+    if backends_dir.exists():
+        for directory in sorted(path for path in backends_dir.iterdir() if path.is_dir()):
+            try:
+                backend = TextBackend.load(directory.name, directory)
+            except FileNotFoundError as e:
+                print(f"Skipping {directory.name}: {e}")
+                continue
+            backends[directory.name] = backend_predictor(service, backend)
+
+    rows = language_report([texts[i] for i in test_idx], labels[test_idx], backends)
+    print_report(rows)
+
+    # Fastest route per language within 0.5 points of the multilingual model
+    routes = {}
+    for language in LANGUAGES:
+        candidates = [row for row in rows if row["language"] == language]
+        baseline = next((row for row in candidates if row["route"] == MULTILINGUAL), None)
+        if baseline is None:
+            continue
+        acceptable = [row for row in candidates if row["accuracy"] >= baseline["accuracy"] - 0.005]
+        best = min(acceptable, key=lambda row: row["ms_per_text"])
+        if best["route"] != MULTILINGUAL:
+            routes[language] = best["route"]
+
+    print(f"\nSuggested TEXT_LANGUAGE_ROUTES={json.dumps(routes)}")
+    return rows
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Train and evaluate per-language text backends")
+    parser.add_argument("--data", required=True, help="Labeled CSV/JSONL file")
+    parser.add_argument("--language", default=None, help=f"One of: {', '.join(LANGUAGES)}")
+    parser.add_argument("--encoder", default=None, help="sentence-transformers model name or path")
+    parser.add_argument("--name", default=None, help="Backend name (directory under TEXT_BACKENDS_DIR)")
+    parser.add_argument("--text-column", default="text")
+    parser.add_argument("--label-column", default="label")
+    parser.add_argument("--language-column", default="language", help="Language field for --train-profiles")
+    parser.add_argument("--test-size", type=float, default=0.2)
+    parser.add_argument(
+        "--report-only",
+        action="store_true",
+        help="Only report per-language accuracy and latency of existing routes"
+    )
+    parser.add_argument(
+        "--train-profiles",
+        action="store_true",
+        help="Fit the character n-gram language profiles used for routing"
+    )
+    args = parser.parse_args()
+
+    if args.train_profiles:
+        train_language_profiles(
+            data_path=args.data,
+            text_column=args.text_column,
+            language_column=args.language_column,
+            test_size=args.test_size,
+        )
+    else:
+        train_language_backend(
+            data_path=args.data,
+            language=args.language,
+            encoder=args.encoder,
+            name=args.name,
+            text_column=args.text_column,
+            label_column=args.label_column,
+            test_size=args.test_size,
+            report_only=args.report_only,
+        )
@@ -0,0 +1,174 @@
+"""
+Projection Trainer - Fits a dimensionality-reduced embedding head
+Sweeps target dimensions, fits projection + classifier head together and
+reports the accuracy-vs-dimension curve, then exports the chosen pair in
+the format ModelLoader loads (text_projection.npz + text_classifier.pkl)
+
+Usage:
+    python train_projection.py --data complaints.csv
+    python train_projection.py --embeddings corpus.npz --kind truncate --dim 128
+"""
+
+import argparse
+import time
+from pathlib import Path
+
+import joblib
+import numpy as np
+from sklearn.linear_model import LogisticRegression
+from sklearn.model_selection import train_test_split
+from sklearn.preprocessing import LabelEncoder
+
+from app.config import settings
+from app.models.projection import EmbeddingProjection, PROJECTION_KINDS
+from app.utils.datasets import load_labeled_texts
+
+DEFAULT_DIMS = [32, 48, 64, 96, 128, 192, 256]
+
+
+def build_head() -> LogisticRegression:
+    """Classifier head matching the deployed text_classifier.pkl"""
+    return LogisticRegression(max_iter=500)
+
+
+def fit_projection(kind: str, embeddings: np.ndarray, dim: int) -> EmbeddingProjection:
+    """Fit a projection of the requested kind"""
+    if kind == "pca":
+        return EmbeddingProjection.fit_pca(embeddings, dim)
+    return EmbeddingProjection.truncation(dim)
+
+
+def load_embeddings(args) -> tuple:
+    """Load (embeddings, labels) from an .npz cache or by embedding a labeled file"""
+    if args.embeddings:
+        with np.load(args.embeddings, allow_pickle=False) as data:
+            return data["embeddings"].astype(np.float32), data["labels"].astype(str)
+
+    from app.services.text_service import text_classification_service as service
+
+    # Embed raw vectors: the projection must be fitted before any is applied
+    settings.TEXT_PROJECTION_ENABLED = False
+    texts, labels = load_labeled_texts(args.data, args.text_column, args.label_column)
+    print(f"Embedding {len(texts)} texts with {settings.MBERT_MODEL}...")
+    start = time.perf_counter()
+    embeddings = service.embed_texts(texts)
+    print(f"✓ Embedded in {time.perf_counter() - start:.1f}s")
+
+    labels = np.asarray(labels)
+    if args.save_embeddings:
+        np.savez(args.save_embeddings, embeddings=embeddings, labels=labels)
+        print(f"✓ Embeddings cached: {args.save_embeddings}")
+    return embeddings, labels
+
+
+def sweep_dimensions(
+    embeddings: np.ndarray,
+    labels: np.ndarray,
+    kind: str,
+    dims: list,
+    test_size: float = 0.2
+) -> list:
+    """Accuracy and head latency for each target dimension (plus the full dimension)"""
+    x_train, x_test, y_train, y_test = train_test_split(
+        embeddings, labels, test_size=test_size, stratify=labels, random_state=42
+    )
+    full_dim = embeddings.shape[1]
+
+    rows = []
+    for dim in sorted(set(d for d in dims if d < full_dim)) + [full_dim]:
+        projection = None if dim == full_dim else fit_projection(kind, x_train, dim)
+        train_x = x_train if projection is None else projection.transform(x_train)
+        test_x = x_test if projection is None else projection.transform(x_test)
+
+        head = build_head().fit(train_x, y_train)
+        accuracy = float((head.predict(test_x) == y_test).mean())
+
+        # Single-row latency of projection + head, as served per request
+        sample = x_test[:1]
+        repeats = 200
+        start = time.perf_counter()
+        for _ in range(repeats):
+            row = sample if projection is None else projection.transform(sample)
+            head.predict_proba(row)
+        head_us = (time.perf_counter() - start) / repeats * 1e6
+
+        rows.append({"dim": dim, "accuracy": accuracy, "head_us": head_us})
+    return rows
+
+
+def train_projection(args):
+    """Sweep, select and export projection + head"""
+    embeddings, labels = load_embeddings(args)
+    full_dim = embeddings.shape[1]
+    print(f"{len(embeddings)} samples, {full_dim}-dim embeddings, {len(set(labels))} classes")
+
+    rows = sweep_dimensions(embeddings, labels, args.kind, args.dims, args.test_size)
+    full_accuracy = rows[-1]["accuracy"]
+
+    print(f"\n{'dim':>5} {'accuracy':>9} {'Δ vs full':>10} {'head µs':>9}")
+    for row in rows:
+        print(
+            f"{row['dim']:>5} {row['accuracy']:>9.4f} "
+            f"{row['accuracy'] - full_accuracy:>+10.4f} {row['head_us']:>9.1f}"
+        )
+
+    if args.dim:
+        dim = args.dim
+    else:
+        dim = min(
+            row["dim"] for row in rows
+            if row["accuracy"] >= full_accuracy - args.tolerance
+        )
+    print(f"\nSelected dimension: {dim} ({args.kind})")
+
+    output_dir = Path(args.output_dir or settings.MODELS_DIR)
+    output_dir.mkdir(parents=True, exist_ok=True)
+    projection_path = output_dir / settings.TEXT_PROJECTION_PATH.name
+    head_path = output_dir / settings.TEXT_MODEL_PATH.name
+    encoder_path = output_dir / settings.LABEL_ENCODER_PATH.name
+
+    # Refit the selected projection and head on all samples
+    encoder = LabelEncoder().fit(labels)
+    y = encoder.transform(labels)
+
+    if dim >= full_dim:
+        projected = embeddings
+        if projection_path.exists():
+            projection_path.unlink()
+            print(f"✓ Removed {projection_path} (head uses full embeddings)")
+    else:
+        projection = fit_projection(args.kind, embeddings, dim)
+        projected = projection.transform(embeddings)
+        projection.save(projection_path)
+        print(f"✓ Projection saved: {projection_path}")
+
+    head = build_head().fit(projected, y)
+    joblib.dump(head, head_path)
+    joblib.dump(encoder, encoder_path)
+    print(f"✓ Head saved: {head_path}")
+    print(f"✓ Label encoder saved: {encoder_path}")
+
+    return rows
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Fit a dimensionality-reduced text head")
+    source = parser.add_mutually_exclusive_group(required=True)
+    source.add_argument("--data", help="Labeled CSV/JSONL file to embed")
+    source.add_argument("--embeddings", help=".npz with 'embeddings' and 'labels' arrays")
+    parser.add_argument("--save-embeddings", help="Cache computed embeddings to this .npz")
+    parser.add_argument("--text-column", default="text")
+    parser.add_argument("--label-column", default="label")
+    parser.add_argument("--kind", choices=PROJECTION_KINDS, default="pca")
+    parser.add_argument("--dims", type=int, nargs="+", default=DEFAULT_DIMS)
+    parser.add_argument("--dim", type=int, default=None, help="Export this dimension instead of auto-selecting")
+    parser.add_argument(
+        "--tolerance",
+        type=float,
+        default=0.005,
+        help="Max accuracy drop vs full dimension when auto-selecting"
+    )
+    parser.add_argument("--test-size", type=float, default=0.2)
+    parser.add_argument("--output-dir", default=None, help="Defaults to the models directory")
+
+    train_projection(parser.parse_args())
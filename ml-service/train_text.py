@@ -0,0 +1,281 @@
+"""
+Text Trainer - Embeds a labeled complaint corpus and fits the text classifier head
+Streams labeled complaints, cleans them with TextPreprocessor.clean_text, embeds
+them in large length-bucketed batches (optionally across worker processes) and
+caches every embedding on disk by text hash, so re-runs only embed new rows.
+Exports text_classifier.pkl + label_encoder.pkl in the format ModelLoader loads,
+then the NumPy text_head.npz
+
+Usage:
+    python train_text.py --data complaints.csv
+    python train_text.py --data archive.parquet --workers 4 --threads 2
+    python train_text.py --data complaints.jsonl --save-embeddings corpus.npz
+"""
+
+import argparse
+import multiprocessing
+import os
+import re
+import time
+from concurrent.futures import ProcessPoolExecutor
+from pathlib import Path
+from typing import Dict, List, Tuple
+
+import joblib
+import numpy as np
+from sklearn.model_selection import train_test_split
+from sklearn.preprocessing import LabelEncoder
+
+from app.config import settings
+from app.utils.datasets import iter_records
+from app.utils.embedding_store import text_hash
+from app.utils.preprocessing import TextPreprocessor
+
+DEFAULT_CACHE_DIR = settings.BASE_DIR.parent / "data" / "text_embedding_cache"
+
+
+def _init_worker(threads: int, batch_size: int, max_batch_tokens: int):
+    """Load the embedder once per process, each process limited to `threads` threads"""
+    from app.config import settings, configure_runtime
+
+    settings.TORCH_NUM_THREADS = threads
+    settings.TORCH_INTEROP_THREADS = 1
+    settings.EMBED_BATCH_SIZE = batch_size
+    settings.EMBED_MAX_BATCH_TOKENS = max_batch_tokens
+    configure_runtime()
+
+    from app.models.model_loader import model_loader
+    model_loader.load_embedder()
+
+
+def embed_chunk(cleaned_texts: List[str]) -> np.ndarray:
+    """Embed cleaned texts with the serving code path (length-bucketed batches)"""
+    from app.models.model_loader import model_loader
+    from app.services.text_service import text_classification_service
+
+    # Only the embedder: the classifier head may not exist yet
+    return text_classification_service.encode_texts(
+        cleaned_texts,
+        embedder=model_loader.load_embedder()
+    )
+
+
+def embedder_key() -> str:
+    """
+    Cache namespace for the embedder ModelLoader serves
+
+    A custom models/multilingual_embedder is keyed by its config files,
+    otherwise by settings.MBERT_MODEL.
+    """
+    custom_path = settings.MODELS_DIR / "multilingual_embedder"
+    if custom_path.exists():
+        from app.models.linear_head import source_digest
+
+        configs = sorted(custom_path.rglob("*.json"))
+        return f"multilingual_embedder-{source_digest(configs)[:12]}"
+    return re.sub(r"[^A-Za-z0-9.-]+", "_", settings.MBERT_MODEL)
+
+
+class EmbeddingCache:
+    """
+    Embeddings keyed by text_hash(cleaned_text), in append-only .npz shards
+
+    Each shard holds `hashes` (S32) and `embeddings`; a finished batch
+    becomes one shard, written atomically, so an interrupted run keeps
+    everything embedded before it stopped.
+    """
+
+    def __init__(self, root: Path):
+        self.root = root
+        self.root.mkdir(parents=True, exist_ok=True)
+
+    def shards(self) -> List[Path]:
+        return sorted(self.root.glob("shard-*.npz"))
+
+    def lookup(self, hashes: np.ndarray) -> Dict[bytes, np.ndarray]:
+        """Cached embeddings for the requested hashes (others are left out)"""
+        found = {}
+        for shard in self.shards():
+            with np.load(shard, allow_pickle=False) as data:
+                shard_hashes = data["hashes"]
+                rows = np.flatnonzero(np.isin(shard_hashes, hashes))
+                if rows.size:
+                    embeddings = data["embeddings"]
+                    for row in rows:
+                        found[bytes(shard_hashes[row])] = embeddings[row]
+        return found
+
+    def add(self, hashes: np.ndarray, embeddings: np.ndarray) -> Path:
+        """Write one shard"""
+        index = len(self.shards())
+        path = self.root / f"shard-{index:06d}.npz"
+        while path.exists():
+            index += 1
+            path = self.root / f"shard-{index:06d}.npz"
+
+        # np.savez appends .npz to names without it, so keep the suffix on the temp file
+        temp_path = self.root / f".{path.stem}.tmp.npz"
+        np.savez(temp_path, hashes=hashes.astype("S32"), embeddings=embeddings.astype(np.float32))
+        os.replace(temp_path, path)
+        return path
+
+
+def load_corpus(path: Path, text_column: str, label_column: str) -> Tuple[List[str], List[str]]:
+    """Stream labeled rows and clean their texts; rows that clean to nothing are skipped"""
+    preprocessor = TextPreprocessor()
+    cleaned_texts, labels = [], []
+    skipped = 0
+
+    for row in iter_records(path):
+        text = row.get(text_column)
+        label = row.get(label_column)
+        if not text or label in (None, ""):
+            skipped += 1
+            continue
+
+        cleaned = preprocessor.clean_text(str(text))
+        if not cleaned:
+            skipped += 1
+            continue
+        cleaned_texts.append(cleaned)
+        labels.append(str(label))
+
+    if not cleaned_texts:
+        raise ValueError(f"No labeled rows found in {path} (columns: '{text_column}', '{label_column}')")
+    if skipped:
+        print(f"Skipped {skipped} rows without text or label")
+    return cleaned_texts, labels
+
+
+def embed_corpus(cleaned_texts: List[str], cache: EmbeddingCache, args) -> np.ndarray:
+    """
+    Embeddings for every text, from the cache where possible
+
+    Missing texts are deduplicated, sorted by length so each chunk
+    buckets with little padding, embedded and added to the cache chunk
+    by chunk.
+    """
+    hashes = np.array([text_hash(text) for text in cleaned_texts], dtype="S32")
+    unique_hashes, first_rows = np.unique(hashes, return_index=True)
+
+    found = cache.lookup(unique_hashes)
+    missing = [int(row) for hash_value, row in zip(unique_hashes, first_rows) if bytes(hash_value) not in found]
+    print(f"{len(cleaned_texts)} rows, {len(unique_hashes)} unique texts, "
+          f"{len(unique_hashes) - len(missing)} cached, {len(missing)} to embed")
+
+    if missing:
+        missing.sort(key=lambda row: len(cleaned_texts[row]), reverse=True)
+        chunks = [missing[i:i + args.chunk_size] for i in range(0, len(missing), args.chunk_size)]
+        started = time.perf_counter()
+        embedded = 0
+
+        def store(rows: List[int], embeddings: np.ndarray):
+            nonlocal embedded
+            chunk_hashes = hashes[rows]
+            cache.add(chunk_hashes, embeddings)
+            for hash_value, embedding in zip(chunk_hashes, embeddings):
+                found[bytes(hash_value)] = embedding
+
+            embedded += len(rows)
+            elapsed = time.perf_counter() - started
+            print(f"  {embedded}/{len(missing)} embedded, {embedded / elapsed:.1f} texts/s")
+
+        if args.workers > 1:
+            # PyTorch is not fork-safe once initialized
+            context = multiprocessing.get_context("spawn")
+            with ProcessPoolExecutor(
+                max_workers=args.workers,
+                mp_context=context,
+                initializer=_init_worker,
+                initargs=(args.threads, args.batch_size, args.max_batch_tokens)
+            ) as pool:
+                print(f"Embedding with {args.workers} workers x {args.threads} threads")
+                futures = [
+                    (rows, pool.submit(embed_chunk, [cleaned_texts[row] for row in rows]))
+                    for rows in chunks
+                ]
+                for rows, future in futures:
+                    store(rows, future.result())
+        else:
+            _init_worker(args.threads, args.batch_size, args.max_batch_tokens)
+            for rows in chunks:
+                store(rows, embed_chunk([cleaned_texts[row] for row in rows]))
+
+        elapsed = time.perf_counter() - started
+        print(f"✓ Embedded {len(missing)} texts in {elapsed:.1f}s ({len(missing) / elapsed:.1f} texts/s)")
+
+    return np.stack([found[bytes(hash_value)] for hash_value in hashes]).astype(np.float32)
+
+
+def train_text(args):
+    """Embed, fit and export the text head"""
+    from train_projection import build_head
+
+    if args.threads is None:
+        args.threads = max(1, (os.cpu_count() or 1) // args.workers)
+
+    cleaned_texts, labels = load_corpus(Path(args.data), args.text_column, args.label_column)
+    cache = EmbeddingCache(Path(args.cache_dir) / embedder_key())
+    embeddings = embed_corpus(cleaned_texts, cache, args)
+    labels = np.asarray(labels)
+    print(f"{len(embeddings)} samples, {embeddings.shape[1]}-dim embeddings, {len(set(labels))} classes")
+
+    if args.save_embeddings:
+        np.savez(args.save_embeddings, embeddings=embeddings, labels=labels)
+        print(f"✓ Embeddings saved: {args.save_embeddings}")
+
+    if args.test_size:
+        x_train, x_test, y_train, y_test = train_test_split(
+            embeddings, labels, test_size=args.test_size, stratify=labels, random_state=42
+        )
+        accuracy = float((build_head().fit(x_train, y_train).predict(x_test) == y_test).mean())
+        print(f"Held-out accuracy: {accuracy:.4f} ({len(y_test)} samples)")
+
+    output_dir = Path(args.output_dir or settings.MODELS_DIR)
+    output_dir.mkdir(parents=True, exist_ok=True)
+    head_path = output_dir / settings.TEXT_MODEL_PATH.name
+    encoder_path = output_dir / settings.LABEL_ENCODER_PATH.name
+    projection_path = output_dir / settings.TEXT_PROJECTION_PATH.name
+
+    # Refit on all samples
+    encoder = LabelEncoder().fit(labels)
+    head = build_head().fit(embeddings, encoder.transform(labels))
+    joblib.dump(head, head_path)
+    joblib.dump(encoder, encoder_path)
+    print(f"✓ Head saved: {head_path}")
+    print(f"✓ Label encoder saved: {encoder_path}")
+
+    if projection_path.exists():
+        projection_path.unlink()
+        print(f"✓ Removed {projection_path} (head uses full embeddings; re-run train_projection.py to reduce)")
+
+    if not args.no_export_head:
+        from export_text_head import export_text_head
+
+        print()
+        export_text_head(
+            model_path=head_path,
+            label_encoder_path=encoder_path,
+            projection_path=projection_path,
+            output_path=output_dir / settings.TEXT_HEAD_PATH.name,
+            embeddings_path=args.save_embeddings
+        )
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Embed a labeled corpus and fit the text classifier head")
+    parser.add_argument("--data", required=True, help="Labeled .csv, .jsonl or .parquet file")
+    parser.add_argument("--text-column", default="text")
+    parser.add_argument("--label-column", default="label")
+    parser.add_argument("--cache-dir", default=str(DEFAULT_CACHE_DIR), help="Embedding cache directory")
+    parser.add_argument("--save-embeddings", help="Also write an .npz for train_projection.py --embeddings")
+    parser.add_argument("--workers", type=int, default=1, help="Embedding processes")
+    parser.add_argument("--threads", type=int, default=None, help="Torch threads per process (default: cores / workers)")
+    parser.add_argument("--batch-size", type=int, default=128, help="Max texts per forward pass")
+    parser.add_argument("--max-batch-tokens", type=int, default=16384, help="Max padded tokens per forward pass")
+    parser.add_argument("--chunk-size", type=int, default=4096, help="Texts per worker task and cache shard")
+    parser.add_argument("--test-size", type=float, default=0.2, help="Held-out fraction to report (0 to skip)")
+    parser.add_argument("--output-dir", default=None, help="Defaults to the models directory")
+    parser.add_argument("--no-export-head", action="store_true", help="Skip writing text_head.npz")
+
+    train_text(parser.parse_args())